@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+行情处理与套利检测热路径基准测试
+使用固定种子生成的订单簿帧和 ticker（离线，不访问任何交易所），测量各热路径函数的
+吞吐（ops/sec）、单次耗时分位数（p50/p99）和内存分配，结果输出为 JSON，可在不同提交之间对比
+
+用法: python benchmarks/hotpath_benchmark.py
+环境变量:
+  BENCH_MIN_TIME（每项最少计时秒数，默认 1.0）、BENCH_MIN_ITERATIONS（每项最少次数，默认 5）
+  BENCH_SYMBOLS（WebSocket 机器人订阅的币种数，默认 20）、BENCH_CASES（只运行名称包含这些子串的项，逗号分隔）
+  BENCH_OUTPUT（结果文件路径）、BENCH_BASELINE（对比的基线结果文件，有退化时退出码为 1）
+  BENCH_TOLERANCE（允许的退化比例，默认 0.10）
+"""
+
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# 固定种子：同一提交上每次生成完全相同的输入
+SEED = 20240601
+TRIANGULAR_PAIRS = (100, 1000, 3000)
+# 每项分配统计最多执行的次数
+ALLOC_OPS = 1000
+
+
+# ===== 测试数据 =====
+
+def make_symbols(count):
+    return [f"C{i:03d}/USDT" for i in range(count)]
+
+
+def book_levels(rng, mid, depth, tick, side):
+    """围绕中间价生成一侧的价位（字符串，与交易所推送格式一致）"""
+    sign = -1 if side == 'bids' else 1
+    return [[f"{mid + sign * tick * (i + 1):.6f}", f"{rng.uniform(0.05, 5.0):.4f}"] for i in range(depth)]
+
+
+def make_frames(symbols, rng):
+    """每个币种的 Bitget books5 帧、Bybit 快照和增量序列
+
+    每 5 个币种中有 1 个两所价差交叉（Bybit 买一高于 Bitget 卖一），其余为正常盘口，
+    以便同时覆盖发现机会和无机会两条路径。
+    """
+    now_ms = str(int(time.time() * 1000))
+    bitget, bybit_snapshots, bybit_deltas = [], [], []
+    for i, symbol in enumerate(symbols):
+        native = symbol.replace('/', '')
+        mid = rng.uniform(0.5, 50000.0)
+        tick = mid * 0.0001
+        bybit_mid = mid * 1.004 if i % 5 == 0 else mid
+        bitget.append({
+            'action': 'snapshot',
+            'arg': {'instType': 'sp', 'channel': 'books5', 'instId': native},
+            'data': [{
+                'instId': native, 'ts': now_ms,
+                'bids': book_levels(rng, mid, 5, tick, 'bids'),
+                'asks': book_levels(rng, mid, 5, tick, 'asks'),
+            }],
+        })
+        bids = book_levels(rng, bybit_mid, 50, tick, 'bids')
+        asks = book_levels(rng, bybit_mid, 50, tick, 'asks')
+        topic = f"orderbook.50.{native}"
+        bybit_snapshots.append({'topic': topic, 'type': 'snapshot', 'ts': now_ms,
+                                'data': {'s': native, 'b': bids, 'a': asks, 'u': 2}})
+        # 增量只修改已有价位的数量，回放多少次盘口结构都保持不变
+        for _ in range(10):
+            bybit_deltas.append({'topic': topic, 'type': 'delta', 'ts': now_ms, 'data': {
+                's': native, 'u': 0,
+                'b': [[bids[j][0], f"{rng.uniform(0.05, 5.0):.4f}"] for j in rng.sample(range(20), 3)],
+                'a': [[asks[j][0], f"{rng.uniform(0.05, 5.0):.4f}"] for j in rng.sample(range(20), 3)],
+            }})
+    rng.shuffle(bybit_deltas)
+    return bitget, bybit_snapshots, bybit_deltas
+
+
+def make_tickers(pairs, rng):
+    """三角套利用的 ticker：所有币种都有 USDT 盘，部分另有 BTC/ETH 盘（接近真实交易所结构）"""
+    usd = {'USDT': 1.0, 'BTC': 60000.0, 'ETH': 3000.0}
+    tickers = {'BTC/USDT': None, 'ETH/USDT': None, 'ETH/BTC': None}
+    bases = []
+    while len(tickers) < pairs:
+        base = f"C{len(bases):04d}"
+        bases.append(base)
+        tickers[f"{base}/USDT"] = None
+        if len(tickers) < pairs and rng.random() < 0.2:
+            tickers[f"{base}/BTC"] = None
+        if len(tickers) < pairs and rng.random() < 0.1:
+            tickers[f"{base}/ETH"] = None
+    prices = {**usd, **{base: rng.uniform(0.001, 100.0) for base in bases}}
+    for symbol in tickers:
+        base, quote = symbol.split('/')
+        # 每个盘口独立加入噪声，使少量三角路径出现价差
+        mid = prices[base] / usd[quote] * (1 + rng.gauss(0, 0.001))
+        tickers[symbol] = {'symbol': symbol, 'bid': mid * 0.9995, 'ask': mid * 1.0005}
+    return tickers
+
+
+# ===== 被测对象 =====
+
+def drive(coroutine):
+    """不经过事件循环直接执行一个不会挂起的协程（消息处理函数不做 IO）"""
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        return
+    coroutine.close()
+    raise RuntimeError("handler suspended; fixture triggered an IO path")
+
+
+def websocket_cases(rng):
+    """WebSocket 机器人的消息处理与机会检测"""
+    from websocket_arbitrage_bot import WebSocketArbitrageBot
+
+    bot = WebSocketArbitrageBot()
+    # 回放某一所的帧时另一所的订单簿不会随之更新，固定新鲜度阈值，保证每次都走到深度计算
+    bot.config['max_book_age'] = float('inf')
+    symbols = bot.symbols.symbols
+    bitget, bybit_snapshots, bybit_deltas = make_frames(symbols, rng)
+    for message in bitget + bybit_snapshots:
+        message_handler = bot.process_bitget_message if 'arg' in message else bot.process_bybit_message
+        drive(message_handler(message))
+
+    # 每次回放都生成带当前时间戳的新帧（增量的 u 必须递增才会被应用，按回放次序重新编号）；
+    # 返回副本而不是改写原帧，分配统计预先生成的参数才不会共用同一个 u
+    update_id = [2]
+
+    def bitget_prepare(i):
+        message = bitget[i % len(bitget)]
+        return {**message, 'data': [{**message['data'][0], 'ts': str(int(time.time() * 1000))}]}
+
+    def bitget_op(i, message):
+        drive(bot.process_bitget_message(message, time.time(), time.perf_counter_ns(), time.perf_counter_ns()))
+
+    def bybit_prepare(i):
+        message = bybit_deltas[i % len(bybit_deltas)]
+        update_id[0] += 1
+        return {**message, 'ts': str(int(time.time() * 1000)), 'data': {**message['data'], 'u': update_id[0]}}
+
+    def bybit_op(i, message):
+        drive(bot.process_bybit_message(message, time.time(), time.perf_counter_ns(), time.perf_counter_ns()))
+
+    def check_op(i):
+        drive(bot.check_arbitrage_opportunity(i % len(symbols)))
+
+    # 交叉的币种每次到达深度计算都会记一次机会 tick；某项没有新增 tick 说明只走了提前返回的分支
+    ticks = [bot.opportunities.stats['ticks']]
+
+    def reached_detection():
+        observed = bot.opportunities.stats['ticks'] - ticks[0]
+        ticks[0] = bot.opportunities.stats['ticks']
+        if not observed:
+            raise AssertionError("crossed symbols never reached depth_arbitrage")
+
+    params = {'symbols': len(symbols)}
+    return [
+        ('process_bitget_message', params, bitget_op, bitget_prepare, reached_detection),
+        ('process_bybit_message', params, bybit_op, bybit_prepare, reached_detection),
+        ('check_arbitrage_opportunity', params, check_op, None, reached_detection),
+    ]
+
+
+def triangular_cases(rng):
+    """三角套利：构图 + 搜索长度不超过 4 的环路"""
+    from triangular_arbitrage import TriangularArbitrage
+
+    cases = []
+    for pairs in TRIANGULAR_PAIRS:
+        tickers = make_tickers(pairs, rng)
+        engine = TriangularArbitrage(exchange=None)
+
+        def op(i, engine=engine, tickers=tickers):
+            engine.build_graph(tickers)
+            engine.find_arbitrage_cycles('USDT', max_length=4)
+
+        cases.append((f'triangular_{pairs}', {'pairs': pairs, 'max_length': 4}, op, None, None))
+    return cases
+
+
+def live_cases(rng):
+    """实时机器人的深度套利计算（订单簿由测试数据提供，不请求 REST）"""
+    from live_arbitrage_bot import LiveArbitrageBot
+
+    bot = LiveArbitrageBot(simulation_mode=True)
+    symbols = make_symbols(20)
+    books = {}
+    for i, symbol in enumerate(symbols):
+        mid = rng.uniform(0.5, 50000.0)
+        tick = mid * 0.0001
+        for venue, venue_mid in (('bitget', mid), ('bybit', mid * 1.004 if i % 5 == 0 else mid)):
+            books[venue, symbol] = {
+                side: [[float(p), float(q)] for p, q in book_levels(rng, venue_mid, 5, tick, side)]
+                for side in ('bids', 'asks')
+            }
+    bot.get_orderbook = lambda exchange_name, symbol, limit=5: books[exchange_name, symbol]
+
+    def op(i):
+        bot.calculate_precise_arbitrage(symbols[i % len(symbols)])
+
+    return [('calculate_precise_arbitrage', {'symbols': len(symbols)}, op, None, None)]
+
+
+def risk_cases(rng):
+    """交易前风险检查（全部在限额内，即热路径上的放行分支）"""
+    from ultra_fast_arbitrage import RiskManagementSystem
+
+    risk = RiskManagementSystem()
+    symbols = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+    prices = {'BTC/USDT': 60000.0, 'ETH/USDT': 3000.0, 'SOL/USDT': 150.0}
+    orders = []
+    for _ in range(256):
+        symbol = rng.choice(symbols)
+        notional = rng.uniform(10.0, 500.0)
+        orders.append((symbol, rng.choice(('buy', 'sell')), notional / prices[symbol], prices[symbol]))
+
+    def op(i):
+        risk.check_trade_risk(*orders[i % len(orders)])
+
+    return [('check_trade_risk', {'orders': len(orders)}, op, None, None)]
+
+
+GROUPS = (websocket_cases, triangular_cases, live_cases, risk_cases)
+
+
+# ===== 测量 =====
+
+def measure(op, prepare, min_time, min_iterations):
+    """逐次计时直到累计耗时达到 min_time，返回每次耗时（纳秒）"""
+    # 预热
+    for i in range(min(min_iterations, 3)):
+        op(i) if prepare is None else op(i, prepare(i))
+
+    samples = []
+    spent = 0
+    i = 0
+    gc.collect()
+    while spent < min_time * 1e9 or i < min_iterations:
+        argument = None if prepare is None else prepare(i)
+        start = time.perf_counter_ns()
+        op(i) if prepare is None else op(i, argument)
+        elapsed = time.perf_counter_ns() - start
+        samples.append(elapsed)
+        spent += elapsed
+        i += 1
+    return np.array(samples, dtype=np.float64)
+
+
+def measure_allocations(op, prepare, iterations):
+    """tracemalloc 下执行若干次：分配峰值（含临时对象）和每次残留的字节数"""
+    arguments = [None if prepare is None else prepare(i) for i in range(iterations)]
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for i in range(iterations):
+        op(i) if prepare is None else op(i, arguments[i])
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'alloc_peak_kb': (peak - before) / 1024,
+        'retained_bytes_per_op': (after - before) / iterations,
+    }
+
+
+def run_case(name, params, op, prepare, check, min_time, min_iterations):
+    samples = measure(op, prepare, min_time, min_iterations)
+    iterations = len(samples)
+    result = {
+        'params': params,
+        'iterations': iterations,
+        'ops_per_sec': iterations / (samples.sum() / 1e9),
+        'mean_us': float(samples.mean()) / 1000,
+        'p50_us': float(np.percentile(samples, 50)) / 1000,
+        'p99_us': float(np.percentile(samples, 99)) / 1000,
+        'max_us': float(samples.max()) / 1000,
+    }
+    result.update(measure_allocations(op, prepare, min(iterations, ALLOC_OPS)))
+    # 确认测到的是预期路径（如机会检测没有被新鲜度检查提前返回）
+    if check is not None:
+        check()
+    return result
+
+
+def git_revision():
+    """当前提交（工作区有改动时标记 dirty），便于对比不同提交的结果"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return f"{commit}-dirty" if commit and dirty else commit or None
+
+
+def compare(results, baseline_path, tolerance):
+    """与基线对比：吞吐下降或 p99 上升超过 tolerance 记为退化"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n对比基线 {baseline_path} (提交 {baseline.get('commit')})")
+
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if 'error' in result or not base or 'error' in base:
+            continue
+        throughput = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        p99 = result['p99_us'] / base['p99_us'] - 1
+        regressed = throughput < -tolerance or p99 > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<30} ops/sec {throughput:+7.1%}  p99 {p99:+7.1%}  {'⚠️ 退化' if regressed else '✅'}")
+    return regressions
+
+
+def main():
+    min_time = float(os.getenv('BENCH_MIN_TIME', 1.0))
+    min_iterations = int(os.getenv('BENCH_MIN_ITERATIONS', 5))
+    symbol_count = int(os.getenv('BENCH_SYMBOLS', 20))
+    selected = [s.strip() for s in os.getenv('BENCH_CASES', '').split(',') if s.strip()]
+    output = os.getenv('BENCH_OUTPUT', os.path.join(REPO_ROOT, 'benchmarks', 'results', 'hotpath.json'))
+    baseline = os.getenv('BENCH_BASELINE')
+    tolerance = float(os.getenv('BENCH_TOLERANCE', 0.10))
+
+    # 机器人从环境变量读取配置：固定币种池，关闭通知、录制和共享缓存
+    os.environ['WS_SYMBOLS'] = ','.join(make_symbols(symbol_count))
+    os.environ['TELEGRAM_ENABLED'] = 'false'
+    for name in ('BOOK_RECORD_FILE', 'PRICE_CACHE_URL'):
+        os.environ.pop(name, None)
+
+    results = {}
+    # 机器人会在工作目录下写日志，放到临时目录中运行
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'logs'))
+        os.makedirs(os.path.join(workdir, 'data'))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for group in GROUPS:
+                try:
+                    cases = group(random.Random(SEED))
+                except Exception as e:
+                    # 缺少依赖（如 ccxt/networkx）时记录错误，其余项照常运行
+                    print(f"{group.__name__:<30} 失败: {type(e).__name__}: {e}")
+                    results[group.__name__] = {'error': f"{type(e).__name__}: {e}"}
+                    continue
+
+                for name, params, op, prepare, check in cases:
+                    if selected and not any(s in name for s in selected):
+                        continue
+                    try:
+                        results[name] = r = run_case(name, params, op, prepare, check, min_time, min_iterations)
+                    except Exception as e:
+                        results[name] = {'error': f"{type(e).__name__}: {e}"}
+                        print(f"{name:<30} 失败: {type(e).__name__}: {e}")
+                        continue
+                    print(f"{name:<30} {r['ops_per_sec']:12.0f} ops/s  p50 {r['p50_us']:10.1f} µs  "
+                          f"p99 {r['p99_us']:10.1f} µs  峰值分配 {r['alloc_peak_kb']:9.1f} KB  "
+                          f"残留 {r['retained_bytes_per_op']:8.1f} B/op")
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'benchmark': 'hotpath',
+        'timestamp': datetime.now().isoformat(),
+        'commit': git_revision(),
+        'python': sys.version.split()[0],
+        'seed': SEED,
+        'min_time': min_time,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} 项性能退化: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
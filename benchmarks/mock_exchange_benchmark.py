@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+模拟交易所行情推送压力测试
+在子进程中按不同 MOCK_RATE 启动 mock_exchange_server.py，客户端订阅 Bitget/Bybit 全部交易对，
+测量实际收到的消息速率（msg/s）和推送延迟（服务端时间戳到客户端收到），结果输出为 JSON
+
+用法: python benchmarks/mock_exchange_benchmark.py
+环境变量:
+  BENCH_RATES（每个交易对每秒推送条数，逗号分隔，默认 100,500,1000）、BENCH_SECONDS（每档计时秒数，默认 5）
+  BENCH_CLIENTS（并发客户端数，默认 1）、BENCH_OUTPUT（结果文件路径）
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import orjson
+import aiohttp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYMBOLS = 'BTCUSDT,ETHUSDT,SOLUSDT,DOGEUSDT,XRPUSDT'
+# 订阅后等待推送稳定再开始计时
+WARMUP_SECONDS = 1.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, rate):
+    env = {**os.environ, 'MOCK_HOST': '127.0.0.1', 'MOCK_PORT': str(port), 'MOCK_RATE': str(rate),
+           'MOCK_SYMBOLS': SYMBOLS, 'MOCK_LATENCY_MS': '0', 'MOCK_JITTER_MS': '0', 'MOCK_REPLAY_FILE': ''}
+    return subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, 'mock_exchange_server.py')],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(session, base):
+    for _ in range(100):
+        try:
+            async with session.get(f"{base}/v5/market/time") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError('mock exchange did not start')
+
+
+async def consume(session, url, subscribe, counts, lags, deadline, started):
+    """订阅并计数，计时窗口内记录每条行情的推送延迟（毫秒）"""
+    async with session.ws_connect(url, max_msg_size=0) as ws:
+        await ws.send_str(orjson.dumps(subscribe).decode())
+        async for msg in ws:
+            now = time.time()
+            if now >= deadline:
+                break
+            if now < started:
+                continue
+            data = orjson.loads(msg.data)
+            # Bybit 帧时间戳在顶层，Bitget 在 data[0]；订阅确认没有时间戳
+            payload = data.get('data')
+            ts = data.get('ts') or (payload[0].get('ts') if isinstance(payload, list) and payload else None)
+            if ts:
+                counts[url] = counts.get(url, 0) + 1
+                lags.append(now * 1000 - int(ts))
+
+
+async def measure(port, seconds, clients):
+    base = f"http://127.0.0.1:{port}"
+    symbols = SYMBOLS.split(',')
+    bitget = {'op': 'subscribe', 'args': [{'instType': 'SPOT', 'channel': 'books5', 'instId': s} for s in symbols]}
+    bybit = {'op': 'subscribe', 'args': [f"orderbook.50.{s}" for s in symbols]}
+    counts, lags = {}, []
+
+    async with aiohttp.ClientSession() as session:
+        await wait_ready(session, base)
+        started = time.time() + WARMUP_SECONDS
+        deadline = started + seconds
+        tasks = []
+        for _ in range(clients):
+            tasks.append(consume(session, f"ws://127.0.0.1:{port}/spot/v1/stream", bitget, counts, lags,
+                                 deadline, started))
+            tasks.append(consume(session, f"ws://127.0.0.1:{port}/v5/public/spot", bybit, counts, lags,
+                                 deadline, started))
+        await asyncio.wait_for(asyncio.gather(*tasks), seconds + WARMUP_SECONDS + 10)
+
+    received = sum(counts.values())
+    lag = np.asarray(lags) if lags else np.zeros(1)
+    return {
+        'received': received,
+        'msgs_per_sec': received / seconds,
+        'lag_p50_ms': float(np.percentile(lag, 50)),
+        'lag_p99_ms': float(np.percentile(lag, 99)),
+    }
+
+
+def main():
+    rates = [float(r) for r in os.getenv('BENCH_RATES', '100,500,1000').split(',') if r.strip()]
+    seconds = float(os.getenv('BENCH_SECONDS', 5))
+    clients = int(os.getenv('BENCH_CLIENTS', 1))
+    output = os.getenv('BENCH_OUTPUT', os.path.join(REPO_ROOT, 'benchmarks', 'results', 'mock_exchange.json'))
+    streams = len(SYMBOLS.split(',')) * 2 * clients
+
+    results = {}
+    for rate in rates:
+        port = free_port()
+        server = start_server(port, rate)
+        try:
+            r = asyncio.run(measure(port, seconds, clients))
+        except Exception as e:
+            results[f"rate_{rate:g}"] = {'error': f"{type(e).__name__}: {e}"}
+            print(f"rate={rate:<8g} 失败: {type(e).__name__}: {e}")
+            continue
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+        r['target_msgs_per_sec'] = rate * streams
+        r['delivered_ratio'] = r['msgs_per_sec'] / r['target_msgs_per_sec']
+        results[f"rate_{rate:g}"] = r
+        print(f"rate={rate:<8g} 目标 {r['target_msgs_per_sec']:9.0f} msg/s  实际 {r['msgs_per_sec']:9.0f} msg/s "
+              f"({r['delivered_ratio']:6.1%})  延迟 p50 {r['lag_p50_ms']:7.2f} ms  p99 {r['lag_p99_ms']:7.2f} ms")
+
+    report = {
+        'benchmark': 'mock_exchange',
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'symbols': SYMBOLS.split(','),
+        'clients': clients,
+        'seconds': seconds,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+启动开销基准测试
+在独立子进程中测量导入/初始化耗时和常驻内存（RSS 峰值），结果输出为 JSON
+
+用法: python benchmarks/startup_benchmark.py
+环境变量: BENCH_REPEAT（每项重复次数，默认 5）、BENCH_OUTPUT（结果文件路径）
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名称 -> 被测语句
+CASES = {
+    'interpreter': 'pass',
+    'import_ccxt': 'import ccxt',
+    'import_src_exchanges': 'import src.exchanges',
+    'exchanges_registry_only': 'from src.exchanges import create_exchange, CcxtClients',
+    'import_binance_adapter': 'from src.exchanges import BinanceExchange',
+    'import_src_monitoring': 'import src.monitoring',
+    'public_bot_init': 'import public_arbitrage_bot; public_arbitrage_bot.PublicArbitrageBot()',
+    'public_bot_first_client': (
+        'import public_arbitrage_bot; bot = public_arbitrage_bot.PublicArbitrageBot(); bot.exchanges["binance"]'
+    ),
+}
+
+PROBE = """
+import resource, sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'modules': len(sys.modules), 'ccxt_loaded': 'ccxt' in sys.modules}}))
+"""
+
+
+def run_case(stmt, workdir):
+    """在新解释器中执行一次，返回测量结果（失败时返回错误信息）"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(root=REPO_ROOT, stmt=stmt)],
+        cwd=workdir, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeat = int(os.getenv('BENCH_REPEAT', 5))
+    output = os.getenv('BENCH_OUTPUT', os.path.join(REPO_ROOT, 'benchmarks', 'results', 'startup.json'))
+
+    results = {}
+    # 机器人会在工作目录下写日志，放到临时目录中运行
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'logs'))
+        os.makedirs(os.path.join(workdir, 'data'))
+
+        for name, stmt in CASES.items():
+            runs = [run_case(stmt, workdir) for _ in range(repeat)]
+            ok = [r for r in runs if 'error' not in r]
+            if not ok:
+                results[name] = {'error': runs[0]['error']}
+                print(f"{name:<26} 失败: {runs[0]['error']}")
+                continue
+
+            results[name] = {
+                'runs': len(ok),
+                'median_ms': statistics.median(r['seconds'] for r in ok) * 1000,
+                'min_ms': min(r['seconds'] for r in ok) * 1000,
+                'max_rss_mb': max(r['max_rss_kb'] for r in ok) / 1024,
+                'modules': ok[0]['modules'],
+                'ccxt_loaded': ok[0]['ccxt_loaded'],
+            }
+            r = results[name]
+            print(f"{name:<26} {r['median_ms']:8.1f} ms  RSS {r['max_rss_mb']:7.1f} MB  "
+                  f"模块 {r['modules']:5d}  ccxt={'是' if r['ccxt_loaded'] else '否'}")
+
+    report = {
+        'benchmark': 'startup',
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'repeat': repeat,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 import requests
 
+from src.models import PriceStats
+
 # 加载环境变量
 load_dotenv()
 
@@ -38,9 +40,9 @@ class BitgetPriceMonitor:
         # 监控的交易对
         self.symbols = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'DOGE/USDT', 'XRP/USDT']
         
-        # 价格历史
-        self.price_history = {symbol: [] for symbol in self.symbols}
+        # 价格历史：每个币种固定大小的环形缓冲，增量维护均值/波动率/EWMA
         self.max_history = 100  # 保留最近100个价格
+        self.price_stats = {symbol: PriceStats(self.max_history) for symbol in self.symbols}
         
         # Telegram 通知
         self.telegram_enabled = os.getenv('TELEGRAM_ENABLED', 'false').lower() == 'true'
@@ -89,10 +91,9 @@ class BitgetPriceMonitor:
                         'timestamp': datetime.now()
                     }
                     
-                    # 添加到历史记录
-                    self.price_history[symbol].append(prices[symbol])
-                    if len(self.price_history[symbol]) > self.max_history:
-                        self.price_history[symbol].pop(0)
+                    # 添加到历史记录（O(1)，旧价格自动被覆盖）
+                    if ticker['last']:
+                        self.price_stats[symbol].update(ticker['last'])
             
             return prices
             
@@ -105,15 +106,15 @@ class BitgetPriceMonitor:
         alerts = []
         
         for symbol, price_data in current_prices.items():
-            history = self.price_history[symbol]
+            stats = self.price_stats[symbol]
             
-            if len(history) >= 2:
+            if stats.count >= 2:
                 # 计算价格变化
-                prev_price = history[-2]['last']
+                prev_price = stats.price.previous()
                 curr_price = price_data['last']
                 
                 if prev_price and curr_price:
-                    change_percent = ((curr_price - prev_price) / prev_price) * 100
+                    change_percent = stats.last_return * 100
                     
                     # 检查是否超过阈值
                     if abs(change_percent) >= self.alert_threshold:
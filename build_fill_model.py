@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+从录制的订单簿构建滑点/成交概率查找表
+录制文件为 JSON Lines（venue, symbol, ts, bids, asks），可由 websocket_arbitrage_bot.py
+设置 BOOK_RECORD_FILE 录制，格式与 mock_exchange_server.py 的回放文件相同
+
+用法: python build_fill_model.py data/books.jsonl [data/fill_model.npz]
+环境变量: FILL_MIN_PROB（默认 0.8）、FILL_MAX_SLIPPAGE_BPS（默认 5），随查找表一起保存，
+         机器人加载模型时按这两个阈值确定最大下单金额
+"""
+
+import os
+import sys
+import time
+
+from src.models import FillModel, load_book_frames
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else os.getenv('FILL_MODEL_PATH', 'data/fill_model.npz')
+
+    start = time.perf_counter()
+    books = load_book_frames(source)
+    print(f"📂 读取 {sum(len(b['ts']) for b in books.values())} 帧, {len(books)} 个订单簿 "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    model = FillModel.fit(books)
+    model.set_limits(float(os.getenv('FILL_MIN_PROB', 0.8)), float(os.getenv('FILL_MAX_SLIPPAGE_BPS', 5)))
+    print(f"🧮 拟合完成 ({time.perf_counter() - start:.1f}s)")
+
+    for row in model.summary():
+        limits = ', '.join(f"{int(latency)}ms:${notional:,.0f}" for latency, notional in row['max_notional'].items())
+        print(f"  {row['venue']:<8} {row['symbol']:<10} {row['side']:<4} 样本 {row['samples']:>6}  {limits}")
+
+    model.save(output)
+    print(f"💾 已保存到 {output}")
+
+
+if __name__ == "__main__":
+    main()
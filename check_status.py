@@ -9,6 +9,8 @@ import requests
 from datetime import datetime
 from dotenv import load_dotenv
 
+from src.storage import SharedPriceCache
+
 # 加载环境变量
 load_dotenv()
 
@@ -30,6 +32,16 @@ def get_latest_log():
         pass
     return []
 
+def get_cached_prices(max_age=10):
+    """读取共享价格缓存中的最新报价（未配置 PRICE_CACHE_URL 时为空）"""
+    cache = SharedPriceCache.from_env()
+    if cache is None:
+        return []
+    try:
+        return cache.snapshot(max_age=max_age)
+    except Exception:
+        return []
+
 def send_status_telegram():
     """发送状态到 Telegram"""
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -87,6 +99,15 @@ def main():
     else:
         print("没有找到日志文件")
     
+    # 共享价格缓存中的最新报价
+    prices = get_cached_prices()
+    if prices:
+        print("\n📈 最新报价 (共享缓存):")
+        print("-" * 40)
+        for top in prices:
+            age = datetime.now().timestamp() - top['ts']
+            print(f"{top['venue']:<8} {top['symbol']:<12} {top['bid']} / {top['ask']} ({age:.1f}s 前)")
+    
     # 发送 Telegram 通知
     if os.getenv('TELEGRAM_ENABLED', 'false').lower() == 'true':
         send_status_telegram()
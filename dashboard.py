@@ -7,12 +7,18 @@
 import os
 import time
 import json
+import urllib.request
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import glob
 
+from src.monitoring import METRICS_PORTS
+from src.monitoring.log_tailer import LogTailer
+from src.storage import RecordStore, SharedPriceCache
+
 class ArbitrageDashboard:
     def __init__(self):
         """初始化仪表板"""
@@ -32,6 +38,21 @@ class ArbitrageDashboard:
         
         self.performance_data = defaultdict(list)
         
+        # 各策略的指标端点（/metrics.json）
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        
+        # 增量日志读取：只解析新追加的行，偏移量和聚合结果持久化
+        self.tailer = LogTailer('data/dashboard_log_state.json')
+        self.log_aggregates = self.tailer.aggregates
+        self.log_aggregates.setdefault('strategies', {})
+        self.log_aggregates.setdefault('hourly', {})
+        
+        # 性能快照追加写入 SQLite，不再每次重写整天的 JSON 文件
+        self.store = RecordStore('data/arbitrage.db')
+        
+        # 共享价格缓存（PRICE_CACHE_URL）：直接读取行情入口进程发布的最优报价
+        self.price_cache = SharedPriceCache.from_env()
+        
     def check_process_status(self):
         """检查各策略进程状态"""
         import subprocess
@@ -54,40 +75,103 @@ class ArbitrageDashboard:
             except:
                 self.strategies[strategy]['status'] = 'unknown'
     
-    def analyze_logs(self):
-        """分析日志文件获取性能数据"""
+    def fetch_metrics(self, strategy):
+        """读取策略进程导出的结构化指标"""
+        port = METRICS_PORTS.get(strategy)
+        if not port:
+            return None
+        try:
+            url = f"http://{self.metrics_host}:{port}/metrics.json"
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                return json.loads(response.read())
+        except Exception:
+            return None
+    
+    def analyze_metrics(self):
+        """从指标端点读取机会、执行和盈亏（O(1)，无需扫描日志）"""
+        # 各端口并发读取：刷新耗时取决于最慢的端点，而不是所有超时之和
+        with ThreadPoolExecutor(max_workers=len(self.strategies)) as pool:
+            snapshots = dict(zip(self.strategies, pool.map(self.fetch_metrics, self.strategies)))
+        
+        for strategy, info in self.strategies.items():
+            snapshot = snapshots[strategy]
+            if snapshot is None:
+                info['source'] = 'logs'
+                continue
+            
+            metrics = snapshot['metrics']
+            
+            def total(name, **match):
+                samples = metrics.get(name, {}).get('samples', [])
+                return sum(s['value'] for s in samples
+                           if all(s['labels'].get(k) == v for k, v in match.items()))
+            
+            info['opportunities'] = int(total('arbitrage_opportunities_total'))
+            info['executions'] = int(total('arbitrage_executions_total', result='success'))
+            info['pnl'] = total('arbitrage_pnl_usdt')
+            info['source'] = 'metrics'
+    
+    def _consume_log_line(self, strategy, line):
+        """把一行新日志累加到运行中的聚合数据"""
+        totals = self.log_aggregates['strategies'].setdefault(
+            strategy, {'opportunities': 0, 'executions': 0, 'profits': 0.0}
+        )
+        
+        # 日志格式: 2024-01-01 12:34:56,789 - ...
+        hour = None
+        if line.startswith('20') and len(line) > 13 and line[10] == ' ':
+            try:
+                hour = str(int(line[11:13]))
+            except ValueError:
+                pass
+        hourly = None
+        if hour is not None:
+            hourly = self.log_aggregates['hourly'].setdefault(hour, {'opportunities': 0, 'profits': 0.0})
+        
+        if '发现套利机会' in line or '发现机会' in line:
+            totals['opportunities'] += 1
+        if hourly is not None and '发现' in line and '机会' in line:
+            hourly['opportunities'] += 1
+        if '执行成功' in line or '交易执行成功' in line:
+            totals['executions'] += 1
+        
+        # 提取利润
+        if '利润:' in line:
+            try:
+                profit_str = line.split('利润:')[1].split()[0]
+                profit = float(profit_str.replace('$', '').replace(',', ''))
+            except (IndexError, ValueError):
+                return
+            totals['profits'] += profit
+            if hourly is not None:
+                hourly['profits'] += profit
+    
+    def update_log_aggregates(self):
+        """增量读取各日志新追加的内容，并保存偏移量和聚合结果"""
         for strategy, log_file in self.log_files.items():
-            if os.path.exists(log_file):
-                try:
-                    # 读取最后1000行
-                    with open(log_file, 'r') as f:
-                        lines = f.readlines()[-1000:]
-                    
-                    # 分析机会和执行
-                    opportunities = 0
-                    executions = 0
-                    profits = 0
-                    
-                    for line in lines:
-                        if '发现套利机会' in line or '发现机会' in line:
-                            opportunities += 1
-                        if '执行成功' in line or '交易执行成功' in line:
-                            executions += 1
-                        # 提取利润
-                        if '利润:' in line:
-                            try:
-                                profit_str = line.split('利润:')[1].split()[0]
-                                profit = float(profit_str.replace('$', '').replace(',', ''))
-                                profits += profit
-                            except:
-                                pass
-                    
-                    self.strategies[strategy]['opportunities'] = opportunities
-                    self.strategies[strategy]['executions'] = executions
-                    self.strategies[strategy]['pnl'] = profits
-                    
-                except Exception as e:
-                    print(f"分析 {strategy} 日志失败: {e}")
+            try:
+                for line in self.tailer.read_new_lines(log_file):
+                    self._consume_log_line(strategy, line)
+            except Exception as e:
+                print(f"分析 {strategy} 日志失败: {e}")
+        
+        try:
+            self.tailer.save()
+        except Exception as e:
+            print(f"保存日志偏移量失败: {e}")
+    
+    def analyze_logs(self):
+        """分析日志文件获取性能数据（仅用于未导出指标的策略）"""
+        self.update_log_aggregates()
+        
+        for strategy in self.log_files:
+            if self.strategies[strategy].get('source') == 'metrics':
+                continue
+            totals = self.log_aggregates['strategies'].get(strategy)
+            if totals:
+                self.strategies[strategy]['opportunities'] = totals['opportunities']
+                self.strategies[strategy]['executions'] = totals['executions']
+                self.strategies[strategy]['pnl'] = totals['profits']
     
     def calculate_statistics(self):
         """计算综合统计数据"""
@@ -104,39 +188,25 @@ class ArbitrageDashboard:
             'success_rate': (total_executions / total_opportunities * 100) if total_opportunities > 0 else 0
         }
     
+    def latest_prices(self, max_age=10):
+        """共享缓存中的最优买卖价，按币种分组 {symbol: {venue: top}}"""
+        if self.price_cache is None:
+            return {}
+        try:
+            tops = self.price_cache.snapshot(max_age=max_age)
+        except Exception:
+            return {}
+        prices = defaultdict(dict)
+        for top in tops:
+            prices[top['symbol']][top['venue']] = top
+        return prices
+    
     def analyze_best_hours(self):
-        """分析最佳交易时段"""
-        hourly_data = defaultdict(lambda: {'opportunities': 0, 'profits': 0})
-        
-        # 分析所有日志文件
-        for log_file in self.log_files.values():
-            if os.path.exists(log_file):
-                try:
-                    with open(log_file, 'r') as f:
-                        for line in f:
-                            # 提取时间戳
-                            if line.startswith('20'):  # 假设日志以日期开始
-                                try:
-                                    timestamp_str = line.split(' - ')[0]
-                                    timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
-                                    hour = timestamp.hour
-                                    
-                                    if '发现' in line and '机会' in line:
-                                        hourly_data[hour]['opportunities'] += 1
-                                    
-                                    if '利润:' in line:
-                                        try:
-                                            profit = float(line.split('利润:')[1].split()[0].replace('$', ''))
-                                            hourly_data[hour]['profits'] += profit
-                                        except:
-                                            pass
-                                except:
-                                    pass
-                except:
-                    pass
+        """分析最佳交易时段（基于增量聚合的每小时数据）"""
+        hourly_data = self.log_aggregates['hourly']
         
         # 找出最佳时段
-        best_hours = sorted(hourly_data.items(), 
+        best_hours = sorted(((int(hour), data) for hour, data in hourly_data.items()),
                           key=lambda x: x[1]['profits'], 
                           reverse=True)[:5]
         
@@ -179,6 +249,16 @@ class ArbitrageDashboard:
         print(f"执行成功率: {stats['success_rate']:.1f}%")
         print(f"总盈亏: ${stats['total_pnl']:.2f}")
         
+        # 实时价格（共享缓存）
+        prices = self.latest_prices()
+        if prices:
+            print("\n" + "=" * 80)
+            print("📈 实时价格 (共享缓存):")
+            print("-" * 80)
+            for symbol, venues in sorted(prices.items()):
+                quotes = " | ".join(f"{venue}: {top['bid']} / {top['ask']}" for venue, top in sorted(venues.items()))
+                print(f"{symbol:<12} {quotes}")
+        
         # 最佳交易时段
         best_hours = self.analyze_best_hours()
         if best_hours:
@@ -234,26 +314,16 @@ class ArbitrageDashboard:
             'strategies': dict(self.strategies)
         }
         
-        # 保存到JSON文件
-        filename = f"data/performance_{timestamp.strftime('%Y%m%d')}.json"
-        os.makedirs('data', exist_ok=True)
-        
         try:
-            # 读取现有数据
-            if os.path.exists(filename):
-                with open(filename, 'r') as f:
-                    data = json.load(f)
-            else:
-                data = []
-            
-            # 添加新记录
-            data.append(performance_record)
-            
-            # 保存
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
-        except:
-            pass
+            self.store.append('performance', performance_record, ts=timestamp)
+        except Exception as e:
+            print(f"保存性能数据失败: {e}")
+    
+    def performance_history(self, hours=24, bucket_seconds=3600):
+        """按时间段聚合的历史 PnL（来自性能快照）"""
+        start = datetime.now() - timedelta(hours=hours)
+        return self.store.aggregate('performance', 'total_pnl', start=start,
+                                    bucket_seconds=bucket_seconds)
     
     def run(self, refresh_interval=10):
         """运行仪表板"""
@@ -264,6 +334,7 @@ class ArbitrageDashboard:
             while True:
                 # 更新数据
                 self.check_process_status()
+                self.analyze_metrics()
                 self.analyze_logs()
                 
                 # 显示仪表板
@@ -277,6 +348,8 @@ class ArbitrageDashboard:
                 
         except KeyboardInterrupt:
             print("\n仪表板已关闭")
+        finally:
+            self.store.close()
 
 def main():
     """主函数"""
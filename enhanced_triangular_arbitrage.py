@@ -14,6 +14,7 @@ import requests
 import sys
 sys.path.append('/root/crypto-arbitrage')
 from triangular_arbitrage import TriangularArbitrage
+from src.monitoring import BotMetrics
 
 # 加载环境变量
 load_dotenv()
@@ -56,6 +57,10 @@ class EnhancedTriangularArbitrage:
             'execution_mode': 'simulation',  # simulation 或 live
         }
         
+        # 结构化指标（供 dashboard 读取）
+        self.metrics = BotMetrics('triangular')
+        self.metrics.start_thread()
+        
         # 统计
         self.stats = {
             'opportunities_found': 0,
@@ -118,6 +123,7 @@ class EnhancedTriangularArbitrage:
                     
                     if net_profit > 0:
                         self.stats['profitable_opportunities'] += 1
+                        self.metrics.opportunity('->'.join(opp['path']))
                         
                         # 记录机会
                         logger.info(f"🎯 发现套利机会!")
@@ -167,6 +173,7 @@ class EnhancedTriangularArbitrage:
             
             if result:
                 self.stats['total_profit'] += result['profit']
+                self.metrics.execution('->'.join(result['path']), result['profit'], success=result['profit'] > 0)
                 
                 message = f"""
 ✅ <b>三角套利执行成功!</b>
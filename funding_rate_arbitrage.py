@@ -13,6 +13,9 @@ from dotenv import load_dotenv
 import requests
 import pandas as pd
 
+from src.exchanges.symbols import SymbolRegistry
+from src.monitoring import BotMetrics
+
 # 加载环境变量
 load_dotenv()
 
@@ -61,9 +64,19 @@ class FundingRateArbitrage:
             'auto_close_threshold': -0.005,  # 资金费率低于 -0.005% 时平仓
         }
         
+        # 现货币种 -> 永续合约 ccxt 符号（首次获取资金费率时由市场元数据构建）
+        self.futures_symbols = None
+        
         # 当前持仓
         self.positions = {}
         
+        # 结构化指标（供 dashboard 读取）
+        self.metrics = BotMetrics('funding_rate')
+        self.metrics.start_thread()
+        self.active_positions_gauge = self.metrics.registry.gauge(
+            'arbitrage_active_positions', 'Open arbitrage positions', ('strategy',)
+        ).labels('funding_rate')
+        
         # 统计
         self.stats = {
             'total_funding_collected': 0.0,
@@ -96,17 +109,33 @@ class FundingRateArbitrage:
         except Exception as e:
             logger.error(f"Telegram 发送失败: {e}")
     
+    def load_futures_symbols(self):
+        """从合约市场元数据建立 现货币种 -> U 本位永续合约符号 的映射（只加载一次）"""
+        if self.futures_symbols is None:
+            markets = self.futures_exchange.load_markets().values()
+            registry = SymbolRegistry()
+            registry.add_markets('bitget_swap', [m for m in markets if m.get('swap') and m.get('linear')],
+                                 native_key='symbol', symbols=self.config['symbols'])
+            for symbol in self.config['symbols']:
+                if symbol not in registry:
+                    logger.warning(f"{symbol} 没有对应的永续合约，跳过")
+            self.futures_symbols = registry
+        return self.futures_symbols
+    
     def get_funding_rates(self):
         """获取所有币种的资金费率"""
         funding_rates = {}
         
         try:
+            futures_symbols = self.load_futures_symbols()
             for symbol in self.config['symbols']:
-                # 获取永续合约的资金费率
-                futures_symbol = symbol.replace('/', '')  # BTC/USDT -> BTCUSDT
+                if symbol not in futures_symbols:
+                    continue
+                # 获取永续合约的资金费率：BTC/USDT -> BTC/USDT:USDT
+                futures_symbol = futures_symbols.native('bitget_swap', symbol)
                 
                 # Bitget API 获取资金费率
-                funding_info = self.futures_exchange.fetch_funding_rate(symbol)
+                funding_info = self.futures_exchange.fetch_funding_rate(futures_symbol)
                 
                 funding_rates[symbol] = {
                     'rate': funding_info['fundingRate'],
@@ -132,6 +161,7 @@ class FundingRateArbitrage:
             
             # 正资金费率：做空永续合约 + 做多现货
             if rate > self.config['min_funding_rate'] / 100:
+                self.metrics.opportunity(symbol)
                 opportunities.append({
                     'symbol': symbol,
                     'type': 'positive_funding',
@@ -145,6 +175,7 @@ class FundingRateArbitrage:
             
             # 负资金费率：做多永续合约 + 做空现货（或不持有）
             elif rate < -self.config['min_funding_rate'] / 100:
+                self.metrics.opportunity(symbol)
                 opportunities.append({
                     'symbol': symbol,
                     'type': 'negative_funding',
@@ -170,7 +201,8 @@ class FundingRateArbitrage:
             
             # 获取当前价格
             spot_ticker = self.spot_exchange.fetch_ticker(symbol)
-            futures_ticker = self.futures_exchange.fetch_ticker(symbol)
+            futures_ticker = self.futures_exchange.fetch_ticker(
+                self.load_futures_symbols().native('bitget_swap', symbol))
             
             spot_price = spot_ticker['last']
             futures_price = futures_ticker['last']
@@ -199,6 +231,8 @@ class FundingRateArbitrage:
             
             self.stats['active_positions'] += 1
             self.stats['total_positions_opened'] += 1
+            self.metrics.executions.labels('funding_rate', symbol, 'success').inc()
+            self.active_positions_gauge.set(self.stats['active_positions'])
             
             # 发送通知
             message = f"""
@@ -231,6 +265,7 @@ class FundingRateArbitrage:
                     funding_collected = position['size'] * position['futures_entry_price'] * position['funding_rate'] * funding_periods
                     position['funding_collected'] = funding_collected
                     self.stats['total_funding_collected'] += funding_collected
+                    self.metrics.pnl.set(self.stats['total_funding_collected'])
                 
                 # 检查是否需要平仓
                 if position['type'] == 'positive_funding' and current_rate < self.config['auto_close_threshold']:
@@ -265,6 +300,7 @@ class FundingRateArbitrage:
         # 移除仓位
         del self.positions[symbol]
         self.stats['active_positions'] -= 1
+        self.active_positions_gauge.set(self.stats['active_positions'])
     
     def print_dashboard(self):
         """打印仪表板"""
@@ -12,19 +12,17 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
 
+from src.exchanges.inventory import InventoryService
+from src.exchanges.rate_limiter import ACCOUNT, SCHEDULER
+from src.models import FillModel, depth_arbitrage
+from src.monitoring import BotMetrics, EventLogger, configure_logging
+from src.storage import ARBITRAGE_TRADE_SCHEMA, TradeLedger
+
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/live_arbitrage.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+events = EventLogger(logger)
 
 class LiveArbitrageBot:
     def __init__(self, simulation_mode=True):
@@ -32,6 +30,10 @@ class LiveArbitrageBot:
         
         self.simulation_mode = simulation_mode  # 模拟模式
         
+        # 结构化指标（供 dashboard 读取）
+        self.metrics = BotMetrics('live')
+        self.metrics.start_thread()
+        
         # 初始化交易所
         self.exchanges = self._init_exchanges()
         
@@ -43,6 +45,11 @@ class LiveArbitrageBot:
             'check_interval': float(os.getenv('PRICE_UPDATE_INTERVAL', 5)),  # 5秒检查
             'slippage_tolerance': 0.02,  # 2% 滑点容忍度
             'max_daily_trades': 20,  # 每日最大交易次数
+            'execution_latency_ms': float(os.getenv('EXECUTION_LATENCY_MS', 2000)),  # 决策到成交的延迟
+            'default_slippage': 0.001,  # 无滑点模型时的固定滑点 0.1%
+            'min_fill_probability': float(os.getenv('MIN_FILL_PROBABILITY', 0.5)),
+            'balance_refresh_interval': float(os.getenv('BALANCE_REFRESH_INTERVAL', 60)),  # 实盘余额刷新间隔（秒）
+            'simulated_holdings_usdt': 250.0,  # 模拟模式下每个交易所每种币的初始现货价值（卖出腿需要库存）
             'fees': {
                 'bitget': {'maker': 0.001, 'taker': 0.001},  # 0.1%
                 'bybit': {'maker': 0.001, 'taker': 0.001}    # 0.1%
@@ -59,18 +66,32 @@ class LiveArbitrageBot:
             'positions': {}  # 当前持仓
         }
         
-        # 统计数据
+        # 各交易所余额库存：交易前检查只读内存，不再逐笔查询 REST；
+        # 实盘每 balance_refresh_interval 秒批量刷新一次，模拟模式按交易所平均分配初始资金
+        self.inventory = InventoryService()
+        self.inventory.bootstrap(
+            self.exchanges,
+            lambda venue, exchange: SCHEDULER.call(venue, exchange.fetch_balance, endpoint=ACCOUNT),
+            seed={'USDT': {'free': self.account['initial_balance'] / len(self.exchanges), 'locked': 0}},
+            live=not self.simulation_mode,
+        )
+        
+        # 由录制订单簿拟合的滑点/成交概率查找表（build_fill_model.py 生成，可选）
+        self.fill_model = FillModel.load_optional()
+        
+        # 成交记录：定长列式缓冲，写满后较旧的一半落盘，内存不随运行时间增长
+        self.trades = TradeLedger(
+            ARBITRAGE_TRADE_SCHEMA,
+            capacity=int(os.getenv('TRADE_LEDGER_CAPACITY', '10000')),
+            spill_dir=os.getenv('TRADE_LEDGER_DIR', 'data/trade_ledger'),
+            name='live',
+        )
+        
+        # 统计数据（成交相关的次数/手续费/最佳最差由 self.trades 的累计聚合提供）
         self.stats = {
             'total_opportunities': 0,
-            'executed_trades': 0,
-            'successful_trades': 0,
-            'failed_trades': 0,
-            'total_fees_paid': 0.0,
-            'best_profit': 0.0,
-            'worst_loss': 0.0,
             'start_time': datetime.now(),
-            'last_reset_time': datetime.now(),
-            'trade_history': []
+            'last_reset_time': datetime.now()
         }
         
         # 创建日志目录
@@ -90,7 +111,7 @@ class LiveArbitrageBot:
             # Bitget (使用您已配置的API)
             if self.simulation_mode:
                 exchanges['bitget'] = ccxt.bitget({
-                    'enableRateLimit': True,
+                    'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                     'timeout': 10000
                 })
             else:
@@ -98,12 +119,12 @@ class LiveArbitrageBot:
                     'apiKey': os.getenv('BITGET_API_KEY'),
                     'secret': os.getenv('BITGET_API_SECRET'),
                     'password': os.getenv('BITGET_PASSPHRASE'),
-                    'enableRateLimit': True
+                    'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 })
             
             # Bybit (使用公共API或您的API)
             exchanges['bybit'] = ccxt.bybit({
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 'timeout': 10000
             })
             
@@ -119,7 +140,7 @@ class LiveArbitrageBot:
         """获取订单簿数据"""
         try:
             exchange = self.exchanges[exchange_name]
-            orderbook = exchange.fetch_order_book(symbol, limit)
+            orderbook = SCHEDULER.call(exchange_name, exchange.fetch_order_book, symbol, limit)
             return orderbook
         except Exception as e:
             logger.warning(f"⚠️ 获取 {exchange_name} {symbol} 订单簿失败: {str(e)[:100]}")
@@ -145,69 +166,31 @@ class LiveArbitrageBot:
             return None
         
         opportunities = []
-        
-        # 场景1: Bitget买入 -> Bybit卖出
-        buy_price = bitget_best_ask  # 在Bitget以卖价买入
-        sell_price = bybit_best_bid  # 在Bybit以买价卖出
-        
-        # 计算利润（考虑手续费）
-        buy_fee = buy_price * self.config['fees']['bitget']['taker']
-        sell_fee = sell_price * self.config['fees']['bybit']['taker'] 
-        
-        total_cost = buy_price + buy_fee
-        total_revenue = sell_price - sell_fee
-        profit_per_unit = total_revenue - total_cost
-        profit_percentage = (profit_per_unit / total_cost) * 100
-        
-        if profit_percentage > self.config['min_profit_percentage']:
-            # 计算最大交易量
-            max_quantity = min(
-                self.config['max_trade_amount'] / buy_price,  # 资金限制
-                bitget_book['asks'][0][1],  # Bitget卖单量
-                bybit_book['bids'][0][1]    # Bybit买单量
-            )
-            
-            opportunities.append({
-                'direction': 'Bitget -> Bybit',
-                'buy_exchange': 'Bitget',
-                'sell_exchange': 'Bybit',
-                'buy_price': buy_price,
-                'sell_price': sell_price,
-                'profit_percentage': profit_percentage,
-                'profit_per_unit': profit_per_unit,
-                'max_quantity': max_quantity,
-                'estimated_profit': profit_per_unit * max_quantity
-            })
-        
-        # 场景2: Bybit买入 -> Bitget卖出
-        buy_price = bybit_best_ask
-        sell_price = bitget_best_bid
-        
-        buy_fee = buy_price * self.config['fees']['bybit']['taker']
-        sell_fee = sell_price * self.config['fees']['bitget']['taker']
-        
-        total_cost = buy_price + buy_fee
-        total_revenue = sell_price - sell_fee
-        profit_per_unit = total_revenue - total_cost
-        profit_percentage = (profit_per_unit / total_cost) * 100
-        
-        if profit_percentage > self.config['min_profit_percentage']:
-            max_quantity = min(
-                self.config['max_trade_amount'] / buy_price,
-                bybit_book['asks'][0][1],
-                bitget_book['bids'][0][1]
+        books = {'Bitget': bitget_book, 'Bybit': bybit_book}
+        
+        # 两个方向分别沿深度计算：Bitget买入 -> Bybit卖出，Bybit买入 -> Bitget卖出
+        for buy_exchange, sell_exchange in (('Bitget', 'Bybit'), ('Bybit', 'Bitget')):
+            cross = depth_arbitrage(
+                books[buy_exchange]['asks'], books[sell_exchange]['bids'],
+                self.config['fees'][buy_exchange.lower()]['taker'],
+                self.config['fees'][sell_exchange.lower()]['taker'],
+                max_notional=self.config['max_trade_amount'],  # 资金限制
             )
+            if cross is None or cross.profit_percentage <= self.config['min_profit_percentage']:
+                continue
             
             opportunities.append({
-                'direction': 'Bybit -> Bitget',
-                'buy_exchange': 'Bybit', 
-                'sell_exchange': 'Bitget',
-                'buy_price': buy_price,
-                'sell_price': sell_price,
-                'profit_percentage': profit_percentage,
-                'profit_per_unit': profit_per_unit,
-                'max_quantity': max_quantity,
-                'estimated_profit': profit_per_unit * max_quantity
+                'symbol': symbol,
+                'direction': f'{buy_exchange} -> {sell_exchange}',
+                'buy_exchange': buy_exchange,
+                'sell_exchange': sell_exchange,
+                'buy_price': cross.buy_price,    # 沿深度成交的均价
+                'sell_price': cross.sell_price,
+                'profit_percentage': cross.profit_percentage,
+                'profit_per_unit': cross.net_profit / cross.quantity,
+                'max_quantity': cross.quantity,
+                'estimated_profit': cross.net_profit,
+                'levels': (cross.buy_levels, cross.sell_levels)
             })
         
         return {
@@ -222,6 +205,18 @@ class LiveArbitrageBot:
             }
         }
     
+    def estimate_execution(self, venue, symbol, side, notional):
+        """估计一条腿的滑点（比例）和成交概率；没有模型数据时使用固定滑点"""
+        estimate = None
+        if self.fill_model is not None and symbol:
+            estimate = self.fill_model.lookup(venue, symbol, side, self.config['execution_latency_ms'], notional)
+        if estimate is None:
+            return self.config['default_slippage'], 1.0
+        slippage_bps, fill_prob = estimate
+        if slippage_bps != slippage_bps:  # NaN：历史深度不足以成交该金额
+            return self.config['default_slippage'], 0.0
+        return max(slippage_bps, 0.0) / 1e4, fill_prob
+    
     def simulate_trade_execution(self, opportunity):
         """模拟交易执行"""
         
@@ -229,13 +224,22 @@ class LiveArbitrageBot:
             logger.warning("📊 今日交易次数已达上限")
             return False
         
-        # 模拟执行时间和滑点
-        execution_delay = 2.0  # 2秒执行延迟
-        slippage = 0.001  # 0.1% 滑点
+        # 按执行延迟和金额估计每条腿的滑点与成交概率
+        buy_venue = opportunity['buy_exchange'].lower()
+        sell_venue = opportunity['sell_exchange'].lower()
+        symbol = opportunity.get('symbol')
+        notional = min(opportunity['max_quantity'] * opportunity['buy_price'], self.config['max_trade_amount'])
+        buy_slippage, buy_fill_prob = self.estimate_execution(buy_venue, symbol, 'buy', notional)
+        sell_slippage, sell_fill_prob = self.estimate_execution(sell_venue, symbol, 'sell', notional)
+        
+        if min(buy_fill_prob, sell_fill_prob) < self.config['min_fill_probability']:
+            events.warning('trade_skipped', "⚠️ 成交概率过低 ({fill_prob:.0%})，取消交易",
+                           symbol=symbol, fill_prob=min(buy_fill_prob, sell_fill_prob))
+            return False
         
         # 计算实际执行价格（考虑滑点）
-        actual_buy_price = opportunity['buy_price'] * (1 + slippage)
-        actual_sell_price = opportunity['sell_price'] * (1 - slippage)
+        actual_buy_price = opportunity['buy_price'] * (1 + buy_slippage)
+        actual_sell_price = opportunity['sell_price'] * (1 - sell_slippage)
         
         # 重新计算利润
         buy_fee = actual_buy_price * self.config['fees'][opportunity['buy_exchange'].lower()]['taker']
@@ -249,33 +253,48 @@ class LiveArbitrageBot:
         trade_quantity = min(opportunity['max_quantity'], self.config['max_trade_amount'] / actual_buy_price)
         
         if actual_profit <= 0:
-            logger.warning(f"⚠️ 考虑滑点后无利润，取消交易")
+            events.warning('trade_skipped', "⚠️ 考虑滑点后无利润，取消交易",
+                           symbol=opportunity['symbol'], profit=actual_profit)
+            return False
+        
+        # 同时预留两条腿：买方的 USDT 和卖方的现货（原子操作，任一不足则放弃）
+        base = symbol.split('/')[0]
+        if self.simulation_mode:
+            self.inventory.ensure(sell_venue, base, self.config['simulated_holdings_usdt'] / opportunity['sell_price'])
+        buy_amount = total_cost * trade_quantity
+        reservation = self.inventory.reserve([(buy_venue, 'USDT', buy_amount), (sell_venue, base, trade_quantity)])
+        if reservation is None:
+            events.warning('insufficient_balance',
+                           "💸 库存不足: {buy_venue} 需要 ${needed:.2f} USDT (可用 ${available:.2f}), "
+                           "{sell_venue} 需要 {quantity:.6f} {asset} (可用 {asset_available:.6f})",
+                           buy_venue=buy_venue, needed=buy_amount,
+                           available=float(self.inventory.available(buy_venue, 'USDT')),
+                           sell_venue=sell_venue, quantity=trade_quantity, asset=base,
+                           asset_available=float(self.inventory.available(sell_venue, base)))
             return False
         
         # 执行模拟交易
         total_profit = actual_profit * trade_quantity
         total_fees = (buy_fee + sell_fee) * trade_quantity
         
+        # 成交后结算库存：买方付出 USDT 收到现货，卖方交付现货收到 USDT
+        self.inventory.settle(reservation, [
+            (buy_venue, 'USDT', -buy_amount),
+            (buy_venue, base, trade_quantity),
+            (sell_venue, base, -trade_quantity),
+            (sell_venue, 'USDT', total_revenue * trade_quantity),
+        ])
+        
         # 更新账户
-        self.account['current_balance'] += total_profit
+        self.account['current_balance'] = float(self.inventory.total('USDT'))
         self.account['daily_pnl'] += total_profit
         self.account['total_pnl'] += total_profit
         self.account['trades_today'] += 1
         
-        # 更新统计
-        self.stats['executed_trades'] += 1
-        self.stats['total_fees_paid'] += total_fees
-        
-        if total_profit > 0:
-            self.stats['successful_trades'] += 1
-            self.stats['best_profit'] = max(self.stats['best_profit'], total_profit)
-        else:
-            self.stats['failed_trades'] += 1
-            self.stats['worst_loss'] = min(self.stats['worst_loss'], total_profit)
-        
-        # 记录交易
+        # 记录交易（账本插入时同时更新次数/胜率/手续费/按币种的累计统计）
+        now = datetime.now()
         trade_record = {
-            'timestamp': datetime.now(),
+            'timestamp': now,
             'symbol': opportunity['symbol'],
             'direction': opportunity['direction'],
             'quantity': trade_quantity,
@@ -286,16 +305,16 @@ class LiveArbitrageBot:
             'balance_after': self.account['current_balance']
         }
         
-        self.stats['trade_history'].append(trade_record)
+        self.trades.append({**trade_record, 'ts': now.timestamp()})
+        self.metrics.execution(opportunity['symbol'], total_profit, success=total_profit > 0)
         
-        # 记录日志
-        logger.info("🎯" + "="*60)
-        logger.info(f"💰 模拟交易执行成功! {opportunity['symbol']}")
-        logger.info(f"📊 方向: {opportunity['direction']}")
-        logger.info(f"💎 数量: {trade_quantity:.6f}")
-        logger.info(f"💵 利润: ${total_profit:.4f}")
-        logger.info(f"🏦 余额: ${self.account['current_balance']:.2f}")
-        logger.info("🎯" + "="*60)
+        # 记录日志（一条结构化记录代替原来的七行）
+        events.info('trade_executed',
+                    "💰 模拟交易执行成功! {symbol} | 方向: {direction} | 数量: {quantity:.6f} | "
+                    "利润: ${profit:.4f} | 余额: ${balance:.2f}",
+                    symbol=opportunity['symbol'], direction=opportunity['direction'],
+                    quantity=trade_quantity, buy_price=actual_buy_price, sell_price=actual_sell_price,
+                    profit=total_profit, fees=total_fees, balance=self.account['current_balance'])
         
         return True
     
@@ -321,17 +340,21 @@ class LiveArbitrageBot:
         print(f"📊 今日盈亏: ${self.account['daily_pnl']:.2f}")
         print(f"🔄 今日交易: {self.account['trades_today']}/{self.config['max_daily_trades']}")
         print()
+        summary = self.trades.summary()
         print(f"🎯 发现机会: {self.stats['total_opportunities']}")
-        print(f"✅ 执行交易: {self.stats['executed_trades']}")
-        print(f"🎉 成功交易: {self.stats['successful_trades']}")
-        print(f"❌ 失败交易: {self.stats['failed_trades']}")
+        print(f"✅ 执行交易: {summary['count']}")
+        print(f"🎉 成功交易: {summary['wins']}")
+        print(f"❌ 失败交易: {summary['count'] - summary['wins']}")
+        
+        if summary['count'] > 0:
+            print(f"📊 成功率: {summary['win_rate'] * 100:.1f}%")
+            print(f"💸 手续费: ${summary['total_fees']:.4f}")
         
-        if self.stats['executed_trades'] > 0:
-            success_rate = (self.stats['successful_trades'] / self.stats['executed_trades']) * 100
-            print(f"📊 成功率: {success_rate:.1f}%")
+        if summary['best'] is not None and summary['best'] > 0:
+            print(f"🏆 最佳交易: ${summary['best']:.4f}")
         
-        if self.stats['best_profit'] > 0:
-            print(f"🏆 最佳交易: ${self.stats['best_profit']:.4f}")
+        for symbol, totals in sorted(self.trades.by_symbol().items()):
+            print(f"   {symbol}: {totals['count']} 笔, 胜 {totals['wins']} 笔, 利润 ${totals['profit']:.4f}")
         
         print("="*80)
     
@@ -342,7 +365,9 @@ class LiveArbitrageBot:
         
         try:
             while True:
+                round_started = time.monotonic()
                 self.check_daily_reset()
+                self.inventory.refresh_stale(self.config['balance_refresh_interval'])
                 
                 for symbol in self.config['symbols']:
                     try:
@@ -351,15 +376,14 @@ class LiveArbitrageBot:
                         
                         if analysis and analysis['opportunities']:
                             self.stats['total_opportunities'] += len(analysis['opportunities'])
+                            self.metrics.opportunity(symbol, len(analysis['opportunities']))
                             
                             for opp in analysis['opportunities']:
                                 logger.info(f"🎯 发现机会: {symbol} {opp['direction']} "
                                           f"利润率: {opp['profit_percentage']:.3f}%")
                                 
                                 # 尝试执行交易
-                                if self.simulate_trade_execution(opp):
-                                    # 执行成功后短暂暂停
-                                    time.sleep(5)
+                                self.simulate_trade_execution(opp)
                         
                         else:
                             # 显示当前价格状态
@@ -369,16 +393,17 @@ class LiveArbitrageBot:
                                 logger.info(f"📊 {symbol}: 价差 {spread:.3f}% "
                                           f"(Bitget: ${data['bitget_ask']:.2f} | Bybit: ${data['bybit_bid']:.2f})")
                         
-                        time.sleep(1)  # 避免API限制
                         
                     except Exception as e:
                         logger.error(f"❌ 处理 {symbol} 时出错: {str(e)}")
                 
                 # 定期显示仪表板
-                if self.stats['executed_trades'] > 0 and self.stats['executed_trades'] % 5 == 0:
+                if self.trades.count > 0 and self.trades.count % 5 == 0:
                     self.print_dashboard()
                 
-                time.sleep(self.config['check_interval'])
+                # 由请求预算调度下一轮：预算充足时每 check_interval 秒一轮，限频退避或预算不足时自动放慢
+                SCHEDULER.pace_sync({name: len(self.config['symbols']) for name in self.exchanges},
+                                    self.config['check_interval'], round_started)
                 
         except KeyboardInterrupt:
             logger.info("\n🛑 用户停止机器人")
@@ -386,13 +411,14 @@ class LiveArbitrageBot:
             logger.error(f"❌ 运行错误: {str(e)}")
         finally:
             self.print_dashboard()
+            self.trades.flush()
             logger.info("👋 套利机器人已停止")
 
 def main():
     """主函数"""
     
-    # 创建日志目录
-    os.makedirs('logs', exist_ok=True)
+    # 配置日志（后台线程写盘，热路径只入队）；只在作为程序运行时配置，导入本模块不改动日志设置
+    configure_logging('logs/live_arbitrage.log', json_file='logs/live_arbitrage.jsonl')
     
     print("🚀 实时套利机器人 v2.0")
     print("🎯 启动模拟模式")
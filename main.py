@@ -26,13 +26,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # 导入交易所模块
-from src.exchanges import BinanceExchange, BybitExchange
+from src.exchanges import create_exchange
+from src.exchanges.order_stream import BybitPrivateStream
 
 
 class CryptoArbitrageBot:
     def __init__(self):
         self.running = True
         self.exchanges = {}
+        self.order_streams = {}
         
     async def setup(self):
         """初始化交易所连接"""
@@ -40,7 +42,8 @@ class CryptoArbitrageBot:
         
         # 初始化 Binance
         if os.getenv('BINANCE_API_KEY'):
-            self.exchanges['binance'] = BinanceExchange(
+            self.exchanges['binance'] = create_exchange(
+                'binance',
                 api_key=os.getenv('BINANCE_API_KEY'),
                 secret_key=os.getenv('BINANCE_SECRET_KEY'),
                 testnet=os.getenv('BINANCE_TESTNET', 'True').lower() == 'true'
@@ -48,11 +51,21 @@ class CryptoArbitrageBot:
             
         # 初始化 Bybit
         if os.getenv('BYBIT_API_KEY'):
-            self.exchanges['bybit'] = BybitExchange(
+            bybit_testnet = os.getenv('BYBIT_TESTNET', 'True').lower() == 'true'
+            self.exchanges['bybit'] = create_exchange(
+                'bybit',
                 api_key=os.getenv('BYBIT_API_KEY'),
                 secret_key=os.getenv('BYBIT_SECRET_KEY'),
-                testnet=os.getenv('BYBIT_TESTNET', 'True').lower() == 'true'
+                testnet=bybit_testnet
             )
+            # 私有订单流（需显式开启 ORDER_STREAM_ENABLED=true）：订单状态由推送更新，查询订单不再走 REST
+            if os.getenv('ORDER_STREAM_ENABLED', 'false').lower() == 'true':
+                stream = BybitPrivateStream(
+                    os.getenv('BYBIT_API_KEY'), os.getenv('BYBIT_SECRET_KEY'),
+                    environment='testnet' if bybit_testnet else 'mainnet'
+                )
+                self.exchanges['bybit'].attach_order_stream(stream)
+                self.order_streams['bybit'] = stream
         
         # 连接所有交易所
         for name, exchange in self.exchanges.items():
@@ -99,12 +112,12 @@ class CryptoArbitrageBot:
                 
                 # 计算潜在利润
                 # 在 ex1 买入，在 ex2 卖出
-                profit1 = float(prices[ex2]['bid'] - prices[ex1]['ask'])
-                profit1_percent = (profit1 / float(prices[ex1]['ask'])) * 100
+                profit1 = prices[ex2]['bid'] - prices[ex1]['ask']
+                profit1_percent = (profit1 / prices[ex1]['ask']) * 100
                 
                 # 在 ex2 买入，在 ex1 卖出
-                profit2 = float(prices[ex1]['bid'] - prices[ex2]['ask'])
-                profit2_percent = (profit2 / float(prices[ex2]['ask'])) * 100
+                profit2 = prices[ex1]['bid'] - prices[ex2]['ask']
+                profit2_percent = (profit2 / prices[ex2]['ask']) * 100
                 
                 min_profit_percent = float(os.getenv('MIN_PROFIT_PERCENTAGE', '0.5'))
                 
@@ -126,13 +139,20 @@ class CryptoArbitrageBot:
             logger.error("❌ 没有可用的交易所连接")
             return
             
+        stream_tasks = [asyncio.create_task(stream.run()) for stream in self.order_streams.values()]
         logger.info("🔍 开始监控价格...")
-        await self.monitor_prices()
+        try:
+            await self.monitor_prices()
+        finally:
+            for task in stream_tasks:
+                task.cancel()
         
     def stop(self):
         """停止机器人"""
         logger.info("🛑 正在停止机器人...")
         self.running = False
+        for stream in self.order_streams.values():
+            stream.stop()
 
 
 # 全局机器人实例
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+本地模拟交易所服务
+实现 Bitget books5 / Bybit orderbook.50 WebSocket 行情流与 Bybit v5 订单接口，
+支持录制数据回放、延迟/抖动注入、限频错误与部分成交，用于离线延迟和压力测试。
+
+用法:
+    MOCK_RATE=200 MOCK_LATENCY_MS=5 python3 mock_exchange_server.py
+
+    # 推送吞吐压测（按不同 MOCK_RATE 测量实际 msg/s 与延迟）
+    python3 benchmarks/mock_exchange_benchmark.py
+
+    # 机器人指向本地服务
+    BITGET_WS_URL=ws://127.0.0.1:8765/spot/v1/stream \\
+    BYBIT_WS_URL=ws://127.0.0.1:8765/v5/public/spot \\
+    BITGET_TIME_URL=http://127.0.0.1:8765/api/spot/v1/public/time \\
+    BYBIT_TIME_URL=http://127.0.0.1:8765/v5/market/time python3 websocket_arbitrage_bot.py
+"""
+
+import asyncio
+import os
+import random
+import time
+import logging
+from collections import defaultdict
+from itertools import count
+
+import orjson
+from aiohttp import web, WSMsgType
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class SyntheticBookSource:
+    """随机游走生成的合成订单簿"""
+
+    # 各交易所推送的档位数（Bitget books5 / Bybit orderbook.50）
+    DEPTH = {'bitget': 5, 'bybit': 50}
+
+    def __init__(self, base_prices, tick_pct=0.0001):
+        self.mid = dict(base_prices)
+        self.tick_pct = tick_pct
+        # 预生成挂单量字符串，避免每帧格式化
+        self.sizes = [f"{random.uniform(0.01, 2):.4f}" for _ in range(1024)]
+
+    @property
+    def symbols(self):
+        return list(self.mid)
+
+    def next_book(self, venue, symbol):
+        mid = self.mid[symbol] * (1 + random.gauss(0, self.tick_pct))
+        self.mid[symbol] = mid
+        # 各交易所在中间价附近独立偏移，制造跨所价差
+        mid *= 1 + random.uniform(-0.0005, 0.0005)
+        step = mid * 0.00005
+        depth = self.DEPTH.get(venue, 50)
+        sizes = random.choices(self.sizes, k=depth * 2)
+        bids = [[f"{mid - step * (i + 1):.8g}", sizes[i]] for i in range(depth)]
+        asks = [[f"{mid + step * (i + 1):.8g}", sizes[depth + i]] for i in range(depth)]
+        return bids, asks
+
+
+class ReplayBookSource:
+    """回放录制的订单簿（JSON Lines: venue, symbol, bids, asks）"""
+
+    def __init__(self, path):
+        self.frames = defaultdict(list)
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    frame = orjson.loads(line)
+                    self.frames[(frame['venue'], frame['symbol'])].append(
+                        (frame['bids'], frame['asks'])
+                    )
+        self.cursors = defaultdict(int)
+
+    @property
+    def symbols(self):
+        return sorted({symbol for _, symbol in self.frames})
+
+    def next_book(self, venue, symbol):
+        frames = self.frames.get((venue, symbol)) or self.frames.get(('*', symbol))
+        if not frames:
+            return [], []
+        i = self.cursors[(venue, symbol)]
+        self.cursors[(venue, symbol)] = (i + 1) % len(frames)
+        return frames[i]
+
+
+class Subscriber:
+    """单个 WebSocket 连接的有序发送队列，按配置注入延迟和抖动"""
+
+    def __init__(self, ws, latency, jitter):
+        self.ws = ws
+        self.latency = latency
+        self.jitter = jitter
+        self.queue = asyncio.Queue(maxsize=100000)
+        self.topics = set()
+        self.last_deliver_at = 0.0
+        self.writer = asyncio.create_task(self._writer())
+
+    def push(self, payload):
+        deliver_at = 0.0
+        if self.latency or self.jitter:
+            # 保持顺序：抖动不会让消息乱序
+            deliver_at = max(self.last_deliver_at,
+                             time.monotonic() + self.latency + random.uniform(0, self.jitter))
+            self.last_deliver_at = deliver_at
+        try:
+            self.queue.put_nowait((deliver_at, payload))
+        except asyncio.QueueFull:
+            pass  # 慢消费者直接丢弃，与真实交易所行为一致
+
+    async def _writer(self):
+        while True:
+            deliver_at, payload = await self.queue.get()
+            delay = deliver_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.ws.send_str(payload)
+            except Exception:
+                return
+
+    def close(self):
+        self.writer.cancel()
+
+
+class MockExchangeServer:
+    def __init__(self):
+        """初始化模拟交易所"""
+
+        self.config = {
+            'host': os.getenv('MOCK_HOST', '127.0.0.1'),
+            'port': int(os.getenv('MOCK_PORT', 8765)),
+            'symbols': os.getenv('MOCK_SYMBOLS', 'BTCUSDT,ETHUSDT,SOLUSDT,DOGEUSDT,XRPUSDT').split(','),
+            'rate': _env_float('MOCK_RATE', 10),                  # 每个交易对每秒推送条数
+            'latency': _env_float('MOCK_LATENCY_MS', 0) / 1000,   # 固定延迟
+            'jitter': _env_float('MOCK_JITTER_MS', 0) / 1000,     # 随机抖动上限
+            'rate_limit_prob': _env_float('MOCK_RATE_LIMIT_PROB', 0),
+            'partial_fill_prob': _env_float('MOCK_PARTIAL_FILL_PROB', 0),
+            'fill_delay': _env_float('MOCK_FILL_DELAY_MS', 50) / 1000,
+            'replay_file': os.getenv('MOCK_REPLAY_FILE', ''),
+        }
+
+        base_prices = {'BTCUSDT': 45000, 'ETHUSDT': 2500, 'SOLUSDT': 100, 'DOGEUSDT': 0.08, 'XRPUSDT': 0.5}
+        if self.config['replay_file']:
+            self.source = ReplayBookSource(self.config['replay_file'])
+        else:
+            self.source = SyntheticBookSource(
+                {s: base_prices.get(s, 10) for s in self.config['symbols']}
+            )
+
+        # topic -> 订阅者集合
+        self.subscribers = defaultdict(set)
+        self.private_subscribers = set()
+
+        # 最新订单簿（供 REST 行情与撮合使用）
+        self.books = {}
+        self.orders = {}
+        self.order_ids = count(1)
+
+        self.stats = {
+            'messages_published': 0,
+            'rest_requests': 0,
+            'rate_limited': 0,
+            'start_time': time.time(),
+        }
+
+    # ===== 行情推送 =====
+
+    def _bitget_frame(self, symbol, bids, asks, ts, action):
+        arg = {'instType': 'sp', 'channel': 'books5', 'instId': symbol}
+        return orjson.dumps({
+            'action': action,
+            'arg': arg,
+            'data': [{'instId': symbol, 'bids': bids[:5], 'asks': asks[:5], 'ts': str(ts)}]
+        }).decode()
+
+    def _bybit_frame(self, symbol, bids, asks, ts, seq):
+        return orjson.dumps({
+            'topic': f'orderbook.50.{symbol}',
+            'type': 'snapshot',
+            'ts': ts,
+            'data': {'s': symbol, 'b': bids[:50], 'a': asks[:50], 'u': seq, 'seq': seq},
+            'cts': ts
+        }).decode()
+
+    async def publish_books(self):
+        """按配置速率生成并广播订单簿；每帧只序列化一次再扇出"""
+        interval = 1 / self.config['rate']
+        seq = 0
+        next_tick = time.monotonic()
+
+        while True:
+            seq += 1
+            ts = int(time.time() * 1000)
+            for symbol in self.source.symbols:
+                for venue in ('bitget', 'bybit'):
+                    bids, asks = self.source.next_book(venue, symbol)
+                    self.books[(venue, symbol)] = (bids, asks)
+
+                    if venue == 'bitget':
+                        topic = ('bitget', symbol)
+                        subscribers = self.subscribers.get(topic)
+                        if subscribers:
+                            payload = self._bitget_frame(symbol, bids, asks, ts, 'update')
+                    else:
+                        topic = ('bybit', symbol)
+                        subscribers = self.subscribers.get(topic)
+                        if subscribers:
+                            payload = self._bybit_frame(symbol, bids, asks, ts, seq)
+
+                    if subscribers:
+                        for sub in subscribers:
+                            sub.push(payload)
+                        self.stats['messages_published'] += len(subscribers)
+
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 短暂落后（定时器粒度、GC）时连续补发以维持目标速率；落后超过 1 秒才放弃欠账
+                if delay < -1.0:
+                    next_tick = time.monotonic()
+                await asyncio.sleep(0)
+
+    async def _ws_session(self, request, on_message):
+        ws = web.WebSocketResponse(heartbeat=None, max_msg_size=0)
+        await ws.prepare(request)
+        sub = Subscriber(ws, self.config['latency'], self.config['jitter'])
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    try:
+                        on_message(sub, msg.data)
+                    except (orjson.JSONDecodeError, AttributeError, TypeError) as e:
+                        # 无法解析的帧直接忽略，不断开连接（与真实交易所一致）
+                        logger.debug(f"忽略无效消息 {msg.data[:100]!r}: {e}")
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            for topic in sub.topics:
+                self.subscribers[topic].discard(sub)
+            self.private_subscribers.discard(sub)
+            sub.close()
+        return ws
+
+    async def bitget_ws(self, request):
+        """Bitget 公共行情 WebSocket"""
+        def on_message(sub, text):
+            if text == 'ping':
+                sub.push('pong')
+                return
+            data = orjson.loads(text)
+            if data.get('op') != 'subscribe':
+                return
+            for arg in data.get('args', []):
+                symbol = arg.get('instId')
+                if arg.get('channel') != 'books5' or symbol not in self.source.symbols:
+                    continue
+                topic = ('bitget', symbol)
+                sub.topics.add(topic)
+                self.subscribers[topic].add(sub)
+                sub.push(orjson.dumps({'event': 'subscribe', 'arg': arg}).decode())
+                book = self.books.get(topic)
+                if book:
+                    sub.push(self._bitget_frame(symbol, book[0], book[1], int(time.time() * 1000), 'snapshot'))
+
+        return await self._ws_session(request, on_message)
+
+    async def bybit_ws(self, request):
+        """Bybit 公共行情 WebSocket"""
+        def on_message(sub, text):
+            if text == 'ping':
+                sub.push('pong')
+                return
+            data = orjson.loads(text)
+            op = data.get('op')
+            if op == 'ping':
+                sub.push(orjson.dumps({'op': 'pong', 'success': True}).decode())
+                return
+            if op != 'subscribe':
+                return
+            for arg in data.get('args', []):
+                parts = arg.split('.')
+                if len(parts) != 3 or parts[0] != 'orderbook' or parts[2] not in self.source.symbols:
+                    continue
+                topic = ('bybit', parts[2])
+                sub.topics.add(topic)
+                self.subscribers[topic].add(sub)
+            sub.push(orjson.dumps({'success': True, 'op': 'subscribe', 'req_id': data.get('req_id', '')}).decode())
+
+        return await self._ws_session(request, on_message)
+
+    async def bybit_private_ws(self, request):
+        """Bybit 私有订单/成交 WebSocket（不校验签名）"""
+        def on_message(sub, text):
+            if text == 'ping':
+                sub.push('pong')
+                return
+            data = orjson.loads(text)
+            op = data.get('op')
+            if op == 'ping':
+                sub.push(orjson.dumps({'op': 'pong', 'success': True}).decode())
+            elif op == 'auth':
+                sub.push(orjson.dumps({'op': 'auth', 'success': True, 'ret_msg': ''}).decode())
+            elif op == 'subscribe':
+                self.private_subscribers.add(sub)
+                sub.push(orjson.dumps({'op': 'subscribe', 'success': True}).decode())
+
+        return await self._ws_session(request, on_message)
+
+    # ===== REST 接口 =====
+
+    @web.middleware
+    async def fault_middleware(self, request, handler):
+        """注入延迟、抖动和限频错误（只作用于 REST 请求，WebSocket 升级直接放行）"""
+        if request.headers.get('Upgrade', '').lower() == 'websocket':
+            return await handler(request)
+        self.stats['rest_requests'] += 1
+        delay = self.config['latency'] + random.uniform(0, self.config['jitter'])
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if random.random() < self.config['rate_limit_prob']:
+            self.stats['rate_limited'] += 1
+            return web.json_response(
+                {'retCode': 10006, 'retMsg': 'Too many visits!', 'result': {}, 'time': int(time.time() * 1000)},
+                status=429,
+                headers={'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '10',
+                         'X-Bapi-Limit-Reset-Timestamp': str(int(time.time() * 1000) + 1000)}
+            )
+        return await handler(request)
+
+    def _ok(self, result):
+        return web.json_response({'retCode': 0, 'retMsg': 'OK', 'result': result, 'time': int(time.time() * 1000)})
+
+    async def server_time(self, request):
+        now = time.time()
+        return self._ok({'timeSecond': str(int(now)), 'timeNano': str(int(now * 1e9))})
+
+    async def bitget_server_time(self, request):
+        return web.json_response({'code': '00000', 'msg': 'success', 'data': int(time.time() * 1000)})
+
+    async def tickers(self, request):
+        symbol = request.query.get('symbol')
+        book = self.books.get(('bybit', symbol))
+        if not book or not book[0] or not book[1]:
+            return web.json_response({'retCode': 10001, 'retMsg': 'symbol invalid', 'result': {}})
+        bids, asks = book
+        return self._ok({'category': 'spot', 'list': [{
+            'symbol': symbol,
+            'bid1Price': bids[0][0], 'bid1Size': bids[0][1],
+            'ask1Price': asks[0][0], 'ask1Size': asks[0][1],
+            'lastPrice': bids[0][0],
+        }]})
+
+    async def wallet_balance(self, request):
+        return self._ok({'list': [{'accountType': 'UNIFIED', 'coin': [
+            {'coin': 'USDT', 'walletBalance': '10000', 'locked': '0'},
+        ]}]})
+
+    async def create_order(self, request):
+        params = orjson.loads(await request.read())
+        order_id = str(next(self.order_ids))
+        qty = float(params['qty'])
+        order = {
+            'orderId': order_id,
+            'symbol': params['symbol'],
+            'side': params['side'],
+            'orderType': params.get('orderType', 'Limit'),
+            'price': params.get('price', '0'),
+            'qty': params['qty'],
+            'cumExecQty': '0',
+            'leavesQty': params['qty'],
+            'avgPrice': '0',
+            'orderStatus': 'New',
+            'updatedTime': str(int(time.time() * 1000)),
+        }
+        self.orders[order_id] = order
+        self._push_order(order)
+        asyncio.get_running_loop().call_later(
+            self.config['fill_delay'], self._fill_order, order_id, qty
+        )
+        return self._ok({'orderId': order_id, 'orderLinkId': params.get('orderLinkId', '')})
+
+    def _fill_order(self, order_id, qty):
+        """模拟撮合：按概率部分成交，部分成交后继续撮合剩余数量直到完全成交"""
+        order = self.orders.get(order_id)
+        if not order or order['orderStatus'] not in ('New', 'PartiallyFilled'):
+            return
+
+        remaining = float(order['leavesQty'])
+        # 剩余不足 1% 时一次成交完，保证即使部分成交概率为 1 也能在有限步内结束
+        partial = remaining > qty * 0.01 and random.random() < self.config['partial_fill_prob']
+        exec_qty = remaining * random.uniform(0.1, 0.9) if partial else remaining
+        cum = float(order['cumExecQty']) + exec_qty
+        leaves = remaining - exec_qty if partial else 0.0
+
+        book = self.books.get(('bybit', order['symbol']))
+        exec_price = order['price']
+        if book and order['orderType'] == 'Market':
+            exec_price = (book[1] if order['side'] == 'Buy' else book[0])[0][0]
+
+        order.update({
+            'cumExecQty': f'{cum:.8f}',
+            'leavesQty': f'{leaves:.8f}',
+            'avgPrice': exec_price,
+            'orderStatus': 'PartiallyFilled' if partial else 'Filled',
+            'updatedTime': str(int(time.time() * 1000)),
+        })
+        self._push_execution(order, exec_qty, exec_price)
+        self._push_order(order)
+        if partial:
+            asyncio.get_running_loop().call_later(
+                self.config['fill_delay'], self._fill_order, order_id, qty
+            )
+
+    def _push_order(self, order):
+        if self.private_subscribers:
+            payload = orjson.dumps({'topic': 'order', 'creationTime': int(time.time() * 1000),
+                                    'data': [order]}).decode()
+            for sub in self.private_subscribers:
+                sub.push(payload)
+
+    def _push_execution(self, order, exec_qty, exec_price):
+        if self.private_subscribers:
+            payload = orjson.dumps({'topic': 'execution', 'creationTime': int(time.time() * 1000), 'data': [{
+                'orderId': order['orderId'],
+                'symbol': order['symbol'],
+                'side': order['side'],
+                'execQty': f'{exec_qty:.8f}',
+                'execPrice': exec_price,
+                'orderQty': order['qty'],
+                'leavesQty': order['leavesQty'],
+                'execTime': order['updatedTime'],
+            }]}).decode()
+            for sub in self.private_subscribers:
+                sub.push(payload)
+
+    async def order_realtime(self, request):
+        order = self.orders.get(request.query.get('orderId'))
+        return self._ok({'list': [order] if order else []})
+
+    async def cancel_order(self, request):
+        params = orjson.loads(await request.read())
+        order = self.orders.get(params.get('orderId'))
+        if not order or order['orderStatus'] not in ('New', 'PartiallyFilled'):
+            return web.json_response({'retCode': 110001, 'retMsg': 'Order does not exist.', 'result': {}})
+        order['orderStatus'] = 'PartiallyFilledCanceled' if order['orderStatus'] == 'PartiallyFilled' else 'Cancelled'
+        order['updatedTime'] = str(int(time.time() * 1000))
+        self._push_order(order)
+        return self._ok({'orderId': order['orderId']})
+
+    # ===== 运行 =====
+
+    async def report_stats(self):
+        """定期打印吞吐量"""
+        last = 0
+        while True:
+            await asyncio.sleep(10)
+            published = self.stats['messages_published']
+            logger.info(f"📨 推送速率: {(published - last) / 10:.0f}/秒 | "
+                        f"REST 请求: {self.stats['rest_requests']} | 限频: {self.stats['rate_limited']}")
+            last = published
+
+    def build_app(self):
+        app = web.Application(middlewares=[self.fault_middleware])
+        app.router.add_get('/spot/v1/stream', self.bitget_ws)
+        app.router.add_get('/v5/public/spot', self.bybit_ws)
+        app.router.add_get('/v5/private', self.bybit_private_ws)
+        app.router.add_get('/v5/market/time', self.server_time)
+        app.router.add_get('/api/spot/v1/public/time', self.bitget_server_time)
+        app.router.add_get('/v5/market/tickers', self.tickers)
+        app.router.add_get('/v5/account/wallet-balance', self.wallet_balance)
+        app.router.add_post('/v5/order/create', self.create_order)
+        app.router.add_get('/v5/order/realtime', self.order_realtime)
+        app.router.add_post('/v5/order/cancel', self.cancel_order)
+        return app
+
+    async def run(self):
+        runner = web.AppRunner(self.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.config['host'], self.config['port'])
+        await site.start()
+
+        logger.info(f"🧪 模拟交易所已启动: http://{self.config['host']}:{self.config['port']}")
+        logger.info(f"📊 交易对: {', '.join(self.source.symbols)} | 推送速率: {self.config['rate']}/秒/交易对")
+
+        try:
+            await asyncio.gather(self.publish_books(), self.report_stats())
+        finally:
+            await runner.cleanup()
+
+
+async def main():
+    """主函数"""
+    # 配置日志（只在作为程序运行时配置，导入本模块不改动日志设置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    server = MockExchangeServer()
+    await server.run()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("🛑 模拟交易所已停止")
@@ -4,13 +4,17 @@
 不需要 API 密钥，仅监控和显示套利机会
 """
 
-import ccxt
+import os
 import time
 import logging
 from datetime import datetime
 from decimal import Decimal
 import json
 
+from src.exchanges import SCHEDULER, CcxtClients
+from src.models import depth_arbitrage
+from src.storage import SharedPriceCache
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -24,15 +28,23 @@ logger = logging.getLogger(__name__)
 
 class PublicArbitrageBot:
     def __init__(self):
-        # 初始化多个交易所
-        self.exchanges = {
-            'binance': ccxt.binance({'enableRateLimit': True}),
-            'bybit': ccxt.bybit({'enableRateLimit': True, 'options': {'defaultType': 'spot'}}),
-            'okx': ccxt.okx({'enableRateLimit': True}),
-            'kucoin': ccxt.kucoin({'enableRateLimit': True}),
-            'gate': ccxt.gate({'enableRateLimit': True})
+        # 声明交易所配置，客户端（以及 ccxt）在首次使用时才创建；限频由 SCHEDULER 统一处理
+        exchange_configs = {
+            'binance': {'enableRateLimit': False},
+            'bybit': {'enableRateLimit': False, 'options': {'defaultType': 'spot'}},
+            'okx': {'enableRateLimit': False},
+            'kucoin': {'enableRateLimit': False},
+            'gate': {'enableRateLimit': False}
         }
         
+        # PUBLIC_EXCHANGES=binance,bybit 只启用部分交易所
+        enabled = os.getenv('PUBLIC_EXCHANGES')
+        if enabled:
+            names = [name.strip() for name in enabled.split(',')]
+            exchange_configs = {name: exchange_configs[name] for name in names if name in exchange_configs}
+        
+        self.exchanges = CcxtClients(exchange_configs)
+        
         # 监控的交易对
         self.symbols = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT']
         
@@ -40,37 +52,43 @@ class PublicArbitrageBot:
         self.min_profit_percentage = 0.3  # 最小利润率
         self.maker_fee = 0.1  # Maker 手续费
         self.taker_fee = 0.1  # Taker 手续费
+        self.trade_amount = 1000  # 单笔最大投入（USDT）
+        self.poll_interval = float(os.getenv('PUBLIC_POLL_INTERVAL', 3))  # 每轮最短间隔（秒），实际节奏由 SCHEDULER 预算决定
+        
+        # 共享价格缓存（PRICE_CACHE_URL）：行情入口进程已发布的新鲜订单簿直接读取，不再重复请求 REST
+        self.price_cache = SharedPriceCache.from_env()
+        self.cache_max_age = float(os.getenv('PRICE_CACHE_MAX_AGE', 2.0))
         
         # 统计数据
         self.opportunities_found = 0
         self.start_time = datetime.now()
         
-    def calculate_profit(self, buy_price, sell_price, amount=1000):
-        """计算套利利润"""
-        # 买入成本（包括手续费）
-        buy_cost = amount * (1 + self.taker_fee / 100)
-        buy_quantity = buy_cost / buy_price
-        
-        # 卖出收益（扣除手续费）
-        sell_revenue = buy_quantity * sell_price * (1 - self.maker_fee / 100)
-        
-        # 净利润
-        net_profit = sell_revenue - buy_cost
-        profit_rate = (net_profit / buy_cost) * 100
-        
+    def get_cached_orderbook(self, exchange_name, symbol):
+        """从共享价格缓存读取足够新的订单簿；缓存不可用时返回 None 回退到 REST"""
+        if self.price_cache is None:
+            return None
+        try:
+            cached = self.price_cache.book(exchange_name, symbol, max_age=self.cache_max_age)
+        except Exception as e:
+            logger.debug(f"读取共享价格缓存失败: {str(e)[:50]}")
+            return None
+        if cached is None:
+            return None
         return {
-            'buy_cost': buy_cost,
-            'buy_quantity': buy_quantity,
-            'sell_revenue': sell_revenue,
-            'net_profit': net_profit,
-            'profit_rate': profit_rate
+            'bids': cached['bids'],
+            'asks': cached['asks'],
+            'timestamp': datetime.fromtimestamp(cached['ts'])
         }
     
     def get_orderbook(self, exchange_name, symbol):
-        """获取订单簿"""
+        """获取订单簿（优先读取共享价格缓存）"""
+        cached = self.get_cached_orderbook(exchange_name, symbol)
+        if cached is not None:
+            return cached
+        
         try:
             exchange = self.exchanges[exchange_name]
-            orderbook = exchange.fetch_order_book(symbol, limit=5)
+            orderbook = SCHEDULER.call(exchange_name, exchange.fetch_order_book, symbol, limit=5)
             return {
                 'bids': orderbook['bids'][:5],  # 买单（最高5档）
                 'asks': orderbook['asks'][:5],  # 卖单（最低5档）
@@ -95,30 +113,32 @@ class PublicArbitrageBot:
         
         opportunities = []
         
-        # 比较所有交易所对
+        # 比较所有交易所对：沿两侧深度计算最优数量（最多投入 trade_amount）
         for buy_exchange, buy_book in orderbooks.items():
             for sell_exchange, sell_book in orderbooks.items():
                 if buy_exchange != sell_exchange:
-                    # 获取最佳价格
-                    buy_price = buy_book['asks'][0][0]  # 最低卖价
-                    sell_price = sell_book['bids'][0][0]  # 最高买价
+                    cross = depth_arbitrage(buy_book['asks'], sell_book['bids'],
+                                            self.taker_fee / 100, self.maker_fee / 100,
+                                            max_notional=self.trade_amount)
+                    if cross is None or cross.profit_percentage <= self.min_profit_percentage:
+                        continue
                     
-                    # 计算利润
-                    if sell_price > buy_price:
-                        profit_info = self.calculate_profit(buy_price, sell_price)
-                        
-                        if profit_info['profit_rate'] > self.min_profit_percentage:
-                            opportunities.append({
-                                'symbol': symbol,
-                                'buy_exchange': buy_exchange,
-                                'sell_exchange': sell_exchange,
-                                'buy_price': buy_price,
-                                'sell_price': sell_price,
-                                'spread': sell_price - buy_price,
-                                'spread_percentage': ((sell_price - buy_price) / buy_price) * 100,
-                                **profit_info,
-                                'timestamp': datetime.now()
-                            })
+                    opportunities.append({
+                        'symbol': symbol,
+                        'buy_exchange': buy_exchange,
+                        'sell_exchange': sell_exchange,
+                        'buy_price': cross.buy_price,    # 成交均价
+                        'sell_price': cross.sell_price,
+                        'spread': cross.sell_price - cross.buy_price,
+                        'spread_percentage': ((cross.sell_price - cross.buy_price) / cross.buy_price) * 100,
+                        'buy_cost': cross.buy_cost,
+                        'buy_quantity': cross.quantity,
+                        'sell_revenue': cross.sell_revenue,
+                        'net_profit': cross.net_profit,
+                        'profit_rate': cross.profit_percentage,
+                        'levels': (cross.buy_levels, cross.sell_levels),
+                        'timestamp': datetime.now()
+                    })
         
         return opportunities
     
@@ -135,7 +155,9 @@ class PublicArbitrageBot:
         print(f"卖出价: ${opp['sell_price']:,.2f}")
         print(f"价差: ${opp['spread']:,.2f} ({opp['spread_percentage']:.3f}%)")
         print(f"净利润率: {opp['profit_rate']:.3f}% (扣除手续费)")
-        print(f"$1000 预计利润: ${opp['net_profit']:.2f}")
+        print(f"数量: {opp['buy_quantity']:.6f} (吃单档数 {opp['levels'][0]}/{opp['levels'][1]}, "
+              f"投入 ${opp['buy_cost']:,.2f})")
+        print(f"预计利润: ${opp['net_profit']:.2f}")
         print(f"时间: {opp['timestamp'].strftime('%H:%M:%S')}")
         
         # 保存到日志
@@ -152,6 +174,10 @@ class PublicArbitrageBot:
         if hours > 0:
             print(f"平均每小时: {self.opportunities_found / hours:.1f} 个")
     
+    def round_weights(self):
+        """一轮检查在各交易所的请求权重"""
+        return {name: len(self.symbols) for name in self.exchanges.keys()}
+    
     def run(self):
         """运行监控"""
         print("🚀 启动公共 API 套利监控机器人")
@@ -164,6 +190,7 @@ class PublicArbitrageBot:
         check_count = 0
         
         while True:
+            round_started = time.monotonic()
             try:
                 check_count += 1
                 
@@ -181,8 +208,8 @@ class PublicArbitrageBot:
                         best_opp = max(opportunities, key=lambda x: x['profit_rate'])
                         self.display_opportunity(best_opp)
                 
-                # 等待一段时间
-                time.sleep(3)
+                # 由请求预算调度下一轮：每轮每个交易所每个交易对一次订单簿请求
+                SCHEDULER.pace_sync(self.round_weights(), self.poll_interval, round_started)
                 
             except KeyboardInterrupt:
                 print("\n\n👋 停止监控")
@@ -191,7 +218,7 @@ class PublicArbitrageBot:
                 
             except Exception as e:
                 logger.error(f"错误: {e}")
-                time.sleep(5)
+                SCHEDULER.pace_sync(self.round_weights(), self.poll_interval, round_started)
 
 if __name__ == "__main__":
     bot = PublicArbitrageBot()
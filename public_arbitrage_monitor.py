@@ -12,6 +12,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 import logging
 
+from src.exchanges.rate_limiter import SCHEDULER
+
 # 加载环境变量
 load_dotenv()
 
@@ -29,11 +31,11 @@ class PublicArbitrageMonitor:
         # 初始化交易所（只使用公共API）
         self.exchanges = {
             'bitget': ccxt.bitget({
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 'timeout': 10000
             }),
             'bybit': ccxt.bybit({
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 'timeout': 10000
             })
         }
@@ -63,7 +65,7 @@ class PublicArbitrageMonitor:
         """获取公共ticker数据"""
         try:
             exchange = self.exchanges[exchange_name]
-            ticker = exchange.fetch_ticker(symbol)
+            ticker = SCHEDULER.call(exchange_name, exchange.fetch_ticker, symbol)
             return {
                 'bid': float(ticker['bid']) if ticker['bid'] else 0,
                 'ask': float(ticker['ask']) if ticker['ask'] else 0,
@@ -177,7 +179,6 @@ class PublicArbitrageMonitor:
                     try:
                         analysis = self.analyze_spread(symbol)
                         self.log_analysis(analysis)
-                        time.sleep(1)  # 避免API限制
                     except Exception as e:
                         logger.error(f"❌ 分析 {symbol} 时出错: {str(e)}")
                 
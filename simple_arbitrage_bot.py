@@ -15,6 +15,8 @@ from datetime import datetime
 from dotenv import load_dotenv
 import logging
 
+from src.exchanges.rate_limiter import SCHEDULER
+
 # 加载环境变量
 load_dotenv()
 
@@ -71,7 +73,7 @@ class SimpleArbitrageBot:
                 'secret': os.getenv('BITGET_API_SECRET'),
                 'password': os.getenv('BITGET_PASSPHRASE'),
                 'sandbox': False,  # 使用主网
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
             })
             
             # Bybit 配置 (先用测试网)
@@ -79,7 +81,7 @@ class SimpleArbitrageBot:
                 'apiKey': os.getenv('BYBIT_API_KEY'),
                 'secret': os.getenv('BYBIT_SECRET_KEY'),
                 'sandbox': True,  # 使用测试网
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
             })
             
             logger.info("✅ 交易所连接初始化成功")
@@ -94,7 +96,7 @@ class SimpleArbitrageBot:
         """获取交易对价格"""
         try:
             exchange = self.exchanges[exchange_name]
-            ticker = exchange.fetch_ticker(symbol)
+            ticker = SCHEDULER.call(exchange_name, exchange.fetch_ticker, symbol)
             return {
                 'bid': float(ticker['bid']),  # 买一价
                 'ask': float(ticker['ask']),  # 卖一价
@@ -224,9 +226,6 @@ class SimpleArbitrageBot:
                     logger.info(f"💎 {symbol}: Bitget ${opportunity_data['bitget_price']:.2f} | "
                               f"Bybit ${opportunity_data['bybit_price']:.2f}")
                 
-                # 避免API限制
-                time.sleep(1)
-                
             except Exception as e:
                 logger.error(f"❌ 检查 {symbol} 时出错: {str(e)}")
     
@@ -1,5 +1,46 @@
+import importlib
+
 from .base_exchange import BaseExchange
-from .binance_exchange import BinanceExchange
-from .bybit_exchange import BybitExchange
+from .numeric import PriceScale
+from .symbols import SymbolRegistry
+from .registry import (
+    ADAPTERS, CcxtClients, available_adapters, create_exchange, get_adapter_class, register_adapter,
+)
+
+# 其余导出按需导入，import src.exchanges 不会加载 ccxt/websockets
+_LAZY_EXPORTS = {
+    'BinanceExchange': '.binance_exchange',
+    'BybitExchange': '.bybit_exchange',
+    'PrivateOrderStream': '.order_stream',
+    'BybitPrivateStream': '.order_stream',
+    'BitgetPrivateStream': '.order_stream',
+    'InventoryService': '.inventory',
+    'balances_from_ccxt': '.inventory',
+    'RequestScheduler': '.rate_limiter',
+    'TokenBucket': '.rate_limiter',
+    'SCHEDULER': '.rate_limiter',
+    'ManagedWebSocket': '.ws_connection',
+    'DeltaBook': '.ws_connection',
+    'ShardedFeed': '.ws_shards',
+    'ClockMonitor': '.clock_sync',
+    'VenueClock': '.clock_sync',
+}
+
+__all__ = [
+    'BaseExchange', 'BinanceExchange', 'BybitExchange', 'PriceScale', 'SymbolRegistry',
+    'PrivateOrderStream', 'BybitPrivateStream', 'BitgetPrivateStream',
+    'InventoryService', 'balances_from_ccxt',
+    'RequestScheduler', 'TokenBucket', 'SCHEDULER',
+    'ManagedWebSocket', 'DeltaBook', 'ShardedFeed', 'ClockMonitor', 'VenueClock',
+    'ADAPTERS', 'CcxtClients', 'available_adapters', 'create_exchange',
+    'get_adapter_class', 'register_adapter',
+]
+
 
-__all__ = ['BaseExchange', 'BinanceExchange', 'BybitExchange']
\ No newline at end of file
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
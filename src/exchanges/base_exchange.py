@@ -3,6 +3,8 @@ from typing import Dict, List, Optional, Tuple
 import asyncio
 from decimal import Decimal
 
+from .numeric import TICK_SIZE, PriceScale
+
 
 class BaseExchange(ABC):
     """Base class for all exchange implementations"""
@@ -12,6 +14,8 @@ class BaseExchange(ABC):
         self.secret_key = secret_key
         self.testnet = testnet
         self.name = self.__class__.__name__
+        self.order_stream = None
+        self._scales: Dict[str, PriceScale] = {}
         
     @abstractmethod
     async def connect(self):
@@ -28,6 +32,37 @@ class BaseExchange(ABC):
         """Get balance for a specific asset"""
         pass
     
+    @abstractmethod
+    async def get_balances(self) -> Dict[str, Dict[str, Decimal]]:
+        """Get free and locked balances for all assets in one request"""
+        pass
+    
+    @abstractmethod
+    async def get_market(self, symbol: str) -> Dict:
+        """Get market metadata (precision, limits) for a symbol, loaded on demand"""
+        pass
+    
+    async def get_scale(self, symbol: str) -> PriceScale:
+        """Integer tick/lot scale for a symbol, built once from its market metadata"""
+        scale = self._scales.get(symbol)
+        if scale is None:
+            market = await self.get_market(symbol)
+            mode = getattr(getattr(self, 'exchange', None), 'precisionMode', TICK_SIZE)
+            scale = self._scales[symbol] = PriceScale.from_market(market, mode)
+        return scale
+    
+    async def order_amounts(
+        self, symbol: str, side: str, quantity: Decimal, price: Optional[Decimal] = None
+    ) -> Tuple[Decimal, Optional[Decimal]]:
+        """Quantity and limit price rounded exactly onto the market's lot/tick grid"""
+        scale = await self.get_scale(symbol)
+        quantity = scale.quantize_qty(quantity)
+        if quantity <= 0:
+            raise ValueError(f"{symbol} order quantity is below the lot size {scale.lot}")
+        if price is not None:
+            price = scale.quantize_price(price, side)
+        return quantity, price
+    
     @abstractmethod
     async def get_ticker(self, symbol: str) -> Dict:
         """Get current ticker data for a symbol"""
@@ -55,9 +90,16 @@ class BaseExchange(ABC):
         """Cancel an existing order"""
         pass
     
-    @abstractmethod
     async def get_order_status(self, symbol: str, order_id: str) -> Dict:
-        """Get status of a specific order"""
+        """Get status of a specific order (order stream cache first, then REST)"""
+        cached = self.cached_order_status(order_id)
+        if cached is not None:
+            return cached
+        return await self.fetch_order_status(symbol, order_id)
+    
+    @abstractmethod
+    async def fetch_order_status(self, symbol: str, order_id: str) -> Dict:
+        """Get status of a specific order from the REST API"""
         pass
     
     @abstractmethod
@@ -65,6 +107,22 @@ class BaseExchange(ABC):
         """Get maker and taker fees for a symbol"""
         pass
     
+    def attach_order_stream(self, order_stream):
+        """Serve order status from a private WebSocket order stream cache
+        
+        The stream re-reads unfinished orders through this adapter's REST
+        ``fetch_order_status`` after every reconnect.
+        """
+        self.order_stream = order_stream
+        if order_stream.order_source is None:
+            order_stream.order_source = self.fetch_order_status
+    
+    def cached_order_status(self, order_id: str) -> Optional[Dict]:
+        """Get order status from the push-updated cache, if available"""
+        if self.order_stream is None:
+            return None
+        return self.order_stream.get_order(order_id)
+    
     def calculate_profit(
         self, 
         buy_price: Decimal, 
@@ -14,13 +14,18 @@ logger = logging.getLogger(__name__)
 class BybitDemoExchange:
     """Bybit Demo Trading 实现"""
     
-    def __init__(self, api_key: str, secret_key: str):
+    def __init__(self, api_key: str, secret_key: str, base_url: str = 'https://api-demo.bybit.com'):
         self.api_key = api_key
         self.secret_key = secret_key
-        self.base_url = 'https://api-demo.bybit.com'  # Demo Trading 端点
+        self.base_url = base_url  # Demo Trading 端点（本地压测时可指向 mock_exchange_server）
         self.session = requests.Session()
         self.recv_window = '5000'
+        self.order_stream = None
         
+    def attach_order_stream(self, order_stream):
+        """使用私有 WebSocket 订单流缓存查询订单状态"""
+        self.order_stream = order_stream
+    
     def _generate_signature(self, params_str: str) -> str:
         """生成签名"""
         return hmac.new(
@@ -198,6 +203,16 @@ class BybitDemoExchange:
     
     async def get_order_status(self, order_id: str, symbol: str = None):
         """查询订单状态"""
+        if self.order_stream is not None:
+            order = self.order_stream.get_order(order_id)
+            if order is not None:
+                return {
+                    'orderId': order['id'],
+                    'status': self.order_stream.get_raw_status(order_id),
+                    'filled': float(order['filled']),
+                    'remaining': float(order['remaining'] or 0)
+                }
+        
         try:
             params = {
                 'category': 'spot',
@@ -3,6 +3,7 @@ import asyncio
 from decimal import Decimal
 from typing import Dict, List, Optional, Tuple
 from .base_exchange import BaseExchange
+from .inventory import balances_from_ccxt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,11 +36,13 @@ class BybitExchange(BaseExchange):
             }
         
         self.exchange = ccxt.bybit(exchange_config)
+        self._markets: Dict[str, Dict] = {}
         
     async def connect(self):
         """Initialize connection to Bybit"""
         try:
-            await self.exchange.load_markets()
+            # 只做连通性检查，市场元数据在 get_market 中按需加载
+            await self.exchange.fetch_time()
             logger.info(f"Connected to Bybit {'testnet' if self.testnet else 'mainnet'}")
         except Exception as e:
             logger.error(f"Failed to connect to Bybit: {e}")
@@ -59,16 +62,34 @@ class BybitExchange(BaseExchange):
             logger.error(f"Failed to get balance for {asset}: {e}")
             raise
     
+    async def get_market(self, symbol: str) -> Dict:
+        """Get market metadata for a symbol, loading markets on first use"""
+        market = self._markets.get(symbol)
+        if market is None:
+            if not self.exchange.markets:
+                await self.exchange.load_markets()
+            market = self._markets[symbol] = self.exchange.market(symbol)
+        return market
+    
+    async def get_balances(self) -> Dict[str, Dict[str, Decimal]]:
+        """Get free and locked balances for all assets in one request"""
+        try:
+            return balances_from_ccxt(await self.exchange.fetch_balance())
+        except Exception as e:
+            logger.error(f"Failed to get balances: {e}")
+            raise
+    
     async def get_ticker(self, symbol: str) -> Dict:
         """Get current ticker data for a symbol"""
         try:
             ticker = await self.exchange.fetch_ticker(symbol)
+            # 行情只用于比较与估算，保持 float；精确 Decimal 只在下单时生成
             return {
                 'symbol': symbol,
-                'bid': Decimal(str(ticker['bid'])) if ticker['bid'] else Decimal('0'),
-                'ask': Decimal(str(ticker['ask'])) if ticker['ask'] else Decimal('0'),
-                'last': Decimal(str(ticker['last'])) if ticker['last'] else Decimal('0'),
-                'volume': Decimal(str(ticker['baseVolume'])) if ticker['baseVolume'] else Decimal('0'),
+                'bid': ticker['bid'] or 0.0,
+                'ask': ticker['ask'] or 0.0,
+                'last': ticker['last'] or 0.0,
+                'volume': ticker['baseVolume'] or 0.0,
                 'timestamp': ticker['timestamp']
             }
         except Exception as e:
@@ -76,12 +97,14 @@ class BybitExchange(BaseExchange):
             raise
     
     async def get_order_book(self, symbol: str, limit: int = 10) -> Dict:
-        """Get order book for a symbol"""
+        """Get order book for a symbol as integer (ticks, lots) levels plus their scale"""
         try:
             order_book = await self.exchange.fetch_order_book(symbol, limit)
+            scale = await self.get_scale(symbol)
             return {
-                'bids': [(Decimal(str(price)), Decimal(str(amount))) for price, amount in order_book['bids']],
-                'asks': [(Decimal(str(price)), Decimal(str(amount))) for price, amount in order_book['asks']],
+                'bids': scale.levels(order_book['bids']),
+                'asks': scale.levels(order_book['asks']),
+                'scale': scale,
                 'timestamp': order_book['timestamp']
             }
         except Exception as e:
@@ -99,6 +122,9 @@ class BybitExchange(BaseExchange):
         """Place an order on Bybit"""
         try:
             params = {}
+            quantity, price = await self.order_amounts(
+                symbol, side, quantity, price if order_type == 'limit' else None
+            )
             if order_type == 'limit' and price:
                 order = await self.exchange.create_limit_order(
                     symbol, side, float(quantity), float(price), params
@@ -107,6 +133,9 @@ class BybitExchange(BaseExchange):
                 order = await self.exchange.create_market_order(
                     symbol, side, float(quantity), params
                 )
+            if self.order_stream is not None:
+                # 重连后订单流按 symbol 通过 REST 补查此订单
+                self.order_stream.track(order['id'], symbol)
             
             return {
                 'id': order['id'],
@@ -131,8 +160,8 @@ class BybitExchange(BaseExchange):
             logger.error(f"Failed to cancel order {order_id}: {e}")
             raise
     
-    async def get_order_status(self, symbol: str, order_id: str) -> Dict:
-        """Get status of a specific order"""
+    async def fetch_order_status(self, symbol: str, order_id: str) -> Dict:
+        """Get status of a specific order from the REST API"""
         try:
             order = await self.exchange.fetch_order(order_id, symbol)
             return {
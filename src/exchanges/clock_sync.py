@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import logging
+
+from ..monitoring.metrics import REGISTRY, MetricsRegistry
+from .rate_limiter import SCHEDULER, RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+# 服务器时间接口：URL 与解析函数（返回秒）；可用 <VENUE>_TIME_URL 覆盖 URL
+TIME_ENDPOINTS: Dict[str, Tuple[str, Callable[[Dict], float]]] = {
+    'bitget': ('https://api.bitget.com/api/spot/v1/public/time', lambda d: float(d['data']) / 1000),
+    'bybit': ('https://api.bybit.com/v5/market/time', lambda d: int(d['result']['timeNano']) / 1e9),
+    'binance': ('https://api.binance.com/api/v3/time', lambda d: d['serverTime'] / 1000),
+}
+
+
+class VenueClock:
+    """Clock offset and one-way latency estimate for one venue
+
+    ``offset`` is exchange time minus local time, taken from the lowest-RTT
+    server-time probe in a small window (the NTP midpoint assumption is most
+    accurate when the round trip is short). Between probes, every message
+    timestamp refines it: a message can't arrive before it was sent, so an
+    apparent negative latency means the offset is too small and it is raised
+    to match. Those corrections survive later probes as long as the window's
+    lowest-RTT probe is unchanged; only a new best probe (or the old one
+    leaving the window) resets the offset, which also lets it follow clock
+    drift downwards. One-way latency is an EWMA of
+    ``recv - (exchange_ts - offset)``.
+    """
+
+    __slots__ = ('offset', 'rtt', 'latency', 'probes', 'synced', 'corrections',
+                 'messages', 'alpha', 'last_probe', 'best')
+
+    def __init__(self, window: int = 8, alpha: float = 0.05):
+        self.offset = 0.0
+        self.rtt: Optional[float] = None
+        self.latency = 0.0
+        self.probes = deque(maxlen=window)
+        self.synced = False
+        self.corrections = 0
+        self.messages = 0
+        self.alpha = alpha
+        self.last_probe = 0.0
+        self.best: Optional[Tuple[float, float]] = None
+
+    def add_probe(self, sent: float, server_time: float, received: float):
+        """Record one server-time round trip (all times in seconds)"""
+        rtt = received - sent
+        self.probes.append((rtt, server_time - (sent + received) / 2))
+        best = min(self.probes)
+        if best == self.best:
+            # 最优探测未变：保留消息时间戳得到的下界修正
+            self.offset = max(self.offset, best[1])
+        else:
+            self.rtt, self.offset = best
+            self.best = best
+        if not self.synced:
+            self.latency = self.rtt / 2
+            self.synced = True
+        self.last_probe = received
+
+    def observe(self, exchange_ts: Optional[float], recv_wall: float) -> float:
+        """Update from a message; return its exchange time on the local clock"""
+        if exchange_ts is None:
+            return recv_wall - self.latency
+        local = exchange_ts - self.offset
+        one_way = recv_wall - local
+        if one_way < 0:
+            # 消息不可能早于发送时刻到达：偏移被低估，按此条修正
+            self.offset -= one_way
+            self.corrections += 1
+            local = recv_wall
+            one_way = 0.0
+        self.latency += self.alpha * (one_way - self.latency)
+        self.messages += 1
+        return local
+
+
+class ClockMonitor:
+    """Per-venue clock offsets, one-way latency and book freshness
+
+    Bots call ``observe()`` for each market-data message to get the
+    message's exchange timestamp expressed on the local clock, store it on
+    the book, and use ``age()`` for freshness filters. ``run()`` probes each
+    venue's server-time endpoint periodically through the request scheduler.
+    """
+
+    def __init__(self, venues: Iterable[str], probe_interval: float = 30.0, window: int = 8,
+                 scheduler: RequestScheduler = SCHEDULER, registry: MetricsRegistry = REGISTRY):
+        self.clocks: Dict[str, VenueClock] = {venue: VenueClock(window) for venue in venues}
+        self.probe_interval = probe_interval
+        self.scheduler = scheduler
+
+        self._offset = registry.gauge(
+            'arbitrage_clock_offset_seconds', 'Exchange clock minus local clock', ('venue',))
+        self._latency = registry.gauge(
+            'arbitrage_one_way_latency_seconds', 'Estimated exchange-to-local one-way latency', ('venue',))
+        self._rtt = registry.gauge(
+            'arbitrage_time_probe_rtt_seconds', 'Round trip of the best recent server-time probe', ('venue',))
+
+    def observe(self, venue: str, exchange_ts_ms: Optional[float], recv_wall: float) -> float:
+        """Exchange time of a message on the local clock (``exchange_ts_ms`` may be None)"""
+        return self.clocks[venue].observe(
+            float(exchange_ts_ms) / 1000 if exchange_ts_ms else None, recv_wall)
+
+    @staticmethod
+    def age(exchange_time: float, now: Optional[float] = None) -> float:
+        """Seconds since the exchange produced a book, on the local clock"""
+        return (time.time() if now is None else now) - exchange_time
+
+    def skew(self, a: str, b: str) -> float:
+        """Clock offset of venue ``a`` relative to venue ``b``"""
+        return self.clocks[a].offset - self.clocks[b].offset
+
+    async def probe(self, venue: str, session: aiohttp.ClientSession):
+        url, parse = TIME_ENDPOINTS[venue]
+        url = os.getenv(f'{venue.upper()}_TIME_URL', url)
+        await self.scheduler.acquire(venue)
+        sent = time.time()
+        async with session.get(url) as response:
+            payload = await response.json(content_type=None)
+            received = time.time()
+        self.scheduler.update_from_headers(venue, response.headers)
+
+        clock = self.clocks[venue]
+        clock.add_probe(sent, parse(payload), received)
+        self._offset.labels(venue).set(clock.offset)
+        self._rtt.labels(venue).set(clock.rtt)
+
+    async def run(self):
+        """Probe every venue with a known time endpoint until cancelled"""
+        venues = [venue for venue in self.clocks if venue in TIME_ENDPOINTS]
+        timeout = aiohttp.ClientTimeout(total=5)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                for venue in venues:
+                    try:
+                        await self.probe(venue, session)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"{venue} server time probe failed: {e}")
+                    self._latency.labels(venue).set(self.clocks[venue].latency)
+                await asyncio.sleep(self.probe_interval)
+
+    def summary(self) -> List[Dict]:
+        return [
+            {'venue': venue, 'offset_ms': clock.offset * 1000, 'latency_ms': clock.latency * 1000,
+             'rtt_ms': clock.rtt * 1000 if clock.rtt is not None else None,
+             'synced': clock.synced, 'corrections': clock.corrections}
+            for venue, clock in self.clocks.items()
+        ]
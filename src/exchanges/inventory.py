@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import threading
+import time
+from functools import partial
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+# (venue, asset, amount)
+Leg = Tuple[str, str, Decimal]
+
+
+def _to_decimal(value) -> Decimal:
+    if value in (None, ''):
+        return ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def balances_from_ccxt(balance: Dict) -> Dict[str, Dict[str, Decimal]]:
+    """Convert a ccxt ``fetch_balance`` result to ``{asset: {'free', 'locked'}}``"""
+    free = balance.get('free') or {}
+    used = balance.get('used') or {}
+    return {
+        asset: {'free': _to_decimal(free.get(asset)), 'locked': _to_decimal(used.get(asset))}
+        for asset in set(free) | set(used)
+    }
+
+
+class InventoryService:
+    """Per-venue, per-asset balances kept in memory
+
+    Balances come from private wallet streams (``attach_stream``) or bulk
+    polling (``refresh`` / ``refresh_stale`` / ``poll``), so pre-trade
+    checks are local reads.
+    ``reserve()`` atomically earmarks funds across all legs of a planned
+    trade; reserved amounts are subtracted from ``available()`` until the
+    reservation is released or settled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.balances: Dict[str, Dict[str, Dict[str, Decimal]]] = {}
+        self.reserved: Dict[Tuple[str, str], Decimal] = {}
+        self.reservations: Dict[int, List[Leg]] = {}
+        self._ids = itertools.count(1)
+        # venue -> 同步余额查询（bootstrap 注册）及上次成功刷新时间
+        self.sources: Dict[str, Callable[[], Dict]] = {}
+        self.refreshed_at: Dict[str, float] = {}
+
+    def set_balances(self, venue: str, balances: Dict[str, Dict], replace: bool = True):
+        """Apply a balance snapshot (``replace``) or a partial update for a venue"""
+        parsed = {
+            asset: {'free': _to_decimal(b.get('free')), 'locked': _to_decimal(b.get('locked'))}
+            for asset, b in balances.items()
+        }
+        with self._lock:
+            if replace:
+                self.balances[venue] = parsed
+            else:
+                self.balances.setdefault(venue, {}).update(parsed)
+
+    def update_balances(self, venue: str, balances: Dict[str, Dict]):
+        self.set_balances(venue, balances, replace=False)
+
+    def ensure(self, venue: str, asset: str, amount):
+        """Seed an asset the venue has not reported yet (simulated starting inventory)"""
+        with self._lock:
+            assets = self.balances.setdefault(venue, {})
+            if asset not in assets:
+                assets[asset] = {'free': _to_decimal(amount), 'locked': ZERO}
+
+    def free(self, venue: str, asset: str) -> Decimal:
+        balance = self.balances.get(venue, {}).get(asset)
+        return balance['free'] if balance else ZERO
+
+    def locked(self, venue: str, asset: str) -> Decimal:
+        balance = self.balances.get(venue, {}).get(asset)
+        return balance['locked'] if balance else ZERO
+
+    def available(self, venue: str, asset: str) -> Decimal:
+        """Free balance minus local reservations"""
+        return self.free(venue, asset) - self.reserved.get((venue, asset), ZERO)
+
+    def total(self, asset: str) -> Decimal:
+        """Free plus locked balance of an asset across all venues"""
+        return sum(
+            (b[asset]['free'] + b[asset]['locked'] for b in self.balances.values() if asset in b), ZERO
+        )
+
+    def reserve(self, legs: Iterable[Leg]) -> Optional[int]:
+        """Reserve every leg or none; returns a reservation id, or None if short"""
+        legs = [(venue, asset, _to_decimal(amount)) for venue, asset, amount in legs]
+        with self._lock:
+            needed: Dict[Tuple[str, str], Decimal] = {}
+            for venue, asset, amount in legs:
+                needed[(venue, asset)] = needed.get((venue, asset), ZERO) + amount
+            for (venue, asset), amount in needed.items():
+                if self.available(venue, asset) < amount:
+                    return None
+            for key, amount in needed.items():
+                self.reserved[key] = self.reserved.get(key, ZERO) + amount
+            reservation_id = next(self._ids)
+            self.reservations[reservation_id] = legs
+            return reservation_id
+
+    def release(self, reservation_id: int):
+        """Return reserved funds (order rejected, cancelled, or confirmed by the venue)"""
+        with self._lock:
+            for venue, asset, amount in self.reservations.pop(reservation_id, ()):
+                remaining = self.reserved.get((venue, asset), ZERO) - amount
+                if remaining > 0:
+                    self.reserved[(venue, asset)] = remaining
+                else:
+                    self.reserved.pop((venue, asset), None)
+
+    def adjust(self, venue: str, asset: str, delta):
+        """Apply a local balance change (e.g. a fill seen before the next wallet update)"""
+        with self._lock:
+            balance = self.balances.setdefault(venue, {}).setdefault(asset, {'free': ZERO, 'locked': ZERO})
+            balance['free'] += _to_decimal(delta)
+
+    def settle(self, reservation_id: int, deltas: Iterable[Leg]):
+        """Release a reservation and apply the resulting balance changes"""
+        self.release(reservation_id)
+        for venue, asset, delta in deltas:
+            self.adjust(venue, asset, delta)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Decimal]]]:
+        with self._lock:
+            return {
+                venue: {
+                    asset: {**b, 'reserved': self.reserved.get((venue, asset), ZERO)}
+                    for asset, b in assets.items()
+                }
+                for venue, assets in self.balances.items()
+            }
+
+    def attach_stream(self, venue: str, stream):
+        """Apply wallet updates pushed by a ``PrivateOrderStream``"""
+        stream.add_balance_listener(lambda balances: self.update_balances(venue, balances))
+
+    def refresh(self, venue: str, fetch: Callable[[], Dict]):
+        """Bulk-poll one venue with a synchronous ccxt ``fetch_balance``"""
+        self.set_balances(venue, balances_from_ccxt(fetch()))
+        self.refreshed_at[venue] = time.monotonic()
+
+    def bootstrap(self, exchanges: Dict[str, object], fetch: Callable[[str, object], Dict],
+                  seed: Dict[str, Dict], live: bool = True):
+        """Initial snapshot for synchronous ccxt bots
+
+        Venues with an API key are polled through ``fetch(venue, exchange)``
+        (a ccxt ``fetch_balance`` result) and registered for
+        ``refresh_stale``; in simulation (``live=False``) or without a key the
+        venue starts from the ``seed`` balances.
+        """
+        for venue, exchange in exchanges.items():
+            if live and getattr(exchange, 'apiKey', None):
+                self.sources[venue] = partial(fetch, venue, exchange)
+                self.refresh(venue, self.sources[venue])
+            else:
+                self.set_balances(venue, seed)
+
+    def refresh_stale(self, max_age: float) -> List[str]:
+        """Re-poll registered venues whose snapshot is older than ``max_age`` seconds
+
+        Between polls balances move through ``settle``, so a trading loop can
+        call this every iteration and only pays for a REST request once per
+        ``max_age``. Returns the venues refreshed.
+        """
+        now = time.monotonic()
+        refreshed = []
+        for venue, fetch in self.sources.items():
+            if now - self.refreshed_at.get(venue, 0.0) < max_age:
+                continue
+            try:
+                self.refresh(venue, fetch)
+                refreshed.append(venue)
+            except Exception as e:
+                # 失败后同样等待 max_age 再重试，避免每轮都阻塞在故障交易所上
+                self.refreshed_at[venue] = now
+                logger.warning(f"Failed to refresh balances for {venue}: {str(e)[:100]}")
+        return refreshed
+
+    async def poll(self, venue: str, fetch: Callable, interval: float = 30.0):
+        """Periodically snapshot a venue without a wallet stream
+
+        ``fetch`` is an async callable returning ``{asset: {'free', 'locked'}}``,
+        such as ``BaseExchange.get_balances``.
+        """
+        while True:
+            try:
+                self.set_balances(venue, await fetch())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to poll balances for {venue}: {e}")
+            await asyncio.sleep(interval)
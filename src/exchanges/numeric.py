@@ -0,0 +1,99 @@
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Dict, List, Sequence, Tuple
+
+# ccxt 的 precisionMode 取值：2 = 小数位数，4 = 最小变动单位
+DECIMAL_PLACES = 2
+TICK_SIZE = 4
+
+# (价格 tick 数, 数量 lot 数)
+Level = Tuple[int, int]
+
+
+def _step(precision, mode: int) -> Decimal:
+    """Smallest increment as a Decimal from a ccxt precision value"""
+    if precision is None:
+        # 未提供精度时退化为 1e-8，足以覆盖现货价格与数量
+        return Decimal('1e-8')
+    if mode == TICK_SIZE:
+        return Decimal(str(precision))
+    return Decimal(1).scaleb(-int(precision))
+
+
+class PriceScale:
+    """Integer tick/lot representation of one market's prices and sizes
+
+    Market data is kept as ints on the hot path: a price is a whole number
+    of ticks and a size a whole number of lots, so comparisons and spreads
+    are exact integer operations with no ``Decimal(str(x))`` per level.
+    Floats come back out via ``price()``/``qty()`` for ratios and display,
+    and exact ``Decimal`` values are produced only at order submission by
+    the ``quantize_*`` helpers, which round in the direction that never
+    breaches the requested price or size.
+    """
+
+    __slots__ = ('symbol', 'tick', 'lot', 'tick_size', 'lot_size', '_inv_tick', '_inv_lot')
+
+    def __init__(self, symbol: str, tick: Decimal, lot: Decimal):
+        self.symbol = symbol
+        self.tick = tick
+        self.lot = lot
+        self.tick_size = float(tick)
+        self.lot_size = float(lot)
+        self._inv_tick = 1 / self.tick_size
+        self._inv_lot = 1 / self.lot_size
+
+    @classmethod
+    def from_market(cls, market: Dict, precision_mode: int = TICK_SIZE) -> 'PriceScale':
+        """Build from a ccxt market dict and the exchange's ``precisionMode``"""
+        precision = market.get('precision') or {}
+        return cls(market['symbol'],
+                   _step(precision.get('price'), precision_mode),
+                   _step(precision.get('amount'), precision_mode))
+
+    # ---- 行情热路径：float <-> int ----
+
+    def to_ticks(self, price: float) -> int:
+        return round(price * self._inv_tick)
+
+    def to_lots(self, qty: float) -> int:
+        return round(qty * self._inv_lot)
+
+    def price(self, ticks: int) -> float:
+        return ticks * self.tick_size
+
+    def qty(self, lots: int) -> float:
+        return lots * self.lot_size
+
+    def levels(self, rows: Sequence) -> List[Level]:
+        """ccxt ``[price, amount, ...]`` rows as ``(ticks, lots)`` pairs"""
+        inv_tick, inv_lot = self._inv_tick, self._inv_lot
+        return [(round(row[0] * inv_tick), round(row[1] * inv_lot)) for row in rows]
+
+    def float_levels(self, levels: Sequence[Level]) -> List[List[float]]:
+        """``(ticks, lots)`` pairs back to ``[price, qty]`` floats, e.g. for depth_arbitrage"""
+        tick, lot = self.tick_size, self.lot_size
+        return [[ticks * tick, lots * lot] for ticks, lots in levels]
+
+    # ---- 下单边界：精确 Decimal ----
+
+    def price_decimal(self, ticks: int) -> Decimal:
+        return ticks * self.tick
+
+    def qty_decimal(self, lots: int) -> Decimal:
+        return lots * self.lot
+
+    def quantize_price(self, price: Decimal, side: str) -> Decimal:
+        """Round a limit price onto the tick grid without worsening it
+
+        Buys round down and sells round up, so the order is never more
+        aggressive than requested.
+        """
+        rounding = ROUND_FLOOR if side == 'buy' else ROUND_CEILING
+        return (Decimal(price) / self.tick).to_integral_value(rounding) * self.tick
+
+    def quantize_qty(self, qty: Decimal) -> Decimal:
+        """Round a size down to a whole number of lots"""
+        return (Decimal(qty) / self.lot).to_integral_value(ROUND_FLOOR) * self.lot
+
+    def __repr__(self):
+        return f"PriceScale({self.symbol!r}, tick={self.tick}, lot={self.lot})"
@@ -0,0 +1,480 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import orjson
+import websockets
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 终态订单：到达后 wait_for_fill 立即返回
+TERMINAL_STATUSES = ('closed', 'canceled', 'rejected')
+# 对外返回的订单字段，与 BaseExchange.get_order_status 的 REST 结果一致
+ORDER_FIELDS = ('id', 'status', 'filled', 'remaining', 'price', 'average_price')
+
+# REST 订单查询 (symbol, order_id) -> 订单状态，用于重连后补齐断线期间的成交
+OrderSource = Callable[[str, str], Awaitable[Dict]]
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    if value in (None, ''):
+        return None
+    return Decimal(str(value))
+
+
+class PrivateOrderStream(ABC):
+    """Base class for private order/execution WebSocket streams
+
+    Keeps an in-memory order state cache updated by push events, so order
+    status lookups are local dict reads instead of REST round trips.
+    Lookups return copies in the same shape as
+    ``BaseExchange.get_order_status``.
+
+    Each connection logs in and waits for the ack before subscribing, then
+    re-reads every tracked, unfinished order through ``order_source`` (REST)
+    so fills pushed while the stream was down are not lost. Terminal orders
+    are evicted ``terminal_ttl`` seconds after they finish.
+    """
+
+    # 心跳间隔（秒）
+    ping_interval = 20
+    reconnect_delay = 5
+    auth_timeout = 10
+    # 终态订单在缓存中保留的时间（秒），之后被清除
+    terminal_ttl = 60.0
+
+    def __init__(self, api_key: str, secret_key: str, url: str, order_source: Optional[OrderSource] = None):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.url = url
+        self.name = self.__class__.__name__
+        self.running = False
+        self.order_source = order_source
+
+        self.orders: Dict[str, Dict] = {}
+        self._tracked: Dict[str, str] = {}  # order_id -> symbol（REST 补查用）
+        self._expiry: deque = deque()       # (到期时间, order_id)
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self.balance_listeners: List[Callable[[Dict], None]] = []
+        self.stats = {'messages': 0, 'errors': 0, 'resynced': 0, 'evicted': 0}
+
+    @abstractmethod
+    def _auth_message(self) -> Dict:
+        """Build the login/auth request"""
+        pass
+
+    @abstractmethod
+    def _auth_result(self, data: Dict) -> Optional[bool]:
+        """True/False if ``data`` is the login response, None for any other message"""
+        pass
+
+    @abstractmethod
+    def _subscribe_message(self) -> Dict:
+        """Build the subscription request for order and execution channels"""
+        pass
+
+    @abstractmethod
+    def _ping_message(self) -> str:
+        """Application-level heartbeat payload"""
+        pass
+
+    @abstractmethod
+    def _parse_message(self, data: Dict) -> List[Dict]:
+        """Convert a push message into normalized order updates"""
+        pass
+
+    def _parse_balances(self, data: Dict) -> Dict[str, Dict]:
+        """Convert a wallet push into ``{asset: {'free', 'locked'}}`` (if supported)"""
+        return {}
+
+    def add_balance_listener(self, callback: Callable[[Dict], None]):
+        """Receive wallet updates, e.g. ``InventoryService.update_balances``"""
+        self.balance_listeners.append(callback)
+
+    @staticmethod
+    def _snapshot(order: Dict) -> Dict:
+        return {key: order.get(key) for key in ORDER_FIELDS}
+
+    def get_order(self, order_id: str) -> Optional[Dict]:
+        """Return a copy of the cached state of an order, or None if never seen"""
+        order = self.orders.get(order_id)
+        return None if order is None else self._snapshot(order)
+
+    def get_raw_status(self, order_id: str) -> Optional[str]:
+        """Venue-native status string of a cached order (e.g. Bybit ``PartiallyFilled``)"""
+        order = self.orders.get(order_id)
+        return None if order is None else order.get('raw_status')
+
+    def track(self, order_id: str, symbol: str):
+        """Remember an order's symbol so it can be re-read over REST after a reconnect"""
+        self._tracked[order_id] = symbol
+
+    async def wait_for_fill(self, order_id: str, timeout: float, symbol: Optional[str] = None) -> Dict:
+        """Wait until an order reaches a terminal state and return it
+
+        Resolves on ``closed`` (fully filled) as well as ``canceled`` and
+        ``rejected``; callers should check ``status``. Raises
+        ``asyncio.TimeoutError`` if no terminal state arrives in time.
+        Passing ``symbol`` lets a reconnect resync this order over REST.
+        """
+        if symbol is not None:
+            self.track(order_id, symbol)
+        order = self.orders.get(order_id)
+        if order and order['status'] in TERMINAL_STATUSES:
+            return self._snapshot(order)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(order_id, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = self._waiters.get(order_id)
+            if waiters:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self._waiters[order_id]
+
+    def apply_update(self, update: Dict, now: Optional[float] = None):
+        """Merge a normalized order update into the cache and wake waiters"""
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        order_id = update['id']
+        order = self.orders.get(order_id)
+        if order is None:
+            self.orders[order_id] = order = {'filled': Decimal('0'), 'remaining': None, 'status': None}
+        if order['status'] in TERMINAL_STATUSES:
+            # 终态不会回退：重连补查后才到达的旧推送不能改写已结束订单的状态和成交量
+            return
+        # 成交回报可能只携带部分字段
+        for key, value in update.items():
+            if value is not None or key not in order:
+                order[key] = value
+
+        if order['status'] in TERMINAL_STATUSES:
+            self._expiry.append((now + self.terminal_ttl, order_id))
+            waiters = self._waiters.pop(order_id, ())
+            if waiters:
+                result = self._snapshot(order)
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(result)
+
+    def _evict(self, now: float):
+        """Drop terminal orders whose retention period has passed"""
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            _, order_id = expiry.popleft()
+            order = self.orders.get(order_id)
+            if order is not None and order['status'] in TERMINAL_STATUSES and order_id not in self._waiters:
+                del self.orders[order_id]
+                self._tracked.pop(order_id, None)
+                self.stats['evicted'] += 1
+
+    def forget(self, order_id: str):
+        """Drop a finished order from the cache"""
+        self.orders.pop(order_id, None)
+        self._tracked.pop(order_id, None)
+
+    async def resync(self):
+        """Re-read tracked orders that are not finished (or have waiters) over REST"""
+        if self.order_source is None:
+            return
+        pending = [
+            (order_id, symbol) for order_id, symbol in self._tracked.items()
+            if order_id in self._waiters
+            or self.orders.get(order_id, {}).get('status') not in TERMINAL_STATUSES
+        ]
+        if not pending:
+            return
+        results = await asyncio.gather(
+            *(self.order_source(symbol, order_id) for order_id, symbol in pending), return_exceptions=True)
+        for (order_id, symbol), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{self.name} resync of order {order_id} failed: {result}")
+            elif result:
+                self.apply_update({**result, 'id': order_id})
+                self.stats['resynced'] += 1
+        logger.info(f"{self.name} resynced {len(pending)} orders after connect")
+
+    def handle_message(self, message):
+        """Apply one raw push message (text) to the order cache and balance listeners"""
+        if message == 'pong':
+            return
+        data = orjson.loads(message)
+        self.stats['messages'] += 1
+        for update in self._parse_message(data):
+            self.apply_update(update)
+        if self.balance_listeners:
+            balances = self._parse_balances(data)
+            if balances:
+                for callback in self.balance_listeners:
+                    callback(balances)
+
+    async def _login(self, ws):
+        """Send the auth request and wait for its ack before subscribing"""
+        await ws.send(json.dumps(self._auth_message()))
+        deadline = time.monotonic() + self.auth_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ConnectionError(f"{self.name} login timed out")
+            message = await asyncio.wait_for(ws.recv(), timeout=remaining)
+            if message == 'pong':
+                continue
+            try:
+                result = self._auth_result(orjson.loads(message))
+            except orjson.JSONDecodeError:
+                continue
+            if result is None:
+                continue
+            if not result:
+                raise ConnectionError(f"{self.name} login rejected: {message}")
+            return
+
+    async def _session(self, ws):
+        """One connection: login, subscribe, resync, then consume until stopped or closed"""
+        await self._login(ws)
+        await ws.send(json.dumps(self._subscribe_message()))
+        logger.info(f"{self.name} connected")
+        await self.resync()
+
+        while self.running:
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=self.ping_interval)
+            except asyncio.TimeoutError:
+                await ws.send(self._ping_message())
+                continue
+            try:
+                self.handle_message(message)
+            except Exception as e:
+                # 单条消息出错不影响连接
+                self.stats['errors'] += 1
+                logger.error(f"{self.name} failed to handle message: {e}")
+
+    async def run(self):
+        """Connect, authenticate and consume push events until stopped"""
+        self.running = True
+        while self.running:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    await self._session(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} connection error: {e}")
+
+            if self.running:
+                await asyncio.sleep(self.reconnect_delay)
+
+    def stop(self):
+        """Stop the consume loop after the current message"""
+        self.running = False
+
+
+class BybitPrivateStream(PrivateOrderStream):
+    """Bybit v5 private ``order``, ``execution`` and ``wallet`` streams"""
+
+    URLS = {
+        'mainnet': 'wss://stream.bybit.com/v5/private',
+        'testnet': 'wss://stream-testnet.bybit.com/v5/private',
+        'demo': 'wss://stream-demo.bybit.com/v5/private',
+    }
+
+    STATUS_MAP = {
+        'New': 'open',
+        'PartiallyFilled': 'open',
+        'Untriggered': 'open',
+        'Filled': 'closed',
+        'Cancelled': 'canceled',
+        'PartiallyFilledCanceled': 'canceled',
+        'Deactivated': 'canceled',
+        'Rejected': 'rejected',
+    }
+
+    def __init__(self, api_key: str, secret_key: str, environment: str = 'mainnet',
+                 order_source: Optional[OrderSource] = None):
+        super().__init__(api_key, secret_key, self.URLS[environment], order_source)
+
+    def _auth_message(self) -> Dict:
+        expires = int((time.time() + 10) * 1000)
+        signature = hmac.new(
+            self.secret_key.encode('utf-8'),
+            f"GET/realtime{expires}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        return {'op': 'auth', 'args': [self.api_key, expires, signature]}
+
+    def _auth_result(self, data: Dict) -> Optional[bool]:
+        if data.get('op') != 'auth':
+            return None
+        return bool(data.get('success'))
+
+    def _subscribe_message(self) -> Dict:
+        return {'op': 'subscribe', 'args': ['order', 'execution', 'wallet']}
+
+    def _ping_message(self) -> str:
+        return '{"op": "ping"}'
+
+    def _parse_message(self, data: Dict) -> List[Dict]:
+        topic = data.get('topic')
+        if topic == 'order':
+            return [self._parse_order(item) for item in data.get('data', [])]
+        if topic == 'execution':
+            return [self._parse_execution(item) for item in data.get('data', [])]
+        return []
+
+    def _parse_balances(self, data: Dict) -> Dict[str, Dict]:
+        if data.get('topic') != 'wallet':
+            return {}
+        balances = {}
+        for account in data.get('data', []):
+            for coin in account.get('coin', []):
+                total = _to_decimal(coin.get('walletBalance')) or Decimal('0')
+                locked = _to_decimal(coin.get('locked')) or Decimal('0')
+                balances[coin['coin']] = {'free': total - locked, 'locked': locked}
+        return balances
+
+    def _parse_order(self, item: Dict) -> Dict:
+        return {
+            'id': item['orderId'],
+            'symbol': item.get('symbol'),
+            'side': item.get('side', '').lower() or None,
+            'status': self.STATUS_MAP.get(item.get('orderStatus'), 'open'),
+            'raw_status': item.get('orderStatus'),
+            'filled': _to_decimal(item.get('cumExecQty')) or Decimal('0'),
+            'remaining': _to_decimal(item.get('leavesQty')) or Decimal('0'),
+            'price': _to_decimal(item.get('price')) or None,
+            'average_price': _to_decimal(item.get('avgPrice')) or None,
+            'timestamp': int(item.get('updatedTime') or 0) or None,
+        }
+
+    def _parse_execution(self, item: Dict) -> Dict:
+        # execution 推送通常先于 order 推送到达，用 orderQty - leavesQty 得到累计成交量
+        order_id = item['orderId']
+        order = self.orders.get(order_id)
+        order_qty = _to_decimal(item.get('orderQty'))
+        remaining = _to_decimal(item.get('leavesQty'))
+        filled = order_qty - remaining if order_qty is not None and remaining is not None else None
+        if remaining == 0:
+            status = 'closed'
+        else:
+            status = order['status'] if order else 'open'
+        return {
+            'id': order_id,
+            'symbol': item.get('symbol'),
+            'status': status,
+            'filled': filled,
+            'remaining': remaining,
+            'timestamp': int(item.get('execTime') or 0) or None,
+        }
+
+
+class BitgetPrivateStream(PrivateOrderStream):
+    """Bitget v2 private spot ``orders`` and ``account`` streams"""
+
+    URL = 'wss://ws.bitget.com/v2/ws/private'
+
+    STATUS_MAP = {
+        'live': 'open',
+        'new': 'open',
+        'partially_filled': 'open',
+        'filled': 'closed',
+        'cancelled': 'canceled',
+        'canceled': 'canceled',
+    }
+
+    ping_interval = 30
+
+    def __init__(self, api_key: str, secret_key: str, passphrase: str,
+                 order_source: Optional[OrderSource] = None):
+        super().__init__(api_key, secret_key, self.URL, order_source)
+        self.passphrase = passphrase
+
+    def _auth_message(self) -> Dict:
+        timestamp = str(int(time.time()))
+        digest = hmac.new(
+            self.secret_key.encode('utf-8'),
+            f"{timestamp}GET/user/verify".encode('utf-8'),
+            hashlib.sha256
+        ).digest()
+        return {
+            'op': 'login',
+            'args': [{
+                'apiKey': self.api_key,
+                'passphrase': self.passphrase,
+                'timestamp': timestamp,
+                'sign': base64.b64encode(digest).decode(),
+            }]
+        }
+
+    def _auth_result(self, data: Dict) -> Optional[bool]:
+        event = data.get('event')
+        if event == 'login':
+            return str(data.get('code', 0)) == '0'
+        if event == 'error':
+            return False
+        return None
+
+    def _subscribe_message(self) -> Dict:
+        return {
+            'op': 'subscribe',
+            'args': [
+                {'instType': 'SPOT', 'channel': 'orders', 'instId': 'default'},
+                {'instType': 'SPOT', 'channel': 'account', 'coin': 'default'},
+            ]
+        }
+
+    def _ping_message(self) -> str:
+        return 'ping'
+
+    def _parse_balances(self, data: Dict) -> Dict[str, Dict]:
+        if data.get('arg', {}).get('channel') != 'account' or 'data' not in data:
+            return {}
+        return {
+            item['coin']: {
+                'free': _to_decimal(item.get('available')) or Decimal('0'),
+                'locked': (_to_decimal(item.get('frozen')) or Decimal('0')) +
+                          (_to_decimal(item.get('locked')) or Decimal('0')),
+            }
+            for item in data['data']
+        }
+
+    def _parse_message(self, data: Dict) -> List[Dict]:
+        if data.get('arg', {}).get('channel') != 'orders' or 'data' not in data:
+            if data.get('event') == 'error':
+                logger.error(f"Bitget private stream error: {data.get('msg')}")
+            return []
+
+        updates = []
+        for item in data['data']:
+            status = self.STATUS_MAP.get(item.get('status'), 'open')
+            filled = _to_decimal(item.get('accBaseVolume')) or Decimal('0')
+            if item.get('orderType') == 'market' and item.get('side') == 'buy':
+                # 市价买单的 size 是计价币金额，无法换算出剩余的基础币数量：结束前未知
+                remaining = Decimal('0') if status in TERMINAL_STATUSES else None
+            else:
+                size = _to_decimal(item.get('size')) or Decimal('0')
+                remaining = max(size - filled, Decimal('0'))
+            updates.append({
+                'id': item['orderId'],
+                'symbol': item.get('instId'),
+                'side': item.get('side'),
+                'status': status,
+                'raw_status': item.get('status'),
+                'filled': filled,
+                'remaining': remaining,
+                'price': _to_decimal(item.get('price')) or None,
+                'average_price': _to_decimal(item.get('priceAvg')) or None,
+                'timestamp': int(item.get('uTime') or 0) or None,
+            })
+        return updates
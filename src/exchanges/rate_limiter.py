@@ -0,0 +1,255 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 端点类别：下单优先，可使用为其保留的共享预算
+ORDER = 'order'
+ACCOUNT = 'account'
+MARKET_DATA = 'market_data'
+
+# 各交易所公开的限额，换算为 (容量, 每秒补充)
+# 'ip' 是整个交易所共享的权重预算，其余是端点类别自己的上限
+VENUE_LIMITS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    'binance': {'ip': (6000, 100.0), ORDER: (100, 10.0), ACCOUNT: (6000, 100.0), MARKET_DATA: (6000, 100.0)},
+    'bybit': {'ip': (600, 120.0), ORDER: (20, 10.0), ACCOUNT: (50, 10.0), MARKET_DATA: (600, 120.0)},
+    'bitget': {'ip': (20, 20.0), ORDER: (10, 10.0), ACCOUNT: (10, 10.0), MARKET_DATA: (20, 20.0)},
+}
+DEFAULT_LIMITS = {'ip': (10, 10.0), ORDER: (5, 5.0), ACCOUNT: (5, 5.0), MARKET_DATA: (10, 10.0)}
+
+# 为下单保留的共享预算比例：行情请求不能把共享桶用到这条线以下
+ORDER_RESERVE = 0.2
+
+# ccxt 的限频异常（按类名匹配，避免导入 ccxt）
+RATE_LIMIT_ERRORS = ('RateLimitExceeded', 'DDoSProtection')
+
+
+class TokenBucket:
+    """Weight-aware token bucket; not thread-safe on its own"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated', 'paused_until')
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        # 桶可能在调用方读取 now 之后才创建，不能倒扣令牌
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, weight: float, now: float, floor: float = 0.0) -> float:
+        """Seconds until ``weight`` tokens are available above ``floor``"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        deficit = weight + floor - self.tokens
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def pause(self, until: float):
+        self.paused_until = max(self.paused_until, until)
+
+
+class RequestScheduler:
+    """Central per-venue request budget
+
+    Every request takes ``weight`` tokens from the venue's shared ``ip``
+    bucket and from its endpoint-class bucket. Order placement may use the
+    whole shared bucket, while market data and account queries must leave
+    ``ORDER_RESERVE`` of it free, so orders are never starved by polling.
+    Rate-limit headers returned by the exchange shrink local budgets to the
+    server's view, and 429 responses pause the venue with exponential
+    backoff. Callers no longer need fixed sleeps between requests; polling
+    loops use ``pace_sync`` to wait until their next round fits the budget.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Tuple[float, float]]]] = None,
+                 max_backoff: float = 60.0):
+        self.limits = limits if limits is not None else VENUE_LIMITS
+        self.max_backoff = max_backoff
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.backoff_streak: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, venue: str, endpoint: str) -> TokenBucket:
+        key = (venue, endpoint)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limits = self.limits.get(venue, DEFAULT_LIMITS)
+            capacity, rate = limits.get(endpoint, DEFAULT_LIMITS.get(endpoint, DEFAULT_LIMITS[MARKET_DATA]))
+            bucket = self.buckets[key] = TokenBucket(capacity, rate)
+        return bucket
+
+    def _venue_stats(self, venue: str) -> Dict[str, float]:
+        stats = self.stats.get(venue)
+        if stats is None:
+            stats = self.stats[venue] = {'requests': 0, 'waited_seconds': 0.0, 'rate_limited': 0}
+        return stats
+
+    def _wait_time(self, venue: str, endpoint: str, weight: float, now: float):
+        """Refill both buckets; returns (wait, capped weight). Caller holds the lock"""
+        shared = self.bucket(venue, 'ip')
+        own = self.bucket(venue, endpoint)
+        shared.refill(now)
+        own.refill(now)
+
+        floor = 0.0 if endpoint == ORDER else shared.capacity * ORDER_RESERVE
+        # 超过桶容量的权重永远无法满足，按容量截断
+        weight = min(weight, own.capacity, shared.capacity - floor)
+        return max(shared.wait_time(weight, now, floor), own.wait_time(weight, now)), weight
+
+    def _try_acquire(self, venue: str, endpoint: str, weight: float) -> float:
+        """Take tokens and return 0, or return how long to wait before retrying"""
+        with self._lock:
+            wait, weight = self._wait_time(venue, endpoint, weight, time.monotonic())
+            stats = self._venue_stats(venue)
+            if wait > 0:
+                stats['waited_seconds'] += wait
+                return wait
+
+            self.bucket(venue, 'ip').tokens -= weight
+            self.bucket(venue, endpoint).tokens -= weight
+            stats['requests'] += 1
+            return 0.0
+
+    def acquire_sync(self, venue: str, endpoint: str = MARKET_DATA, weight: float = 1):
+        """Block the calling thread until the request fits the budget"""
+        while True:
+            wait = self._try_acquire(venue, endpoint, weight)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire(self, venue: str, endpoint: str = MARKET_DATA, weight: float = 1):
+        """Wait (without blocking the loop) until the request fits the budget"""
+        while True:
+            wait = self._try_acquire(venue, endpoint, weight)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def round_wait(self, venues: Mapping[str, float], endpoint: str = MARKET_DATA) -> float:
+        """Seconds until every venue's budget covers one more polling round
+
+        ``venues`` maps venue -> total request weight of one round. Nothing
+        is taken from the buckets; the requests themselves still acquire.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return max((self._wait_time(venue, endpoint, weight, now)[0]
+                        for venue, weight in venues.items()), default=0.0)
+
+    def pace_sync(self, venues: Mapping[str, float], min_interval: float = 0.0,
+                  started: Optional[float] = None, endpoint: str = MARKET_DATA) -> float:
+        """Block until the next polling round fits the budget; returns seconds slept
+
+        Replaces a fixed ``time.sleep`` between rounds: the loop runs as fast
+        as the budget refills and automatically slows down after a 429 or
+        when response headers report a low budget. ``min_interval`` bounds
+        the round period measured from ``started`` (``time.monotonic()`` at
+        the start of the round), not the idle time after it.
+        """
+        elapsed = time.monotonic() - started if started is not None else 0.0
+        wait = max(min_interval - elapsed, self.round_wait(venues, endpoint))
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+    def update_from_headers(self, venue: str, headers: Optional[Mapping[str, str]],
+                            endpoint: str = MARKET_DATA):
+        """Adopt the server's view of the remaining budget"""
+        if not headers:
+            return
+        h = {k.lower(): v for k, v in headers.items()}
+        try:
+            with self._lock:
+                now = time.monotonic()
+                # Binance: 已用权重（1 分钟窗口，上限 6000）
+                used = h.get('x-mbx-used-weight-1m')
+                if used is not None:
+                    shared = self.bucket(venue, 'ip')
+                    shared.refill(now)
+                    shared.tokens = min(shared.tokens, shared.capacity * max(0.0, 1 - float(used) / 6000))
+
+                # Bybit: 按端点的剩余次数及重置时间；通用的 X-RateLimit-* 同理
+                remaining = h.get('x-bapi-limit-status', h.get('x-ratelimit-remaining'))
+                limit = h.get('x-bapi-limit', h.get('x-ratelimit-limit'))
+                if remaining is not None and limit:
+                    own = self.bucket(venue, endpoint)
+                    own.refill(now)
+                    own.tokens = min(own.tokens, own.capacity * float(remaining) / float(limit))
+                    if float(remaining) <= 0:
+                        reset = h.get('x-bapi-limit-reset-timestamp')
+                        delay = (float(reset) / 1000 - time.time()) if reset else 1.0
+                        own.pause(now + max(0.0, min(delay, self.max_backoff)))
+
+                retry_after = h.get('retry-after')
+                if retry_after is not None:
+                    self.bucket(venue, 'ip').pause(now + min(float(retry_after), self.max_backoff))
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Ignoring malformed rate-limit headers from {venue}: {e}")
+
+    def on_rate_limited(self, venue: str, retry_after: Optional[float] = None) -> float:
+        """Pause a venue after a 429; returns the pause length"""
+        with self._lock:
+            streak = self.backoff_streak.get(venue, 0)
+            self.backoff_streak[venue] = streak + 1
+            if retry_after is None:
+                retry_after = min(self.max_backoff, 2 ** streak) * random.uniform(0.5, 1.0)
+            self.bucket(venue, 'ip').pause(time.monotonic() + retry_after)
+            self._venue_stats(venue)['rate_limited'] += 1
+        logger.warning(f"{venue} rate limited, backing off {retry_after:.1f}s")
+        return retry_after
+
+    def on_success(self, venue: str):
+        if self.backoff_streak.get(venue):
+            self.backoff_streak[venue] = 0
+
+    def _after_call(self, venue: str, endpoint: str, fn: Callable):
+        # ccxt 客户端会保存最后一次响应头
+        client = getattr(fn, '__self__', None)
+        self.update_from_headers(venue, getattr(client, 'last_response_headers', None), endpoint)
+        self.on_success(venue)
+
+    def call(self, venue: str, fn: Callable, *args, endpoint: str = MARKET_DATA, weight: float = 1,
+             retries: int = 3, **kwargs):
+        """Run a blocking request (e.g. a ccxt method) under the venue budget"""
+        for attempt in range(retries + 1):
+            self.acquire_sync(venue, endpoint, weight)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if type(e).__name__ not in RATE_LIMIT_ERRORS or attempt == retries:
+                    raise
+                self.on_rate_limited(venue)
+                continue
+            self._after_call(venue, endpoint, fn)
+            return result
+
+    async def call_async(self, venue: str, fn: Callable, *args, endpoint: str = MARKET_DATA,
+                         weight: float = 1, retries: int = 3, **kwargs):
+        """Await a coroutine function under the venue budget"""
+        for attempt in range(retries + 1):
+            await self.acquire(venue, endpoint, weight)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                if type(e).__name__ not in RATE_LIMIT_ERRORS or attempt == retries:
+                    raise
+                self.on_rate_limited(venue)
+                continue
+            self._after_call(venue, endpoint, fn)
+            return result
+
+
+# 进程内共享的调度器
+SCHEDULER = RequestScheduler()
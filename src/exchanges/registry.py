@@ -0,0 +1,93 @@
+import importlib
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 适配器声明：名称 -> (模块, 类名)，首次使用时才导入模块（及 ccxt）
+ADAPTERS: Dict[str, Tuple[str, str]] = {
+    'binance': ('.binance_exchange', 'BinanceExchange'),
+    'bybit': ('.bybit_exchange', 'BybitExchange'),
+    'binance_testnet': ('.binance_testnet', 'BinanceTestnetExchange'),
+    'bybit_demo': ('.bybit_demo', 'BybitDemoExchange'),
+}
+
+_loaded: Dict[str, Type] = {}
+
+
+def register_adapter(name: str, module: str, class_name: str):
+    """Declare an adapter by name; the module is imported on first use"""
+    ADAPTERS[name] = (module, class_name)
+    _loaded.pop(name, None)
+
+
+def available_adapters() -> List[str]:
+    return sorted(ADAPTERS)
+
+
+def get_adapter_class(name: str) -> Type:
+    """Import and return the adapter class registered under ``name``"""
+    cls = _loaded.get(name)
+    if cls is None:
+        try:
+            module_name, class_name = ADAPTERS[name]
+        except KeyError:
+            raise ValueError(f"Unknown exchange adapter: {name} (available: {available_adapters()})")
+        module = importlib.import_module(module_name, __package__)
+        cls = _loaded[name] = getattr(module, class_name)
+    return cls
+
+
+def create_exchange(name: str, *args, **kwargs):
+    """Instantiate a registered adapter, importing it only now"""
+    return get_adapter_class(name)(*args, **kwargs)
+
+
+class CcxtClients(Mapping):
+    """Named ccxt clients created on first access
+
+    Scripts that talk to ccxt directly declare their venues with a config
+    per name; ``ccxt`` itself is imported, and each client constructed, only
+    when a venue is first looked up. Market metadata is also deferred:
+    ``market()`` loads a venue's markets the first time a symbol on it is
+    needed and caches per-symbol results.
+    """
+
+    def __init__(self, configs: Dict[str, Dict], exchange_ids: Optional[Dict[str, str]] = None):
+        self.configs = configs
+        self.exchange_ids = exchange_ids or {}
+        self._clients: Dict[str, object] = {}
+        self._markets: Dict[Tuple[str, str], Dict] = {}
+
+    def __getitem__(self, name: str):
+        client = self._clients.get(name)
+        if client is None:
+            if name not in self.configs:
+                raise KeyError(name)
+            ccxt = importlib.import_module('ccxt')
+            exchange_id = self.exchange_ids.get(name, name)
+            client = self._clients[name] = getattr(ccxt, exchange_id)(self.configs[name])
+            logger.debug(f"Created ccxt client {exchange_id} for {name}")
+        return client
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.configs)
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    def loaded(self) -> List[str]:
+        """Names of venues whose clients have actually been created"""
+        return list(self._clients)
+
+    def market(self, name: str, symbol: str) -> Dict:
+        """Market metadata (precision, limits, fees) for one symbol on one venue"""
+        key = (name, symbol)
+        market = self._markets.get(key)
+        if market is None:
+            client = self[name]
+            if not client.markets:
+                client.load_markets()
+            market = self._markets[key] = client.market(symbol)
+        return market
@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+class SymbolRegistry:
+    """Canonical symbols, dense integer ids and per-venue native names
+
+    Built once at startup, either from ccxt market metadata
+    (``add_markets``) or from configured ``BASE/QUOTE`` pairs
+    (``for_symbols``). Each canonical symbol gets an id ``0..n-1`` so hot
+    paths can keep per-symbol state in lists/arrays indexed by id; message
+    handlers turn a venue's native instId or WebSocket topic into that id
+    with one dict lookup (``channel_ids``) instead of splitting and
+    rewriting strings. Natives that were never registered map to None
+    rather than being guessed, so e.g. ``USDTBRL`` is not mistaken for a
+    USDT pair.
+    """
+
+    def __init__(self):
+        self.symbols: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._from_native: Dict[str, Dict[str, int]] = {}
+        self._to_native: Dict[str, Dict[int, str]] = {}
+
+    @classmethod
+    def for_symbols(cls, symbols: Iterable[str], venues: Iterable[str]) -> 'SymbolRegistry':
+        """Registry for configured ``BASE/QUOTE`` pairs, native ``BASEQUOTE`` on every venue"""
+        registry = cls()
+        venues = list(venues)
+        for symbol in symbols:
+            base, quote = symbol.split('/')
+            for venue in venues:
+                registry.add(symbol, venue, base + quote)
+        return registry
+
+    def add(self, symbol: str, venue: Optional[str] = None, native: Optional[str] = None) -> int:
+        """Register a canonical symbol (and optionally its native name on a venue); returns its id"""
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        if venue is not None and native is not None:
+            self._from_native.setdefault(venue, {})[native] = symbol_id
+            self._to_native.setdefault(venue, {})[symbol_id] = native
+        return symbol_id
+
+    def add_markets(self, venue: str, markets: Iterable[Dict], native_key: str = 'id',
+                    symbols: Optional[Sequence[str]] = None) -> List[int]:
+        """Register ccxt markets under canonical ``base/quote``
+
+        ``native_key`` picks the market field the caller talks to the venue
+        with: ``'id'`` for raw REST/WebSocket names (``BTCUSDT``) or
+        ``'symbol'`` for ccxt calls on derivatives (``BTC/USDT:USDT``).
+        With ``symbols``, only those canonical symbols are registered.
+        """
+        wanted = set(symbols) if symbols is not None else None
+        added = []
+        for market in markets:
+            symbol = f"{market['base']}/{market['quote']}"
+            if wanted is None or symbol in wanted:
+                added.append(self.add(symbol, venue, market[native_key]))
+        return added
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.ids
+
+    def id(self, symbol: str) -> int:
+        return self.ids[symbol]
+
+    def name(self, symbol_id: int) -> str:
+        return self.symbols[symbol_id]
+
+    def native(self, venue: str, symbol: str) -> str:
+        """Venue-native name of a canonical symbol"""
+        return self._to_native[venue][self.ids[symbol]]
+
+    def lookup(self, venue: str, native: str) -> Optional[int]:
+        """Id of a venue-native name, or None if it was never registered"""
+        return self._from_native.get(venue, {}).get(native)
+
+    def canonical(self, venue: str, native: str) -> Optional[str]:
+        symbol_id = self.lookup(venue, native)
+        return None if symbol_id is None else self.symbols[symbol_id]
+
+    def channel_ids(self, venue: str, template: str = '{}') -> Dict[str, int]:
+        """Precomputed channel name -> id, e.g. ``'orderbook.50.{}'`` for Bybit topics"""
+        return {template.format(native): symbol_id
+                for symbol_id, native in self._to_native.get(venue, {}).items()}
@@ -0,0 +1,339 @@
+import asyncio
+import heapq
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import orjson
+import websockets
+import logging
+
+from ..monitoring.metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+Message = Union[str, Dict]
+# on_message(data, recv_wall, recv_ns, decoded_ns)
+MessageHandler = Callable[[Dict, float, int, int], Awaitable[None]]
+
+# 恢复时间直方图的分桶（秒）
+RECOVERY_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+
+class ManagedWebSocket:
+    """Supervised market-data WebSocket connection
+
+    A single ``run()`` task owns the connection for its whole life: on any
+    disconnect it calls ``on_disconnect`` with the connection's channels (so
+    callers drop book state that is no longer being updated), waits a jittered exponential backoff and
+    reconnects, replaying every subscription. Messages are consumed with
+    ``async for`` rather than polled with a timeout; a separate heartbeat
+    task sends the venue's application ping and checks each channel's last
+    message time. A stale channel is resubscribed once (which also makes
+    the venue push a fresh snapshot); if it stays silent, or every channel
+    goes quiet, the connection is recycled.
+
+    Time-to-recover, from the disconnect to the first data message on the
+    new connection, is exported as ``arbitrage_ws_recovery_seconds``.
+    """
+
+    def __init__(self, venue: str, url: str, channels: Sequence[str],
+                 subscribe: Callable[[Sequence[str]], List[Message]],
+                 on_message: MessageHandler,
+                 channel_of: Callable[[Dict], Optional[str]],
+                 unsubscribe: Optional[Callable[[Sequence[str]], List[Message]]] = None,
+                 on_disconnect: Optional[Callable[[List[str]], None]] = None,
+                 ping_message: Optional[str] = None,
+                 ping_interval: float = 20.0,
+                 stale_after: float = 30.0,
+                 initial_backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 stable_after: float = 60.0,
+                 registry: MetricsRegistry = REGISTRY):
+        self.venue = venue
+        self.url = url
+        self.channels = list(channels)
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self.on_message = on_message
+        self.channel_of = channel_of
+        self.on_disconnect = on_disconnect
+        self.ping_message = ping_message
+        self.ping_interval = ping_interval
+        self.stale_after = stale_after
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+
+        self.running = False
+        self.ws = None
+        self.attempt = 0
+        self.last_message: Dict[str, float] = {}
+        self.message_counts: Dict[str, int] = dict.fromkeys(self.channels, 0)
+        self._resubscribed: Set[str] = set()
+        self._down_since: Optional[float] = None
+        self._close_reason: Optional[str] = None
+
+        self.stats = {'connects': 0, 'reconnects': 0, 'messages': 0, 'handler_errors': 0,
+                      'stale_channels': 0, 'last_recovery_seconds': None}
+
+        self._connected = registry.gauge(
+            'arbitrage_ws_connected', 'Open market data WebSocket connections', ('venue',)).labels(venue)
+        self._reconnects = registry.counter(
+            'arbitrage_ws_reconnects_total', 'Market data WebSocket reconnects', ('venue', 'reason'))
+        self._stale = registry.counter(
+            'arbitrage_ws_stale_channels_total', 'Channels that stopped updating', ('venue',)).labels(venue)
+        self._recovery = registry.histogram(
+            'arbitrage_ws_recovery_seconds', 'Time from disconnect to first data message after reconnect',
+            ('venue',), buckets=RECOVERY_BUCKETS).labels(venue)
+
+    @staticmethod
+    def _encode(message: Message) -> str:
+        return message if isinstance(message, str) else orjson.dumps(message).decode()
+
+    async def send(self, messages: Sequence[Message]):
+        """Send messages on the current connection (dropped if disconnected)"""
+        ws = self.ws
+        if ws is None:
+            return
+        for message in messages:
+            await ws.send(self._encode(message))
+
+    async def resubscribe(self, channels: Sequence[str]):
+        """Re-request channels, e.g. to obtain a fresh book snapshot"""
+        if self.unsubscribe is not None:
+            await self.send(self.unsubscribe(channels))
+        await self.send(self.subscribe(channels))
+
+    async def add_channels(self, channels: Sequence[str]):
+        """Start tracking and subscribe to more channels on this connection"""
+        new = [c for c in channels if c not in self.message_counts]
+        if not new:
+            return
+        self.channels.extend(new)
+        now = time.monotonic()
+        for channel in new:
+            self.message_counts[channel] = 0
+            if self.ws is not None:
+                self.last_message[channel] = now
+        await self.send(self.subscribe(new))
+
+    async def remove_channels(self, channels: Sequence[str]):
+        """Stop tracking channels and unsubscribe them (if supported)"""
+        removed = [c for c in channels if c in self.message_counts]
+        if not removed:
+            return
+        for channel in removed:
+            self.channels.remove(channel)
+            del self.message_counts[channel]
+            self.last_message.pop(channel, None)
+            self._resubscribed.discard(channel)
+        if self.unsubscribe is not None:
+            await self.send(self.unsubscribe(removed))
+
+    def backoff_delay(self) -> float:
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** self.attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run(self):
+        """Keep the connection alive until ``stop()`` is called"""
+        self.running = True
+        while self.running:
+            connected_at = None
+            reason = 'error'
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    self.ws = ws
+                    connected_at = time.monotonic()
+                    self.stats['connects'] += 1
+                    self._connected.inc()
+                    await self.send(self.subscribe(self.channels))
+                    # 订阅后尚无消息的频道从连接时刻开始计时
+                    self.last_message = dict.fromkeys(self.channels, connected_at)
+                    self._resubscribed.clear()
+                    logger.info(f"{self.venue} WebSocket connected ({len(self.channels)} channels)")
+
+                    heartbeat = asyncio.create_task(self._heartbeat(ws))
+                    try:
+                        await self._consume(ws)
+                    finally:
+                        heartbeat.cancel()
+                    reason = self._close_reason or 'closed'
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.venue} WebSocket error: {e}")
+            finally:
+                if connected_at is not None:
+                    self._connected.dec()
+                self.ws = None
+                self._close_reason = None
+
+            if self._down_since is None:
+                self._down_since = time.monotonic()
+            if self.on_disconnect is not None:
+                # 回调异常不能中断重连循环
+                try:
+                    self.on_disconnect(list(self.channels))
+                except Exception:
+                    logger.exception(f"{self.venue} on_disconnect callback failed")
+            if not self.running:
+                break
+
+            if connected_at is not None and time.monotonic() - connected_at >= self.stable_after:
+                self.attempt = 0
+            delay = self.backoff_delay()
+            self.attempt += 1
+            self.stats['reconnects'] += 1
+            self._reconnects.labels(self.venue, reason).inc()
+            logger.warning(f"{self.venue} WebSocket disconnected ({reason}), reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _consume(self, ws):
+        channel_of = self.channel_of
+        last_message = self.last_message
+        counts = self.message_counts
+        async for message in ws:
+            recv_wall = time.time()
+            recv_ns = time.perf_counter_ns()
+            if message == 'pong':
+                continue
+            try:
+                data = orjson.loads(message)
+            except orjson.JSONDecodeError:
+                continue
+            decoded_ns = time.perf_counter_ns()
+
+            channel = channel_of(data)
+            # 迁移到其他连接的频道在退订生效前仍可能到达，只统计本连接负责的频道
+            if channel in counts:
+                counts[channel] += 1
+                last_message[channel] = time.monotonic()
+                if self._resubscribed:
+                    self._resubscribed.discard(channel)
+                if self._down_since is not None:
+                    self._record_recovery()
+            self.stats['messages'] += 1
+
+            try:
+                await self.on_message(data, recv_wall, recv_ns, decoded_ns)
+            except Exception as e:
+                # 单条消息处理失败不影响连接
+                self.stats['handler_errors'] += 1
+                logger.error(f"{self.venue} message handler error: {e}")
+
+    def _record_recovery(self):
+        seconds = time.monotonic() - self._down_since
+        self._down_since = None
+        self.stats['last_recovery_seconds'] = seconds
+        self._recovery.observe(seconds)
+        logger.info(f"{self.venue} WebSocket recovered in {seconds:.2f}s")
+
+    def stale_channels(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        return [c for c, ts in self.last_message.items() if now - ts > self.stale_after]
+
+    async def _heartbeat(self, ws):
+        interval = min(self.ping_interval, self.stale_after / 2)
+        last_ping = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                now = time.monotonic()
+                if self.ping_message is not None and now - last_ping >= self.ping_interval:
+                    await ws.send(self.ping_message)
+                    last_ping = now
+
+                stale = self.stale_channels(now)
+                if not stale:
+                    continue
+                self.stats['stale_channels'] += len(stale)
+                self._stale.inc(len(stale))
+
+                # 全部频道静默，或重新订阅后仍无数据：重建连接
+                if len(stale) == len(self.last_message) or self._resubscribed.intersection(stale):
+                    logger.warning(f"{self.venue} feed stale ({len(stale)}/{len(self.last_message)} channels), "
+                                   f"recycling connection")
+                    self._close_reason = 'stale'
+                    await ws.close()
+                    return
+
+                logger.warning(f"{self.venue} stale channels {stale}, resubscribing")
+                for channel in stale:
+                    self.last_message[channel] = now
+                self._resubscribed.update(stale)
+                await self.resubscribe(stale)
+        except websockets.ConnectionClosed:
+            # 连接已断开，由 run() 负责重连
+            return
+
+    def stop(self):
+        """Stop after the current connection closes"""
+        self.running = False
+        if self.ws is not None:
+            asyncio.ensure_future(self.ws.close())
+
+
+class DeltaBook:
+    """L2 book kept from a snapshot followed by incremental deltas
+
+    Deltas are only applied once a snapshot has been seen; after a
+    reconnect (``reset``) the book reports ``synced = False`` until the
+    venue pushes a new snapshot, so stale or partial levels are never read.
+    A zero size removes the level.
+    """
+
+    __slots__ = ('bids', 'asks', 'update_id', 'synced')
+
+    def __init__(self):
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.update_id = None
+        self.synced = False
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.update_id = None
+        self.synced = False
+
+    @staticmethod
+    def _apply(side: Dict[float, float], levels):
+        for price, size in levels:
+            size = float(size)
+            if size:
+                side[float(price)] = size
+            else:
+                side.pop(float(price), None)
+
+    def apply_snapshot(self, bids, asks, update_id=None):
+        self.bids.clear()
+        self.asks.clear()
+        self._apply(self.bids, bids)
+        self._apply(self.asks, asks)
+        self.update_id = update_id
+        self.synced = True
+
+    def apply_delta(self, bids, asks, update_id=None) -> Optional[bool]:
+        """Apply a delta; True if applied, False if the book needs a snapshot first
+
+        Deltas at or below the current update id are skipped and return
+        None, so the same stream arriving on two connections (e.g. while a
+        channel moves to another shard) is applied, and acted on, only once.
+        """
+        if not self.synced:
+            return False
+        if update_id is not None and self.update_id is not None and update_id <= self.update_id:
+            return None
+        self._apply(self.bids, bids)
+        self._apply(self.asks, asks)
+        if update_id is not None:
+            self.update_id = update_id
+        return True
+
+    def top(self, depth: int = 5) -> Tuple[List[List[float]], List[List[float]]]:
+        """Best ``depth`` bids (descending) and asks (ascending)"""
+        bids = [[p, self.bids[p]] for p in heapq.nlargest(depth, self.bids)]
+        asks = [[p, self.asks[p]] for p in heapq.nsmallest(depth, self.asks)]
+        return bids, asks
@@ -0,0 +1,208 @@
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Coroutine, Dict, List, Optional, Sequence, Tuple
+
+import logging
+
+from .ws_connection import ManagedWebSocket, Message, MessageHandler
+
+logger = logging.getLogger(__name__)
+
+# 每条连接的频道上限与单条订阅消息的参数上限
+# Bitget: 官方建议单连接少于 50 个频道；Bybit 现货: 每条订阅请求最多 10 个 topic
+WS_LIMITS: Dict[str, Dict[str, int]] = {
+    'bitget': {'channels_per_connection': 50, 'args_per_message': 50},
+    'bybit': {'channels_per_connection': 100, 'args_per_message': 10},
+}
+DEFAULT_WS_LIMITS = {'channels_per_connection': 50, 'args_per_message': 10}
+
+# (channel, 源分片, 目标分片)
+Move = Tuple[str, int, int]
+
+
+def _chunked(builder: Callable[[Sequence[str]], List[Message]], size: int):
+    """Wrap a subscribe/unsubscribe builder so each message carries at most ``size`` args"""
+    def build(channels: Sequence[str]) -> List[Message]:
+        messages = []
+        for i in range(0, len(channels), size):
+            messages.extend(builder(channels[i:i + size]))
+        return messages
+    return build
+
+
+def plan_rebalance(rates: Dict[str, float], assignment: Dict[str, int], shards: int,
+                   capacity: int, imbalance: float = 1.25, max_moves: int = 10) -> List[Move]:
+    """Greedy moves that even out per-shard message rates
+
+    Repeatedly moves a channel from the busiest shard to the quietest one
+    that has room, choosing the channel whose rate best halves the gap, and
+    stops once the busiest shard is within ``imbalance`` of the mean.
+    Few moves are made per round to keep subscription churn low.
+    """
+    loads = [0.0] * shards
+    members: List[List[str]] = [[] for _ in range(shards)]
+    for channel, shard in assignment.items():
+        loads[shard] += rates.get(channel, 0.0)
+        members[shard].append(channel)
+
+    moves: List[Move] = []
+    mean = sum(loads) / shards if shards else 0.0
+    while len(moves) < max_moves and mean > 0:
+        hi = max(range(shards), key=loads.__getitem__)
+        if loads[hi] <= imbalance * mean:
+            break
+        candidates = [i for i in range(shards) if i != hi and len(members[i]) < capacity]
+        if not candidates:
+            break
+        lo = min(candidates, key=loads.__getitem__)
+        gap = loads[hi] - loads[lo]
+        # 只移动能缩小差距的频道（rate < gap），优先接近 gap/2 的
+        movable = [c for c in members[hi] if 0 < rates.get(c, 0.0) < gap]
+        if not movable:
+            break
+        channel = min(movable, key=lambda c: abs(rates[c] - gap / 2))
+        members[hi].remove(channel)
+        members[lo].append(channel)
+        loads[hi] -= rates[channel]
+        loads[lo] += rates[channel]
+        moves.append((channel, hi, lo))
+    return moves
+
+
+class ShardedFeed:
+    """A venue's channels spread over several ``ManagedWebSocket`` connections
+
+    The shard count is the minimum the venue's per-connection channel limit
+    allows (or more, if requested); channels start round-robin and are then
+    rebalanced live by measured message rate, so one busy symbol does not
+    queue behind hundreds of others on the same socket. A moving channel is
+    subscribed on its new shard before it is unsubscribed from the old one.
+    Each shard reconnects independently, and ``on_disconnect`` receives
+    only that shard's channels.
+
+    ``timer(name, coroutine)`` (e.g. ``Profiler.timed``), if given, wraps
+    every shard's ``run()`` before it is scheduled, so message handling is
+    attributed to ``<venue>_ws`` instead of escaping into untimed tasks.
+    """
+
+    def __init__(self, venue: str, url: str, channels: Sequence[str],
+                 subscribe: Callable[[Sequence[str]], List[Message]],
+                 on_message: MessageHandler,
+                 channel_of: Callable[[Dict], Optional[str]],
+                 unsubscribe: Optional[Callable[[Sequence[str]], List[Message]]] = None,
+                 on_disconnect: Optional[Callable[[List[str]], None]] = None,
+                 shards: Optional[int] = None,
+                 channels_per_connection: Optional[int] = None,
+                 rebalance_interval: float = 60.0,
+                 imbalance: float = 1.25,
+                 timer: Optional[Callable[[str, Coroutine], Awaitable]] = None,
+                 **connection_kwargs):
+        limits = WS_LIMITS.get(venue, DEFAULT_WS_LIMITS)
+        self.venue = venue
+        self.capacity = channels_per_connection or limits['channels_per_connection']
+        args_per_message = limits['args_per_message']
+        channels = list(dict.fromkeys(channels))
+
+        needed = max(1, math.ceil(len(channels) / self.capacity))
+        count = max(needed, shards or 0)
+        self.rebalance_interval = rebalance_interval
+        self.imbalance = imbalance
+        self.timer = timer
+
+        self.assignment: Dict[str, int] = {c: i % count for i, c in enumerate(channels)}
+        subscribe = _chunked(subscribe, args_per_message)
+        unsubscribe = _chunked(unsubscribe, args_per_message) if unsubscribe is not None else None
+        self.shards: List[ManagedWebSocket] = [
+            ManagedWebSocket(
+                venue, url, [c for c, shard in self.assignment.items() if shard == i],
+                subscribe=subscribe, unsubscribe=unsubscribe, on_message=on_message,
+                channel_of=channel_of, on_disconnect=on_disconnect, **connection_kwargs)
+            for i in range(count)
+        ]
+        self.rebalances = 0
+        self._rate_base: Dict[str, int] = {}
+        self._rate_since = time.monotonic()
+
+    def rates(self) -> Dict[str, float]:
+        """Messages per second per channel since the previous call"""
+        now = time.monotonic()
+        elapsed = max(now - self._rate_since, 1e-9)
+        counts = {c: n for shard in self.shards for c, n in shard.message_counts.items()}
+        rates = {c: (n - self._rate_base.get(c, 0)) / elapsed for c, n in counts.items()}
+        self._rate_base = counts
+        self._rate_since = now
+        return rates
+
+    def shard_loads(self, rates: Dict[str, float]) -> List[float]:
+        loads = [0.0] * len(self.shards)
+        for channel, shard in self.assignment.items():
+            loads[shard] += rates.get(channel, 0.0)
+        return loads
+
+    async def move(self, channel: str, source: int, target: int):
+        """Re-home one channel: subscribe on ``target`` first, then drop from ``source``"""
+        # 新连接的计数从 0 开始，保留已统计的条数以免下一轮速率失真
+        count = self.shards[source].message_counts.get(channel, 0)
+        await self.shards[target].add_channels([channel])
+        self.shards[target].message_counts[channel] = count
+        await self.shards[source].remove_channels([channel])
+        self.assignment[channel] = target
+
+    async def rebalance(self) -> List[Move]:
+        rates = self.rates()
+        moves = plan_rebalance(rates, self.assignment, len(self.shards), self.capacity, self.imbalance)
+        for channel, source, target in moves:
+            await self.move(channel, source, target)
+        if moves:
+            self.rebalances += 1
+            loads = self.shard_loads(rates)
+            logger.info(f"{self.venue} rebalanced {len(moves)} channels across {len(self.shards)} shards, "
+                        f"loads {[round(x, 1) for x in loads]} msg/s")
+        return moves
+
+    async def _rebalance_loop(self):
+        while True:
+            await asyncio.sleep(self.rebalance_interval)
+            try:
+                await self.rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.venue} shard rebalance failed: {e}")
+
+    async def run(self):
+        """Run every shard plus the rebalancer until stopped"""
+        tasks = [shard.run() for shard in self.shards]
+        if self.timer is not None:
+            # 各分片在 gather 创建的独立任务中运行，必须逐个包装才能计时
+            tasks = [self.timer(f"{self.venue}_ws", task) for task in tasks]
+        if len(self.shards) > 1 and self.rebalance_interval:
+            tasks.append(self._rebalance_loop())
+        await asyncio.gather(*tasks)
+
+    def stop(self):
+        for shard in self.shards:
+            shard.stop()
+
+    async def resubscribe(self, channels: Sequence[str]):
+        """Re-request channels on whichever shard owns them"""
+        by_shard: Dict[int, List[str]] = {}
+        for channel in channels:
+            shard = self.assignment.get(channel)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(channel)
+        for shard, owned in by_shard.items():
+            await self.shards[shard].resubscribe(owned)
+
+    @property
+    def stats(self) -> Dict:
+        """Connection stats summed over shards"""
+        recoveries = [s.stats['last_recovery_seconds'] for s in self.shards
+                      if s.stats['last_recovery_seconds'] is not None]
+        totals = {key: sum(s.stats[key] for s in self.shards)
+                  for key in ('connects', 'reconnects', 'messages', 'handler_errors', 'stale_channels')}
+        totals['last_recovery_seconds'] = max(recoveries) if recoveries else None
+        totals['shards'] = len(self.shards)
+        totals['rebalances'] = self.rebalances
+        return totals
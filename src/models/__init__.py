@@ -0,0 +1,6 @@
+from .depth_vwap import DepthCross, depth_arbitrage
+from .fill_model import BookRecorder, FillModel, load_book_frames
+from .rolling_stats import PriceStats, RollingWindow
+
+__all__ = ['DepthCross', 'depth_arbitrage', 'BookRecorder', 'FillModel', 'load_book_frames',
+           'PriceStats', 'RollingWindow']
@@ -0,0 +1,95 @@
+import math
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+class DepthCross(NamedTuple):
+    """Best cross-venue trade found by walking both books"""
+    quantity: float          # 基础币数量
+    buy_price: float         # 买入 VWAP
+    sell_price: float        # 卖出 VWAP
+    buy_cost: float          # 买入金额（含手续费）
+    sell_revenue: float      # 卖出金额（扣除手续费）
+    net_profit: float
+    profit_percentage: float
+    buy_levels: int          # 吃掉的卖单档数
+    sell_levels: int         # 吃掉的买单档数
+
+
+def _levels(book_side) -> np.ndarray:
+    levels = book_side if isinstance(book_side, np.ndarray) else np.asarray(book_side, dtype=float)
+    # ccxt 的档位可能带第三列（如订单数），只取价格和数量
+    return levels[:, :2] if levels.ndim == 2 and levels.shape[1] > 2 else levels
+
+
+def _fill_value(q: float, px: np.ndarray, cum_qty: np.ndarray, cum_value: np.ndarray) -> float:
+    """Value of taking ``q`` units from levels with cumulative qty/value"""
+    k = int(np.searchsorted(cum_qty, q))
+    if k == 0:
+        return q * px[0]
+    return cum_value[k - 1] + (q - cum_qty[k - 1]) * px[k]
+
+
+def depth_arbitrage(asks: Sequence, bids: Sequence, buy_fee: float, sell_fee: float,
+                    max_quantity: float = math.inf, max_notional: float = math.inf) -> Optional[DepthCross]:
+    """Size that maximizes net profit buying into ``asks`` and selling into ``bids``
+
+    The marginal profit per unit, ``bid * (1 - sell_fee) - ask * (1 + buy_fee)``,
+    only changes where either book's cumulative size crosses a level, and
+    never increases with size (asks rise, bids fall). So the optimum is the
+    last level boundary with positive margin, capped by ``max_quantity`` and
+    by ``max_notional`` of buy-side spend (before fees). ``asks``/``bids``
+    are ``[price, qty]`` rows (lists or arrays), best first. Returns None if
+    nothing is profitable; the common uncrossed case returns after one
+    comparison on the raw levels.
+    """
+    if not len(asks) or not len(bids):
+        return None
+    buy_mult, sell_mult = 1 + buy_fee, 1 - sell_fee
+    # 绝大多数行情更新最优一档都不交叉，直接读原始档位返回，不构造数组
+    if bids[0][0] * sell_mult <= asks[0][0] * buy_mult:
+        return None
+
+    asks = _levels(asks)
+    bids = _levels(bids)
+    ask_px, bid_px = asks[:, 0], bids[:, 0]
+
+    cum_ask = np.cumsum(asks[:, 1])
+    cum_bid = np.cumsum(bids[:, 1])
+    # 边际利润只在任一侧累计量的档位边界处变化
+    edges = np.concatenate((cum_ask, cum_bid))
+    edges.sort()
+    edges = edges[edges <= min(cum_ask[-1], cum_bid[-1])]
+    ai = np.searchsorted(cum_ask, edges)
+    bi = np.searchsorted(cum_bid, edges)
+    profitable = np.count_nonzero(bid_px[bi] * sell_mult > ask_px[ai] * buy_mult)
+    if not profitable:
+        return None
+    quantity = min(float(edges[profitable - 1]), max_quantity)
+
+    cum_cost = np.cumsum(ask_px * asks[:, 1])
+    if max_notional < cum_cost[-1]:
+        k = int(np.searchsorted(cum_cost, max_notional))
+        spent = cum_cost[k - 1] if k else 0.0
+        filled = cum_ask[k - 1] if k else 0.0
+        quantity = min(quantity, float(filled + (max_notional - spent) / ask_px[k]))
+    if quantity <= 0:
+        return None
+
+    cost = _fill_value(quantity, ask_px, cum_ask, cum_cost)
+    revenue = _fill_value(quantity, bid_px, cum_bid, np.cumsum(bid_px * bids[:, 1]))
+    buy_cost = cost * buy_mult
+    sell_revenue = revenue * sell_mult
+    net_profit = sell_revenue - buy_cost
+    return DepthCross(
+        quantity=quantity,
+        buy_price=float(cost / quantity),
+        sell_price=float(revenue / quantity),
+        buy_cost=float(buy_cost),
+        sell_revenue=float(sell_revenue),
+        net_profit=float(net_profit),
+        profit_percentage=float(net_profit / buy_cost * 100),
+        buy_levels=int(np.searchsorted(cum_ask, quantity)) + 1,
+        sell_levels=int(np.searchsorted(cum_bid, quantity)) + 1,
+    )
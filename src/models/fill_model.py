@@ -0,0 +1,276 @@
+import bisect
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 查表网格：决策到成交的延迟（毫秒）与下单金额（USDT）
+LATENCY_GRID_MS = (0, 5, 10, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+NOTIONAL_GRID = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+BUY, SELL = 0, 1
+SIDES = {'buy': BUY, 'sell': SELL}
+
+# (venue, symbol)
+BookKey = Tuple[str, str]
+
+
+def load_book_frames(path: str, frame_interval_ms: float = 100.0) -> Dict[BookKey, Dict[str, np.ndarray]]:
+    """Read recorded books (JSON Lines: venue, symbol, ts, bids, asks)
+
+    This is the format written by ``BookRecorder`` and replayed by the mock
+    exchange. Frames without ``ts`` are assumed ``frame_interval_ms`` apart.
+    Returns per-key arrays ``ts`` (ms), ``bid_px``/``bid_qty``/``ask_px``/
+    ``ask_qty`` of shape ``(frames, depth)``, zero-padded to the deepest frame.
+    """
+    raw: Dict[BookKey, List[Tuple[float, list, list]]] = defaultdict(list)
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            frame = orjson.loads(line)
+            key = (frame['venue'], frame['symbol'])
+            ts = frame.get('ts')
+            if ts is None:
+                ts = len(raw[key]) * frame_interval_ms
+            raw[key].append((float(ts), frame['bids'], frame['asks']))
+
+    books = {}
+    for key, frames in raw.items():
+        frames.sort(key=lambda frame: frame[0])
+        depth = max(max(len(bids), len(asks)) for _, bids, asks in frames)
+        arrays = {name: np.zeros((len(frames), depth)) for name in ('bid_px', 'bid_qty', 'ask_px', 'ask_qty')}
+        for i, (_, bids, asks) in enumerate(frames):
+            if bids:
+                levels = np.asarray(bids, dtype=float)
+                arrays['bid_px'][i, :len(levels)] = levels[:, 0]
+                arrays['bid_qty'][i, :len(levels)] = levels[:, 1]
+            if asks:
+                levels = np.asarray(asks, dtype=float)
+                arrays['ask_px'][i, :len(levels)] = levels[:, 0]
+                arrays['ask_qty'][i, :len(levels)] = levels[:, 1]
+        arrays['ts'] = np.array([frame[0] for frame in frames])
+        books[key] = arrays
+    return books
+
+
+def _walk(px: np.ndarray, qty: np.ndarray, size: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """VWAP of taking ``size`` (base units, shape (n, S)) from each row's levels
+
+    Returns ``(vwap, filled)``; rows without enough depth fill what exists.
+    """
+    cum_qty = np.cumsum(qty, axis=1)
+    cum_cost = np.cumsum(px * qty, axis=1)
+    depth = qty.shape[1]
+    # 完全吃掉的档位数
+    k = (cum_qty[:, None, :] < size[:, :, None]).sum(axis=2)
+    rows = np.arange(qty.shape[0])[:, None]
+    prev_qty = np.where(k > 0, cum_qty[rows, np.maximum(k - 1, 0)], 0.0)
+    prev_cost = np.where(k > 0, cum_cost[rows, np.maximum(k - 1, 0)], 0.0)
+    next_px = px[rows, np.minimum(k, depth - 1)]
+    filled = np.minimum(size, cum_qty[:, -1:])
+    cost = np.where(k < depth, prev_cost + (filled - prev_qty) * next_px, cum_cost[:, -1:])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(filled > 0, cost / filled, np.nan)
+    return vwap, filled
+
+
+class FillModel:
+    """Expected slippage and fill probability as precomputed lookup tables
+
+    Fitted offline from recorded L2 books. For every venue/symbol, side,
+    latency bucket and notional bucket it stores:
+
+    - ``slippage_bps``: mean cost of a taker order of that notional executed
+      against the book seen ``latency`` later, relative to the best price at
+      decision time (positive = worse);
+    - ``fill_prob``: share of samples where the liquidity at or better than
+      the decision-time best price still covered the whole order.
+
+    ``set_limits()`` then derives the largest acceptable notional per
+    (venue/symbol, side, latency), so sizing on the hot path is two bisects
+    on short grids and an array index. The thresholds are saved with the
+    tables, so bots loading the file size with the limits it was built for.
+    """
+
+    def __init__(self, keys: Sequence[BookKey], slippage_bps: np.ndarray, fill_prob: np.ndarray,
+                 latency_grid: Sequence[float] = LATENCY_GRID_MS, notional_grid: Sequence[float] = NOTIONAL_GRID,
+                 samples: Optional[np.ndarray] = None, min_fill_prob: float = 0.8,
+                 max_slippage_bps: float = 5.0):
+        self.keys = [tuple(key) for key in keys]
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.latency_grid = tuple(float(x) for x in latency_grid)
+        self.notional_grid = tuple(float(x) for x in notional_grid)
+        self.slippage_bps = slippage_bps
+        self.fill_prob = fill_prob
+        self.samples = samples if samples is not None else np.zeros(len(self.keys), dtype=int)
+        self.set_limits(min_fill_prob, max_slippage_bps)
+
+    @classmethod
+    def fit(cls, books: Dict[BookKey, Dict[str, np.ndarray]],
+            latency_grid: Sequence[float] = LATENCY_GRID_MS, notional_grid: Sequence[float] = NOTIONAL_GRID,
+            max_samples: int = 20000, chunk: int = 2000) -> 'FillModel':
+        """Build tables from ``load_book_frames`` output"""
+        keys = sorted(books)
+        shape = (len(keys), 2, len(latency_grid), len(notional_grid))
+        slippage = np.full(shape, np.nan)
+        fill_prob = np.zeros(shape)
+        samples = np.zeros(len(keys), dtype=int)
+        notionals = np.asarray(notional_grid, dtype=float)
+
+        for i, key in enumerate(keys):
+            book = books[key]
+            ts = book['ts']
+            n = len(ts)
+            # 样本过多时等间隔抽样决策时刻
+            decisions = np.linspace(0, n - 1, min(n, max_samples)).astype(int)
+            valid = decisions[(book['ask_px'][decisions, 0] > 0) & (book['bid_px'][decisions, 0] > 0)]
+            samples[i] = len(valid)
+            if not len(valid):
+                continue
+
+            for li, latency in enumerate(latency_grid):
+                # 延迟后看到的订单簿：第一帧 ts >= 决策时刻 + 延迟
+                later = np.minimum(np.searchsorted(ts, ts[valid] + latency), n - 1)
+                for side, px_name, qty_name, sign in ((BUY, 'ask_px', 'ask_qty', 1.0),
+                                                      (SELL, 'bid_px', 'bid_qty', -1.0)):
+                    slip_sum = np.zeros(len(notionals))
+                    slip_n = np.zeros(len(notionals))
+                    survived = np.zeros(len(notionals))
+                    for start in range(0, len(valid), chunk):
+                        d = valid[start:start + chunk]
+                        j = later[start:start + chunk]
+                        p0 = book[px_name][d, 0]
+                        px, qty = book[px_name][j], book[qty_name][j]
+                        size = notionals[None, :] / p0[:, None]
+                        vwap, filled = _walk(px, qty, size)
+
+                        complete = filled >= size * (1 - 1e-9)
+                        slip = sign * (vwap - p0[:, None]) / p0[:, None] * 1e4
+                        ok = complete & np.isfinite(slip)
+                        slip_sum += np.where(ok, slip, 0.0).sum(axis=0)
+                        slip_n += ok.sum(axis=0)
+
+                        # 决策价及更优价位上的剩余量是否仍够成交
+                        at_or_better = (px <= p0[:, None]) if side == BUY else (px >= p0[:, None])
+                        at_or_better &= qty > 0
+                        liquidity = (qty * at_or_better).sum(axis=1)
+                        survived += (liquidity[:, None] >= size * (1 - 1e-9)).sum(axis=0)
+
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        slippage[i, side, li] = np.where(slip_n > 0, slip_sum / slip_n, np.nan)
+                    fill_prob[i, side, li] = survived / len(valid)
+
+        logger.info(f"Fitted fill model for {len(keys)} books ({int(samples.sum())} decision samples)")
+        return cls(keys, slippage, fill_prob, latency_grid, notional_grid, samples)
+
+    def set_limits(self, min_fill_prob: float = 0.8, max_slippage_bps: float = 5.0):
+        """Precompute the largest notional per (book, side, latency) meeting both thresholds"""
+        self.min_fill_prob = min_fill_prob
+        self.max_slippage_bps = max_slippage_bps
+        ok = (self.fill_prob >= min_fill_prob) & (np.nan_to_num(self.slippage_bps, nan=np.inf) <= max_slippage_bps)
+        # 从小到大连续满足条件的最大档位（更大的金额只会更差）
+        prefix = np.cumprod(ok, axis=-1)
+        count = prefix.sum(axis=-1)
+        grid = np.concatenate([[0.0], self.notional_grid])
+        self.max_notional_table = grid[count]
+
+    def _bucket(self, grid: Tuple[float, ...], value: float) -> int:
+        # 向上取整到网格（偏保守）；超出网格按最后一档
+        return min(bisect.bisect_left(grid, value), len(grid) - 1)
+
+    def has(self, venue: str, symbol: str) -> bool:
+        return (venue, symbol) in self.index
+
+    def lookup(self, venue: str, symbol: str, side: str, latency_ms: float,
+               notional: float) -> Optional[Tuple[float, float]]:
+        """``(expected slippage bps, fill probability)``, or None for an unknown book"""
+        i = self.index.get((venue, symbol))
+        if i is None:
+            return None
+        li = self._bucket(self.latency_grid, latency_ms)
+        ni = self._bucket(self.notional_grid, notional)
+        return float(self.slippage_bps[i, SIDES[side], li, ni]), float(self.fill_prob[i, SIDES[side], li, ni])
+
+    def max_notional(self, venue: str, symbol: str, side: str, latency_ms: float) -> Optional[float]:
+        """Largest notional (USDT) within the configured fill/slippage limits"""
+        i = self.index.get((venue, symbol))
+        if i is None:
+            return None
+        return float(self.max_notional_table[i, SIDES[side], self._bucket(self.latency_grid, latency_ms)])
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path, keys=np.array(self.keys, dtype=str).reshape(-1, 2), slippage_bps=self.slippage_bps,
+            fill_prob=self.fill_prob, latency_grid=np.array(self.latency_grid),
+            notional_grid=np.array(self.notional_grid), samples=self.samples,
+            min_fill_prob=np.array(self.min_fill_prob), max_slippage_bps=np.array(self.max_slippage_bps),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'FillModel':
+        with np.load(path) as data:
+            # 旧文件没有保存阈值时使用默认值
+            limits = {name: float(data[name]) for name in ('min_fill_prob', 'max_slippage_bps') if name in data.files}
+            return cls([tuple(key) for key in data['keys'].tolist()], data['slippage_bps'], data['fill_prob'],
+                       data['latency_grid'].tolist(), data['notional_grid'].tolist(), data['samples'], **limits)
+
+    @classmethod
+    def load_optional(cls, path: Optional[str] = None) -> Optional['FillModel']:
+        """Load ``FILL_MODEL_PATH`` (default ``data/fill_model.npz``) if it exists"""
+        path = path or os.getenv('FILL_MODEL_PATH', 'data/fill_model.npz')
+        if not os.path.exists(path):
+            return None
+        try:
+            model = cls.load(path)
+        except Exception as e:
+            logger.warning(f"Failed to load fill model {path}: {e}")
+            return None
+        logger.info(f"Loaded fill model {path} ({len(model.keys)} books)")
+        return model
+
+    def summary(self) -> List[Dict]:
+        rows = []
+        for key, i in self.index.items():
+            for side, s in SIDES.items():
+                rows.append({
+                    'venue': key[0], 'symbol': key[1], 'side': side, 'samples': int(self.samples[i]),
+                    'max_notional': dict(zip(self.latency_grid, self.max_notional_table[i, s].tolist())),
+                })
+        return rows
+
+
+class BookRecorder:
+    """Append books to a JSON Lines file for ``load_book_frames`` / mock replay"""
+
+    def __init__(self, path: str, buffer_size: int = 500):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'ab')
+        self.buffer: List[bytes] = []
+        self.buffer_size = buffer_size
+
+    def record(self, venue: str, symbol: str, ts_ms: float, bids: Iterable, asks: Iterable):
+        self.buffer.append(orjson.dumps(
+            {'venue': venue, 'symbol': symbol, 'ts': ts_ms, 'bids': bids, 'asks': asks}) + b'\n')
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
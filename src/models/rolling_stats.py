@@ -0,0 +1,181 @@
+import math
+from array import array
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+
+class RollingWindow:
+    """Fixed-size window of floats with O(1) running statistics
+
+    Values live in a preallocated ring buffer (``array('d')``, no per-tick
+    objects). Mean and variance are maintained with a sliding-window form of
+    Welford's update, min/max with monotonic deques, and an EWMA alongside;
+    every read is constant time. Floating-point drift from the add/remove
+    updates is reset by an exact recompute once per ``window`` pushes, so
+    the amortized cost per push stays O(1).
+    """
+
+    __slots__ = ('window', 'values', 'count', 'mean', 'm2', 'ewma', 'alpha', 'last',
+                 '_mins', '_maxs', '_since_recompute')
+
+    def __init__(self, window: int, alpha: Optional[float] = None):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self.values = array('d', bytes(8 * window))
+        self.count = 0            # 累计写入次数
+        self.mean = 0.0
+        self.m2 = 0.0             # 窗口内离差平方和
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.ewma: Optional[float] = None
+        self.last: Optional[float] = None
+        self._mins: deque = deque()   # (序号, 值)，值单调递增
+        self._maxs: deque = deque()   # (序号, 值)，值单调递减
+        self._since_recompute = 0
+
+    def push(self, x: float):
+        x = float(x)
+        window = self.window
+        seq = self.count
+        pos = seq % window
+
+        if seq < window:
+            # 窗口未满：标准 Welford
+            n = seq + 1
+            delta = x - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (x - self.mean)
+        else:
+            # 窗口已满：加入 x 的同时移除最旧的值
+            old = self.values[pos]
+            mean = self.mean + (x - old) / window
+            self.m2 += (x - old) * (x - mean + old - self.mean)
+            if self.m2 < 0:
+                self.m2 = 0.0
+            self.mean = mean
+        self.values[pos] = x
+        self.count = seq + 1
+        self.last = x
+        self.ewma = x if self.ewma is None else self.ewma + self.alpha * (x - self.ewma)
+
+        expired = seq - window
+        mins, maxs = self._mins, self._maxs
+        while mins and mins[-1][1] >= x:
+            mins.pop()
+        mins.append((seq, x))
+        if mins[0][0] <= expired:
+            mins.popleft()
+        while maxs and maxs[-1][1] <= x:
+            maxs.pop()
+        maxs.append((seq, x))
+        if maxs[0][0] <= expired:
+            maxs.popleft()
+
+        self._since_recompute += 1
+        if self._since_recompute >= window:
+            self._recompute()
+
+    def _recompute(self):
+        values = self.ordered()
+        self.mean = float(values.mean())
+        self.m2 = float(((values - self.mean) ** 2).sum())
+        self._since_recompute = 0
+
+    @property
+    def size(self) -> int:
+        return min(self.count, self.window)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.window
+
+    def variance(self, ddof: int = 0) -> float:
+        n = self.size
+        return self.m2 / (n - ddof) if n > ddof else 0.0
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(ddof))
+
+    @property
+    def min(self) -> Optional[float]:
+        return self._mins[0][1] if self._mins else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return self._maxs[0][1] if self._maxs else None
+
+    @property
+    def oldest(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return self.values[self.count % self.window] if self.full else self.values[0]
+
+    def previous(self, lag: int = 1) -> Optional[float]:
+        """Value ``lag`` pushes before the latest (within the window)"""
+        if lag >= self.size:
+            return None
+        return self.values[(self.count - 1 - lag) % self.window]
+
+    def ordered(self) -> np.ndarray:
+        """Window contents oldest-first as a numpy array (copy)"""
+        values = np.frombuffer(self.values, dtype=np.float64)
+        if not self.full:
+            return values[:self.count].copy()
+        pos = self.count % self.window
+        return np.concatenate((values[pos:], values[:pos]))
+
+
+class PriceStats:
+    """Rolling price and one-step return statistics for one symbol
+
+    ``volatility`` is the standard deviation of simple returns over the
+    window, ``dispersion`` the price std relative to its mean (what the
+    strategies used to compute from a list copy), and ``trend`` the EWMA's
+    deviation from the window mean. All are O(1) reads.
+    """
+
+    __slots__ = ('price', 'returns')
+
+    def __init__(self, window: int = 100, alpha: Optional[float] = None):
+        self.price = RollingWindow(window, alpha)
+        self.returns = RollingWindow(window, alpha)
+
+    def update(self, price: float):
+        last = self.price.last
+        if last:
+            self.returns.push(price / last - 1)
+        self.price.push(price)
+
+    @property
+    def count(self) -> int:
+        return self.price.size
+
+    @property
+    def last(self) -> Optional[float]:
+        return self.price.last
+
+    @property
+    def last_return(self) -> Optional[float]:
+        return self.returns.last
+
+    @property
+    def volatility(self) -> float:
+        return self.returns.std()
+
+    @property
+    def dispersion(self) -> float:
+        mean = self.price.mean
+        return self.price.std() / mean if mean else 0.0
+
+    @property
+    def trend(self) -> float:
+        mean = self.price.mean
+        return (self.price.ewma - mean) / mean if mean and self.price.ewma is not None else 0.0
+
+    @property
+    def change(self) -> float:
+        """Relative change from the oldest price in the window to the latest"""
+        oldest = self.price.oldest
+        return self.price.last / oldest - 1 if oldest else 0.0
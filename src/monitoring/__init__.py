@@ -0,0 +1,15 @@
+from .http_endpoint import start_http_endpoint, start_http_thread
+from .latency import LatencyHistogram, LatencyTracker
+from .metrics import METRICS_PORTS, REGISTRY, BotMetrics, MetricsRegistry
+from .opportunities import Opportunity, OpportunityTracker
+from .profiling import Profiler, StackSampler
+from .structured_log import EventLogger, JsonLinesFormatter, configure_logging
+
+__all__ = [
+    'start_http_endpoint', 'start_http_thread',
+    'LatencyHistogram', 'LatencyTracker',
+    'METRICS_PORTS', 'REGISTRY', 'BotMetrics', 'MetricsRegistry',
+    'Opportunity', 'OpportunityTracker',
+    'Profiler', 'StackSampler',
+    'EventLogger', 'JsonLinesFormatter', 'configure_logging',
+]
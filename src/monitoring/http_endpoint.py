@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 路由处理函数返回 (content_type, body)
+Handler = Callable[[], Tuple[str, bytes]]
+
+
+def bind_host(host: Optional[str] = None) -> str:
+    """Interface to listen on: ``host``, else ``METRICS_BIND``, else loopback only
+
+    The endpoints expose PnL, positions and latency, so they are not
+    reachable from other machines unless explicitly configured (e.g.
+    ``METRICS_BIND=0.0.0.0`` inside a container).
+    """
+    return host or os.getenv('METRICS_BIND', '127.0.0.1')
+
+
+async def start_http_endpoint(routes: Dict[str, Handler], host: Optional[str] = None,
+                              port: int = 8080) -> asyncio.AbstractServer:
+    """Serve read-only GET endpoints on the running event loop
+
+    Deliberately minimal (no framework, one request per connection) so a
+    scrape never competes with the market-data tasks for more than the time
+    it takes to render the response.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 丢弃请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) >= 2 else '/'
+            handler = routes.get(path)
+
+            if parts and parts[0] != 'GET':
+                status, content_type, body = '405 Method Not Allowed', 'text/plain', b'method not allowed\n'
+            elif handler is None:
+                status, content_type, body = '404 Not Found', 'text/plain', b'not found\n'
+            else:
+                content_type, body = handler()
+                status = '200 OK'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"HTTP endpoint error: {e}")
+        finally:
+            writer.close()
+
+    host = bind_host(host)
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"HTTP endpoint listening on {host}:{port} ({', '.join(routes)})")
+    return server
+
+
+def start_http_thread(routes: Dict[str, Handler], host: Optional[str] = None,
+                      port: int = 8080) -> ThreadingHTTPServer:
+    """Serve the same routes from a daemon thread, for synchronous bots"""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            handler = routes.get(self.path.split('?')[0])
+            if handler is None:
+                self.send_error(404)
+                return
+            content_type, body = handler()
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    host = bind_host(host)
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"HTTP endpoint listening on {host}:{port} ({', '.join(routes)})")
+    return server
@@ -0,0 +1,175 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+# 子桶精度：每个 2 的幂区间分 64 个桶（相对误差约 1.5%）
+_SUB_BITS = 6
+_SUB_COUNT = 1 << _SUB_BITS
+_LINEAR_LIMIT = _SUB_COUNT << 1
+
+# 流水线阶段
+STAGES = ('network', 'decode', 'book_apply', 'strategy', 'tick_to_decision', 'decision', 'order_send')
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of microsecond values
+
+    Recording is a bit_length, a shift and a list increment, with no
+    allocation; memory is fixed by ``max_us``.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max', '_max_index')
+
+    def __init__(self, max_us: int = 60_000_000):
+        self._max_index = self._index(max_us)
+        self.counts = [0] * (self._max_index + 1)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        if value < _LINEAR_LIMIT:
+            return value
+        shift = value.bit_length() - (_SUB_BITS + 1)
+        return _LINEAR_LIMIT + (shift - 1) * _SUB_COUNT + (value >> shift) - _SUB_COUNT
+
+    @staticmethod
+    def _value(index: int) -> int:
+        """Midpoint of the value range covered by a bucket"""
+        if index < _LINEAR_LIMIT:
+            return index
+        shift = (index - _LINEAR_LIMIT) // _SUB_COUNT + 1
+        mantissa = (index - _LINEAR_LIMIT) % _SUB_COUNT + _SUB_COUNT
+        return (mantissa << shift) + (1 << (shift - 1))
+
+    def record(self, value_us: int):
+        if value_us < 0:
+            value_us = 0
+        index = self._index(value_us)
+        if index > self._max_index:
+            index = self._max_index
+        self.counts[index] += 1
+        if self.count == 0 or value_us < self.min:
+            self.min = value_us
+        if value_us > self.max:
+            self.max = value_us
+        self.count += 1
+        self.total += value_us
+
+    def percentile(self, pct: float) -> int:
+        """Value at the given percentile (0-100), in microseconds"""
+        if self.count == 0:
+            return 0
+        target = max(1, int(self.count * pct / 100 + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= target:
+                    return min(self._value(index), self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, n in enumerate(other.counts):
+            if n:
+                self.counts[index] += n
+        if other.count:
+            self.min = other.min if self.count == 0 else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self):
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = self.total = self.min = self.max = 0
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count if self.count else 0,
+            'min_us': self.min,
+            'p50_us': self.percentile(50),
+            'p99_us': self.percentile(99),
+            'p999_us': self.percentile(99.9),
+            'max_us': self.max,
+        }
+
+
+class LatencyTracker:
+    """Per-venue, per-symbol, per-stage latency histograms
+
+    Stages:
+        network           exchange event timestamp -> socket receive (wall clock)
+        decode            receive -> JSON decoded
+        book_apply        decoded -> order book updated
+        strategy          book updated -> opportunity evaluated
+        tick_to_decision  exchange event timestamp -> decision
+        decision          opportunity -> order sized and risk-checked
+        order_send        decision -> order request sent (real orders only)
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+
+    def histogram(self, venue: str, symbol: str, stage: str) -> LatencyHistogram:
+        key = (venue, symbol, stage)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        return hist
+
+    def record(self, venue: str, symbol: str, stage: str, value_us: int):
+        self.histogram(venue, symbol, stage).record(value_us)
+
+    def record_message(self, venue: str, symbol: str, exchange_ts_ms: Optional[float],
+                       recv_wall: float, recv_ns: int, decoded_ns: int,
+                       book_ns: int, strategy_ns: int):
+        """Record all stages of one market-data message
+
+        ``recv_wall`` is ``time.time()`` at receive; the ``*_ns`` arguments are
+        ``time.perf_counter_ns()`` readings taken after each stage.
+        """
+        self.record(venue, symbol, 'decode', (decoded_ns - recv_ns) // 1000)
+        self.record(venue, symbol, 'book_apply', (book_ns - decoded_ns) // 1000)
+        self.record(venue, symbol, 'strategy', (strategy_ns - book_ns) // 1000)
+
+        if exchange_ts_ms:
+            network_us = int((recv_wall * 1000 - exchange_ts_ms) * 1000)
+            self.record(venue, symbol, 'network', network_us)
+            self.record(venue, symbol, 'tick_to_decision', network_us + (strategy_ns - recv_ns) // 1000)
+
+    def merged(self, stage: str) -> LatencyHistogram:
+        """Aggregate one stage across all venues and symbols"""
+        total = LatencyHistogram()
+        for (_, _, key_stage), hist in self.histograms.items():
+            if key_stage == stage:
+                total.merge(hist)
+        return total
+
+    def summary(self) -> List[Dict]:
+        rows = []
+        for (venue, symbol, stage), hist in sorted(self.histograms.items()):
+            if hist.count:
+                rows.append({'venue': venue, 'symbol': symbol, 'stage': stage, **hist.summary()})
+        return rows
+
+    def format_summary(self) -> List[str]:
+        """One line per venue/symbol/stage for periodic logging"""
+        return [
+            f"{row['venue']:<8} {row['symbol']:<10} {row['stage']:<17} "
+            f"n={row['count']:<7} p50={row['p50_us'] / 1000:.2f}ms "
+            f"p99={row['p99_us'] / 1000:.2f}ms p999={row['p999_us'] / 1000:.2f}ms"
+            for row in self.summary()
+        ]
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def http_handler(self):
+        """Route handler for ``start_http_endpoint`` returning the JSON summary"""
+        return 'application/json', orjson.dumps({'timestamp': time.time(), 'latency': self.summary()})
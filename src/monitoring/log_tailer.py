@@ -0,0 +1,121 @@
+import json
+import os
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LogTailer:
+    """Incremental reader that remembers byte offsets per log file
+
+    Each call to ``read_new_lines`` yields only complete lines appended since
+    the previous call. Truncation (size below the saved offset, or a changed
+    head fingerprint) restarts from the beginning; rotation (inode change)
+    first drains the unread tail of the rotated file (``<path>.1``) if it can
+    still be found.
+
+    Offsets are checkpointed to ``state_path`` together with ``aggregates``,
+    a caller-owned dict, so running totals and read positions always
+    persist atomically and a restart never double counts.
+    """
+
+    def __init__(self, state_path: str, max_chunk: int = 8 * 1024 * 1024):
+        self.state_path = state_path
+        self.max_chunk = max_chunk
+        self.offsets: Dict[str, Dict] = {}
+        self.aggregates: Dict = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self.offsets = state.get('offsets', {})
+            self.aggregates = state.get('aggregates', {})
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable tailer checkpoint {self.state_path}: {e}")
+
+    def save(self):
+        """Atomically persist offsets and aggregates"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'offsets': self.offsets, 'aggregates': self.aggregates}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _read_from(self, path: str, offset: int) -> Tuple[int, bytes]:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(self.max_chunk)
+        # 只消费完整的行，未写完的行留到下次
+        end = data.rfind(b'\n')
+        if end < 0:
+            if len(data) == self.max_chunk:
+                # 超长行直接跳过，避免卡住
+                return offset + len(data), b''
+            return offset, b''
+        return offset + end + 1, data[:end + 1]
+
+    @staticmethod
+    def _drain(path: str, offset: int) -> bytes:
+        """Everything after ``offset`` in a file that is no longer written to"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read()
+
+    @staticmethod
+    def _fingerprint(path: str, offset: int) -> int:
+        """CRC of the already-consumed head of the file (at most 128 bytes)"""
+        with open(path, 'rb') as f:
+            return zlib.crc32(f.read(min(offset, 128)))
+
+    def _find_rotated(self, path: str, inode: int) -> Optional[str]:
+        candidate = f"{path}.1"
+        try:
+            if os.stat(candidate).st_ino == inode:
+                return candidate
+        except OSError:
+            pass
+        return None
+
+    def read_new_lines(self, path: str) -> Iterator[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+
+        state = self.offsets.get(path)
+        chunks = []
+
+        if state is None:
+            offset = 0
+        elif state['inode'] != st.st_ino:
+            # 日志已轮转：先读完旧文件剩余部分
+            rotated = self._find_rotated(path, state['inode'])
+            if rotated:
+                # 旧文件不会再增长，读到 EOF 为止（最后一行即使没有换行符也保留）
+                chunks.append(self._drain(rotated, state['offset']))
+            offset = 0
+        elif st.st_size < state['offset'] or (
+                self._fingerprint(path, state['offset']) != state.get('head')):
+            # 文件被截断（或截断后又写入了相同长度的内容）
+            offset = 0
+        else:
+            offset = state['offset']
+
+        if st.st_size > offset:
+            offset, data = self._read_from(path, offset)
+            chunks.append(data)
+
+        self.offsets[path] = {'inode': st.st_ino, 'offset': offset,
+                              'head': self._fingerprint(path, offset)}
+
+        for chunk in chunks:
+            if chunk:
+                yield from chunk.decode('utf-8', errors='replace').splitlines()
@@ -0,0 +1,335 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+from .http_endpoint import start_http_endpoint, start_http_thread
+from .latency import LatencyTracker
+
+# 各策略默认的指标端口，dashboard 按此读取
+METRICS_PORTS = {
+    'cross_exchange': 9101,
+    'triangular': 9102,
+    'funding_rate': 9103,
+    'websocket': 9104,
+    'live': 9105,
+    'ultra_fast': 9106,
+}
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100)
+
+
+def _escape_label(value: str) -> str:
+    """Escape a label value per the Prometheus text format (backslash, quote, newline)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Metric(ABC):
+    """A named metric family; ``labels()`` returns a cached child
+
+    Hot paths should keep the child returned by ``labels()`` and call
+    ``inc``/``set``/``observe`` on it directly.
+
+    Children are created under a lock and rendering works on a copy taken
+    under the same lock, so a scrape served from another thread (see
+    ``BotMetrics.start_thread``) never iterates ``children`` while the bot
+    adds to it. Cached lookups stay lock-free.
+    """
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self):
+        """Create the value holder for one label combination"""
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self.children.get(key)
+                if child is None:
+                    child = self.children[key] = self._new_child()
+        return child
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self.children.items())
+
+    def _samples(self) -> List[Tuple[str, str, float]]:
+        return [('', _format_labels(self.labelnames, key), child.value)
+                for key, child in self._items()]
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, labels, value in self._samples():
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return lines
+
+    def snapshot(self) -> Dict:
+        return {
+            'type': self.type_name,
+            'samples': [
+                {'labels': dict(zip(self.labelnames, key)), 'value': child.value}
+                for key, child in self._items()
+            ]
+        }
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        samples = []
+        for key, child in self._items():
+            cumulative = 0
+            for bound, n in zip(child.buckets, list(child.counts)):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                samples.append(('_bucket', labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(('_sum', labels, child.sum))
+            samples.append(('_count', labels, child.count))
+        return samples
+
+    def snapshot(self) -> Dict:
+        return {
+            'type': self.type_name,
+            'samples': [
+                {'labels': dict(zip(self.labelnames, key)),
+                 'value': {'count': child.count, 'sum': child.sum}}
+                for key, child in self._items()
+            ]
+        }
+
+
+class MetricsRegistry:
+    """In-process registry rendered as Prometheus text or a JSON snapshot"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.latency_trackers: List[LatencyTracker] = []
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def register_latency(self, tracker: LatencyTracker):
+        """Export a LatencyTracker's p50/p99/p999 as quantile gauges"""
+        self.latency_trackers.append(tracker)
+
+    def _latency_lines(self) -> List[str]:
+        name = 'arbitrage_latency_quantile_seconds'
+        lines = [f'# HELP {name} Pipeline stage latency quantiles over the current window',
+                 f'# TYPE {name} gauge']
+        for tracker in self.latency_trackers:
+            for row in tracker.summary():
+                for quantile, key in (('0.5', 'p50_us'), ('0.99', 'p99_us'), ('0.999', 'p999_us')):
+                    labels = _format_labels(('venue', 'symbol', 'stage', 'quantile'),
+                                            (row['venue'], row['symbol'], row['stage'], quantile))[1:-1]
+                    lines.append(f'{name}{{{labels}}} {row[key] / 1e6!r}')
+        return lines
+
+    def _metrics(self) -> List[Tuple[str, Metric]]:
+        with self._lock:
+            return list(self.metrics.items())
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for _, metric in self._metrics():
+            lines.extend(metric.render())
+        if self.latency_trackers:
+            lines.extend(self._latency_lines())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        data = {
+            'timestamp': time.time(),
+            'uptime_seconds': time.time() - self.start_time,
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics()},
+        }
+        if self.latency_trackers:
+            data['latency'] = [row for tracker in self.latency_trackers for row in tracker.summary()]
+        return data
+
+    def prometheus_handler(self):
+        return 'text/plain; version=0.0.4', self.render_prometheus().encode()
+
+    def json_handler(self):
+        return 'application/json', orjson.dumps(self.snapshot())
+
+    def routes(self) -> Dict[str, Callable]:
+        return {'/metrics': self.prometheus_handler, '/metrics.json': self.json_handler}
+
+
+REGISTRY = MetricsRegistry()
+
+
+class BotMetrics:
+    """Standard metric set every strategy publishes
+
+    Exposes opportunities, executions, PnL, message rates and latencies
+    under a ``strategy`` label so the dashboard can aggregate bots uniformly.
+    """
+
+    def __init__(self, strategy: str, registry: MetricsRegistry = REGISTRY):
+        self.strategy = strategy
+        self.registry = registry
+
+        self.opportunities = registry.counter(
+            'arbitrage_opportunities_total', 'Arbitrage opportunities detected', ('strategy', 'symbol'))
+        self.executions = registry.counter(
+            'arbitrage_executions_total', 'Trade executions by result', ('strategy', 'symbol', 'result'))
+        self.pnl = registry.gauge(
+            'arbitrage_pnl_usdt', 'Cumulative realized PnL in USDT', ('strategy',)).labels(strategy)
+        self.trade_profit = registry.histogram(
+            'arbitrage_trade_profit_usdt', 'Realized profit per trade in USDT', ('strategy',),
+            buckets=(-1, -0.1, 0, 0.01, 0.05, 0.1, 0.5, 1, 5)).labels(strategy)
+        self.messages = registry.counter(
+            'arbitrage_messages_total', 'Market data messages processed', ('strategy', 'venue'))
+        self.up = registry.gauge('arbitrage_up', 'Bot process is running', ('strategy',)).labels(strategy)
+        self.up.set(1)
+
+    def opportunity(self, symbol: str, count: int = 1):
+        self.opportunities.labels(self.strategy, symbol).inc(count)
+
+    def execution(self, symbol: str, profit: float, success: bool = True):
+        self.executions.labels(self.strategy, symbol, 'success' if success else 'failed').inc()
+        self.trade_profit.observe(profit)
+        self.pnl.inc(profit)
+
+    def message_counter(self, venue: str) -> CounterChild:
+        """Cached per-venue message counter for hot loops"""
+        return self.messages.labels(self.strategy, venue)
+
+    def _port(self) -> int:
+        return int(os.getenv('METRICS_PORT', METRICS_PORTS.get(self.strategy, 0)))
+
+    def start_thread(self, routes: Optional[Dict[str, Callable]] = None):
+        """Serve /metrics from a daemon thread (for synchronous bots)"""
+        port = self._port()
+        if port:
+            return start_http_thread({**self.registry.routes(), **(routes or {})}, port=port)
+
+    async def start_server(self, routes: Optional[Dict[str, Callable]] = None):
+        """Serve /metrics on the running event loop (for asyncio bots)"""
+        port = self._port()
+        if port:
+            return await start_http_endpoint({**self.registry.routes(), **(routes or {})}, port=port)
@@ -0,0 +1,193 @@
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import REGISTRY, MetricsRegistry
+
+# (symbol, 买入交易所, 卖出交易所)：方向由两个交易所的先后顺序表示
+OpportunityKey = Tuple[str, str, str]
+# listener(event, opportunity)，event 为 'open' / 'update' / 'close'
+Listener = Callable[[str, 'Opportunity'], None]
+
+# 机会持续时间直方图的分桶（秒）
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+
+class Opportunity:
+    """One persistent cross-venue spread, from first sighting until it closes"""
+
+    __slots__ = ('symbol', 'buy_venue', 'sell_venue', 'opened_at', 'last_seen', 'closed_at',
+                 'ticks', 'peak_pct', 'sum_pct', 'last_pct', 'reported_pct', 'details', 'close_reason',
+                 'cleared_at')
+
+    def __init__(self, symbol: str, buy_venue: str, sell_venue: str, profit_pct: float,
+                 now: float, details: Dict):
+        self.symbol = symbol
+        self.buy_venue = buy_venue
+        self.sell_venue = sell_venue
+        self.opened_at = now
+        self.last_seen = now
+        self.closed_at: Optional[float] = None
+        self.ticks = 1
+        self.peak_pct = profit_pct
+        self.sum_pct = profit_pct
+        self.last_pct = profit_pct
+        self.reported_pct = profit_pct
+        self.details = details
+        self.close_reason: Optional[str] = None
+        # 第一次不再盈利的时间；再次确认盈利时重置
+        self.cleared_at: Optional[float] = None
+
+    @property
+    def key(self) -> OpportunityKey:
+        return self.symbol, self.buy_venue, self.sell_venue
+
+    @property
+    def duration(self) -> float:
+        return (self.closed_at if self.closed_at is not None else self.last_seen) - self.opened_at
+
+    @property
+    def average_pct(self) -> float:
+        return self.sum_pct / self.ticks
+
+    def as_dict(self) -> Dict:
+        return {
+            'symbol': self.symbol, 'buy_venue': self.buy_venue, 'sell_venue': self.sell_venue,
+            'opened_at': self.opened_at, 'closed_at': self.closed_at, 'duration': self.duration,
+            'ticks': self.ticks, 'peak_pct': self.peak_pct, 'average_pct': self.average_pct,
+            'last_pct': self.last_pct, 'close_reason': self.close_reason, **self.details,
+        }
+
+
+class OpportunityTracker:
+    """Collapse per-tick spread sightings into open/update/close events
+
+    Strategies call ``observe()`` whenever a direction is profitable and
+    ``clear()`` when it is not; listeners only hear about transitions. An
+    ``update`` is emitted when the spread reaches a new peak at least
+    ``update_step`` (relative) above the last reported one, so a wide spread
+    that persists for thousands of ticks produces a handful of events.
+
+    A direction is only closed after it has stayed unprofitable for
+    ``close_after`` seconds, so a spread hovering around the threshold stays
+    one opportunity instead of re-opening on every crossing. ``expire()``
+    closes those pending directions once the grace period is over even if
+    no further tick arrives, as well as opportunities whose books stopped
+    updating; call it from a short timer.
+    """
+
+    def __init__(self, strategy: str, update_step: float = 0.25, max_idle: float = 5.0,
+                 close_after: float = 1.0, registry: MetricsRegistry = REGISTRY):
+        self.strategy = strategy
+        self.update_step = update_step
+        self.max_idle = max_idle
+        self.close_after = close_after
+        self.active: Dict[OpportunityKey, Opportunity] = {}
+        self.listeners: List[Listener] = []
+        self.stats = {'opened': 0, 'updated': 0, 'closed': 0, 'ticks': 0}
+
+        self._events = registry.counter(
+            'arbitrage_opportunity_events_total', 'Opportunity lifecycle events', ('strategy', 'event'))
+        self._open = self._events.labels(strategy, 'open')
+        self._update = self._events.labels(strategy, 'update')
+        self._close = self._events.labels(strategy, 'close')
+        self._active = registry.gauge(
+            'arbitrage_opportunities_active', 'Currently open opportunities', ('strategy',)).labels(strategy)
+        self._duration = registry.histogram(
+            'arbitrage_opportunity_duration_seconds', 'Lifetime of closed opportunities',
+            ('strategy',), buckets=DURATION_BUCKETS).labels(strategy)
+
+    def subscribe(self, listener: Listener):
+        self.listeners.append(listener)
+
+    def _emit(self, event: str, opportunity: Opportunity):
+        for listener in self.listeners:
+            listener(event, opportunity)
+
+    def observe(self, symbol: str, buy_venue: str, sell_venue: str, profit_pct: float,
+                now: Optional[float] = None, **details) -> Opportunity:
+        """Record a profitable tick; opens the opportunity on first sight"""
+        now = time.time() if now is None else now
+        self.stats['ticks'] += 1
+        key = (symbol, buy_venue, sell_venue)
+        opportunity = self.active.get(key)
+        if opportunity is None:
+            opportunity = self.active[key] = Opportunity(symbol, buy_venue, sell_venue, profit_pct, now, details)
+            self.stats['opened'] += 1
+            self._open.inc()
+            self._active.set(len(self.active))
+            self._emit('open', opportunity)
+            return opportunity
+
+        opportunity.last_seen = now
+        opportunity.cleared_at = None
+        opportunity.ticks += 1
+        opportunity.sum_pct += profit_pct
+        opportunity.last_pct = profit_pct
+        opportunity.details = details
+        if profit_pct > opportunity.peak_pct:
+            opportunity.peak_pct = profit_pct
+            if profit_pct >= opportunity.reported_pct * (1 + self.update_step):
+                opportunity.reported_pct = profit_pct
+                self.stats['updated'] += 1
+                self._update.inc()
+                self._emit('update', opportunity)
+        return opportunity
+
+    def clear(self, symbol: str, buy_venue: str, sell_venue: str, now: Optional[float] = None,
+              reason: str = 'spread_closed') -> Optional[Opportunity]:
+        """The direction is not profitable on this tick
+
+        Closes it once it has stayed unprofitable for ``close_after`` seconds
+        and returns the closed opportunity; otherwise returns None.
+        """
+        if not self.active:
+            return None
+        key = (symbol, buy_venue, sell_venue)
+        opportunity = self.active.get(key)
+        if opportunity is None:
+            return None
+        now = time.time() if now is None else now
+        if opportunity.cleared_at is None:
+            opportunity.cleared_at = now
+        if now - opportunity.cleared_at < self.close_after:
+            return None
+        del self.active[key]
+        # 以第一次不再盈利的时间作为结束时间
+        self._finish(opportunity, opportunity.cleared_at, reason)
+        return opportunity
+
+    def close_symbol(self, symbol: str, reason: str = 'stale', now: Optional[float] = None):
+        """Close every open direction of a symbol, e.g. when its books are dropped"""
+        for key in [key for key in self.active if key[0] == symbol]:
+            self._finish(self.active.pop(key), time.time() if now is None else now, reason)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Close pending directions past ``close_after`` and opportunities
+        not confirmed for ``max_idle`` seconds"""
+        now = time.time() if now is None else now
+        closed = 0
+        for key, opportunity in list(self.active.items()):
+            if opportunity.cleared_at is not None and now - opportunity.cleared_at >= self.close_after:
+                del self.active[key]
+                self._finish(opportunity, opportunity.cleared_at, 'spread_closed')
+            elif now - opportunity.last_seen > self.max_idle:
+                # 以最后一次确认的时间作为结束时间
+                del self.active[key]
+                self._finish(opportunity, opportunity.last_seen, 'expired')
+            else:
+                continue
+            closed += 1
+        return closed
+
+    def _finish(self, opportunity: Opportunity, now: float, reason: str):
+        opportunity.closed_at = max(now, opportunity.last_seen)
+        opportunity.close_reason = reason
+        self.stats['closed'] += 1
+        self._close.inc()
+        self._active.set(len(self.active))
+        self._duration.observe(opportunity.duration)
+        self._emit('close', opportunity)
+
+    def close_all(self, reason: str = 'shutdown'):
+        for key in list(self.active):
+            self._finish(self.active.pop(key), time.time(), reason)
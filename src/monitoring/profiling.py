@@ -0,0 +1,268 @@
+import asyncio
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from datetime import datetime
+from typing import Coroutine, Dict, List, Optional
+
+import orjson
+import logging
+
+from .latency import LatencyHistogram
+from .metrics import REGISTRY, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# 事件循环延迟直方图的分桶（秒）
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+class StackSampler:
+    """Statistical sampler writing collapsed stacks (flamegraph.pl / speedscope format)
+
+    A daemon thread reads the target thread's current frame every
+    ``interval`` seconds via ``sys._current_frames()`` and counts the
+    root-to-leaf stack. Coroutine frames are on the thread's stack while
+    they run, so samples taken from the event-loop thread show which
+    handler was executing. Overhead is one frame walk per sample and no
+    tracing hooks, so it is safe to run in production for short windows.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[types.CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code: types.CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self) -> bool:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return False
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[';'.join(stack)] += 1
+        self.samples += 1
+        return True
+
+    def _run(self, deadline: float, path: str):
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            if not self.sample():
+                break
+        self.write(path)
+
+    def start(self, seconds: float, path: str):
+        """Sample for ``seconds`` in a background thread, then write ``path``"""
+        self._thread = threading.Thread(
+            target=self._run, args=(time.monotonic() + seconds, path), name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """On-demand profiling, per-coroutine timing and event-loop lag for asyncio bots
+
+    * ``capture(seconds, mode)`` profiles the event-loop thread for a
+      bounded window: ``'sample'`` writes a collapsed-stack ``.folded``
+      file, ``'cprofile'`` a pstats ``.prof`` file. ``install_signals()``
+      binds SIGUSR1/SIGUSR2 to the two modes, so a running bot can be
+      profiled with ``kill -USR1 <pid>`` without restarting it.
+    * ``timed(name, coro)`` wraps a long-running coroutine (e.g. a
+      WebSocket loop) and records how long each step holds the loop.
+    * ``watch_loop()`` measures how late the loop wakes up from a sleep.
+
+    Results are published as metrics and via ``http_handler`` (``/profile``).
+    """
+
+    def __init__(self, strategy: str, output_dir: Optional[str] = None, interval: float = 0.005,
+                 registry: MetricsRegistry = REGISTRY):
+        self.strategy = strategy
+        self.output_dir = output_dir or os.getenv('PROFILE_DIR', 'logs/profiles')
+        self.interval = interval
+        self.default_seconds = float(os.getenv('PROFILE_SECONDS', 30))
+        self.steps: Dict[str, LatencyHistogram] = {}
+        self.busy: Dict[str, float] = {}
+        self.loop_lag = LatencyHistogram()
+        self.captures: List[Dict] = []
+        self._active: Optional[Dict] = None
+
+        self._busy_seconds = registry.counter(
+            'arbitrage_coroutine_busy_seconds_total', 'Time coroutines held the event loop', ('strategy', 'task'))
+        self._lag_seconds = registry.histogram(
+            'arbitrage_event_loop_lag_seconds', 'Event loop wake-up delay', ('strategy',),
+            buckets=LAG_BUCKETS).labels(strategy)
+
+    # ---- 按需采样 ----
+
+    def _path(self, mode: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        suffix = 'folded' if mode == 'sample' else 'prof'
+        return os.path.join(self.output_dir, f"{self.strategy}-{datetime.now():%Y%m%d-%H%M%S}.{suffix}")
+
+    def capture(self, seconds: Optional[float] = None, mode: str = 'sample') -> Optional[str]:
+        """Profile the event-loop thread for ``seconds``; returns the output path, None if busy
+
+        Must be called from the loop thread (signal handlers and tasks are).
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+        if self._active is not None:
+            logger.warning(f"Profile already running ({self._active['path']}), ignoring request")
+            return None
+        seconds = seconds or self.default_seconds
+        path = self._path(mode)
+        self._active = {'mode': mode, 'path': path, 'started': time.time(), 'seconds': seconds}
+
+        if mode == 'sample':
+            sampler = StackSampler(interval=self.interval)
+            self._active['sampler'] = sampler
+            sampler.start(seconds, path)
+        else:
+            profile = cProfile.Profile()
+            self._active['profile'] = profile
+            profile.enable()
+        asyncio.get_running_loop().call_later(seconds, self._finish)
+        logger.info(f"🔬 {mode} profile started for {seconds:.0f}s -> {path}")
+        return path
+
+    def _finish(self):
+        active, self._active = self._active, None
+        if active is None:
+            return
+        profile = active.pop('profile', None)
+        sampler = active.pop('sampler', None)
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(active['path'])
+        if sampler is not None:
+            # 采样线程在截止时间后自行写文件
+            active['samples'] = sampler.samples
+        self.captures = (self.captures + [active])[-10:]
+        logger.info(f"🔬 {active['mode']} profile written to {active['path']}")
+
+    def install_signals(self):
+        """SIGUSR1: collapsed-stack sampling, SIGUSR2: cProfile (Unix only)"""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.capture, None, 'sample')
+            loop.add_signal_handler(signal.SIGUSR2, self.capture, None, 'cprofile')
+        except (AttributeError, NotImplementedError, RuntimeError):
+            logger.info("Profiling signals are not available on this platform")
+            return
+        logger.info(f"🔬 Profiling: kill -USR1 {os.getpid()} (sampling) / -USR2 (cProfile), "
+                    f"{self.default_seconds:.0f}s -> {self.output_dir}")
+
+    # ---- 协程计时 ----
+
+    async def timed(self, name: str, coroutine: Coroutine):
+        """Run ``coroutine`` recording the duration of every step between awaits"""
+        histogram = self.steps.setdefault(name, LatencyHistogram())
+        self.busy.setdefault(name, 0.0)
+        busy = self._busy_seconds.labels(self.strategy, name)
+
+        def record(elapsed: float):
+            histogram.record(int(elapsed * 1e6))
+            self.busy[name] += elapsed
+            busy.inc(elapsed)
+
+        return await _drive(coroutine, record)
+
+    # ---- 事件循环延迟 ----
+
+    async def watch_loop(self, interval: float = 0.1):
+        """Sleep ``interval`` repeatedly and record how late each wake-up is"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(time.perf_counter() - start - interval, 0.0)
+            self.loop_lag.record(int(lag * 1e6))
+            self._lag_seconds.observe(lag)
+
+    # ---- 报告 ----
+
+    def summary(self) -> Dict:
+        return {
+            'timestamp': time.time(),
+            'loop_lag': self.loop_lag.summary(),
+            'coroutines': [{'task': name, 'busy_seconds': self.busy[name], **hist.summary()}
+                           for name, hist in sorted(self.steps.items()) if hist.count],
+            'active': {k: v for k, v in self._active.items() if k not in ('profile', 'sampler')}
+                      if self._active else None,
+            'captures': self.captures,
+        }
+
+    def format_summary(self) -> List[str]:
+        """Loop lag and per-coroutine step times for periodic logging"""
+        lag = self.loop_lag.summary()
+        lines = [f"event-loop lag      n={lag['count']:<7} p50={lag['p50_us'] / 1000:.2f}ms "
+                 f"p99={lag['p99_us'] / 1000:.2f}ms max={lag['max_us'] / 1000:.2f}ms"]
+        for row in self.summary()['coroutines']:
+            lines.append(f"{row['task']:<19} n={row['count']:<7} p50={row['p50_us'] / 1000:.2f}ms "
+                         f"p99={row['p99_us'] / 1000:.2f}ms max={row['max_us'] / 1000:.2f}ms "
+                         f"busy={row['busy_seconds']:.2f}s")
+        return lines
+
+    def reset(self):
+        self.loop_lag.reset()
+        for hist in self.steps.values():
+            hist.reset()
+
+    def http_handler(self):
+        """Route handler for ``start_http_endpoint`` returning the JSON summary"""
+        return 'application/json', orjson.dumps(self.summary())
+
+
+@types.coroutine
+def _drive(coroutine: Coroutine, record):
+    """Step ``coroutine`` manually, timing each ``send``/``throw`` until it yields"""
+    value, error = None, None
+    while True:
+        start = time.perf_counter()
+        try:
+            if error is not None:
+                future = coroutine.throw(error)
+            else:
+                future = coroutine.send(value)
+        except StopIteration as stop:
+            record(time.perf_counter() - start)
+            return stop.value
+        except BaseException:
+            record(time.perf_counter() - start)
+            raise
+        record(time.perf_counter() - start)
+        try:
+            value, error = (yield future), None
+        except GeneratorExit:
+            coroutine.close()
+            raise
+        except BaseException as e:
+            # 取消等异常转交给被包装的协程处理
+            value, error = None, e
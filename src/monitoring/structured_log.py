@@ -0,0 +1,181 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Dict, Optional
+
+import orjson
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class _LazyMessage:
+    """Message template rendered only when a handler formats the record"""
+
+    __slots__ = ('template', 'fields')
+
+    def __init__(self, template: str, fields: Dict):
+        self.template = template
+        self.fields = fields
+
+    def __str__(self):
+        try:
+            return self.template.format(**self.fields)
+        except (KeyError, IndexError, ValueError) as e:
+            return f"{self.template} {self.fields} (format error: {e})"
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock ``prepare`` renders the message on the caller's thread so the
+    record can be pickled; our queue never leaves the process, so the record
+    is passed through untouched.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _json_default(value):
+    # numpy 标量转成原生类型，其余（Decimal/datetime）转字符串
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, event, msg plus typed fields"""
+
+    def format(self, record):
+        data = {
+            'ts': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            data.update(fields)
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=_json_default).decode()
+
+
+def configure_logging(log_file: Optional[str] = None, json_file: Optional[str] = None,
+                      level: int = logging.INFO, console: bool = True) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer thread
+
+    Drop-in replacement for the ``logging.basicConfig`` block at the top of
+    each bot: the text log keeps its existing format (the dashboard parses
+    it), ``json_file`` additionally receives JSON lines. The root logger only
+    enqueues records, so no formatting or disk I/O happens on the caller's
+    thread.
+    """
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        text_handler = logging.FileHandler(log_file)
+        text_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(text_handler)
+    if json_file:
+        os.makedirs(os.path.dirname(json_file) or '.', exist_ok=True)
+        json_handler = logging.FileHandler(json_file)
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    if console:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    # 退出时写完队列中剩余的记录（可能已被调用方提前停止）
+    if listener._thread is not None:
+        listener.stop()
+
+
+class EventLogger:
+    """Structured event logging with lazy formatting and per-event rate limits
+
+    ``info('opportunity', '{symbol} 利润率: {pct:.3f}%', symbol=s, pct=p)``
+    only builds a dict on the calling thread; the template is rendered by the
+    listener. Events registered with ``limit()`` pass through a token bucket
+    (``per_second``) and/or keep one in ``sample_every``; dropped records are
+    counted and reported as ``suppressed`` on the next emitted one.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.limits: Dict[str, tuple] = {}
+        self._state: Dict[tuple, list] = {}
+
+    def limit(self, event: str, per_second: Optional[float] = None, sample_every: Optional[int] = None):
+        self.limits[event] = (per_second, sample_every)
+        return self
+
+    def _admit(self, event: str, key) -> int:
+        """-1 to drop, otherwise the number of records suppressed since the last one"""
+        per_second, sample_every = self.limits[event]
+        state = self._state.get((event, key))
+        now = time.monotonic()
+        if state is None:
+            # [令牌, 上次补充时间, 计数, 已丢弃]
+            state = self._state[(event, key)] = [max(per_second or 0.0, 1.0), now, 0, 0]
+
+        state[2] += 1
+        if sample_every and (state[2] - 1) % sample_every:
+            state[3] += 1
+            return -1
+        if per_second:
+            state[0] = min(max(per_second, 1.0), state[0] + (now - state[1]) * per_second)
+            state[1] = now
+            if state[0] < 1:
+                state[3] += 1
+                return -1
+            state[0] -= 1
+
+        suppressed = state[3]
+        state[3] = 0
+        return suppressed
+
+    def log(self, level: int, event: str, template: str, key=None, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if event in self.limits:
+            suppressed = self._admit(event, key)
+            if suppressed < 0:
+                return
+            if suppressed:
+                fields['suppressed'] = suppressed
+        self.logger.log(level, _LazyMessage(template, fields), exc_info=exc_info,
+                        extra={'event': event, 'fields': fields})
+
+    def debug(self, event: str, template: str, **fields):
+        self.log(logging.DEBUG, event, template, **fields)
+
+    def info(self, event: str, template: str, **fields):
+        self.log(logging.INFO, event, template, **fields)
+
+    def warning(self, event: str, template: str, **fields):
+        self.log(logging.WARNING, event, template, **fields)
+
+    def error(self, event: str, template: str, **fields):
+        self.log(logging.ERROR, event, template, **fields)
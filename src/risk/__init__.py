@@ -0,0 +1,3 @@
+from .risk_gate import RiskGate
+
+__all__ = ['RiskGate']
@@ -0,0 +1,189 @@
+import math
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+
+class RiskGate:
+    """Incrementally maintained pre-trade risk state
+
+    Positions live in numpy arrays indexed by a per-symbol slot. Fills and
+    price marks update realized/unrealized PnL, equity, peak and drawdown as
+    they arrive, and the derived limits are folded into two precomputed
+    values: a global ``blocked`` flag (daily loss or drawdown breached) and a
+    per-slot buy headroom in quote currency. ``allow()`` is then a flag test,
+    a dict lookup and one comparison.
+
+    Positions are long-only spot inventory: sells reduce exposure and realize
+    PnL against the average entry price.
+    """
+
+    def __init__(self, initial_balance: float = 10000.0, max_position_size: float = 1000.0,
+                 daily_loss_limit: float = 50.0, max_drawdown: float = 0.1,
+                 position_limits: Optional[Dict[str, float]] = None,
+                 default_position_limit: float = 0.2, capacity: int = 16):
+        self.initial_balance = initial_balance
+        self.max_position_size = max_position_size
+        self.daily_loss_limit = daily_loss_limit
+        self.max_drawdown = max_drawdown
+        self.default_position_limit = default_position_limit
+
+        self.slots: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.size = np.zeros(capacity)
+        self.entry_price = np.zeros(capacity)
+        self.mark_price = np.zeros(capacity)
+        self.unrealized = np.zeros(capacity)
+        self.limits = np.full(capacity, default_position_limit)
+
+        self.realized_pnl = 0.0
+        self.daily_pnl = 0.0
+        self.unrealized_pnl = 0.0
+        self.equity = initial_balance
+        self.peak_equity = initial_balance
+        self.drawdown = 0.0
+
+        # 预计算结果，allow() 只读这些
+        self.blocked = False
+        self.headroom: List[float] = []
+        self.default_headroom = 0.0
+
+        for symbol, limit in (position_limits or {}).items():
+            self.limits[self._slot(symbol)] = limit
+        self._refresh()
+
+    def _slot(self, symbol: str) -> int:
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            return slot
+        slot = len(self.symbols)
+        if slot == len(self.size):
+            grow = len(self.size)
+            self.size = np.concatenate([self.size, np.zeros(grow)])
+            self.entry_price = np.concatenate([self.entry_price, np.zeros(grow)])
+            self.mark_price = np.concatenate([self.mark_price, np.zeros(grow)])
+            self.unrealized = np.concatenate([self.unrealized, np.zeros(grow)])
+            self.limits = np.concatenate([self.limits, np.full(grow, self.default_position_limit)])
+        self.slots[symbol] = slot
+        self.symbols.append(symbol)
+        return slot
+
+    def _refresh(self):
+        """Recompute equity-dependent limits after PnL changed"""
+        self.equity = self.initial_balance + self.realized_pnl + self.unrealized_pnl
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+        self.drawdown = (self.peak_equity - self.equity) / self.peak_equity if self.peak_equity > 0 else 0.0
+        self.blocked = self.daily_pnl < -self.daily_loss_limit or self.drawdown > self.max_drawdown
+
+        n = len(self.symbols)
+        exposure = self.size[:n] * self.mark_price[:n]
+        headroom = np.minimum(self.max_position_size, self.limits[:n] * self.equity - exposure)
+        self.headroom = headroom.tolist()
+        self.default_headroom = min(self.max_position_size, self.default_position_limit * self.equity)
+
+    def allow(self, symbol: str, side: str, notional: float) -> bool:
+        """Pre-trade check against the precomputed limits"""
+        if self.blocked:
+            return False
+        if side == 'sell':
+            return notional <= self.max_position_size
+        slot = self.slots.get(symbol)
+        return notional <= (self.default_headroom if slot is None else self.headroom[slot])
+
+    def reasons(self, symbol: str, side: str, notional: float) -> List[str]:
+        """Human-readable rejection reasons (only built when a check fails)"""
+        reasons = []
+        if notional > self.max_position_size:
+            reasons.append(f"仓位超限: ${notional:.2f} > ${self.max_position_size}")
+        if self.daily_pnl < -self.daily_loss_limit:
+            reasons.append(f"已达每日亏损限制: ${self.daily_pnl:.2f}")
+        if self.drawdown > self.max_drawdown:
+            reasons.append(f"超过最大回撤: {self.drawdown * 100:.1f}%")
+        slot = self.slots.get(symbol)
+        if side != 'sell' and slot is not None and self.equity > 0:
+            exposure = (self.size[slot] * self.mark_price[slot] + notional) / self.equity
+            if exposure > self.limits[slot]:
+                reasons.append(f"{symbol} 仓位过度集中: {exposure * 100:.1f}%")
+        return reasons
+
+    def on_fill(self, symbol: str, side: str, size: float, price: float, fee: float = 0.0) -> float:
+        """Apply a fill; returns the PnL realized by it"""
+        slot = self._slot(symbol)
+        held = self.size[slot]
+        realized = -fee
+
+        if side == 'buy':
+            total = held + size
+            self.entry_price[slot] = (held * self.entry_price[slot] + size * price) / total if total > 0 else price
+            self.size[slot] = total
+        else:
+            closed = min(size, held)
+            realized += (price - self.entry_price[slot]) * closed
+            self.size[slot] = held - closed
+            if self.size[slot] <= 0:
+                self.size[slot] = 0.0
+                self.entry_price[slot] = 0.0
+
+        self.realized_pnl += realized
+        self.daily_pnl += realized
+        self._mark(slot, price)
+        self._refresh()
+        return realized
+
+    def _mark(self, slot: int, price: float):
+        self.mark_price[slot] = price
+        unrealized = (price - self.entry_price[slot]) * self.size[slot]
+        self.unrealized_pnl += unrealized - self.unrealized[slot]
+        self.unrealized[slot] = unrealized
+
+    def update_price(self, symbol: str, price: float):
+        """Mark a single symbol; O(1) apart from the limit refresh
+
+        Called per market-data tick. A flat slot only stores the mark, since
+        its exposure and PnL cannot change.
+        """
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return
+        if self.size[slot] == 0 and self.unrealized[slot] == 0:
+            self.mark_price[slot] = price
+            return
+        self._mark(slot, price)
+        self._refresh()
+
+    def mark_to_market(self, prices: Union[Dict[str, float], np.ndarray]) -> np.ndarray:
+        """Mark all positions at once; returns PnL % per slot
+
+        ``prices`` is either a dict by symbol or an array aligned with
+        ``symbols``. Missing prices (absent keys or NaN) keep the last mark.
+        """
+        n = len(self.symbols)
+        if isinstance(prices, dict):
+            prices = np.fromiter((prices.get(symbol, math.nan) for symbol in self.symbols), float, n)
+        prices = np.asarray(prices, dtype=float)[:n]
+
+        marks = np.where(np.isnan(prices), self.mark_price[:n], prices)
+        self.mark_price[:n] = marks
+        entry = self.entry_price[:n]
+        self.unrealized[:n] = (marks - entry) * self.size[:n]
+        self.unrealized_pnl = float(self.unrealized[:n].sum())
+        self._refresh()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(entry > 0, (marks - entry) / entry * 100, 0.0)
+
+    def reset_daily(self):
+        self.daily_pnl = 0.0
+        self._refresh()
+
+    def positions(self) -> Dict[str, Dict]:
+        return {
+            symbol: {
+                'size': float(self.size[slot]),
+                'entry_price': float(self.entry_price[slot]),
+                'value': float(self.size[slot] * self.mark_price[slot]),
+                'unrealized_pnl': float(self.unrealized[slot]),
+            }
+            for symbol, slot in self.slots.items() if self.size[slot] > 0
+        }
@@ -0,0 +1,5 @@
+from .price_cache import InMemoryRedis, SharedPriceCache
+from .record_store import RecordStore
+from .trade_ledger import ARBITRAGE_TRADE_SCHEMA, TradeLedger
+
+__all__ = ['ARBITRAGE_TRADE_SCHEMA', 'InMemoryRedis', 'RecordStore', 'SharedPriceCache', 'TradeLedger']
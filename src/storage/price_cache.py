@@ -0,0 +1,274 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (venue, symbol)
+BookKey = Tuple[str, str]
+
+
+def _bytes(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class InMemoryRedis:
+    """In-process stand-in for the subset of redis-py the price cache uses
+
+    Values come back as bytes and ``px`` expiry is honoured, like a real
+    client with ``decode_responses=False``. Pub/sub delivers to
+    subscribers created from the same instance, so a writer and readers can
+    share one fake inside a test or a single-process deployment.
+    """
+
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._sets: Dict[bytes, set] = {}
+        self._subscribers: List['_InMemoryPubSub'] = []
+        self._lock = threading.Lock()
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def set(self, name, value, px: Optional[int] = None):
+        with self._lock:
+            expires = time.monotonic() + px / 1000 if px else None
+            self._data[_bytes(name)] = (_bytes(value), expires)
+        return True
+
+    def get(self, name) -> Optional[bytes]:
+        with self._lock:
+            return self._live(_bytes(name))
+
+    def mget(self, keys: Sequence) -> List[Optional[bytes]]:
+        with self._lock:
+            return [self._live(_bytes(key)) for key in keys]
+
+    def sadd(self, name, *values) -> int:
+        with self._lock:
+            members = self._sets.setdefault(_bytes(name), set())
+            before = len(members)
+            members.update(_bytes(v) for v in values)
+            return len(members) - before
+
+    def smembers(self, name) -> set:
+        with self._lock:
+            return set(self._sets.get(_bytes(name), ()))
+
+    def publish(self, channel, message) -> int:
+        channel, message = _bytes(channel), _bytes(message)
+        receivers = [s for s in self._subscribers if channel in s.channels]
+        for subscriber in receivers:
+            subscriber.queue.append({'type': 'message', 'pattern': None, 'channel': channel, 'data': message})
+        return len(receivers)
+
+    def pipeline(self, transaction: bool = True) -> '_InMemoryPipeline':
+        return _InMemoryPipeline(self)
+
+    def pubsub(self) -> '_InMemoryPubSub':
+        return _InMemoryPubSub(self)
+
+    def ping(self) -> bool:
+        return True
+
+
+class _InMemoryPipeline:
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> List:
+        commands, self.commands = self.commands, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class _InMemoryPubSub:
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.channels: set = set()
+        self.queue: deque = deque()
+
+    def subscribe(self, *channels):
+        self.channels.update(_bytes(c) for c in channels)
+        if self not in self.client._subscribers:
+            self.client._subscribers.append(self)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0) -> Optional[Dict]:
+        deadline = time.monotonic() + timeout
+        while not self.queue and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return self.queue.popleft() if self.queue else None
+
+    def close(self):
+        if self in self.client._subscribers:
+            self.client._subscribers.remove(self)
+
+
+class SharedPriceCache:
+    """Best bid/ask and depth snapshots shared between bot processes via Redis
+
+    One ingest process (the WebSocket bot) calls ``update()`` for every book
+    change; updates are coalesced per (venue, symbol) and written by
+    ``flush()`` in a single non-transactional pipeline: the top of book and
+    the depth snapshot go to separate keys with a TTL (so a dead publisher's
+    prices expire instead of going stale silently), and the top of book is
+    also published on a pub/sub channel. Other processes read with ``top()``
+    / ``book()`` / ``snapshot()`` (key lookups) or ``listen()`` (pub/sub),
+    instead of polling the exchanges themselves.
+
+    ``client`` is a redis-py ``Redis`` or an ``InMemoryRedis``.
+    """
+
+    def __init__(self, client, prefix: str = 'arb', ttl: float = 5.0, depth: int = 5):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_ms = int(ttl * 1000)
+        self.depth = depth
+        self.channel = f"{prefix}:top"
+        self.index_key = f"{prefix}:index"
+        self._pending: Dict[BookKey, Dict] = {}
+        self._indexed: set = set()
+        self.stats = {'updates': 0, 'flushes': 0, 'written': 0, 'errors': 0}
+
+    @classmethod
+    def from_env(cls, url: Optional[str] = None, **kwargs) -> Optional['SharedPriceCache']:
+        """Cache from ``PRICE_CACHE_URL`` (``redis://...`` or ``memory://``); None if unset
+
+        The cache is optional: without a URL, or without the ``redis``
+        package, bots run exactly as before with their own feeds.
+        """
+        url = url or os.getenv('PRICE_CACHE_URL')
+        if not url:
+            return None
+        if url.startswith('memory://'):
+            return cls(InMemoryRedis(), **kwargs)
+        try:
+            import redis
+        except ImportError:
+            logger.warning("PRICE_CACHE_URL is set but the redis package is not installed; shared price cache disabled")
+            return None
+        return cls(redis.Redis.from_url(url, socket_timeout=1.0), **kwargs)
+
+    def _top_key(self, venue: str, symbol: str) -> str:
+        return f"{self.prefix}:top:{venue}:{symbol}"
+
+    def _book_key(self, venue: str, symbol: str) -> str:
+        return f"{self.prefix}:book:{venue}:{symbol}"
+
+    # ---- 写入端 ----
+
+    def update(self, venue: str, symbol: str, bids: Sequence, asks: Sequence, exchange_time: float):
+        """Queue the latest book for a venue/symbol; only the newest survives until ``flush()``"""
+        self._pending[(venue, symbol)] = {
+            'venue': venue, 'symbol': symbol, 'ts': exchange_time,
+            'bids': [[float(p), float(q)] for p, q, *_ in bids[:self.depth]],
+            'asks': [[float(p), float(q)] for p, q, *_ in asks[:self.depth]],
+        }
+        self.stats['updates'] += 1
+
+    def _write(self, batch: Dict[BookKey, Dict]):
+        pipe = self.client.pipeline(transaction=False)
+        published = time.time()
+        for (venue, symbol), book in batch.items():
+            top = {
+                'venue': venue, 'symbol': symbol, 'ts': book['ts'], 'published': published,
+                'bid': book['bids'][0][0] if book['bids'] else None,
+                'bid_size': book['bids'][0][1] if book['bids'] else None,
+                'ask': book['asks'][0][0] if book['asks'] else None,
+                'ask_size': book['asks'][0][1] if book['asks'] else None,
+            }
+            encoded_top = orjson.dumps(top)
+            pipe.set(self._top_key(venue, symbol), encoded_top, px=self.ttl_ms)
+            pipe.set(self._book_key(venue, symbol), orjson.dumps({**book, 'published': published}), px=self.ttl_ms)
+            pipe.publish(self.channel, encoded_top)
+            if (venue, symbol) not in self._indexed:
+                pipe.sadd(self.index_key, f"{venue}|{symbol}")
+        pipe.execute()
+        self._indexed.update(batch)
+
+    def flush(self) -> int:
+        """Write all queued books in one pipeline round trip"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        self._write(batch)
+        self.stats['flushes'] += 1
+        self.stats['written'] += len(batch)
+        return len(batch)
+
+    async def run(self, interval: float = 0.05):
+        """Flush periodically from the event loop; the Redis round trip runs in a worker thread"""
+        while True:
+            await asyncio.sleep(interval)
+            if not self._pending:
+                continue
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+                self.stats['flushes'] += 1
+                self.stats['written'] += len(batch)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Shared price cache write failed: {e}")
+
+    # ---- 读取端 ----
+
+    @staticmethod
+    def _fresh(raw: Optional[bytes], max_age: Optional[float]) -> Optional[Dict]:
+        if raw is None:
+            return None
+        data = orjson.loads(raw)
+        if max_age is not None and time.time() - data['ts'] > max_age:
+            return None
+        return data
+
+    def top(self, venue: str, symbol: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Best bid/ask for a venue/symbol, or None if missing or older than ``max_age`` seconds"""
+        return self._fresh(self.client.get(self._top_key(venue, symbol)), max_age)
+
+    def book(self, venue: str, symbol: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Depth snapshot ``{'bids', 'asks', 'ts', ...}``, or None if missing or too old"""
+        return self._fresh(self.client.get(self._book_key(venue, symbol)), max_age)
+
+    def keys(self) -> List[BookKey]:
+        members = sorted(m.decode() if isinstance(m, bytes) else m for m in self.client.smembers(self.index_key))
+        return [tuple(m.split('|', 1)) for m in members]
+
+    def snapshot(self, max_age: Optional[float] = None) -> List[Dict]:
+        """Top of book for every published venue/symbol in one MGET"""
+        keys = self.keys()
+        if not keys:
+            return []
+        raws = self.client.mget([self._top_key(venue, symbol) for venue, symbol in keys])
+        return [top for top in (self._fresh(raw, max_age) for raw in raws) if top is not None]
+
+    def listen(self, timeout: float = 1.0) -> Iterator[Dict]:
+        """Yield top-of-book updates as they are published (blocking generator)"""
+        pubsub = self.client.pubsub()
+        pubsub.subscribe(self.channel)
+        try:
+            while True:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                if message is not None and message.get('type') == 'message':
+                    yield orjson.loads(message['data'])
+        finally:
+            pubsub.close()
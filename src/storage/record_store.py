@@ -0,0 +1,200 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# 允许聚合的字段名（直接拼进 json_extract 路径，必须是简单标识符）
+_FIELD_CHARS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.')
+
+
+def _to_epoch(value) -> float:
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def _finite(value):
+    """Replace NaN/inf (which SQLite's JSON functions reject) with None, recursively"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def _dumps(record: Dict) -> str:
+    try:
+        return json.dumps(record, default=str, allow_nan=False)
+    except ValueError:
+        # 缺失特征以 NaN 表示时存为 null，否则 json_extract/aggregate 会报 malformed JSON
+        return json.dumps(_finite(record), default=str)
+
+
+class RecordStore:
+    """Append-only record storage on a SQLite WAL-mode table
+
+    Records are JSON documents tagged with a ``kind`` (e.g. ``performance``,
+    ``trades``), an epoch timestamp and an optional symbol. Appends are
+    buffered and written in one transaction per batch, so the cost per record
+    is constant regardless of how much history is stored; readers query time
+    ranges through the ``(kind, ts)`` index instead of loading whole files.
+
+    ``append`` never touches SQLite: a daemon writer thread commits the
+    buffer when a batch fills or every ``flush_interval`` seconds, so it is
+    safe to call from an event loop. ``flush``, ``prune``, ``query`` and
+    ``aggregate`` write or read on the calling thread and block; call them
+    from reporting code, not per tick.
+    """
+
+    def __init__(self, path: str = 'data/arbitrage.db', batch_size: int = 100,
+                 flush_interval: float = 5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[tuple] = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                ts REAL NOT NULL,
+                symbol TEXT,
+                data TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_records_kind_ts ON records (kind, ts)')
+        self.conn.commit()
+
+        # 写入专用连接，由后台线程和 flush() 共用（_write_lock 串行化）
+        self._writer_conn = sqlite3.connect(path, check_same_thread=False)
+        self._writer_conn.execute('PRAGMA synchronous=NORMAL')
+        self._writer = threading.Thread(target=self._run_writer, name='record-store-writer', daemon=True)
+        self._writer.start()
+
+    def append(self, kind: str, record: Dict, ts=None, symbol: Optional[str] = None):
+        """Buffer one record; the writer thread commits it (non-blocking)"""
+        row = (
+            kind,
+            _to_epoch(ts if ts is not None else record.get('timestamp')),
+            symbol if symbol is not None else record.get('symbol'),
+            _dumps(record),
+        )
+        with self._buffer_lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run_writer(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._write_pending()
+            except sqlite3.Error:
+                # 写入失败的批次已放回缓冲区，下一轮重试
+                time.sleep(self.flush_interval)
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._buffer_lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            try:
+                with self._writer_conn:
+                    self._writer_conn.executemany(
+                        'INSERT INTO records (kind, ts, symbol, data) VALUES (?, ?, ?, ?)', rows
+                    )
+            except sqlite3.Error:
+                with self._buffer_lock:
+                    self._buffer[:0] = rows
+                raise
+
+    def flush(self):
+        """Commit buffered records on the calling thread (blocking)"""
+        self._write_pending()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self._writer_conn.close()
+        self.conn.close()
+
+    def prune(self, kind: str, before) -> int:
+        """Delete records of a kind older than ``before``; returns rows removed"""
+        self.flush()
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM records WHERE kind = ? AND ts < ?',
+                                       (kind, _to_epoch(before)))
+        return cursor.rowcount
+
+    def query(self, kind: str, start=None, end=None, symbol: Optional[str] = None,
+              limit: Optional[int] = None) -> Iterator[Dict]:
+        """Iterate records of a kind in ``[start, end)`` ordered by time"""
+        self.flush()
+        sql, params = self._where(kind, start, end, symbol)
+        sql = f'SELECT data FROM records {sql} ORDER BY ts'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        for (data,) in self.conn.execute(sql, params):
+            yield json.loads(data)
+
+    def aggregate(self, kind: str, field: str, start=None, end=None,
+                  symbol: Optional[str] = None, bucket_seconds: Optional[int] = None) -> List[Dict]:
+        """count/sum/avg/min/max of a numeric field, optionally per time bucket"""
+        if not field or not set(field) <= _FIELD_CHARS:
+            raise ValueError(f"Invalid field name: {field!r}")
+
+        self.flush()
+        where, params = self._where(kind, start, end, symbol)
+        value = f"json_extract(data, '$.{field}')"
+        columns = f'COUNT({value}), SUM({value}), AVG({value}), MIN({value}), MAX({value})'
+
+        if bucket_seconds:
+            bucket = f'CAST(ts / {int(bucket_seconds)} AS INTEGER) * {int(bucket_seconds)}'
+            sql = f'SELECT {bucket} AS bucket, {columns} FROM records {where} GROUP BY bucket ORDER BY bucket'
+        else:
+            sql = f'SELECT NULL, {columns} FROM records {where}'
+
+        return [
+            {'bucket': row[0], 'count': row[1], 'sum': row[2] or 0.0,
+             'avg': row[3], 'min': row[4], 'max': row[5]}
+            for row in self.conn.execute(sql, params)
+        ]
+
+    def _where(self, kind, start, end, symbol):
+        clauses, params = ['kind = ?'], [kind]
+        if start is not None:
+            clauses.append('ts >= ?')
+            params.append(_to_epoch(start))
+        if end is not None:
+            clauses.append('ts < ?')
+            params.append(_to_epoch(end))
+        if symbol is not None:
+            clauses.append('symbol = ?')
+            params.append(symbol)
+        return 'WHERE ' + ' AND '.join(clauses), params
@@ -0,0 +1,247 @@
+import glob
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 字符串列按类别编码存储（int32 编码 + 类别表）
+CATEGORY = 'category'
+
+# 跨交易所套利机器人（live / telegram）共用的成交记录格式
+ARBITRAGE_TRADE_SCHEMA = {
+    'ts': 'f8',
+    'symbol': CATEGORY,
+    'direction': CATEGORY,
+    'quantity': 'f8',
+    'buy_price': 'f8',
+    'sell_price': 'f8',
+    'profit': 'f8',
+    'fees': 'f8',
+    'balance_after': 'f8',
+}
+
+
+class TradeLedger:
+    """Fixed-schema columnar trade log with bounded memory
+
+    Each column is a preallocated numpy array of ``capacity`` rows (string
+    columns are stored as int32 codes into a per-column category list).
+    When the buffer fills, the older half is written to an ``.npz`` segment
+    under ``spill_dir`` (or dropped, if no directory is configured) and the
+    newer half is moved down, so memory stays fixed while the most recent
+    trades remain available for DataFrame analysis. ``append`` only copies
+    the rows out; compression and the file write run on a single background
+    thread (segments stay in order). ``flush()`` and ``history()`` wait for
+    pending writes.
+
+    Totals, per-symbol and per-hour aggregates are updated on every insert,
+    so ``summary()``/``by_symbol()``/``by_hour()`` never rescan history.
+    Every schema needs a float ``ts`` (epoch seconds) column; ``symbol``,
+    ``profit`` and ``fees`` feed the running aggregates when present.
+    """
+
+    def __init__(self, schema: Dict[str, str], capacity: int = 10000,
+                 spill_dir: Optional[str] = None, name: str = 'trades',
+                 sum_fields: Sequence[str] = ('profit', 'fees')):
+        if 'ts' not in schema:
+            raise ValueError("TradeLedger schema needs a 'ts' column")
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.schema = dict(schema)
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.name = name
+        self.sum_fields = tuple(f for f in sum_fields if f in schema)
+
+        self.columns: Dict[str, np.ndarray] = {
+            column: np.zeros(capacity, dtype=np.int32 if dtype == CATEGORY else dtype)
+            for column, dtype in self.schema.items()
+        }
+        self.categories: Dict[str, List[str]] = {c: [] for c, d in self.schema.items() if d == CATEGORY}
+        self._codes: Dict[str, Dict[str, int]] = {c: {} for c in self.categories}
+        self.size = 0
+        self.segments = 0
+        self.spilled_rows = 0
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+
+        # 运行中的聚合：插入时更新，读取 O(1)
+        self.count = 0
+        self.wins = 0
+        self.sums = dict.fromkeys(self.sum_fields, 0.0)
+        self.best: Optional[float] = None
+        self.worst: Optional[float] = None
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.per_symbol: Dict[str, Dict[str, float]] = {}
+        self.hour_count = [0] * 24
+        self.hour_profit = [0.0] * 24
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _code(self, column: str, value) -> int:
+        codes = self._codes[column]
+        value = '' if value is None else str(value)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[column])
+            self.categories[column].append(value)
+        return code
+
+    def append(self, record: Dict):
+        """Insert one trade; columns missing from ``record`` are stored as 0/''"""
+        if self.size == self.capacity:
+            self._spill(self.capacity // 2)
+        row = self.size
+        for column, dtype in self.schema.items():
+            value = record.get(column)
+            if dtype == CATEGORY:
+                self.columns[column][row] = self._code(column, value)
+            elif value is not None:
+                self.columns[column][row] = value
+            else:
+                self.columns[column][row] = 0
+        self.size = row + 1
+        self._aggregate(record)
+
+    def _aggregate(self, record: Dict):
+        ts = float(record['ts'])
+        profit = float(record.get('profit') or 0.0)
+        self.count += 1
+        if profit > 0:
+            self.wins += 1
+        for field in self.sum_fields:
+            self.sums[field] += float(record.get(field) or 0.0)
+        self.best = profit if self.best is None else max(self.best, profit)
+        self.worst = profit if self.worst is None else min(self.worst, profit)
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+
+        symbol = record.get('symbol')
+        if symbol is not None:
+            totals = self.per_symbol.get(symbol)
+            if totals is None:
+                totals = self.per_symbol[symbol] = {'count': 0, 'wins': 0, **dict.fromkeys(self.sum_fields, 0.0)}
+            totals['count'] += 1
+            if profit > 0:
+                totals['wins'] += 1
+            for field in self.sum_fields:
+                totals[field] += float(record.get(field) or 0.0)
+
+        hour = time.localtime(ts).tm_hour
+        self.hour_count[hour] += 1
+        self.hour_profit[hour] += profit
+
+    def _spill(self, rows: int):
+        """Write the oldest ``rows`` to a segment (if configured) and drop them from memory"""
+        if self.spill_dir:
+            path = os.path.join(self.spill_dir, f"{self.name}-{int(time.time())}-{self.segments:06d}.npz")
+            # 复制出待落盘的行，压缩和写文件在后台线程完成
+            arrays = {f"col_{c}": self.columns[c][:rows].copy() for c in self.schema}
+            arrays.update({f"cat_{c}": np.array(cats, dtype=object) for c, cats in self.categories.items()})
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ledger-{self.name}")
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(self._writer.submit(self._write_segment, path, arrays))
+            self.segments += 1
+        keep = self.size - rows
+        for column in self.columns.values():
+            column[:keep] = column[rows:self.size]
+        self.size = keep
+        self.spilled_rows += rows
+
+    def _write_segment(self, path: str, arrays: Dict[str, np.ndarray]):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            np.savez_compressed(path, **arrays)
+        except Exception as e:
+            logger.error(f"Trade ledger segment write failed ({path}): {e}")
+
+    def wait(self):
+        """Block until every queued segment has been written"""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def flush(self):
+        """Spill everything still in memory and wait for the writes (e.g. on shutdown)"""
+        if self.size:
+            self._spill(self.size)
+        self.wait()
+
+    def column(self, name: str) -> np.ndarray:
+        """In-memory values of a numeric column, oldest first (view, not a copy)"""
+        return self.columns[name][:self.size]
+
+    def frame(self) -> pd.DataFrame:
+        """In-memory trades as a DataFrame (category columns decoded)"""
+        data = {}
+        for column, dtype in self.schema.items():
+            values = self.columns[column][:self.size]
+            if dtype == CATEGORY:
+                data[column] = pd.Categorical.from_codes(values, categories=self.categories[column]) \
+                    if self.categories[column] else pd.Categorical([])
+            else:
+                data[column] = values.copy()
+        return pd.DataFrame(data, columns=list(self.schema))
+
+    def segment_paths(self) -> List[str]:
+        if not self.spill_dir:
+            return []
+        return sorted(glob.glob(os.path.join(self.spill_dir, f"{self.name}-*.npz")))
+
+    @staticmethod
+    def load_segment(path: str) -> pd.DataFrame:
+        """Read one spilled segment back as a DataFrame"""
+        with np.load(path, allow_pickle=True) as segment:
+            data = {}
+            for key in segment.files:
+                if not key.startswith('col_'):
+                    continue
+                column = key[4:]
+                values = segment[key]
+                categories = f"cat_{column}"
+                if categories in segment.files:
+                    values = np.asarray(segment[categories], dtype=object)[values]
+                data[column] = values
+        return pd.DataFrame(data)
+
+    def history(self) -> pd.DataFrame:
+        """All spilled segments plus the in-memory buffer (reads disk; offline use)"""
+        self.wait()
+        frames = [self.load_segment(path) for path in self.segment_paths()]
+        frames.append(self.frame())
+        return pd.concat(frames, ignore_index=True)
+
+    def summary(self) -> Dict:
+        """Running totals over every trade ever inserted (O(1))"""
+        return {
+            'count': self.count,
+            'wins': self.wins,
+            'win_rate': self.wins / self.count if self.count else 0.0,
+            **{f"total_{field}": value for field, value in self.sums.items()},
+            **{f"avg_{field}": value / self.count if self.count else 0.0 for field, value in self.sums.items()},
+            'best': self.best,
+            'worst': self.worst,
+            'first_ts': self.first_ts,
+            'last_ts': self.last_ts,
+            'in_memory': self.size,
+            'spilled': self.spilled_rows,
+        }
+
+    def by_symbol(self) -> Dict[str, Dict[str, float]]:
+        return {symbol: dict(totals) for symbol, totals in self.per_symbol.items()}
+
+    def by_hour(self) -> Dict[int, Dict[str, float]]:
+        """Trade count, total and average profit per local hour of day"""
+        return {hour: {'count': count, 'profit': self.hour_profit[hour],
+                       'avg_profit': self.hour_profit[hour] / count}
+                for hour, count in enumerate(self.hour_count) if count}
@@ -15,6 +15,11 @@ import logging
 import asyncio
 import threading
 
+from src.exchanges.inventory import InventoryService
+from src.exchanges.rate_limiter import ACCOUNT, SCHEDULER
+from src.monitoring import BotMetrics
+from src.storage import ARBITRAGE_TRADE_SCHEMA, TradeLedger
+
 # 加载环境变量
 load_dotenv()
 
@@ -70,6 +75,10 @@ class EnhancedArbitrageBot:
         self.simulation_mode = simulation_mode
         self.notifier = TelegramNotifier()
         
+        # 结构化指标（供 dashboard 读取）
+        self.metrics = BotMetrics('cross_exchange')
+        self.metrics.start_thread()
+        
         # 初始化交易所
         self.exchanges = self._init_exchanges()
         
@@ -81,6 +90,8 @@ class EnhancedArbitrageBot:
             'check_interval': 3.0,
             'slippage_tolerance': 0.02,
             'max_daily_trades': 50,
+            'balance_refresh_interval': float(os.getenv('BALANCE_REFRESH_INTERVAL', 60)),  # 实盘余额刷新间隔（秒）
+            'simulated_holdings_usdt': 250.0,  # 模拟模式下每个交易所每种币的初始现货价值（卖出腿需要库存）
             'fees': {
                 'bitget': {'maker': 0.001, 'taker': 0.001},
                 'bybit': {'maker': 0.001, 'taker': 0.001}
@@ -97,18 +108,29 @@ class EnhancedArbitrageBot:
             'positions': {}
         }
         
-        # 统计数据
+        # 各交易所余额库存：交易前检查只读内存，不再逐笔查询 REST；
+        # 实盘每 balance_refresh_interval 秒批量刷新一次，模拟模式按交易所平均分配初始资金
+        self.inventory = InventoryService()
+        self.inventory.bootstrap(
+            self.exchanges,
+            lambda venue, exchange: SCHEDULER.call(venue, exchange.fetch_balance, endpoint=ACCOUNT),
+            seed={'USDT': {'free': self.account['initial_balance'] / len(self.exchanges), 'locked': 0}},
+            live=not self.simulation_mode,
+        )
+        
+        # 成交记录：定长列式缓冲，写满后较旧的一半落盘，内存不随运行时间增长
+        self.trades = TradeLedger(
+            ARBITRAGE_TRADE_SCHEMA,
+            capacity=int(os.getenv('TRADE_LEDGER_CAPACITY', '10000')),
+            spill_dir=os.getenv('TRADE_LEDGER_DIR', 'data/trade_ledger'),
+            name='telegram',
+        )
+        
+        # 统计数据（成交相关的次数/手续费/最佳最差由 self.trades 的累计聚合提供）
         self.stats = {
             'total_opportunities': 0,
-            'executed_trades': 0,
-            'successful_trades': 0,
-            'failed_trades': 0,
-            'total_fees_paid': 0.0,
-            'best_profit': 0.0,
-            'worst_loss': 0.0,
             'start_time': datetime.now(),
             'last_reset_time': datetime.now(),
-            'trade_history': [],
             'last_notification_time': datetime.now()
         }
         
@@ -123,7 +145,7 @@ class EnhancedArbitrageBot:
             # Bitget
             if self.simulation_mode:
                 exchanges['bitget'] = ccxt.bitget({
-                    'enableRateLimit': True,
+                    'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                     'timeout': 10000
                 })
             else:
@@ -131,12 +153,12 @@ class EnhancedArbitrageBot:
                     'apiKey': os.getenv('BITGET_API_KEY'),
                     'secret': os.getenv('BITGET_API_SECRET'),
                     'password': os.getenv('BITGET_PASSPHRASE'),
-                    'enableRateLimit': True
+                    'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 })
             
             # Bybit
             exchanges['bybit'] = ccxt.bybit({
-                'enableRateLimit': True,
+                'enableRateLimit': False,  # 由 SCHEDULER 统一限频
                 'timeout': 10000
             })
             
@@ -170,7 +192,7 @@ class EnhancedArbitrageBot:
         """获取订单簿数据"""
         try:
             exchange = self.exchanges[exchange_name]
-            orderbook = exchange.fetch_order_book(symbol, limit)
+            orderbook = SCHEDULER.call(exchange_name, exchange.fetch_order_book, symbol, limit)
             return orderbook
         except Exception as e:
             logger.warning(f"⚠️ 获取 {exchange_name} {symbol} 订单簿失败: {str(e)[:100]}")
@@ -319,10 +341,13 @@ class EnhancedArbitrageBot:
     def send_daily_summary(self):
         """发送每日统计"""
         
-        if self.stats['executed_trades'] == 0:
+        summary = self.trades.summary()
+        if summary['count'] == 0:
             return
         
-        success_rate = (self.stats['successful_trades'] / self.stats['executed_trades']) * 100
+        top_symbols = sorted(self.trades.by_symbol().items(), key=lambda item: item[1]['profit'], reverse=True)[:3]
+        symbol_lines = "\n".join(f"  {symbol}: {totals['count']}次, ${totals['profit']:.4f}"
+                                 for symbol, totals in top_symbols)
         
         message = f"""
 📊 <b>每日交易统计</b>
@@ -332,12 +357,15 @@ class EnhancedArbitrageBot:
 📈 <b>总盈亏</b>: ${self.account['total_pnl']:.2f} ({self.account['total_pnl']/self.account['initial_balance']*100:+.2f}%)
 
 🎯 <b>发现机会</b>: {self.stats['total_opportunities']}次
-✅ <b>执行交易</b>: {self.stats['executed_trades']}次
-🎉 <b>成功率</b>: {success_rate:.1f}%
-💸 <b>手续费</b>: ${self.stats['total_fees_paid']:.2f}
+✅ <b>执行交易</b>: {summary['count']}次
+🎉 <b>成功率</b>: {summary['win_rate'] * 100:.1f}%
+💸 <b>手续费</b>: ${summary['total_fees']:.2f}
+
+🏆 <b>最佳交易</b>: ${summary['best']:.4f}
+📉 <b>最差交易</b>: ${summary['worst']:.4f}
 
-🏆 <b>最佳交易</b>: ${self.stats['best_profit']:.4f}
-📉 <b>最差交易</b>: ${self.stats['worst_loss']:.4f}
+💎 <b>币种利润</b>:
+{symbol_lines}
 """
         
         self.notifier.send_message(message)
@@ -372,30 +400,43 @@ class EnhancedArbitrageBot:
             logger.warning(f"⚠️ 考虑滑点后无利润，取消交易")
             return False
         
+        # 同时预留两条腿：买方的 USDT 和卖方的现货（原子操作，任一不足则放弃）
+        buy_venue = opportunity['buy_exchange'].lower()
+        sell_venue = opportunity['sell_exchange'].lower()
+        base = opportunity['symbol'].split('/')[0]
+        if self.simulation_mode:
+            self.inventory.ensure(sell_venue, base, self.config['simulated_holdings_usdt'] / opportunity['sell_price'])
+        buy_amount = total_cost * trade_quantity
+        reservation = self.inventory.reserve([(buy_venue, 'USDT', buy_amount), (sell_venue, base, trade_quantity)])
+        if reservation is None:
+            logger.warning(f"💸 库存不足: {buy_venue} 需要 ${buy_amount:.2f} USDT "
+                           f"(可用 ${float(self.inventory.available(buy_venue, 'USDT')):.2f}), "
+                           f"{sell_venue} 需要 {trade_quantity:.6f} {base} "
+                           f"(可用 {float(self.inventory.available(sell_venue, base)):.6f})")
+            return False
+        
         # 执行模拟交易
         total_profit = actual_profit * trade_quantity
         total_fees = (buy_fee + sell_fee) * trade_quantity
         
+        # 成交后结算库存：买方付出 USDT 收到现货，卖方交付现货收到 USDT
+        self.inventory.settle(reservation, [
+            (buy_venue, 'USDT', -buy_amount),
+            (buy_venue, base, trade_quantity),
+            (sell_venue, base, -trade_quantity),
+            (sell_venue, 'USDT', total_revenue * trade_quantity),
+        ])
+        
         # 更新账户
-        self.account['current_balance'] += total_profit
+        self.account['current_balance'] = float(self.inventory.total('USDT'))
         self.account['daily_pnl'] += total_profit
         self.account['total_pnl'] += total_profit
         self.account['trades_today'] += 1
         
-        # 更新统计
-        self.stats['executed_trades'] += 1
-        self.stats['total_fees_paid'] += total_fees
-        
-        if total_profit > 0:
-            self.stats['successful_trades'] += 1
-            self.stats['best_profit'] = max(self.stats['best_profit'], total_profit)
-        else:
-            self.stats['failed_trades'] += 1
-            self.stats['worst_loss'] = min(self.stats['worst_loss'], total_profit)
-        
-        # 记录交易
+        # 记录交易（账本插入时同时更新次数/胜率/手续费/按币种的累计统计）
+        now = datetime.now()
         trade_record = {
-            'timestamp': datetime.now(),
+            'timestamp': now,
             'symbol': opportunity['symbol'],
             'direction': opportunity['direction'],
             'quantity': trade_quantity,
@@ -406,7 +447,8 @@ class EnhancedArbitrageBot:
             'balance_after': self.account['current_balance']
         }
         
-        self.stats['trade_history'].append(trade_record)
+        self.trades.append({**trade_record, 'ts': now.timestamp()})
+        self.metrics.execution(opportunity['symbol'], total_profit, success=total_profit > 0)
         
         # 发送通知
         self.send_trade_notification(trade_record)
@@ -425,6 +467,8 @@ class EnhancedArbitrageBot:
             
             while True:
                 check_count += 1
+                round_started = time.monotonic()
+                self.inventory.refresh_stale(self.config['balance_refresh_interval'])
                 
                 for symbol in self.config['symbols']:
                     try:
@@ -433,6 +477,7 @@ class EnhancedArbitrageBot:
                         
                         if analysis and analysis['opportunities']:
                             self.stats['total_opportunities'] += len(analysis['opportunities'])
+                            self.metrics.opportunity(symbol, len(analysis['opportunities']))
                             
                             for opp in analysis['opportunities']:
                                 logger.info(f"🎯 发现机会: {symbol} {opp['direction']} "
@@ -442,24 +487,24 @@ class EnhancedArbitrageBot:
                                 self.send_opportunity_notification(opp)
                                 
                                 # 尝试执行交易
-                                if self.simulate_trade_execution(opp):
-                                    time.sleep(5)
+                                self.simulate_trade_execution(opp)
                         
                         else:
                             # 显示当前价差
                             if analysis:
                                 logger.info(f"📊 {symbol}: 价差 {analysis['spread']:.3f}%")
                         
-                        time.sleep(0.5)  # 避免API限制
                         
                     except Exception as e:
                         logger.error(f"❌ 处理 {symbol} 时出错: {str(e)}")
                 
                 # 每100次检查发送一次统计
-                if check_count % 100 == 0 and self.stats['executed_trades'] > 0:
+                if check_count % 100 == 0 and self.trades.count > 0:
                     self.send_daily_summary()
                 
-                time.sleep(self.config['check_interval'])
+                # 由请求预算调度下一轮：预算充足时每 check_interval 秒一轮，限频退避或预算不足时自动放慢
+                SCHEDULER.pace_sync({name: len(self.config['symbols']) for name in self.exchanges},
+                                    self.config['check_interval'], round_started)
                 
         except KeyboardInterrupt:
             logger.info("\n🛑 用户停止机器人")
@@ -469,6 +514,7 @@ class EnhancedArbitrageBot:
             self.notifier.send_message(f"❌ 机器人异常: {str(e)}")
         finally:
             self.send_daily_summary()
+            self.trades.flush()
             logger.info("👋 套利机器人已停止")
 
 def main():
@@ -33,8 +33,9 @@ async def test_exchange(exchange, name):
         
         # Test getting order book
         order_book = await exchange.get_order_book(symbol, limit=5)
-        logger.info(f"✓ Order Book - Top Bid: {order_book['bids'][0][0] if order_book['bids'] else 'N/A'}, "
-                   f"Top Ask: {order_book['asks'][0][0] if order_book['asks'] else 'N/A'}")
+        scale = order_book['scale']
+        logger.info(f"✓ Order Book - Top Bid: {scale.price(order_book['bids'][0][0]) if order_book['bids'] else 'N/A'}, "
+                   f"Top Ask: {scale.price(order_book['asks'][0][0]) if order_book['asks'] else 'N/A'}")
         
         # Test getting balance
         balance_usdt = await exchange.get_balance('USDT')
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import logging, sys
+sys.path.insert(0, {root!r})
+import websocket_arbitrage_bot, ultra_fast_arbitrage, mock_exchange_server
+print(len(logging.getLogger().handlers))
+"""
+
+
+def test_importing_bots_does_not_configure_logging(tmp_path):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(root=REPO_ROOT)],
+                            cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '0'
+    assert not (tmp_path / 'logs').exists()
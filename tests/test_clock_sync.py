@@ -0,0 +1,40 @@
+import pytest
+
+from src.exchanges.clock_sync import VenueClock
+
+
+def test_best_probe_sets_offset_and_latency():
+    clock = VenueClock()
+    clock.add_probe(sent=100.0, server_time=150.1, received=100.2)
+    assert clock.offset == pytest.approx(50.0)
+    assert clock.rtt == pytest.approx(0.2) and clock.latency == pytest.approx(0.1)
+    # RTT 更大的探测不替换最优结果
+    clock.add_probe(sent=110.0, server_time=160.0, received=111.0)
+    assert clock.offset == pytest.approx(50.0)
+
+
+def test_message_corrections_survive_later_probes():
+    clock = VenueClock()
+    clock.add_probe(sent=100.0, server_time=150.1, received=100.2)
+    # 消息时间戳显示偏移被低估 0.05s
+    assert clock.observe(160.05, recv_wall=110.0) == pytest.approx(110.0)
+    assert clock.offset == pytest.approx(50.05) and clock.corrections == 1
+
+    clock.add_probe(sent=120.0, server_time=170.5, received=121.0)
+    assert clock.offset == pytest.approx(50.05)
+    assert clock.observe(170.05, recv_wall=120.1) == pytest.approx(120.0)
+
+
+def test_new_best_probe_resets_offset():
+    clock = VenueClock(window=2)
+    clock.add_probe(sent=100.0, server_time=150.1, received=100.2)
+    clock.observe(160.05, recv_wall=110.0)
+    clock.add_probe(sent=120.0, server_time=169.95, received=120.1)
+    assert clock.rtt == pytest.approx(0.1)
+    assert clock.offset == pytest.approx(49.9)
+
+
+def test_message_without_timestamp_uses_latency_estimate():
+    clock = VenueClock()
+    clock.add_probe(sent=100.0, server_time=150.1, received=100.2)
+    assert clock.observe(None, recv_wall=200.0) == pytest.approx(199.9)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.models import depth_arbitrage
+
+ASKS = [[100.0, 1.0], [100.5, 2.0], [101.0, 5.0]]
+BIDS = [[101.2, 0.5], [100.8, 1.5], [100.0, 5.0]]
+
+
+def brute_force_profit(asks, bids, buy_fee, sell_fee, q):
+    def value(levels, q):
+        total, left = 0.0, q
+        for price, qty in levels:
+            take = min(left, qty)
+            total += take * price
+            left -= take
+        return total
+    return value(bids, q) * (1 - sell_fee) - value(asks, q) * (1 + buy_fee)
+
+
+def test_optimum_matches_brute_force_search():
+    cross = depth_arbitrage(ASKS, BIDS, 0.001, 0.001)
+    assert cross is not None
+    grid = np.linspace(0.01, 7.0, 700)
+    best = max(brute_force_profit(ASKS, BIDS, 0.001, 0.001, q) for q in grid)
+    assert cross.net_profit == pytest.approx(best, abs=1e-3)
+    assert cross.net_profit == pytest.approx(brute_force_profit(ASKS, BIDS, 0.001, 0.001, cross.quantity))
+    assert cross.quantity == pytest.approx(2.0)
+    assert (cross.buy_levels, cross.sell_levels) == (2, 2)
+    assert cross.buy_price == pytest.approx((100.0 + 100.5) / 2)
+    assert cross.profit_percentage == pytest.approx(cross.net_profit / cross.buy_cost * 100)
+
+
+def test_uncrossed_or_fee_eaten_books_return_none():
+    assert depth_arbitrage([[101.0, 1.0]], [[100.0, 1.0]], 0, 0) is None
+    assert depth_arbitrage([[100.0, 1.0]], [[100.1, 1.0]], 0.001, 0.001) is None
+    assert depth_arbitrage([], BIDS, 0, 0) is None
+
+
+def test_quantity_and_notional_caps():
+    assert depth_arbitrage(ASKS, BIDS, 0.001, 0.001, max_quantity=0.3).quantity == pytest.approx(0.3)
+    capped = depth_arbitrage(ASKS, BIDS, 0.001, 0.001, max_notional=150.0)
+    # 第一档 100 USDT 买 1 个，剩余 50 USDT 按 100.5 买入
+    assert capped.quantity == pytest.approx(1 + 50 / 100.5)
+    assert capped.buy_cost == pytest.approx(150.0 * 1.001)
+
+
+def test_accepts_arrays_with_extra_columns():
+    asks = np.array([[p, q, 3] for p, q in ASKS])
+    bids = np.array([[p, q, 1] for p, q in BIDS])
+    assert depth_arbitrage(asks, bids, 0.001, 0.001) == depth_arbitrage(ASKS, BIDS, 0.001, 0.001)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from src.models import FillModel, load_book_frames
+from src.models.fill_model import _walk
+
+
+def test_walk_vwap_on_zero_padded_levels():
+    px = np.array([[100.0, 101.0, 0.0], [0.0, 0.0, 0.0]])
+    qty = np.array([[1.0, 1.0, 0.0], [0.0, 0.0, 0.0]])
+    size = np.array([[0.5, 1.5, 2.0, 5.0], [1.0, 1.0, 1.0, 1.0]])
+    vwap, filled = _walk(px, qty, size)
+
+    assert vwap[0].tolist() == pytest.approx([100.0, (100 + 0.5 * 101) / 1.5, 100.5, 100.5])
+    # 深度不足时只成交已有数量，补零的档位不参与均价
+    assert filled[0].tolist() == [0.5, 1.5, 2.0, 2.0]
+    assert np.isnan(vwap[1]).all() and (filled[1] == 0).all()
+
+
+def constant_books(frames=50):
+    ask_px, ask_qty = [100.0, 100.1, 101.0], [1.0, 1.0, 10.0]
+    bid_px, bid_qty = [99.9, 99.8, 99.0], [1.0, 1.0, 10.0]
+    return {('bybit', 'BTC/USDT'): {
+        'ts': np.arange(frames) * 100.0,
+        'ask_px': np.tile(ask_px, (frames, 1)), 'ask_qty': np.tile(ask_qty, (frames, 1)),
+        'bid_px': np.tile(bid_px, (frames, 1)), 'bid_qty': np.tile(bid_qty, (frames, 1)),
+    }}
+
+
+def fit():
+    return FillModel.fit(constant_books(), latency_grid=(0, 100), notional_grid=(50, 150, 500))
+
+
+def test_fit_tables_and_max_notional_lookup():
+    model = fit()
+    slippage, prob = model.lookup('bybit', 'BTC/USDT', 'buy', 0, 150)
+    assert slippage == pytest.approx((100.0 + 0.5 * 100.1) / 1.5 / 100 * 1e4 - 1e4)
+    assert prob == 0.0
+    assert model.lookup('bybit', 'BTC/USDT', 'sell', 50, 40) == (pytest.approx(0.0), 1.0)
+
+    # 默认阈值（成交概率 0.8）：只有 50 USDT 档满足
+    assert model.max_notional('bybit', 'BTC/USDT', 'buy', 10) == 50
+    model.set_limits(min_fill_prob=0.0, max_slippage_bps=5)
+    assert model.max_notional('bybit', 'BTC/USDT', 'buy', 10) == 150
+    assert model.max_notional('okx', 'BTC/USDT', 'buy', 10) is None
+
+
+def test_saved_model_keeps_its_limits(tmp_path):
+    path = str(tmp_path / 'fill_model.npz')
+    model = fit()
+    model.set_limits(min_fill_prob=0.0, max_slippage_bps=5)
+    model.save(path)
+
+    loaded = FillModel.load(path)
+    assert (loaded.min_fill_prob, loaded.max_slippage_bps) == (0.0, 5.0)
+    assert loaded.max_notional('bybit', 'BTC/USDT', 'buy', 10) == 150
+    assert np.array_equal(loaded.max_notional_table, model.max_notional_table)
+
+
+def test_load_book_frames_pads_shallow_frames(tmp_path):
+    path = tmp_path / 'books.jsonl'
+    path.write_text('{"venue": "bybit", "symbol": "BTC/USDT", "ts": 200, "bids": [[99, 1]], "asks": [[100, 1]]}\n'
+                    '{"venue": "bybit", "symbol": "BTC/USDT", "ts": 100, "bids": [[99, 1], [98, 2]], '
+                    '"asks": [[100, 1]]}\n')
+    book = load_book_frames(str(path))[('bybit', 'BTC/USDT')]
+    assert book['ts'].tolist() == [100.0, 200.0]
+    assert book['bid_px'].tolist() == [[99.0, 98.0], [99.0, 0.0]]
+    assert book['ask_qty'].tolist() == [[1.0, 0.0], [1.0, 0.0]]
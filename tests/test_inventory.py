@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+import pytest
+
+from src.exchanges.base_exchange import BaseExchange
+from src.exchanges.inventory import InventoryService, balances_from_ccxt
+
+
+def make_inventory():
+    inventory = InventoryService()
+    inventory.set_balances('bitget', {'USDT': {'free': '100', 'locked': '0'}})
+    inventory.set_balances('bybit', {'USDT': {'free': '100', 'locked': '0'}, 'BTC': {'free': '0.01', 'locked': '0'}})
+    return inventory
+
+
+def test_reserve_is_all_or_nothing_across_legs():
+    inventory = make_inventory()
+    # 卖出腿现货不足：买入腿的 USDT 也不能被占用
+    assert inventory.reserve([('bitget', 'USDT', 50), ('bybit', 'BTC', '0.02')]) is None
+    assert inventory.available('bitget', 'USDT') == Decimal('100')
+
+    reservation = inventory.reserve([('bitget', 'USDT', 50), ('bybit', 'BTC', '0.006')])
+    assert reservation is not None
+    assert inventory.available('bybit', 'BTC') == Decimal('0.004')
+    assert inventory.reserve([('bybit', 'BTC', '0.005')]) is None
+
+    inventory.release(reservation)
+    assert inventory.available('bybit', 'BTC') == Decimal('0.01')
+    assert inventory.reserved == {}
+
+
+def test_settle_moves_both_assets_on_both_venues():
+    inventory = make_inventory()
+    reservation = inventory.reserve([('bitget', 'USDT', 40), ('bybit', 'BTC', '0.001')])
+    inventory.settle(reservation, [
+        ('bitget', 'USDT', -40), ('bitget', 'BTC', '0.001'),
+        ('bybit', 'BTC', '-0.001'), ('bybit', 'USDT', 41),
+    ])
+    assert inventory.free('bitget', 'USDT') == Decimal('60')
+    assert inventory.free('bitget', 'BTC') == Decimal('0.001')
+    assert inventory.free('bybit', 'BTC') == Decimal('0.009')
+    assert inventory.total('USDT') == Decimal('201')
+    assert inventory.reserved == {}
+
+
+def test_ensure_only_seeds_unknown_assets():
+    inventory = make_inventory()
+    inventory.ensure('bybit', 'BTC', 5)
+    inventory.ensure('bybit', 'ETH', '0.5')
+    assert inventory.free('bybit', 'BTC') == Decimal('0.01')
+    assert inventory.free('bybit', 'ETH') == Decimal('0.5')
+
+
+class FakeCcxt:
+    def __init__(self, api_key=None, usdt='10'):
+        self.apiKey = api_key
+        self.usdt = usdt
+        self.calls = 0
+
+
+def fetch(venue, exchange):
+    exchange.calls += 1
+    return {'free': {'USDT': exchange.usdt}, 'used': {'USDT': '1'}}
+
+
+def test_bootstrap_polls_keyed_venues_and_seeds_the_rest():
+    exchanges = {'bitget': FakeCcxt('key'), 'bybit': FakeCcxt()}
+    inventory = InventoryService()
+    inventory.bootstrap(exchanges, fetch, seed={'USDT': {'free': 500, 'locked': 0}})
+
+    assert inventory.free('bitget', 'USDT') == Decimal('10')
+    assert inventory.locked('bitget', 'USDT') == Decimal('1')
+    assert inventory.free('bybit', 'USDT') == Decimal('500')
+    assert list(inventory.sources) == ['bitget']
+
+    simulated = InventoryService()
+    simulated.bootstrap(exchanges, fetch, seed={'USDT': {'free': 500, 'locked': 0}}, live=False)
+    assert simulated.sources == {}
+    assert exchanges['bitget'].calls == 1
+
+
+def test_refresh_stale_only_polls_after_max_age():
+    exchange = FakeCcxt('key')
+    inventory = InventoryService()
+    inventory.bootstrap({'bitget': exchange}, fetch, seed={})
+
+    assert inventory.refresh_stale(60) == []
+    assert exchange.calls == 1
+
+    inventory.refreshed_at['bitget'] -= 61
+    exchange.usdt = '20'
+    assert inventory.refresh_stale(60) == ['bitget']
+    assert inventory.free('bitget', 'USDT') == Decimal('20')
+
+
+def test_refresh_stale_backs_off_after_failure():
+    inventory = InventoryService()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError('down')
+
+    inventory.sources['bitget'] = failing
+    assert inventory.refresh_stale(60) == []
+    assert inventory.refresh_stale(60) == []
+    assert len(calls) == 1
+
+
+def test_balances_from_ccxt():
+    balances = balances_from_ccxt({'free': {'BTC': 0.5}, 'used': {'BTC': 0.1, 'USDT': 3}})
+    assert balances['BTC'] == {'free': Decimal('0.5'), 'locked': Decimal('0.1')}
+    assert balances['USDT'] == {'free': Decimal('0'), 'locked': Decimal('3')}
+
+
+def test_adapters_must_implement_bulk_balances():
+    assert 'get_balances' in BaseExchange.__abstractmethods__
+    with pytest.raises(TypeError):
+        type('Partial', (BaseExchange,), {})('key', 'secret')
+
+
+def test_adapters_must_implement_market_metadata():
+    assert 'get_market' in BaseExchange.__abstractmethods__
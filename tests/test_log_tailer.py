@@ -0,0 +1,70 @@
+import os
+
+from src.monitoring.log_tailer import LogTailer
+
+
+def write(path, text, mode='a'):
+    with open(path, mode) as f:
+        f.write(text)
+
+
+def test_appended_lines_are_read_once(tmp_path):
+    log = str(tmp_path / 'bot.log')
+    tailer = LogTailer(str(tmp_path / 'state.json'))
+    write(log, 'a\nb\n')
+    assert list(tailer.read_new_lines(log)) == ['a', 'b']
+    assert list(tailer.read_new_lines(log)) == []
+    write(log, 'c\n')
+    assert list(tailer.read_new_lines(log)) == ['c']
+
+
+def test_partial_line_waits_for_newline(tmp_path):
+    log = str(tmp_path / 'bot.log')
+    tailer = LogTailer(str(tmp_path / 'state.json'))
+    write(log, 'a\nhal')
+    assert list(tailer.read_new_lines(log)) == ['a']
+    write(log, 'f\n')
+    assert list(tailer.read_new_lines(log)) == ['half']
+
+
+def test_truncation_restarts_from_the_beginning(tmp_path):
+    log = str(tmp_path / 'bot.log')
+    tailer = LogTailer(str(tmp_path / 'state.json'))
+    write(log, 'first line\nsecond line\n')
+    list(tailer.read_new_lines(log))
+    write(log, 'new\n', mode='w')
+    assert list(tailer.read_new_lines(log)) == ['new']
+    # 截断后写回相同长度的不同内容：按头部指纹识别
+    write(log, 'XXXX\n', mode='w')
+    list(tailer.read_new_lines(log))
+    write(log, 'YYYY\n', mode='w')
+    assert list(tailer.read_new_lines(log)) == ['YYYY']
+
+
+def test_rotation_drains_whole_tail_of_rotated_file(tmp_path):
+    log = str(tmp_path / 'bot.log')
+    tailer = LogTailer(str(tmp_path / 'state.json'), max_chunk=16)
+    write(log, 'seen\n')
+    assert list(tailer.read_new_lines(log)) == ['seen']
+    # 未读尾部远超 max_chunk，最后一行没有换行符
+    tail = [f"line {i:03d}" for i in range(20)]
+    write(log, '\n'.join(tail))
+    os.rename(log, log + '.1')
+    write(log, 'fresh\n')
+    assert list(tailer.read_new_lines(log)) == tail + ['fresh']
+    assert list(tailer.read_new_lines(log)) == []
+
+
+def test_offsets_and_aggregates_survive_restart(tmp_path):
+    log = str(tmp_path / 'bot.log')
+    state = str(tmp_path / 'state.json')
+    tailer = LogTailer(state)
+    write(log, 'a\n')
+    list(tailer.read_new_lines(log))
+    tailer.aggregates['lines'] = 1
+    tailer.save()
+
+    restarted = LogTailer(state)
+    write(log, 'b\n')
+    assert list(restarted.read_new_lines(log)) == ['b']
+    assert restarted.aggregates == {'lines': 1}
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from src.monitoring.http_endpoint import bind_host, start_http_thread
+from src.monitoring.latency import LatencyTracker
+from src.monitoring.metrics import Metric, MetricsRegistry
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('events_total', 'Events', ('symbol',)).labels('a"b\\c\nd').inc()
+
+    text = registry.render_prometheus()
+    assert 'events_total{symbol="a\\"b\\\\c\\nd"} 1.0' in text
+    # 转义后每个样本仍占一行
+    assert len([line for line in text.splitlines() if line.startswith('events_total')]) == 1
+
+
+def test_latency_quantile_labels_are_escaped():
+    registry = MetricsRegistry()
+    tracker = LatencyTracker()
+    tracker.record('bitget', 'BAD"SYM', 'decode', 10)
+    registry.register_latency(tracker)
+
+    text = registry.render_prometheus()
+    assert 'symbol="BAD\\"SYM"' in text
+
+
+def test_histogram_render_is_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('venue',), buckets=(0.1, 1)).labels('x')
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    text = registry.render_prometheus()
+    assert 'latency_seconds_bucket{venue="x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{venue="x",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{venue="x",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{venue="x"} 3' in text
+
+
+def test_render_while_another_thread_adds_children():
+    registry = MetricsRegistry()
+    counter = registry.counter('symbols_total', 'Per-symbol counter', ('symbol',))
+    errors = []
+    done = threading.Event()
+
+    def scrape():
+        while not done.is_set():
+            try:
+                registry.render_prometheus()
+                registry.snapshot()
+            except RuntimeError as e:
+                errors.append(e)
+                return
+
+    scraper = threading.Thread(target=scrape)
+    scraper.start()
+    for i in range(20000):
+        counter.labels(f"S{i}").inc()
+    done.set()
+    scraper.join()
+
+    assert not errors
+    assert len(registry.snapshot()['metrics']['symbols_total']['samples']) == 20000
+
+
+def test_metric_base_requires_child_factory():
+    with pytest.raises(TypeError):
+        Metric('x', 'abstract')
+
+
+def test_http_endpoints_bind_loopback_unless_configured(monkeypatch):
+    monkeypatch.delenv('METRICS_BIND', raising=False)
+    assert bind_host() == '127.0.0.1'
+    server = start_http_thread({}, port=0)
+    try:
+        assert server.server_address[0] == '127.0.0.1'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    monkeypatch.setenv('METRICS_BIND', '0.0.0.0')
+    assert bind_host() == '0.0.0.0'
+    assert bind_host('10.0.0.5') == '10.0.0.5'
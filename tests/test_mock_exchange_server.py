@@ -0,0 +1,66 @@
+import asyncio
+
+import orjson
+from aiohttp.test_utils import TestClient, TestServer
+
+from mock_exchange_server import MockExchangeServer
+
+
+def run_with_client(scenario, **config):
+    server = MockExchangeServer()
+    server.config.update(config)
+
+    async def main():
+        async with TestClient(TestServer(server.build_app())) as client:
+            return await scenario(server, client)
+
+    return asyncio.run(main())
+
+
+def test_partial_fills_continue_until_order_is_filled():
+    async def scenario(server, client):
+        resp = await client.post('/v5/order/create', data=orjson.dumps(
+            {'symbol': 'BTCUSDT', 'side': 'Buy', 'orderType': 'Limit', 'qty': '1', 'price': '100'}))
+        order_id = (await resp.json())['result']['orderId']
+        for _ in range(200):
+            await asyncio.sleep(0.005)
+            if server.orders[order_id]['orderStatus'] == 'Filled':
+                break
+        return server.orders[order_id]
+
+    order = run_with_client(scenario, partial_fill_prob=1.0, fill_delay=0.001)
+    assert order['orderStatus'] == 'Filled'
+    assert float(order['leavesQty']) == 0
+    assert abs(float(order['cumExecQty']) - 1) < 1e-6
+
+
+def test_plain_text_ping_does_not_end_session():
+    async def scenario(server, client):
+        ws = await client.ws_connect('/v5/public/spot')
+        await ws.send_str('ping')
+        pong = await ws.receive_str(timeout=1)
+        await ws.send_str('{not json')
+        await ws.send_str(orjson.dumps({'op': 'subscribe', 'args': ['orderbook.50.BTCUSDT']}).decode())
+        ack = orjson.loads(await ws.receive_str(timeout=1))
+        await ws.close()
+        return pong, ack
+
+    pong, ack = run_with_client(scenario)
+    assert pong == 'pong'
+    assert ack['op'] == 'subscribe' and ack['success'] is True
+
+
+def test_faults_apply_to_rest_but_not_websocket_upgrades():
+    async def scenario(server, client):
+        ws = await client.ws_connect('/v5/public/spot')
+        await ws.close()
+        after_upgrade = dict(server.stats)
+        resp = await client.get('/v5/market/time')
+        return after_upgrade, resp.status, dict(server.stats)
+
+    # 限频概率为 1：REST 必然 429，WebSocket 升级仍然成功
+    after_upgrade, status, stats = run_with_client(scenario, rate_limit_prob=1.0, latency=0.0, jitter=0.0)
+    assert after_upgrade['rest_requests'] == 0
+    assert status == 429
+    assert stats['rest_requests'] == 1 and stats['rate_limited'] == 1
+
@@ -0,0 +1,69 @@
+import pytest
+
+from src.monitoring import OpportunityTracker
+from src.monitoring.metrics import MetricsRegistry
+
+
+def make_tracker(**kwargs):
+    tracker = OpportunityTracker('test', registry=MetricsRegistry(), **kwargs)
+    events = []
+    tracker.subscribe(lambda event, opp: events.append((event, opp.key)))
+    return tracker, events
+
+
+def test_persistent_spread_is_one_opportunity():
+    tracker, events = make_tracker(update_step=0.25)
+    for i, pct in enumerate((0.1, 0.11, 0.2, 0.21)):
+        tracker.observe('BTC/USDT', 'bitget', 'bybit', pct, now=100 + i)
+    assert [event for event, _ in events] == ['open', 'update']
+    opp = tracker.active[('BTC/USDT', 'bitget', 'bybit')]
+    assert opp.ticks == 4 and opp.peak_pct == 0.21
+    assert opp.average_pct == pytest.approx(0.155)
+
+
+def test_spread_flapping_at_threshold_does_not_reopen():
+    tracker, events = make_tracker(close_after=1.0)
+    # 阈值附近每 0.2 秒交替盈利/不盈利
+    for i in range(20):
+        now = 100 + i * 0.2
+        if i % 2:
+            assert tracker.clear('BTC/USDT', 'bitget', 'bybit', now=now) is None
+        else:
+            tracker.observe('BTC/USDT', 'bitget', 'bybit', 0.1, now=now)
+    assert [event for event, _ in events] == ['open']
+    assert tracker.stats['opened'] == 1
+
+
+def test_clear_closes_after_grace_from_first_unprofitable_tick():
+    tracker, events = make_tracker(close_after=1.0)
+    tracker.observe('BTC/USDT', 'bitget', 'bybit', 0.1, now=100)
+    assert tracker.clear('BTC/USDT', 'bitget', 'bybit', now=101) is None
+    opp = tracker.clear('BTC/USDT', 'bitget', 'bybit', now=102.5)
+    assert opp is not None and opp.close_reason == 'spread_closed'
+    assert opp.closed_at == 101 and opp.duration == 1
+    assert tracker.active == {}
+
+
+def test_expire_closes_pending_and_idle_opportunities():
+    tracker, events = make_tracker(close_after=1.0, max_idle=5.0)
+    tracker.observe('BTC/USDT', 'bitget', 'bybit', 0.1, now=100)
+    tracker.observe('ETH/USDT', 'bybit', 'bitget', 0.1, now=100)
+    tracker.clear('BTC/USDT', 'bitget', 'bybit', now=100.5)
+
+    assert tracker.expire(now=101) == 0
+    # 没有新行情也会在宽限期后结束
+    assert tracker.expire(now=101.5) == 1
+    assert list(tracker.active) == [('ETH/USDT', 'bybit', 'bitget')]
+    assert tracker.expire(now=106) == 1
+    closed = [opp for event, opp in events if event == 'close']
+    assert closed == [('BTC/USDT', 'bitget', 'bybit'), ('ETH/USDT', 'bybit', 'bitget')]
+    assert tracker.stats['closed'] == 2
+
+
+def test_close_symbol_closes_every_direction():
+    tracker, events = make_tracker()
+    tracker.observe('BTC/USDT', 'bitget', 'bybit', 0.1, now=100)
+    tracker.observe('BTC/USDT', 'bybit', 'bitget', 0.1, now=100)
+    tracker.close_symbol('BTC/USDT', 'disconnected', now=101)
+    assert tracker.active == {}
+    assert [event for event, _ in events].count('close') == 2
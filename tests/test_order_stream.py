@@ -0,0 +1,174 @@
+import asyncio
+from decimal import Decimal
+
+import orjson
+import pytest
+
+from src.exchanges.order_stream import BitgetPrivateStream, BybitPrivateStream
+
+
+class FakeSocket:
+    """Scripted WebSocket: recv() returns queued frames, then stops the stream"""
+
+    def __init__(self, stream, frames):
+        self.stream = stream
+        self.frames = list(frames)
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def recv(self):
+        if not self.frames:
+            self.stream.stop()
+            return 'pong'
+        return self.frames.pop(0)
+
+
+def bybit_order(order_id, status, filled, leaves, **extra):
+    return {'orderId': order_id, 'symbol': 'BTCUSDT', 'side': 'Buy', 'orderStatus': status,
+            'cumExecQty': filled, 'leavesQty': leaves, 'price': '100', 'avgPrice': '100', **extra}
+
+
+def order_push(*items):
+    return orjson.dumps({'topic': 'order', 'data': list(items)}).decode()
+
+
+def test_get_order_returns_rest_shaped_copy():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.handle_message(order_push(bybit_order('1', 'PartiallyFilled', '0.4', '0.6')))
+
+    order = stream.get_order('1')
+    assert set(order) == {'id', 'status', 'filled', 'remaining', 'price', 'average_price'}
+    assert order['status'] == 'open'
+    assert order['filled'] == Decimal('0.4')
+    assert stream.get_raw_status('1') == 'PartiallyFilled'
+
+    order['status'] = 'closed'
+    assert stream.get_order('1')['status'] == 'open'
+
+
+def test_terminal_status_is_not_reverted_by_stale_push():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.handle_message(order_push(bybit_order('1', 'Filled', '1', '0')))
+    stream.handle_message(order_push(bybit_order('1', 'PartiallyFilled', '0.4', '0.6')))
+    assert stream.get_order('1')['status'] == 'closed'
+
+
+def test_stale_push_does_not_overwrite_finished_order_fields():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.handle_message(order_push(bybit_order('1', 'Filled', '1', '0', avgPrice='101')))
+    # 补查之后才到达的旧推送
+    stream.handle_message(order_push(bybit_order('1', 'New', '0.3', '0.7', avgPrice='99')))
+    order = stream.get_order('1')
+    assert (order['status'], order['filled'], order['remaining']) == ('closed', Decimal('1'), Decimal('0'))
+    assert order['average_price'] == Decimal('101')
+    assert stream.get_raw_status('1') == 'Filled'
+
+
+def test_terminal_orders_are_evicted_after_ttl():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.terminal_ttl = 10
+    stream.apply_update({'id': '1', 'status': 'closed', 'filled': Decimal('1'), 'remaining': Decimal('0')}, now=0)
+    stream.apply_update({'id': '2', 'status': 'open', 'filled': Decimal('0'), 'remaining': Decimal('1')}, now=5)
+    assert stream.get_order('1') is not None
+
+    stream.apply_update({'id': '2', 'status': 'open', 'filled': Decimal('0.5'), 'remaining': Decimal('0.5')}, now=11)
+    assert stream.get_order('1') is None
+    assert stream.get_order('2') is not None
+    assert stream.stats['evicted'] == 1
+
+
+def test_wait_for_fill_resolves_on_terminal_push():
+    stream = BybitPrivateStream('key', 'secret')
+
+    async def scenario():
+        waiter = asyncio.ensure_future(stream.wait_for_fill('1', timeout=1))
+        await asyncio.sleep(0)
+        stream.handle_message(order_push(bybit_order('1', 'Filled', '1', '0')))
+        return await waiter
+
+    order = asyncio.run(scenario())
+    assert order['status'] == 'closed'
+    assert order['remaining'] == Decimal('0')
+
+
+def test_session_waits_for_login_ack_before_subscribing():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.running = True
+    ws = FakeSocket(stream, [
+        orjson.dumps({'op': 'pong'}).decode(),
+        orjson.dumps({'op': 'auth', 'success': True}).decode(),
+    ])
+    asyncio.run(stream._session(ws))
+
+    sent = [orjson.loads(message) for message in ws.sent]
+    assert sent[0]['op'] == 'auth'
+    assert sent[1]['op'] == 'subscribe'
+
+
+def test_rejected_login_raises():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.running = True
+    ws = FakeSocket(stream, [orjson.dumps({'op': 'auth', 'success': False, 'ret_msg': 'bad key'}).decode()])
+    with pytest.raises(ConnectionError):
+        asyncio.run(stream._session(ws))
+    assert len(ws.sent) == 1
+
+
+def test_reconnect_resyncs_fills_missed_while_disconnected():
+    calls = []
+
+    async def order_source(symbol, order_id):
+        calls.append((symbol, order_id))
+        return {'id': order_id, 'status': 'closed', 'filled': Decimal('1'), 'remaining': Decimal('0'),
+                'price': Decimal('100'), 'average_price': Decimal('100')}
+
+    stream = BybitPrivateStream('key', 'secret', order_source=order_source)
+    stream.handle_message(order_push(bybit_order('1', 'New', '0', '1')))
+    stream.track('1', 'BTC/USDT')
+
+    async def scenario():
+        waiter = asyncio.ensure_future(stream.wait_for_fill('1', timeout=1))
+        await asyncio.sleep(0)
+        stream.running = True
+        await stream._session(FakeSocket(stream, [orjson.dumps({'op': 'auth', 'success': True}).decode()]))
+        return await waiter
+
+    order = asyncio.run(scenario())
+    assert calls == [('BTC/USDT', '1')]
+    assert order['status'] == 'closed'
+
+
+def test_bad_message_does_not_end_session():
+    stream = BybitPrivateStream('key', 'secret')
+    stream.running = True
+    ws = FakeSocket(stream, [
+        orjson.dumps({'op': 'auth', 'success': True}).decode(),
+        'not json',
+        order_push({'symbol': 'BTCUSDT'}),  # 缺少 orderId
+        order_push(bybit_order('1', 'Filled', '1', '0')),
+    ])
+    asyncio.run(stream._session(ws))
+    assert stream.stats['errors'] == 2
+    assert stream.get_order('1')['status'] == 'closed'
+
+
+def test_bitget_login_ack_and_market_buy_remaining():
+    stream = BitgetPrivateStream('key', 'secret', 'pass')
+    assert stream._auth_result({'event': 'login', 'code': 0}) is True
+    assert stream._auth_result({'event': 'error', 'code': 30005}) is False
+    assert stream._auth_result({'event': 'subscribe'}) is None
+
+    def push(status, base_volume):
+        return orjson.dumps({'arg': {'channel': 'orders'}, 'data': [{
+            'orderId': '9', 'instId': 'BTCUSDT', 'side': 'buy', 'orderType': 'market',
+            'size': '50', 'accBaseVolume': base_volume, 'status': status, 'priceAvg': '25000',
+        }]}).decode()
+
+    # 市价买单 size=50 是 USDT 金额，不能当作基础币数量相减
+    stream.handle_message(push('partially_filled', '0.001'))
+    assert stream.get_order('9')['remaining'] is None
+    stream.handle_message(push('filled', '0.002'))
+    assert stream.get_order('9')['remaining'] == 0
+    assert stream.get_order('9')['filled'] == Decimal('0.002')
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+from src.storage import InMemoryRedis, SharedPriceCache
+
+
+def book(bid, ask, levels=3):
+    bids = [[bid - i, 1.0 + i] for i in range(levels)]
+    asks = [[ask + i, 2.0 + i] for i in range(levels)]
+    return bids, asks
+
+
+def test_flush_coalesces_and_readers_see_latest_book():
+    writer = SharedPriceCache(InMemoryRedis(), depth=2)
+    reader = SharedPriceCache(writer.client)
+    now = time.time()
+    writer.update('bitget', 'BTC/USDT', *book(100, 101), exchange_time=now)
+    writer.update('bitget', 'BTC/USDT', *book(102, 103), exchange_time=now)
+    writer.update('bybit', 'BTC/USDT', *book(99, 100), exchange_time=now)
+    assert reader.top('bitget', 'BTC/USDT') is None
+
+    assert writer.flush() == 2
+    top = reader.top('bitget', 'BTC/USDT')
+    assert (top['bid'], top['ask'], top['bid_size']) == (102, 103, 1.0)
+    depth = reader.book('bitget', 'BTC/USDT')
+    assert depth['bids'] == [[102, 1.0], [101, 2.0]]
+    assert reader.keys() == [('bitget', 'BTC/USDT'), ('bybit', 'BTC/USDT')]
+    assert [t['venue'] for t in reader.snapshot()] == ['bitget', 'bybit']
+    assert writer.stats['written'] == 2 and writer.flush() == 0
+
+
+def test_stale_and_expired_prices_are_not_returned():
+    cache = SharedPriceCache(InMemoryRedis(), ttl=0.05)
+    cache.update('bitget', 'ETH/USDT', *book(10, 11), exchange_time=time.time() - 10)
+    cache.flush()
+    assert cache.top('bitget', 'ETH/USDT') is not None
+    assert cache.top('bitget', 'ETH/USDT', max_age=1) is None
+    time.sleep(0.06)
+    # 发布端停止后价格随 TTL 过期
+    assert cache.top('bitget', 'ETH/USDT') is None
+    assert cache.snapshot() == []
+
+
+def test_listen_receives_published_tops():
+    cache = SharedPriceCache(InMemoryRedis())
+    received = []
+    listener = cache.listen(timeout=0.01)
+
+    def consume():
+        received.append(next(listener))
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    # 等待订阅生效后再发布
+    deadline = time.monotonic() + 1
+    while not cache.client._subscribers and time.monotonic() < deadline:
+        time.sleep(0.001)
+    cache.update('bybit', 'SOL/USDT', *book(150, 151), exchange_time=time.time())
+    cache.flush()
+    thread.join(timeout=1)
+    assert received and received[0]['symbol'] == 'SOL/USDT' and received[0]['ask'] == 151
+
+
+def test_run_flushes_from_the_event_loop():
+    cache = SharedPriceCache(InMemoryRedis())
+
+    async def scenario():
+        task = asyncio.ensure_future(cache.run(interval=0.01))
+        cache.update('bitget', 'BTC/USDT', *book(100, 101), exchange_time=time.time())
+        for _ in range(100):
+            if cache.stats['written']:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert cache.top('bitget', 'BTC/USDT')['bid'] == 100
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv('PRICE_CACHE_URL', raising=False)
+    assert SharedPriceCache.from_env() is None
+    assert isinstance(SharedPriceCache.from_env('memory://').client, InMemoryRedis)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from src.exchanges.rate_limiter import ACCOUNT, MARKET_DATA, ORDER, RequestScheduler, TokenBucket
+
+
+def scheduler(ip=(10, 10.0), order=(10, 10.0), market=(10, 10.0)):
+    return RequestScheduler(limits={'x': {'ip': ip, ORDER: order, ACCOUNT: market, MARKET_DATA: market}})
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(10, 5.0)
+    bucket.tokens = 0
+    bucket.refill(bucket.updated + 1)
+    assert bucket.tokens == pytest.approx(5)
+    bucket.refill(bucket.updated + 10)
+    assert bucket.tokens == 10
+    assert bucket.wait_time(12, bucket.updated) == pytest.approx(0.4)
+
+
+def test_market_data_leaves_order_reserve():
+    limiter = scheduler()
+    for _ in range(8):
+        assert limiter._try_acquire('x', MARKET_DATA, 1) == 0
+    # 共享桶剩余 2 个令牌 = 20% 保留给下单
+    assert limiter._try_acquire('x', MARKET_DATA, 1) > 0
+    assert limiter._try_acquire('x', ORDER, 1) == 0
+    assert limiter._try_acquire('x', ORDER, 1) == 0
+
+
+def test_waits_are_counted_in_stats():
+    limiter = scheduler(ip=(1, 1000.0), market=(1, 1000.0))
+    limiter.acquire_sync('x', ORDER)
+    limiter.acquire_sync('x', ORDER)
+    stats = limiter.stats['x']
+    assert stats['requests'] == 2
+    assert stats['waited_seconds'] > 0
+
+
+def test_stats_are_exact_under_concurrent_acquire():
+    limiter = scheduler(ip=(1e9, 1e9), order=(1e9, 1e9), market=(1e9, 1e9))
+
+    def worker():
+        for _ in range(2000):
+            limiter.acquire_sync('x', MARKET_DATA)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.stats['x']['requests'] == 16000
+
+
+def test_rate_limited_venue_pauses_and_backs_off():
+    limiter = scheduler()
+    first = limiter.on_rate_limited('x', retry_after=0.5)
+    assert first == 0.5
+    assert limiter._try_acquire('x', ORDER, 1) == pytest.approx(0.5, abs=0.05)
+    assert limiter.stats['x']['rate_limited'] == 1
+
+    limiter.on_success('x')
+    assert limiter.backoff_streak['x'] == 0
+
+
+def test_headers_shrink_budget():
+    limiter = scheduler(ip=(6000, 100.0), market=(6000, 100.0))
+    limiter.update_from_headers('x', {'X-MBX-USED-WEIGHT-1M': '5400'})
+    assert limiter.bucket('x', 'ip').tokens == pytest.approx(600, rel=0.01)
+
+    limiter.update_from_headers('x', {'X-Bapi-Limit-Status': '0', 'X-Bapi-Limit': '10'}, endpoint=MARKET_DATA)
+    assert limiter._try_acquire('x', MARKET_DATA, 1) > 0
+
+
+def test_call_retries_rate_limit_errors():
+    class RateLimitExceeded(Exception):
+        pass
+
+    limiter = scheduler(ip=(100, 1000.0), market=(100, 1000.0))
+    attempts = []
+
+    def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimitExceeded()
+        return 'ok'
+
+    limiter.max_backoff = 0.01
+    assert limiter.call('x', fetch) == 'ok'
+    assert len(attempts) == 2
+
+
+def test_round_wait_does_not_take_tokens():
+    limiter = scheduler()
+    assert limiter.round_wait({'x': 5}) == 0
+    assert limiter.bucket('x', 'ip').tokens == 10
+    # 一轮 8 个请求超出可用于行情的 8 个令牌时需要等待补充
+    for _ in range(4):
+        limiter.acquire_sync('x', MARKET_DATA)
+    assert limiter.round_wait({'x': 8}) == pytest.approx(0.4, abs=0.05)
+
+
+def test_pace_sync_floors_round_period_from_start():
+    limiter = scheduler(ip=(100, 1000.0), market=(100, 1000.0))
+    started = time.monotonic() - 0.08
+    slept = limiter.pace_sync({'x': 1}, min_interval=0.1, started=started)
+    assert 0 < slept <= 0.03
+    assert limiter.pace_sync({'x': 1}, min_interval=0.1, started=time.monotonic() - 1) == 0
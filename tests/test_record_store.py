@@ -0,0 +1,90 @@
+import sqlite3
+import time
+
+from src.storage import RecordStore
+
+
+def stored_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_append_does_not_write_on_caller_thread(tmp_path):
+    path = str(tmp_path / 'records.db')
+    store = RecordStore(path, batch_size=1000, flush_interval=60)
+    try:
+        store.append('trades', {'symbol': 'BTC/USDT', 'profit': 1.0}, ts=100)
+        assert stored_rows(path) == 0
+        store.flush()
+        assert stored_rows(path) == 1
+    finally:
+        store.close()
+
+
+def test_writer_thread_commits_full_batches(tmp_path):
+    path = str(tmp_path / 'records.db')
+    store = RecordStore(path, batch_size=10, flush_interval=60)
+    try:
+        for i in range(10):
+            store.append('trades', {'profit': i}, ts=100 + i)
+        assert wait_for(lambda: stored_rows(path) == 10)
+    finally:
+        store.close()
+
+
+def test_writer_thread_commits_stale_buffer(tmp_path):
+    path = str(tmp_path / 'records.db')
+    store = RecordStore(path, batch_size=1000, flush_interval=0.05)
+    try:
+        store.append('trades', {'profit': 1}, ts=100)
+        assert wait_for(lambda: stored_rows(path) == 1)
+    finally:
+        store.close()
+
+
+def test_query_and_aggregate_see_buffered_records(tmp_path):
+    store = RecordStore(str(tmp_path / 'records.db'), batch_size=1000, flush_interval=60)
+    try:
+        for i, symbol in enumerate(('BTC/USDT', 'ETH/USDT', 'BTC/USDT')):
+            store.append('trades', {'symbol': symbol, 'profit': float(i + 1)}, ts=100 + i)
+
+        assert [r['profit'] for r in store.query('trades', symbol='BTC/USDT')] == [1.0, 3.0]
+        row, = store.aggregate('trades', 'profit')
+        assert row['count'] == 3 and row['sum'] == 6.0
+        assert store.prune('trades', before=101) == 1
+    finally:
+        store.close()
+
+
+def test_close_commits_remaining_records(tmp_path):
+    path = str(tmp_path / 'records.db')
+    store = RecordStore(path, batch_size=1000, flush_interval=60)
+    store.append('performance', {'value': 1}, ts=100)
+    store.close()
+    assert stored_rows(path) == 1
+
+
+def test_non_finite_values_are_stored_as_null(tmp_path):
+    store = RecordStore(str(tmp_path / 'records.db'), batch_size=1000, flush_interval=60)
+    try:
+        store.append('trades', {'profit': 2.0, 'volatility': float('nan'), 'depth': [float('inf'), 1.0]}, ts=100)
+        store.append('trades', {'profit': 3.0, 'volatility': 0.1}, ts=101)
+        row, = store.aggregate('trades', 'profit')
+        assert row['sum'] == 5.0
+        first, second = store.query('trades')
+        assert first['volatility'] is None and first['depth'] == [None, 1.0]
+        assert second['volatility'] == 0.1
+    finally:
+        store.close()
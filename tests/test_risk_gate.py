@@ -0,0 +1,99 @@
+import asyncio
+import math
+import time
+
+import numpy as np
+import pytest
+
+from src.risk import RiskGate
+
+
+def test_fills_update_position_pnl_and_headroom():
+    gate = RiskGate(initial_balance=10000, max_position_size=5000, position_limits={'BTC/USDT': 0.5})
+    assert gate.allow('BTC/USDT', 'buy', 5000)
+
+    assert gate.on_fill('BTC/USDT', 'buy', 0.1, 40000, fee=1.0) == -1.0
+    assert gate.positions()['BTC/USDT']['size'] == pytest.approx(0.1)
+    # 持仓 4000 后限额 50% 权益只剩约 1000
+    assert gate.headroom[gate.slots['BTC/USDT']] == pytest.approx(0.5 * 9999 - 4000)
+    assert not gate.allow('BTC/USDT', 'buy', 1500)
+
+    realized = gate.on_fill('BTC/USDT', 'sell', 0.1, 41000)
+    assert realized == pytest.approx(100)
+    assert gate.realized_pnl == pytest.approx(99)
+    assert gate.positions() == {}
+
+
+def test_update_price_moves_unrealized_pnl_and_drawdown():
+    gate = RiskGate(initial_balance=10000, max_drawdown=0.1)
+    gate.on_fill('ETH/USDT', 'buy', 1, 3000)
+    gate.update_price('ETH/USDT', 2000)
+    assert gate.unrealized_pnl == pytest.approx(-1000)
+    assert gate.drawdown == pytest.approx(0.1)
+
+    gate.update_price('ETH/USDT', 1900)
+    assert gate.blocked
+    assert not gate.allow('ETH/USDT', 'sell', 10)
+
+
+def test_update_price_on_flat_symbol_only_stores_mark():
+    gate = RiskGate(position_limits={'SOL/USDT': 0.2})
+    equity = gate.equity
+    gate.update_price('SOL/USDT', 150)
+    gate.update_price('UNKNOWN/USDT', 1)
+    assert gate.mark_price[gate.slots['SOL/USDT']] == 150
+    assert gate.equity == equity
+    assert 'UNKNOWN/USDT' not in gate.slots
+
+
+def test_daily_loss_blocks_until_reset():
+    gate = RiskGate(daily_loss_limit=50)
+    gate.on_fill('BTC/USDT', 'buy', 1, 100)
+    gate.on_fill('BTC/USDT', 'sell', 1, 40)
+    assert gate.blocked
+    gate.reset_daily()
+    assert not gate.blocked
+
+
+def test_mark_to_market_keeps_last_mark_for_missing_prices():
+    gate = RiskGate()
+    gate.on_fill('BTC/USDT', 'buy', 1, 100)
+    gate.on_fill('ETH/USDT', 'buy', 1, 100)
+
+    pnl = gate.mark_to_market({'BTC/USDT': 110})
+    assert pnl.tolist() == pytest.approx([10.0, 0.0])
+    pnl = gate.mark_to_market(np.array([math.nan, 90.0]))
+    assert pnl.tolist() == pytest.approx([10.0, -10.0])
+    assert gate.unrealized_pnl == pytest.approx(0.0)
+
+
+def test_ultra_fast_fills_and_marks_reach_the_gate():
+    from ultra_fast_arbitrage import RiskManagementSystem, UltraFastArbitrage
+
+    bot = UltraFastArbitrage()
+    risk = RiskManagementSystem()
+    bot.risk_manager, bot.risk_gate = risk, risk.gate
+    bot.config['risk_check_interval'] = 0.01
+
+    def tick(bid, ask):
+        return {'data': [{'instId': 'BTCUSDT', 'ts': str(int(time.time() * 1000)),
+                          'bids': [[str(bid), '0.01']], 'asks': [[str(ask), '0.01']]}]}
+
+    async def scenario():
+        # 价差足够大，窗口填满后执行模拟买入
+        for _ in range(bot.config['volatility_window']):
+            await bot.process_message_ultra_fast(tick(40000, 40100))
+        assert risk.current_positions['BTC/USDT']['size'] > 0
+
+        # 行情下跌：逐笔重估未实现盈亏，风险监控触发止损并平仓
+        bot.config['min_profit_threshold'] = 100
+        await bot.process_message_ultra_fast(tick(38000, 38010))
+        assert risk.gate.unrealized_pnl < 0
+        monitor = asyncio.ensure_future(bot.risk_monitor())
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+
+    asyncio.run(scenario())
+    assert risk.current_positions == {}
+    assert risk.gate.realized_pnl < 0
+    assert [event['type'] for event in risk.risk_events] == ['stop_loss']
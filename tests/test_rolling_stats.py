@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.models import PriceStats, RollingWindow
+
+
+def test_rolling_window_matches_numpy_over_the_window():
+    rng = np.random.default_rng(7)
+    values = 100 + rng.normal(0, 5, 500)
+    window = RollingWindow(50)
+    for i, x in enumerate(values):
+        window.push(x)
+        expected = values[max(0, i - 49):i + 1]
+        assert window.mean == pytest.approx(expected.mean())
+        assert window.std() == pytest.approx(expected.std(), rel=1e-6)
+        assert window.min == expected.min() and window.max == expected.max()
+        assert window.oldest == expected[0]
+    assert window.ordered().tolist() == values[-50:].tolist()
+    assert window.previous(3) == values[-4]
+    assert window.previous(50) is None
+
+
+def test_partial_window_and_empty_reads():
+    window = RollingWindow(10)
+    assert window.min is None and window.oldest is None and window.std() == 0.0
+    for x in (1.0, 2.0, 3.0):
+        window.push(x)
+    assert not window.full and window.size == 3
+    assert window.variance(ddof=1) == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        RollingWindow(0)
+
+
+def test_ewma_follows_alpha():
+    window = RollingWindow(5, alpha=0.5)
+    for x in (10.0, 20.0, 30.0):
+        window.push(x)
+    assert window.ewma == pytest.approx(22.5)
+
+
+def test_price_stats_returns_and_derived_measures():
+    prices = [100.0, 101.0, 99.0, 102.0, 102.0, 103.0]
+    stats = PriceStats(window=4)
+    for price in prices:
+        stats.update(price)
+
+    returns = np.diff(prices) / prices[:-1]
+    assert stats.count == 4
+    assert stats.last_return == pytest.approx(returns[-1])
+    assert stats.volatility == pytest.approx(returns[-4:].std())
+    window = np.array(prices[-4:])
+    assert stats.dispersion == pytest.approx(window.std() / window.mean())
+    assert stats.change == pytest.approx(103.0 / 99.0 - 1)
+    assert stats.trend == pytest.approx((stats.price.ewma - window.mean()) / window.mean())
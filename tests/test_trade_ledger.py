@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.storage import ARBITRAGE_TRADE_SCHEMA, TradeLedger
+
+
+def trade(i, symbol='BTC/USDT', profit=1.0, fees=0.1):
+    return {'ts': 1_700_000_000 + i, 'symbol': symbol, 'direction': 'Bitget → Bybit', 'quantity': 0.01,
+            'buy_price': 100.0, 'sell_price': 101.0, 'profit': profit, 'fees': fees, 'balance_after': 1000.0}
+
+
+def test_running_aggregates_cover_every_insert():
+    ledger = TradeLedger(ARBITRAGE_TRADE_SCHEMA, capacity=4)
+    profits = [1.0, -0.5, 2.0, 0.0, 3.0, -1.0]
+    for i, profit in enumerate(profits):
+        ledger.append(trade(i, 'ETH/USDT' if i % 2 else 'BTC/USDT', profit))
+
+    summary = ledger.summary()
+    assert summary['count'] == 6 and summary['wins'] == 3
+    assert summary['total_profit'] == pytest.approx(sum(profits))
+    assert summary['total_fees'] == pytest.approx(0.6)
+    assert (summary['best'], summary['worst']) == (3.0, -1.0)
+    # 内存中只保留最近的行，聚合仍覆盖全部历史
+    assert len(ledger) <= 4 and summary['spilled'] == 6 - len(ledger)
+    by_symbol = ledger.by_symbol()
+    assert by_symbol['BTC/USDT']['count'] == 3 and by_symbol['BTC/USDT']['profit'] == pytest.approx(6.0)
+    assert by_symbol['ETH/USDT']['wins'] == 0
+    assert sum(h['count'] for h in ledger.by_hour().values()) == 6
+
+
+def test_frame_decodes_categories_and_fills_missing_columns():
+    ledger = TradeLedger(ARBITRAGE_TRADE_SCHEMA, capacity=10)
+    ledger.append(trade(0))
+    ledger.append({'ts': 1_700_000_001, 'symbol': 'SOL/USDT'})
+    frame = ledger.frame()
+    assert frame['symbol'].tolist() == ['BTC/USDT', 'SOL/USDT']
+    assert frame['profit'].tolist() == [1.0, 0.0]
+    assert ledger.column('quantity').tolist() == [0.01, 0.0]
+
+
+def test_spills_run_off_the_appending_thread(tmp_path, monkeypatch):
+    writers = []
+    real_write = TradeLedger._write_segment
+
+    def record_thread(self, path, arrays):
+        writers.append(threading.current_thread())
+        real_write(self, path, arrays)
+
+    monkeypatch.setattr(TradeLedger, '_write_segment', record_thread)
+    ledger = TradeLedger(ARBITRAGE_TRADE_SCHEMA, capacity=4, spill_dir=str(tmp_path), name='test')
+    for i in range(9):
+        ledger.append(trade(i, profit=float(i)))
+    ledger.wait()
+
+    assert writers and all(t is not threading.current_thread() for t in writers)
+    assert len(ledger.segment_paths()) == ledger.segments == 3
+    history = ledger.history()
+    assert history['profit'].tolist() == [float(i) for i in range(9)]
+    assert set(history['symbol']) == {'BTC/USDT'}
+
+
+def test_spilled_rows_are_copies(tmp_path):
+    ledger = TradeLedger({'ts': 'f8', 'profit': 'f8'}, capacity=2, spill_dir=str(tmp_path))
+    for i in range(5):
+        ledger.append({'ts': i, 'profit': i * 10.0})
+    ledger.flush()
+    assert len(ledger) == 0
+    profits = np.concatenate([TradeLedger.load_segment(p)['profit'].to_numpy() for p in ledger.segment_paths()])
+    assert profits.tolist() == [0.0, 10.0, 20.0, 30.0, 40.0]
+
+
+def test_schema_validation():
+    with pytest.raises(ValueError):
+        TradeLedger({'profit': 'f8'})
+    with pytest.raises(ValueError):
+        TradeLedger({'ts': 'f8'}, capacity=1)
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from ultra_fast_arbitrage import RiskManagementSystem, TradingAnalytics, UltraFastArbitrage
+
+
+@pytest.fixture
+def analytics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('TRADE_LEDGER_DIR', str(tmp_path / 'ledger'))
+    analytics = TradingAnalytics()
+    yield analytics
+    analytics.store.close()
+
+
+def test_trade_summary_works_without_market_features(analytics):
+    # 无行情来源：特征全部缺失（NaN）
+    analytics.record_trade({'symbol': 'BTC/USDT', 'side': 'buy', 'price': 100.0, 'size': 1.0,
+                            'profit': -0.1, 'fees': 0.1})
+    analytics.record_trade({'symbol': 'BTC/USDT', 'side': 'sell', 'price': 101.0, 'size': 1.0,
+                            'profit': 0.9, 'fees': 0.1})
+    analytics.save_trade_history()
+    row, = analytics.trade_summary()
+    assert row['count'] == 2 and row['sum'] == pytest.approx(0.8)
+
+
+def test_fills_and_risk_closes_record_realized_profit(analytics):
+    bot = UltraFastArbitrage()
+    risk = RiskManagementSystem()
+    bot.risk_manager, bot.risk_gate, bot.analytics = risk, risk.gate, analytics
+    analytics.market_source = bot
+    bot.config['risk_check_interval'] = 0.01
+
+    def tick(bid, ask):
+        return {'data': [{'instId': 'BTCUSDT', 'ts': str(int(time.time() * 1000)),
+                          'bids': [[str(bid), '0.01']], 'asks': [[str(ask), '0.01']]}]}
+
+    async def scenario():
+        for _ in range(bot.config['volatility_window']):
+            await bot.process_message_ultra_fast(tick(40000, 40100))
+        bot.config['min_profit_threshold'] = 100
+        await bot.process_message_ultra_fast(tick(38000, 38010))
+        monitor = asyncio.ensure_future(bot.risk_monitor())
+        await asyncio.sleep(0.05)
+        monitor.cancel()
+
+    asyncio.run(scenario())
+    trades = analytics.trade_frame()
+    buys, sells = trades[trades['side'] == 'buy'], trades[trades['side'] == 'sell']
+    assert len(buys) >= 1 and len(sells) == 1
+    assert (buys['profit'] == -buys['fees']).all() and (buys['fees'] > 0).all()
+    assert sells['profit'].iloc[0] < 0
+    assert trades['profit'].sum() == pytest.approx(risk.gate.realized_pnl)
+    assert analytics.trades.summary()['total_profit'] == pytest.approx(risk.gate.realized_pnl)
@@ -0,0 +1,55 @@
+import asyncio
+
+import websockets
+
+from src.exchanges.ws_connection import DeltaBook, ManagedWebSocket
+from src.monitoring.metrics import MetricsRegistry
+
+
+def test_failing_on_disconnect_does_not_stop_reconnects():
+    calls = []
+
+    def on_disconnect(channels):
+        calls.append(channels)
+        raise RuntimeError('callback bug')
+
+    async def handler(ws, *args):
+        await ws.close()
+
+    async def noop(*args):
+        pass
+
+    async def scenario():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            conn = ManagedWebSocket('x', f'ws://127.0.0.1:{port}', ['books'], subscribe=lambda c: [],
+                                    on_message=noop, channel_of=lambda data: None,
+                                    on_disconnect=on_disconnect, initial_backoff=0.01, max_backoff=0.01,
+                                    registry=MetricsRegistry())
+            task = asyncio.ensure_future(conn.run())
+            for _ in range(200):
+                if conn.stats['connects'] >= 2:
+                    break
+                await asyncio.sleep(0.01)
+            conn.stop()
+            task.cancel()
+            return conn
+
+    conn = asyncio.run(scenario())
+    assert conn.stats['connects'] >= 2
+    assert calls and calls[0] == ['books']
+
+
+def test_delta_book_applies_each_update_once():
+    book = DeltaBook()
+    assert book.apply_delta([['100', '1']], [], update_id=1) is False
+
+    book.apply_snapshot([['100', '1']], [['101', '2']], update_id=5)
+    assert book.apply_delta([['100', '0'], ['99', '3']], [], update_id=6) is True
+    # 同一增量经另一条连接再次到达
+    assert book.apply_delta([['98', '1']], [], update_id=6) is None
+    assert book.apply_delta([['97', '1']], [], update_id=4) is None
+    assert book.top(5) == ([[99.0, 3.0]], [[101.0, 2.0]])
+
+    book.reset()
+    assert not book.synced and book.apply_delta([], [], update_id=7) is False
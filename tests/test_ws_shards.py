@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import orjson
+import websockets
+
+from src.exchanges.ws_shards import ShardedFeed, plan_rebalance
+from src.monitoring.metrics import MetricsRegistry
+from src.monitoring.profiling import Profiler
+
+
+def test_timer_measures_message_handling_in_every_shard(tmp_path):
+    registry = MetricsRegistry()
+    profiler = Profiler('test', output_dir=str(tmp_path), registry=registry)
+    handled = []
+
+    async def server(ws, *args):
+        request = orjson.loads(await ws.recv())
+        for channel in request['args']:
+            for _ in range(5):
+                await ws.send(orjson.dumps({'ch': channel}).decode())
+        await ws.wait_closed()
+
+    async def on_message(data, *args):
+        # 模拟占用事件循环的消息处理
+        time.sleep(0.002)
+        handled.append(data['ch'])
+
+    async def scenario():
+        async with websockets.serve(server, '127.0.0.1', 0) as srv:
+            port = srv.sockets[0].getsockname()[1]
+            feed = ShardedFeed('x', f'ws://127.0.0.1:{port}', ['a', 'b'],
+                               subscribe=lambda channels: [{'args': list(channels)}],
+                               on_message=on_message, channel_of=lambda data: data.get('ch'),
+                               channels_per_connection=1, rebalance_interval=0,
+                               timer=profiler.timed, registry=registry)
+            assert len(feed.shards) == 2
+            task = asyncio.ensure_future(feed.run())
+            for _ in range(200):
+                if len(handled) == 10:
+                    break
+                await asyncio.sleep(0.01)
+            feed.stop()
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert sorted(set(handled)) == ['a', 'b'] and len(handled) == 10
+    # 分片任务内的处理时间计入 x_ws，而不是只统计外层包装
+    assert profiler.busy['x_ws'] >= 10 * 0.002
+    assert profiler.steps['x_ws'].count >= 10
+
+
+def test_plan_rebalance_moves_load_off_the_busiest_shard():
+    rates = {'a': 100.0, 'b': 40.0, 'c': 1.0, 'd': 1.0}
+    moves = plan_rebalance(rates, {'a': 0, 'b': 0, 'c': 1, 'd': 1}, shards=2, capacity=3)
+    assert moves == [('b', 0, 1)]
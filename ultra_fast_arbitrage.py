@@ -5,26 +5,27 @@
 """
 
 import asyncio
-import websockets
-import orjson
 import time
 import os
 import logging
 from datetime import datetime
-from collections import deque
 from dotenv import load_dotenv
-import aiohttp
 import numpy as np
 
+from src.exchanges.clock_sync import ClockMonitor
+from src.exchanges.symbols import SymbolRegistry
+from src.exchanges.ws_shards import ShardedFeed
+from src.models import FillModel, PriceStats
+from src.monitoring import REGISTRY, BotMetrics, EventLogger, LatencyTracker, Profiler, configure_logging
+from src.risk import RiskGate
+from src.storage import RecordStore, TradeLedger
+
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
+events = EventLogger(logger).limit('execution', per_second=5).limit('risk_rejected', per_second=1) \
+    .limit('stop_loss_set', per_second=1)
 
 class UltraFastArbitrage:
     def __init__(self):
@@ -36,17 +37,44 @@ class UltraFastArbitrage:
             'min_profit_threshold': 0.1,  # 0.1% 最小利润
             'max_latency_ms': 100,  # 最大可接受延迟
             'order_book_depth': 5,  # 订单簿深度
-            'price_cache_size': 1000,  # 价格缓存大小
+            'max_book_age': 1.0,  # 订单簿最大年龄（秒，交易所时间）
+            'volatility_window': 10,  # 波动率统计窗口（报价条数）
             'execution_mode': 'aggressive',  # aggressive 或 conservative
+            'taker_fee': 0.001,  # 模拟成交手续费率
+            'risk_check_interval': 1.0,  # 止损/止盈检查间隔（秒）
         }
         
+        # 币种注册表：原生 instId -> 稠密整数 id，行情状态按 id 索引
+        self.symbols = SymbolRegistry.for_symbols(self.config['symbols'], ('bitget',))
+        self.bitget_ids = self.symbols.channel_ids('bitget')
+        
         # 高性能数据结构
-        self.price_cache = {symbol: deque(maxlen=self.config['price_cache_size']) for symbol in self.config['symbols']}
-        self.order_books = {}
-        self.latency_tracker = deque(maxlen=1000)
+        # 每个币种的滚动统计（固定大小环形缓冲，增量更新均值/方差/EWMA）
+        self.price_stats = [PriceStats(self.config['volatility_window']) for _ in range(len(self.symbols))]
+        self.order_books = [None] * len(self.symbols)
+        self.latency_tracker = LatencyTracker()  # 交易所时间戳 -> 决策 各阶段延迟
+        self.last_latency_ms = 0.0
+        
+        # 结构化指标：/metrics (Prometheus)、/metrics.json、/latency
+        self.metrics = BotMetrics('ultra_fast')
+        REGISTRY.register_latency(self.latency_tracker)
+        self.message_counter = self.metrics.message_counter('bitget')
+        # 事件循环延迟、协程占用时间，以及按信号触发的采样/cProfile（/profile）
+        self.profiler = Profiler('ultra_fast')
         
         # WebSocket 连接池
         self.ws_connections = {}
+        # 时钟偏移与单向延迟估计
+        self.clock = ClockMonitor(['bitget'])
+        # 滑点/成交概率查找表（可选，由 build_fill_model.py 生成）
+        self.fill_model = FillModel.load_optional()
+        
+        # 风险管理（RiskManagementSystem，由 main 注入）：成交更新仓位，行情重估盈亏；
+        # 热路径的交易前检查直接读取其 RiskGate
+        self.risk_manager = None
+        self.risk_gate = None
+        # 交易数据分析（TradingAnalytics，由 main 注入）
+        self.analytics = None
         
         # 性能统计
         self.performance_stats = {
@@ -60,80 +88,86 @@ class UltraFastArbitrage:
         logger.info("⚡ 超高速套利系统启动")
     
     async def connect_bitget_ultra_fast(self):
-        """超快速 Bitget WebSocket 连接"""
-        url = 'wss://ws.bitget.com/spot/v1/stream'
-        
-        async with websockets.connect(url, ping_interval=20) as ws:
-            # 订阅深度数据
-            subscribe_msg = {
-                "op": "subscribe",
-                "args": []
-            }
-            
-            for symbol in self.config['symbols']:
-                base, quote = symbol.split('/')
-                subscribe_msg["args"].append({
-                    "instType": "sp",
-                    "channel": "books5",  # 5档深度
-                    "instId": f"{base}{quote}"
-                })
-            
-            await ws.send(orjson.dumps(subscribe_msg).decode())
-            
-            # 高速数据处理循环
-            while True:
-                try:
-                    msg = await asyncio.wait_for(ws.recv(), timeout=0.1)
-                    await self.process_message_ultra_fast(orjson.loads(msg))
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as e:
-                    logger.error(f"WebSocket 错误: {e}")
-                    break
+        """超快速 Bitget WebSocket 连接（受监管、按消息速率分片到多条连接）"""
+        def books5(channels):
+            # 5档深度
+            return [{"instType": "sp", "channel": "books5", "instId": inst_id} for inst_id in channels]
+        
+        feed = self.ws_connections['bitget'] = ShardedFeed(
+            'bitget', os.getenv('BITGET_WS_URL', 'wss://ws.bitget.com/spot/v1/stream'),
+            list(self.bitget_ids),
+            subscribe=lambda channels: [{"op": "subscribe", "args": books5(channels)}],
+            unsubscribe=lambda channels: [{"op": "unsubscribe", "args": books5(channels)}],
+            on_message=self.process_message_ultra_fast,
+            channel_of=lambda data: data['arg'].get('instId') if 'data' in data and 'arg' in data else None,
+            on_disconnect=self._drop_books,
+            ping_message='ping',
+            shards=int(os.getenv('WS_SHARDS', 0)) or None,
+            # 每个分片的消息处理计入 bitget_ws 的协程耗时
+            timer=self.profiler.timed,
+        )
+        # 消息到达即处理，不再轮询 recv
+        await feed.run()
     
-    async def process_message_ultra_fast(self, data):
+    def _drop_books(self, channels):
+        """断线期间的订单簿不再更新，丢弃以免基于旧价格交易"""
+        for inst_id in channels:
+            symbol_id = self.bitget_ids.get(inst_id)
+            if symbol_id is not None:
+                self.order_books[symbol_id] = None
+    
+    async def process_message_ultra_fast(self, data, recv_wall=None, recv_ns=None, decoded_ns=None):
         """超快速消息处理"""
-        start_time = time.perf_counter()
+        if recv_ns is None:
+            recv_wall = time.time()
+            recv_ns = decoded_ns = time.perf_counter_ns()
         
         if 'data' in data:
             for item in data['data']:
                 if 'instId' not in item:
                     continue
                     
-                # 超快速解析
-                symbol = self._parse_symbol(item['instId'])
-                if not symbol:
+                # 超快速解析：一次字典查找得到币种 id，未注册的交易对跳过
+                symbol_id = self.bitget_ids.get(item['instId'])
+                if symbol_id is None:
                     continue
                 
-                # 更新订单簿（内存中）
-                self.order_books[symbol] = {
+                # 更新订单簿（内存中），附带校正时钟偏移后的交易所时间
+                exchange_ts = item.get('ts')
+                book = self.order_books[symbol_id] = {
                     'bids': [(float(b[0]), float(b[1])) for b in item.get('bids', [])[:5]],
                     'asks': [(float(a[0]), float(a[1])) for a in item.get('asks', [])[:5]],
-                    'timestamp': time.time()
+                    'timestamp': recv_wall,
+                    'exchange_time': self.clock.observe('bitget', exchange_ts, recv_wall)
                 }
+                book_ns = time.perf_counter_ns()
+                
+                # 持仓按最新买一价重估（无持仓时只记录价格）
+                if self.risk_gate is not None and book['bids']:
+                    self.risk_gate.update_price(self.symbols.symbols[symbol_id], book['bids'][0][0])
                 
                 # 立即检查套利机会
-                await self.check_arbitrage_ultra_fast(symbol)
+                await self.check_arbitrage_ultra_fast(symbol_id)
+                
+                # 记录各阶段延迟
+                strategy_ns = time.perf_counter_ns()
+                self.latency_tracker.record_message(
+                    'bitget', self.symbols.symbols[symbol_id], book['exchange_time'] * 1000 if exchange_ts else None,
+                    recv_wall, recv_ns, decoded_ns, book_ns, strategy_ns
+                )
+                self.last_latency_ms = (strategy_ns - recv_ns) / 1e6
         
-        # 记录延迟
-        latency = (time.perf_counter() - start_time) * 1000
-        self.latency_tracker.append(latency)
         self.performance_stats['messages_per_second'] += 1
+        self.message_counter.inc()
     
-    def _parse_symbol(self, inst_id):
-        """快速符号解析"""
-        if 'USDT' in inst_id:
-            base = inst_id.replace('USDT', '')
-            return f"{base}/USDT"
-        return None
-    
-    async def check_arbitrage_ultra_fast(self, symbol):
-        """超快速套利检查"""
-        if symbol not in self.order_books:
+    async def check_arbitrage_ultra_fast(self, symbol_id):
+        """超快速套利检查（按币种 id 索引）"""
+        book = self.order_books[symbol_id]
+        if book is None or not book['bids'] or not book['asks']:
             return
         
-        book = self.order_books[symbol]
-        if not book['bids'] or not book['asks']:
+        # 过期报价不参与决策（按校正后的交易所时间）
+        if time.time() - book['exchange_time'] > self.config['max_book_age']:
             return
         
         # 快速计算价差
@@ -141,31 +175,28 @@ class UltraFastArbitrage:
         best_ask = book['asks'][0][0]
         spread_pct = ((best_ask - best_bid) / best_ask) * 100
         
-        # 缓存价格用于趋势分析
-        self.price_cache[symbol].append({
-            'bid': best_bid,
-            'ask': best_ask,
-            'spread': spread_pct,
-            'timestamp': time.time()
-        })
+        # 更新滚动统计用于波动率判断
+        self.price_stats[symbol_id].update(best_bid)
         
         # 检测异常价差
         if spread_pct > self.config['min_profit_threshold']:
+            symbol = self.symbols.symbols[symbol_id]
             self.performance_stats['opportunities_detected'] += 1
+            self.metrics.opportunity(symbol)
             
             # 执行决策
-            if self.should_execute_trade(symbol, spread_pct):
+            if self.should_execute_trade(symbol_id, spread_pct):
                 await self.execute_trade_ultra_fast(symbol, book)
     
-    def should_execute_trade(self, symbol, spread_pct):
+    def should_execute_trade(self, symbol_id, spread_pct):
         """智能交易决策"""
         # 检查历史价格趋势
-        if len(self.price_cache[symbol]) < 10:
+        stats = self.price_stats[symbol_id]
+        if stats.count < self.config['volatility_window']:
             return False
         
-        # 计算价格波动性
-        recent_prices = [p['bid'] for p in list(self.price_cache[symbol])[-10:]]
-        volatility = np.std(recent_prices) / np.mean(recent_prices)
+        # 价格波动性：窗口内标准差/均值，常数时间读取
+        volatility = stats.dispersion
         
         # 激进模式：立即执行
         if self.config['execution_mode'] == 'aggressive':
@@ -180,36 +211,139 @@ class UltraFastArbitrage:
         
         try:
             # 模拟超快速执行
-            execution_time = time.perf_counter()
+            execution_start = time.perf_counter_ns()
             
             # 计算最优交易量
-            optimal_size = self.calculate_optimal_size(book)
+            optimal_size = self.calculate_optimal_size(book, symbol)
+            if optimal_size <= 0:
+                return
             
-            # 记录执行
-            logger.info(f"⚡ 执行套利: {symbol} | 价差: {book['asks'][0][0] - book['bids'][0][0]:.4f} | "
-                       f"数量: {optimal_size:.4f} | 延迟: {self.latency_tracker[-1]:.1f}ms")
+            # 内联风险检查：只读预计算的限额，不做重新计算
+            notional = optimal_size * book['asks'][0][0]
+            if self.risk_gate is not None and not self.risk_gate.allow(symbol, 'buy', notional):
+                events.warning('risk_rejected', "🛡️ 风险闸门拒绝: {symbol} 金额 ${notional:.2f}",
+                               key=symbol, symbol=symbol, notional=notional)
+                self.metrics.executions.labels('ultra_fast', symbol, 'rejected').inc()
+                return
+            
+            # 记录决策耗时（发现机会 -> 定量与风控完成）；本系统只模拟执行，不发出订单，
+            # 因此不记录 order_send 阶段
+            self.latency_tracker.record(
+                'bitget', symbol, 'decision', (time.perf_counter_ns() - execution_start) // 1000
+            )
+            
+            # 模拟成交：按卖一价吃单，成交回报更新仓位、盈亏和风险限额
+            fill_price = book['asks'][0][0]
+            fee = optimal_size * fill_price * self.config['taker_fee']
+            realized = -fee
+            if self.risk_manager is not None:
+                realized = self.risk_manager.update_position(symbol, 'buy', optimal_size, fill_price, fee)
+            
+            # 记录执行（按币种限流，格式化在日志线程完成）
+            events.info('execution', "⚡ 执行套利: {symbol} | 价差: {spread:.4f} | "
+                        "数量: {size:.4f} | 延迟: {latency_ms:.1f}ms",
+                        key=symbol, symbol=symbol, spread=book['asks'][0][0] - book['bids'][0][0],
+                        size=optimal_size, latency_ms=self.last_latency_ms)
             
             self.performance_stats['executions_successful'] += 1
+            self.metrics.executions.labels('ultra_fast', symbol, 'success').inc()
+            
+            if self.analytics is not None:
+                self.analytics.record_trade({
+                    'symbol': symbol,
+                    'side': 'buy',
+                    'price': fill_price,
+                    'size': optimal_size,
+                    'profit': realized,
+                    'fees': fee,
+                    'execution_time': (time.perf_counter_ns() - execution_start) / 1e6,
+                })
             
         except Exception as e:
-            logger.error(f"执行失败: {e}")
+            events.error('execution_failed', "执行失败: {error}", symbol=symbol, error=str(e))
+    
+    def market_conditions(self, symbol):
+        """当前真实市场特征：滚动统计 + 订单簿（供交易记录使用）"""
+        symbol_id = self.symbols.ids.get(symbol)
+        book = self.order_books[symbol_id] if symbol_id is not None else None
+        if book is None or not book['bids'] or not book['asks']:
+            return {}
+        
+        stats = self.price_stats[symbol_id]
+        best_bid = book['bids'][0][0]
+        best_ask = book['asks'][0][0]
+        return {
+            'volatility': stats.volatility,
+            'dispersion': stats.dispersion,
+            'trend': stats.trend,
+            'spread_pct': (best_ask - best_bid) / best_ask * 100,
+            'depth_bid': sum(price * size for price, size in book['bids']),
+            'depth_ask': sum(price * size for price, size in book['asks']),
+            'book_volume': sum(size for _, size in book['bids']) + sum(size for _, size in book['asks']),
+            'book_age_ms': (time.time() - book['exchange_time']) * 1000,
+            'latency_ms': self.last_latency_ms,
+        }
     
-    def calculate_optimal_size(self, book):
+    def calculate_optimal_size(self, book, symbol=None):
         """计算最优交易量"""
-        # 基于订单簿深度计算
+        # 有滑点模型时查表：报价年龄 + 单向延迟 ≈ 订单到达交易所时的行情延迟
+        if self.fill_model is not None and symbol is not None:
+            latency_ms = (time.time() - book['exchange_time'] + self.clock.clocks['bitget'].latency) * 1000
+            max_notional = self.fill_model.max_notional('bitget', symbol, 'buy', latency_ms)
+            if max_notional is not None:
+                return max_notional / book['asks'][0][0]
+        
+        # 否则基于订单簿深度计算
         total_bid_volume = sum(bid[1] for bid in book['bids'][:3])
         total_ask_volume = sum(ask[1] for ask in book['asks'][:3])
         
         return min(total_bid_volume, total_ask_volume) * 0.8  # 80% 保守执行
     
+    def current_prices(self):
+        """各币种最新买一价（持仓的可变现价格），用于批量重估"""
+        return {
+            symbol: book['bids'][0][0]
+            for symbol, book in zip(self.symbols.symbols, self.order_books)
+            if book is not None and book['bids']
+        }
+    
+    async def risk_monitor(self):
+        """定期批量重估持仓，触发止损/止盈时按买一价模拟平仓；跨日重置当日盈亏"""
+        day = datetime.now().date()
+        while True:
+            await asyncio.sleep(self.config['risk_check_interval'])
+            if self.risk_manager is None:
+                continue
+            
+            if datetime.now().date() != day:
+                day = datetime.now().date()
+                self.risk_manager.gate.reset_daily()
+            
+            prices = self.current_prices()
+            positions = self.risk_manager.current_positions
+            for symbol, reason in self.risk_manager.monitor_positions(prices):
+                size = positions[symbol]['size']
+                price = prices.get(symbol)
+                if price is None:
+                    continue
+                fee = size * price * self.config['taker_fee']
+                realized = self.risk_manager.update_position(symbol, 'sell', size, price, fee)
+                logger.info(f"🛡️ {reason} 平仓: {symbol} {size:.4f} @ ${price:.2f} | 实现盈亏 ${realized:.2f}")
+                if self.analytics is not None:
+                    self.analytics.record_trade({
+                        'symbol': symbol, 'side': 'sell', 'price': price, 'size': size,
+                        'profit': realized, 'fees': fee,
+                    })
+    
     async def performance_monitor(self):
         """性能监控器"""
         while True:
             await asyncio.sleep(10)
             
             # 计算性能指标
-            if self.latency_tracker:
-                self.performance_stats['avg_latency_ms'] = np.mean(self.latency_tracker)
+            tick_to_decision = self.latency_tracker.merged('tick_to_decision')
+            if tick_to_decision.count:
+                self.performance_stats['avg_latency_ms'] = tick_to_decision.total / tick_to_decision.count / 1000
             
             # 打印性能报告
             logger.info("="*60)
@@ -218,16 +352,30 @@ class UltraFastArbitrage:
             logger.info(f"⏱️ 平均延迟: {self.performance_stats['avg_latency_ms']:.1f}ms")
             logger.info(f"🎯 发现机会: {self.performance_stats['opportunities_detected']}")
             logger.info(f"✅ 执行成功: {self.performance_stats['executions_successful']}")
+            for line in self.latency_tracker.format_summary():
+                logger.info(f"   {line}")
+            for line in self.profiler.format_summary():
+                logger.info(f"   {line}")
             logger.info("="*60)
             
+            self.latency_tracker.reset()
+            self.profiler.reset()
+            
             # 重置计数器
             self.performance_stats['messages_per_second'] = 0
     
     async def run(self):
         """运行超高速套利系统"""
+        await self.metrics.start_server({'/latency': self.latency_tracker.http_handler,
+                                         '/profile': self.profiler.http_handler})
+        self.profiler.install_signals()
+        
         tasks = [
             self.connect_bitget_ultra_fast(),
-            self.performance_monitor()
+            self.clock.run(),
+            self.risk_monitor(),
+            self.performance_monitor(),
+            self.profiler.watch_loop()
         ]
         
         await asyncio.gather(*tasks)
@@ -251,109 +399,89 @@ class RiskManagementSystem:
             'take_profit_pct': 5.0,     # 止盈 5%
         }
         
-        # 风险状态跟踪
-        self.current_positions = {}
-        self.daily_pnl = 0.0
-        self.peak_balance = 10000.0
-        self.current_balance = 10000.0
+        # 风险状态：成交时增量更新，交易前检查只读预计算结果
+        self.gate = RiskGate(
+            initial_balance=10000.0,
+            max_position_size=self.risk_params['max_position_size'],
+            daily_loss_limit=self.risk_params['daily_loss_limit'],
+            max_drawdown=self.risk_params['max_drawdown'],
+            position_limits=self.risk_params['position_limits'],
+        )
         
         # 风险事件记录
         self.risk_events = []
         
         logger.info("🛡️ 风险管理系统启动")
     
+    @property
+    def daily_pnl(self):
+        return self.gate.daily_pnl
+    
+    @property
+    def current_balance(self):
+        return self.gate.equity
+    
+    @property
+    def peak_balance(self):
+        return self.gate.peak_equity
+    
+    @property
+    def current_positions(self):
+        return self.gate.positions()
+    
     def check_trade_risk(self, symbol, side, size, price):
-        """交易前风险检查"""
-        risks = []
-        
-        # 1. 检查仓位限制
-        position_value = size * price
-        if position_value > self.risk_params['max_position_size']:
-            risks.append(f"仓位超限: ${position_value:.2f} > ${self.risk_params['max_position_size']}")
-        
-        # 2. 检查每日亏损限制
-        if self.daily_pnl < -self.risk_params['daily_loss_limit']:
-            risks.append(f"已达每日亏损限制: ${self.daily_pnl:.2f}")
-        
-        # 3. 检查最大回撤
-        current_drawdown = (self.peak_balance - self.current_balance) / self.peak_balance
-        if current_drawdown > self.risk_params['max_drawdown']:
-            risks.append(f"超过最大回撤: {current_drawdown*100:.1f}%")
-        
-        # 4. 检查币种仓位集中度
-        if symbol in self.current_positions:
-            current_exposure = self.current_positions[symbol]['value'] / self.current_balance
-            max_exposure = self.risk_params['position_limits'].get(symbol, 0.2)
-            if current_exposure > max_exposure:
-                risks.append(f"{symbol} 仓位过度集中: {current_exposure*100:.1f}%")
-        
-        if risks:
-            logger.warning(f"⚠️ 风险警告: {', '.join(risks)}")
-            return False, risks
-        
-        return True, []
-    
-    def update_position(self, symbol, side, size, entry_price):
-        """更新仓位信息"""
-        if symbol not in self.current_positions:
-            self.current_positions[symbol] = {
-                'size': 0,
-                'value': 0,
-                'entry_price': 0,
-                'unrealized_pnl': 0
-            }
-        
-        pos = self.current_positions[symbol]
+        """交易前风险检查（热路径直接用 self.gate.allow）"""
+        notional = size * price
+        if self.gate.allow(symbol, side, notional):
+            return True, []
+        
+        risks = self.gate.reasons(symbol, side, notional)
+        logger.warning(f"⚠️ 风险警告: {', '.join(risks)}")
+        return False, risks
+    
+    def update_position(self, symbol, side, size, entry_price, fee=0.0):
+        """按成交更新仓位、已实现盈亏和风险限额，返回本次成交的已实现盈亏"""
+        realized = self.gate.on_fill(symbol, side, size, entry_price, fee)
         
         if side == 'buy':
-            # 更新平均成本
-            total_value = pos['size'] * pos['entry_price'] + size * entry_price
-            pos['size'] += size
-            pos['entry_price'] = total_value / pos['size'] if pos['size'] > 0 else entry_price
-        else:  # sell
-            pos['size'] -= size
-            if pos['size'] <= 0:
-                del self.current_positions[symbol]
-        
-        # 设置止损单
-        self.set_stop_loss(symbol, entry_price)
+            # 设置止损单
+            self.set_stop_loss(symbol, entry_price)
+        return realized
     
     def set_stop_loss(self, symbol, entry_price):
         """设置止损"""
         stop_loss_price = entry_price * (1 - self.risk_params['stop_loss_pct'] / 100)
         take_profit_price = entry_price * (1 + self.risk_params['take_profit_pct'] / 100)
         
-        logger.info(f"🛡️ 设置 {symbol} 止损: ${stop_loss_price:.2f} | 止盈: ${take_profit_price:.2f}")
+        # 每笔成交都会调用，按币种限流
+        events.info('stop_loss_set', "🛡️ 设置 {symbol} 止损: ${stop:.2f} | 止盈: ${take:.2f}",
+                    key=symbol, symbol=symbol, stop=stop_loss_price, take=take_profit_price)
     
     def monitor_positions(self, current_prices):
-        """监控所有仓位"""
-        total_unrealized_pnl = 0
-        
-        for symbol, pos in self.current_positions.items():
-            if symbol in current_prices:
-                current_price = current_prices[symbol]
-                pos['unrealized_pnl'] = (current_price - pos['entry_price']) * pos['size']
-                total_unrealized_pnl += pos['unrealized_pnl']
-                
-                # 检查止损/止盈
-                pnl_pct = (current_price - pos['entry_price']) / pos['entry_price'] * 100
-                
-                if pnl_pct <= -self.risk_params['stop_loss_pct']:
-                    logger.warning(f"🚨 触发止损: {symbol} 亏损 {pnl_pct:.1f}%")
-                    self.risk_events.append({
-                        'time': datetime.now(),
-                        'type': 'stop_loss',
-                        'symbol': symbol,
-                        'loss': pos['unrealized_pnl']
-                    })
-                
-                elif pnl_pct >= self.risk_params['take_profit_pct']:
-                    logger.info(f"💰 触发止盈: {symbol} 盈利 {pnl_pct:.1f}%")
-        
-        # 更新余额
-        self.current_balance = 10000 + self.daily_pnl + total_unrealized_pnl
-        if self.current_balance > self.peak_balance:
-            self.peak_balance = self.current_balance
+        """监控所有仓位（一次性向量化重估，只遍历触发止损/止盈的仓位）
+        
+        返回触发的 (symbol, 'stop_loss' | 'take_profit') 列表，由调用方平仓
+        """
+        gate = self.gate
+        pnl_pct = gate.mark_to_market(current_prices)
+        held = gate.size[:len(pnl_pct)] > 0
+        triggered = []
+        
+        for slot in np.flatnonzero(held & (pnl_pct <= -self.risk_params['stop_loss_pct'])):
+            symbol = gate.symbols[slot]
+            logger.warning(f"🚨 触发止损: {symbol} 亏损 {pnl_pct[slot]:.1f}%")
+            self.risk_events.append({
+                'time': datetime.now(),
+                'type': 'stop_loss',
+                'symbol': symbol,
+                'loss': float(gate.unrealized[slot])
+            })
+            triggered.append((symbol, 'stop_loss'))
+        
+        for slot in np.flatnonzero(held & (pnl_pct >= self.risk_params['take_profit_pct'])):
+            logger.info(f"💰 触发止盈: {gate.symbols[slot]} 盈利 {pnl_pct[slot]:.1f}%")
+            triggered.append((gate.symbols[slot], 'take_profit'))
+        return triggered
     
     def generate_risk_report(self):
         """生成风险报告"""
@@ -378,20 +506,44 @@ class RiskManagementSystem:
 # ===== 3. 数据分析系统 =====
 
 class TradingAnalytics:
-    def __init__(self):
+    # 交易记录的固定列（按列存储，分析时直接转成 DataFrame 分组聚合）
+    TRADE_SCHEMA = {
+        'ts': 'f8', 'hour': 'i1', 'day_of_week': 'i1', 'symbol': 'category', 'side': 'category',
+        'price': 'f8', 'size': 'f8', 'profit': 'f8', 'fees': 'f8', 'execution_time_ms': 'f8',
+        'volatility': 'f8', 'dispersion': 'f8', 'trend': 'f8', 'trend_label': 'category',
+        'spread_pct': 'f8', 'depth_bid': 'f8', 'depth_ask': 'f8', 'book_volume': 'f8',
+        'book_age_ms': 'f8', 'latency_ms': 'f8',
+    }
+    # 无行情来源时的特征缺省值
+    MARKET_FEATURES = ('volatility', 'dispersion', 'trend', 'spread_pct', 'depth_bid', 'depth_ask',
+                       'book_volume', 'book_age_ms', 'latency_ms')
+    
+    def __init__(self, market_source=None):
         """初始化数据分析系统"""
         
         self.analytics_config = {
             'data_retention_days': 30,
             'analysis_interval': 3600,  # 每小时分析
             'min_data_points': 100,
+            'trend_threshold': 0.0005,  # EWMA 偏离均值超过 0.05% 视为趋势
+            'memory_trades': 10000,  # 内存中保留的交易条数，超出后较旧的一半落盘
         }
         
-        # 数据存储
-        self.trade_history = []
+        # 实时市场特征来源（提供 market_conditions(symbol)，如 UltraFastArbitrage）
+        self.market_source = market_source
+        
+        # 数据存储：固定列的有界交易账本，插入时更新累计聚合，旧数据分段落盘
+        self.trades = TradeLedger(
+            self.TRADE_SCHEMA, capacity=self.analytics_config['memory_trades'],
+            spill_dir=os.getenv('TRADE_LEDGER_DIR', 'data/trade_ledger'), name='ultra_fast',
+            sum_fields=('profit', 'fees', 'execution_time_ms'),
+        )
         self.market_data = []
         self.performance_metrics = {}
         
+        # 交易记录追加写入 SQLite（WAL，批量提交）
+        self.store = RecordStore('data/arbitrage.db')
+        
         # 分析结果
         self.best_trading_hours = []
         self.profitable_patterns = []
@@ -399,81 +551,92 @@ class TradingAnalytics:
         
         logger.info("📊 数据分析系统启动")
     
+    @property
+    def trade_count(self):
+        return self.trades.count
+    
     def record_trade(self, trade_data):
-        """记录交易数据"""
+        """记录交易数据（附带成交时刻的真实市场特征）"""
+        now = datetime.now()
         trade_record = {
-            'timestamp': datetime.now(),
+            'ts': now.timestamp(),
             'symbol': trade_data['symbol'],
             'side': trade_data['side'],
             'price': trade_data['price'],
             'size': trade_data['size'],
             'profit': trade_data.get('profit', 0),
             'fees': trade_data.get('fees', 0),
-            'market_conditions': self.capture_market_conditions(),
             'execution_time_ms': trade_data.get('execution_time', 0),
+            **self.capture_market_conditions(trade_data['symbol'], now),
         }
         
-        self.trade_history.append(trade_record)
-        
-        # 定期保存到文件
-        if len(self.trade_history) % 100 == 0:
-            self.save_trade_history()
+        self.trades.append(trade_record)
+        self.store.append('trades', trade_record, ts=trade_record['ts'])
     
-    def capture_market_conditions(self):
-        """捕获市场状况"""
-        return {
-            'volatility': self.calculate_market_volatility(),
-            'volume': self.get_market_volume(),
-            'trend': self.identify_market_trend(),
-            'hour': datetime.now().hour,
-            'day_of_week': datetime.now().weekday(),
-        }
+    def capture_market_conditions(self, symbol, now=None):
+        """捕获市场状况：波动率/价差/深度/延迟来自实时滚动统计和订单簿"""
+        now = now or datetime.now()
+        conditions = dict.fromkeys(self.MARKET_FEATURES, float('nan'))
+        if self.market_source is not None:
+            conditions.update(self.market_source.market_conditions(symbol))
+        conditions['trend_label'] = self.identify_market_trend(conditions['trend'])
+        conditions['hour'] = now.hour
+        conditions['day_of_week'] = now.weekday()
+        return conditions
+    
+    def identify_market_trend(self, trend):
+        """按 EWMA 相对窗口均值的偏离划分趋势"""
+        threshold = self.analytics_config['trend_threshold']
+        if trend != trend:  # NaN：没有行情来源
+            return 'unknown'
+        if trend > threshold:
+            return 'bullish'
+        if trend < -threshold:
+            return 'bearish'
+        return 'sideways'
+    
+    def trade_frame(self):
+        """内存中最近交易的 DataFrame"""
+        return self.trades.frame()
     
     def analyze_trading_patterns(self):
         """分析交易模式"""
-        if len(self.trade_history) < self.analytics_config['min_data_points']:
+        if self.trade_count < self.analytics_config['min_data_points']:
             return
+        trades = self.trade_frame()
         
-        # 1. 分析最佳交易时段
-        hourly_profits = {}
-        for trade in self.trade_history:
-            hour = trade['market_conditions']['hour']
-            if hour not in hourly_profits:
-                hourly_profits[hour] = []
-            hourly_profits[hour].append(trade['profit'])
-        
-        # 计算每小时平均利润
-        avg_hourly_profits = {
-            hour: np.mean(profits) 
-            for hour, profits in hourly_profits.items()
-        }
-        
-        # 找出最佳交易时段
+        # 1. 分析最佳交易时段：账本按小时累计，覆盖全部历史而非仅内存中的交易
+        hourly = self.trades.by_hour()
         self.best_trading_hours = sorted(
-            avg_hourly_profits.items(), 
-            key=lambda x: x[1], 
+            ((hour, data['avg_profit']) for hour, data in hourly.items()),
+            key=lambda x: x[1],
             reverse=True
         )[:5]
         
         logger.info(f"📊 最佳交易时段: {[f'{h[0]}点(利润${h[1]:.2f})' for h in self.best_trading_hours]}")
         
         # 2. 分析盈利模式
-        self.analyze_profitable_patterns()
+        self.analyze_profitable_patterns(trades)
         
         # 3. 优化参数
-        self.optimize_parameters()
+        self.optimize_parameters(trades)
     
-    def analyze_profitable_patterns(self):
+    def analyze_profitable_patterns(self, trades=None):
         """分析盈利模式"""
-        profitable_trades = [t for t in self.trade_history if t['profit'] > 0]
+        trades = self.trade_frame() if trades is None else trades
+        profitable_trades = trades[trades['profit'] > 0]
         
-        if profitable_trades:
+        if len(profitable_trades):
             # 分析盈利交易的共同特征
+            features = profitable_trades[['volatility', 'spread_pct', 'depth_ask', 'latency_ms', 'size']].mean()
             patterns = {
-                'avg_volatility': np.mean([t['market_conditions']['volatility'] for t in profitable_trades]),
+                'avg_volatility': float(features['volatility']),
+                'avg_spread_pct': float(features['spread_pct']),
+                'avg_depth': float(features['depth_ask']),
+                'avg_latency_ms': float(features['latency_ms']),
                 'common_symbols': self.get_most_profitable_symbols(profitable_trades),
-                'avg_size': np.mean([t['size'] for t in profitable_trades]),
-                'market_trend': self.analyze_trend_correlation(profitable_trades),
+                'avg_size': float(features['size']),
+                'market_trend': self.analyze_trend_correlation(trades),
             }
             
             self.profitable_patterns = patterns
@@ -481,31 +644,29 @@ class TradingAnalytics:
     
     def get_most_profitable_symbols(self, trades):
         """获取最盈利的交易对"""
-        symbol_profits = {}
-        for trade in trades:
-            symbol = trade['symbol']
-            if symbol not in symbol_profits:
-                symbol_profits[symbol] = []
-            symbol_profits[symbol].append(trade['profit'])
-        
-        avg_profits = {
-            symbol: np.mean(profits) 
-            for symbol, profits in symbol_profits.items()
-        }
-        
-        return sorted(avg_profits.items(), key=lambda x: x[1], reverse=True)[:3]
+        avg_profits = trades.groupby('symbol', observed=True)['profit'].mean().nlargest(3)
+        return [(symbol, float(profit)) for symbol, profit in avg_profits.items()]
+    
+    def analyze_trend_correlation(self, trades):
+        """各趋势下的平均利润与胜率"""
+        grouped = trades.assign(win=trades['profit'] > 0).groupby('trend_label', observed=True)
+        summary = grouped.agg(avg_profit=('profit', 'mean'), win_rate=('win', 'mean'), trades=('profit', 'size'))
+        return {label: {'avg_profit': float(row['avg_profit']), 'win_rate': float(row['win_rate']),
+                        'trades': int(row['trades'])}
+                for label, row in summary.to_dict('index').items()}
     
-    def optimize_parameters(self):
+    def optimize_parameters(self, trades=None):
         """优化交易参数"""
+        trades = self.trade_frame() if trades is None else trades
         # 基于历史数据优化参数
-        if len(self.trade_history) > 1000:
+        if len(trades) > 1000:
             # 优化最小利润阈值
             profit_thresholds = np.arange(0.05, 0.3, 0.05)
             best_threshold = 0.1
             best_profit = 0
             
             for threshold in profit_thresholds:
-                simulated_profit = self.simulate_with_threshold(threshold)
+                simulated_profit = self.simulate_with_threshold(threshold, trades)
                 if simulated_profit > best_profit:
                     best_profit = simulated_profit
                     best_threshold = threshold
@@ -513,19 +674,21 @@ class TradingAnalytics:
             self.optimal_parameters['min_profit_threshold'] = best_threshold
             logger.info(f"📊 优化参数: 最佳利润阈值 = {best_threshold:.2f}%")
     
-    def simulate_with_threshold(self, threshold):
-        """模拟不同阈值的收益"""
-        # 简化的模拟逻辑
-        return np.random.uniform(100, 200) * threshold
+    def simulate_with_threshold(self, threshold, trades=None):
+        """回放历史交易：只保留成交时价差不低于阈值的交易，返回其总利润"""
+        trades = self.trade_frame() if trades is None else trades
+        return float(trades.loc[trades['spread_pct'] >= threshold, 'profit'].sum())
     
     def generate_analytics_report(self):
-        """生成分析报告"""
+        """生成分析报告（读取账本的累计聚合，O(1)）"""
+        summary = self.trades.summary()
         report = f"""
 📊 交易数据分析报告
 ==================
-📈 总交易次数: {len(self.trade_history)}
-💰 总利润: ${sum(t['profit'] for t in self.trade_history):.2f}
-⏱️ 平均执行时间: {np.mean([t['execution_time_ms'] for t in self.trade_history]):.1f}ms
+📈 总交易次数: {summary['count']}
+💰 总利润: ${summary['total_profit']:.2f}
+💸 总手续费: ${summary['total_fees']:.2f}
+⏱️ 平均执行时间: {summary['avg_execution_time_ms']:.1f}ms
 
 🕐 最佳交易时段:
 """
@@ -535,6 +698,7 @@ class TradingAnalytics:
         if self.profitable_patterns:
             report += f"\n\n💎 盈利模式:"
             report += f"\n  平均波动率: {self.profitable_patterns['avg_volatility']:.4f}"
+            report += f"\n  平均价差: {self.profitable_patterns['avg_spread_pct']:.4f}%"
             report += f"\n  最佳币种: {[s[0] for s in self.profitable_patterns['common_symbols']]}"
         
         if self.optimal_parameters:
@@ -545,37 +709,31 @@ class TradingAnalytics:
         return report
     
     def save_trade_history(self):
-        """保存交易历史"""
-        filename = f"data/trades_{datetime.now().strftime('%Y%m%d')}.json"
-        os.makedirs('data', exist_ok=True)
-        
-        with open(filename, 'w') as f:
-            import json
-            json.dump(self.trade_history[-1000:], f, default=str)
-    
-    def calculate_market_volatility(self):
-        """计算市场波动率"""
-        # 实际实现需要基于实时价格数据
-        return np.random.uniform(0.001, 0.01)
-    
-    def get_market_volume(self):
-        """获取市场成交量"""
-        # 实际实现需要从交易所获取
-        return np.random.uniform(1000000, 10000000)
-    
-    def identify_market_trend(self):
-        """识别市场趋势"""
-        # 简化版本
-        return np.random.choice(['bullish', 'bearish', 'sideways'])
+        """提交缓冲的交易记录，并清理超过保留期的数据"""
+        self.trades.flush()
+        self.store.flush()
+        cutoff = time.time() - self.analytics_config['data_retention_days'] * 86400
+        self.store.prune('trades', cutoff)
+    
+    def trade_summary(self, start=None, end=None, bucket_seconds=None):
+        """按时间范围汇总交易利润（count/sum/avg/min/max）"""
+        return self.store.aggregate('trades', 'profit', start=start, end=end,
+                                    bucket_seconds=bucket_seconds)
 
 # ===== 主程序 =====
 
 async def main():
     """主程序"""
+    # 配置日志（后台线程写盘，热路径只入队）；只在作为程序运行时配置，导入本模块不改动日志设置
+    configure_logging(json_file='logs/ultra_fast_arbitrage.jsonl')
+    
     # 创建各个系统实例
     arbitrage = UltraFastArbitrage()
     risk_mgmt = RiskManagementSystem()
-    analytics = TradingAnalytics()
+    analytics = TradingAnalytics(market_source=arbitrage)
+    arbitrage.risk_manager = risk_mgmt
+    arbitrage.risk_gate = risk_mgmt.gate
+    arbitrage.analytics = analytics
     
     logger.info("🚀 启动高级套利系统...")
     logger.info("⚡ WebSocket 超高速执行")
@@ -583,7 +741,11 @@ async def main():
     logger.info("📊 数据分析系统运行")
     
     # 运行系统
-    await arbitrage.run()
+    try:
+        await arbitrage.run()
+    finally:
+        analytics.save_trade_history()
+        analytics.store.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
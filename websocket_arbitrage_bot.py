@@ -5,31 +5,28 @@ WebSocket 实时套利机器人 v4.0
 """
 
 import asyncio
-import websockets
-import json
 import time
 import os
 import logging
-import aiohttp
 from datetime import datetime
 from dotenv import load_dotenv
 import requests
-from collections import defaultdict
-import orjson  # 高性能 JSON 解析
+
+from src.exchanges.clock_sync import ClockMonitor
+from src.exchanges.symbols import SymbolRegistry
+from src.exchanges.ws_connection import DeltaBook
+from src.exchanges.ws_shards import ShardedFeed
+from src.models import BookRecorder, depth_arbitrage
+from src.storage import SharedPriceCache
+from src.monitoring import (REGISTRY, BotMetrics, EventLogger, LatencyTracker, OpportunityTracker, Profiler,
+                            configure_logging)
 
 # 加载环境变量
 load_dotenv()
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/websocket_arbitrage.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
+# 高频事件按币种限流，被丢弃的条数记在下一条的 suppressed 字段
+events = EventLogger(logger).limit('opportunity', per_second=2).limit('opportunity_update', per_second=2)
 
 class WebSocketArbitrageBot:
     def __init__(self):
@@ -37,10 +34,15 @@ class WebSocketArbitrageBot:
         
         # 交易配置
         self.config = {
-            'symbols': ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'DOGE/USDT', 'XRP/USDT'],
+            # WS_SYMBOLS 可配置更大的币种池（逗号分隔），订阅会自动分片到多条连接
+            'symbols': [s.strip() for s in os.getenv('WS_SYMBOLS', '').split(',') if s.strip()]
+                       or ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'DOGE/USDT', 'XRP/USDT'],
             'min_profit_percentage': 0.005,
             'max_trade_amount': 50.0,
             'slippage_tolerance': 0.02,
+            'max_book_age': float(os.getenv('MAX_BOOK_AGE', 1.0)),  # 订单簿最大年龄（秒，交易所时间）
+            # 价差持续低于阈值多久才结束机会（秒），避免在阈值附近反复开启/通知
+            'opportunity_close_after': float(os.getenv('OPPORTUNITY_CLOSE_AFTER', 1.0)),
             'fees': {
                 'bitget': {'maker': 0.001, 'taker': 0.001},
                 'bybit': {'maker': 0.001, 'taker': 0.001}
@@ -49,13 +51,22 @@ class WebSocketArbitrageBot:
         
         # WebSocket URLs
         self.ws_urls = {
-            'bitget': 'wss://ws.bitget.com/spot/v1/stream',
-            'bybit': 'wss://stream.bybit.com/v5/public/spot'
+            'bitget': os.getenv('BITGET_WS_URL', 'wss://ws.bitget.com/spot/v1/stream'),
+            'bybit': os.getenv('BYBIT_WS_URL', 'wss://stream.bybit.com/v5/public/spot')
         }
         
-        # 价格数据存储
-        self.orderbooks = defaultdict(lambda: defaultdict(dict))
-        self.last_update = defaultdict(lambda: defaultdict(float))
+        # 币种注册表：规范名 <-> 各交易所原生名/频道 <-> 稠密整数 id，消息处理只做一次字典查找
+        self.symbols = SymbolRegistry.for_symbols(self.config['symbols'], ('bitget', 'bybit'))
+        self.bitget_ids = self.symbols.channel_ids('bitget')
+        self.bybit_topics = self.symbols.channel_ids('bybit', 'orderbook.50.{}')
+        
+        # 价格数据存储（按币种 id 索引，None 表示暂无可用订单簿）
+        n = len(self.symbols)
+        self.orderbooks = {'bitget': [None] * n, 'bybit': [None] * n}
+        self.last_update = {'bitget': [0.0] * n, 'bybit': [0.0] * n}
+        # Bybit 推送快照+增量，需要在本地维护完整的 50 档
+        self.bybit_books = [DeltaBook() for _ in range(n)]
+        self.bybit_resyncing = set()
         
         # 统计信息
         self.stats = {
@@ -63,8 +74,32 @@ class WebSocketArbitrageBot:
             'opportunities_found': 0,
             'trades_executed': 0,
             'start_time': datetime.now(),
-            'latency': defaultdict(list)
+            'latency': LatencyTracker()  # 按交易所/币种/阶段的延迟直方图
+        }
+        
+        # 结构化指标：/metrics (Prometheus)、/metrics.json、/latency
+        self.metrics = BotMetrics('websocket')
+        REGISTRY.register_latency(self.stats['latency'])
+        self.message_counters = {
+            'bitget': self.metrics.message_counter('bitget'),
+            'bybit': self.metrics.message_counter('bybit'),
         }
+        # 事件循环延迟、各协程占用时间，以及按信号触发的采样/cProfile（/profile）
+        self.profiler = Profiler('websocket')
+        
+        # 同一价差持续存在时只产生 开启/扩大/结束 事件，不再逐 tick 重复上报
+        self.opportunities = OpportunityTracker('websocket', close_after=self.config['opportunity_close_after'])
+        self.opportunities.subscribe(self._on_opportunity)
+        
+        # 行情连接
+        self.feeds = self._build_feeds()
+        # 各交易所时钟偏移与单向延迟（服务器时间接口 + 消息时间戳）
+        self.clock = ClockMonitor(self.feeds)
+        # 录制订单簿，供 build_fill_model.py 拟合滑点/成交概率模型
+        record_file = os.getenv('BOOK_RECORD_FILE')
+        self.recorder = BookRecorder(record_file) if record_file else None
+        # 共享价格缓存（PRICE_CACHE_URL，可选）：本进程作为行情入口，其他进程直接读取
+        self.price_cache = SharedPriceCache.from_env()
         
         # Telegram 通知
         self.telegram_enabled = os.getenv('TELEGRAM_ENABLED', 'false').lower() == 'true'
@@ -90,205 +125,246 @@ class WebSocketArbitrageBot:
         except Exception as e:
             logger.error(f"Telegram 发送失败: {e}")
     
+    def _build_feeds(self):
+        """创建分片的行情连接（断线重连、重新订阅、心跳检测，按消息速率在连接间均衡）"""
+        shards = int(os.getenv('WS_SHARDS', 0)) or None  # 默认按各交易所单连接上限自动分片
+        
+        def bitget_args(channels):
+            return [{"instType": "sp", "channel": "books5", "instId": inst_id} for inst_id in channels]
+        
+        bitget = ShardedFeed(
+            'bitget', self.ws_urls['bitget'], list(self.bitget_ids),
+            subscribe=lambda channels: [{"op": "subscribe", "args": bitget_args(channels)}],
+            unsubscribe=lambda channels: [{"op": "unsubscribe", "args": bitget_args(channels)}],
+            on_message=self.process_bitget_message,
+            channel_of=lambda data: data['arg'].get('instId') if 'data' in data and 'arg' in data else None,
+            on_disconnect=lambda channels: self._drop_books('bitget', channels),
+            ping_message='ping',
+            shards=shards,
+            timer=self.profiler.timed,
+        )
+        bybit = ShardedFeed(
+            'bybit', self.ws_urls['bybit'], list(self.bybit_topics),
+            subscribe=lambda topics: [{"op": "subscribe", "args": list(topics)}],
+            unsubscribe=lambda topics: [{"op": "unsubscribe", "args": list(topics)}],
+            on_message=self.process_bybit_message,
+            channel_of=lambda data: data.get('topic'),
+            on_disconnect=lambda topics: self._drop_books('bybit', topics),
+            ping_message='{"op": "ping"}',
+            shards=shards,
+            timer=self.profiler.timed,
+        )
+        return {'bitget': bitget, 'bybit': bybit}
+    
+    def _drop_books(self, exchange, channels):
+        """断线后丢弃该连接负责的订单簿，重连后等待新快照"""
+        # bitget: BTCUSDT; bybit: orderbook.50.BTCUSDT
+        ids = self.bitget_ids if exchange == 'bitget' else self.bybit_topics
+        for channel in channels:
+            symbol_id = ids.get(channel)
+            if symbol_id is None:
+                continue
+            self.orderbooks[exchange][symbol_id] = None
+            self.opportunities.close_symbol(self.symbols.symbols[symbol_id], 'disconnected')
+            if exchange == 'bybit':
+                self.bybit_books[symbol_id].reset()
+                self.bybit_resyncing.discard(symbol_id)
+    
     async def connect_bitget_ws(self):
-        """连接 Bitget WebSocket"""
-        try:
-            async with websockets.connect(self.ws_urls['bitget']) as ws:
-                logger.info("✅ Bitget WebSocket 已连接")
-                
-                # 订阅所需的交易对
-                subscribe_msg = {
-                    "op": "subscribe",
-                    "args": []
-                }
-                
-                for symbol in self.config['symbols']:
-                    base, quote = symbol.split('/')
-                    bitget_symbol = f"{base}{quote}"
-                    subscribe_msg["args"].append({
-                        "instType": "sp",
-                        "channel": "books5",
-                        "instId": bitget_symbol
-                    })
-                
-                await ws.send(json.dumps(subscribe_msg))
-                
-                # 接收数据
-                while True:
-                    try:
-                        message = await asyncio.wait_for(ws.recv(), timeout=30)
-                        await self.process_bitget_message(orjson.loads(message))
-                    except asyncio.TimeoutError:
-                        # 发送 ping 保持连接
-                        await ws.send('ping')
-                    except Exception as e:
-                        logger.error(f"Bitget 消息处理错误: {e}")
-                        
-        except Exception as e:
-            logger.error(f"Bitget WebSocket 连接错误: {e}")
-            await asyncio.sleep(5)  # 重连延迟
-            asyncio.create_task(self.connect_bitget_ws())  # 重新连接
+        """连接 Bitget WebSocket（直到停止）"""
+        await self.feeds['bitget'].run()
     
     async def connect_bybit_ws(self):
-        """连接 Bybit WebSocket"""
-        try:
-            async with websockets.connect(self.ws_urls['bybit']) as ws:
-                logger.info("✅ Bybit WebSocket 已连接")
-                
-                # 订阅所需的交易对
-                for symbol in self.config['symbols']:
-                    base, quote = symbol.split('/')
-                    bybit_symbol = f"{base}{quote}"
-                    
-                    subscribe_msg = {
-                        "op": "subscribe",
-                        "args": [f"orderbook.50.{bybit_symbol}"]
-                    }
-                    
-                    await ws.send(json.dumps(subscribe_msg))
-                
-                # 接收数据
-                while True:
-                    try:
-                        message = await asyncio.wait_for(ws.recv(), timeout=30)
-                        await self.process_bybit_message(orjson.loads(message))
-                    except asyncio.TimeoutError:
-                        # 发送 ping 保持连接
-                        await ws.send('{"op": "ping"}')
-                    except Exception as e:
-                        logger.error(f"Bybit 消息处理错误: {e}")
-                        
-        except Exception as e:
-            logger.error(f"Bybit WebSocket 连接错误: {e}")
-            await asyncio.sleep(5)
-            asyncio.create_task(self.connect_bybit_ws())
+        """连接 Bybit WebSocket（直到停止）"""
+        await self.feeds['bybit'].run()
     
-    async def process_bitget_message(self, data):
+    async def process_bitget_message(self, data, recv_wall=None, recv_ns=None, decoded_ns=None):
         """处理 Bitget WebSocket 消息"""
         if data.get('action') == 'snapshot' or data.get('action') == 'update':
             if 'data' in data:
                 for item in data['data']:
-                    symbol = item['instId']
-                    # 转换为标准格式
-                    if 'USDT' in symbol:
-                        base = symbol.replace('USDT', '')
-                        std_symbol = f"{base}/USDT"
-                        
-                        # 更新订单簿
-                        self.orderbooks['bitget'][std_symbol] = {
-                            'bids': [[float(bid[0]), float(bid[1])] for bid in item.get('bids', [])[:5]],
-                            'asks': [[float(ask[0]), float(ask[1])] for ask in item.get('asks', [])[:5]],
-                            'timestamp': time.time()
-                        }
-                        
-                        self.last_update['bitget'][std_symbol] = time.time()
-                        self.stats['ws_messages_received'] += 1
-                        
-                        # 检查套利机会
-                        await self.check_arbitrage_opportunity(std_symbol)
-    
-    async def process_bybit_message(self, data):
-        """处理 Bybit WebSocket 消息"""
-        if data.get('topic') and data.get('topic').startswith('orderbook'):
-            if 'data' in data:
-                symbol_raw = data['topic'].split('.')[-1]
-                # 转换为标准格式
-                if 'USDT' in symbol_raw:
-                    base = symbol_raw.replace('USDT', '')
-                    std_symbol = f"{base}/USDT"
+                    # 原生 instId -> 币种 id（未注册的交易对直接跳过）
+                    symbol_id = self.bitget_ids.get(item['instId'])
+                    if symbol_id is None:
+                        continue
+                    std_symbol = self.symbols.symbols[symbol_id]
+                    
+                    # 交易所时间戳换算到本地时钟（已校正时钟偏移）
+                    recv_time = recv_wall if recv_wall is not None else time.time()
+                    exchange_time = self.clock.observe('bitget', item.get('ts'), recv_time)
                     
                     # 更新订单簿
-                    orderbook_data = data['data']
-                    self.orderbooks['bybit'][std_symbol] = {
-                        'bids': [[float(bid[0]), float(bid[1])] for bid in orderbook_data.get('b', [])[:5]],
-                        'asks': [[float(ask[0]), float(ask[1])] for ask in orderbook_data.get('a', [])[:5]],
-                        'timestamp': time.time()
+                    self.orderbooks['bitget'][symbol_id] = {
+                        'bids': [[float(bid[0]), float(bid[1])] for bid in item.get('bids', [])[:5]],
+                        'asks': [[float(ask[0]), float(ask[1])] for ask in item.get('asks', [])[:5]],
+                        'timestamp': recv_time,
+                        'exchange_time': exchange_time
                     }
                     
-                    self.last_update['bybit'][std_symbol] = time.time()
+                    self.last_update['bitget'][symbol_id] = time.time()
+                    if self.recorder is not None:
+                        self.recorder.record('bitget', std_symbol, exchange_time * 1000,
+                                             item.get('bids', [])[:5], item.get('asks', [])[:5])
+                    if self.price_cache is not None:
+                        book = self.orderbooks['bitget'][symbol_id]
+                        self.price_cache.update('bitget', std_symbol, book['bids'], book['asks'], exchange_time)
                     self.stats['ws_messages_received'] += 1
+                    self.message_counters['bitget'].inc()
+                    book_ns = time.perf_counter_ns()
                     
                     # 检查套利机会
-                    await self.check_arbitrage_opportunity(std_symbol)
+                    await self.check_arbitrage_opportunity(symbol_id)
+                    
+                    if recv_ns is not None:
+                        self.stats['latency'].record_message(
+                            'bitget', std_symbol, exchange_time * 1000 if item.get('ts') else None,
+                            recv_wall, recv_ns, decoded_ns, book_ns, time.perf_counter_ns()
+                        )
     
-    async def check_arbitrage_opportunity(self, symbol):
-        """检查套利机会（超快速版本）"""
+    async def process_bybit_message(self, data, recv_wall=None, recv_ns=None, decoded_ns=None):
+        """处理 Bybit WebSocket 消息"""
+        # 订阅时预先计算 topic -> 币种 id，不再逐条拆分 topic 字符串
+        symbol_id = self.bybit_topics.get(data.get('topic'))
+        if symbol_id is None or 'data' not in data:
+            return
+        std_symbol = self.symbols.symbols[symbol_id]
+        
+        # orderbook.50 先推快照再推增量；u=1 表示服务端重置，按快照处理
+        orderbook_data = data['data']
+        book = self.bybit_books[symbol_id]
+        if data.get('type') == 'snapshot' or orderbook_data.get('u') == 1:
+            book.apply_snapshot(orderbook_data.get('b', []), orderbook_data.get('a', []),
+                                orderbook_data.get('u'))
+            self.bybit_resyncing.discard(symbol_id)
+        else:
+            applied = book.apply_delta(orderbook_data.get('b', []), orderbook_data.get('a', []),
+                                       orderbook_data.get('u'))
+            if applied is None:
+                # 重复或过期的增量（如频道迁移期间两条连接同时推送）：订单簿未变化，不再重复处理
+                return
+            if not applied:
+                # 没有快照的增量无法使用，重新订阅以获取快照（每个币种只请求一次）
+                if symbol_id not in self.bybit_resyncing:
+                    self.bybit_resyncing.add(symbol_id)
+                    await self.feeds['bybit'].resubscribe([data['topic']])
+                return
+        
+        # 交易所时间戳换算到本地时钟（已校正时钟偏移）
+        recv_time = recv_wall if recv_wall is not None else time.time()
+        exchange_time = self.clock.observe('bybit', data.get('ts'), recv_time)
+        
+        # 更新订单簿（前 5 档）
+        bids, asks = book.top(5)
+        self.orderbooks['bybit'][symbol_id] = {
+            'bids': bids,
+            'asks': asks,
+            'timestamp': recv_time,
+            'exchange_time': exchange_time
+        }
+        
+        self.last_update['bybit'][symbol_id] = time.time()
+        if self.recorder is not None:
+            self.recorder.record('bybit', std_symbol, exchange_time * 1000, bids, asks)
+        if self.price_cache is not None:
+            self.price_cache.update('bybit', std_symbol, bids, asks, exchange_time)
+        self.stats['ws_messages_received'] += 1
+        self.message_counters['bybit'].inc()
+        book_ns = time.perf_counter_ns()
+        
+        # 检查套利机会
+        await self.check_arbitrage_opportunity(symbol_id)
+        
+        if recv_ns is not None:
+            self.stats['latency'].record_message(
+                'bybit', std_symbol, exchange_time * 1000 if data.get('ts') else None,
+                recv_wall, recv_ns, decoded_ns, book_ns, time.perf_counter_ns()
+            )
+    
+    async def check_arbitrage_opportunity(self, symbol_id):
+        """检查套利机会（超快速版本，按币种 id 读取两侧订单簿）"""
+        bitget_book = self.orderbooks['bitget'][symbol_id]
+        bybit_book = self.orderbooks['bybit'][symbol_id]
+        symbol = self.symbols.symbols[symbol_id]
         
         # 确保两个交易所都有数据
-        if symbol not in self.orderbooks['bitget'] or symbol not in self.orderbooks['bybit']:
+        if bitget_book is None or bybit_book is None:
             return
         
-        # 检查数据新鲜度（1秒内）
+        # 检查数据新鲜度：按校正后的交易所时间计算，而非本地接收时间
         current_time = time.time()
-        if (current_time - self.orderbooks['bitget'][symbol]['timestamp'] > 1 or 
-            current_time - self.orderbooks['bybit'][symbol]['timestamp'] > 1):
+        max_age = self.config['max_book_age']
+        if (current_time - bitget_book['exchange_time'] > max_age or 
+            current_time - bybit_book['exchange_time'] > max_age):
+            if self.opportunities.active:
+                self.opportunities.close_symbol(symbol, 'stale', current_time)
             return
         
-        bitget_book = self.orderbooks['bitget'][symbol]
-        bybit_book = self.orderbooks['bybit'][symbol]
-        
         if not bitget_book['bids'] or not bitget_book['asks'] or not bybit_book['bids'] or not bybit_book['asks']:
             return
         
-        # 计算套利机会
-        opportunities = []
-        
-        # 场景1: Bitget买入 -> Bybit卖出
-        bitget_ask = bitget_book['asks'][0][0]  # Bitget 卖价
-        bybit_bid = bybit_book['bids'][0][0]    # Bybit 买价
-        
-        profit_percentage = ((bybit_bid - bitget_ask) / bitget_ask - 
-                           self.config['fees']['bitget']['taker'] - 
-                           self.config['fees']['bybit']['taker']) * 100
-        
-        if profit_percentage > self.config['min_profit_percentage']:
-            opportunities.append({
-                'direction': 'Bitget → Bybit',
-                'buy_price': bitget_ask,
-                'sell_price': bybit_bid,
-                'profit_percentage': profit_percentage,
-                'symbol': symbol
-            })
-        
-        # 场景2: Bybit买入 -> Bitget卖出
-        bybit_ask = bybit_book['asks'][0][0]    # Bybit 卖价
-        bitget_bid = bitget_book['bids'][0][0]  # Bitget 买价
-        
-        profit_percentage = ((bitget_bid - bybit_ask) / bybit_ask - 
-                           self.config['fees']['bybit']['taker'] - 
-                           self.config['fees']['bitget']['taker']) * 100
-        
-        if profit_percentage > self.config['min_profit_percentage']:
-            opportunities.append({
-                'direction': 'Bybit → Bitget',
-                'buy_price': bybit_ask,
-                'sell_price': bitget_bid,
-                'profit_percentage': profit_percentage,
-                'symbol': symbol
-            })
-        
-        # 发现机会时的处理
-        for opp in opportunities:
-            self.stats['opportunities_found'] += 1
-            
-            logger.info(f"🎯 发现套利机会! {symbol} {opp['direction']} "
-                       f"利润率: {opp['profit_percentage']:.3f}%")
-            
-            # 发送通知
-            if self.stats['opportunities_found'] % 10 == 1:  # 每10个机会通知一次
-                message = f"""
+        # 计算套利机会：沿两侧 5 档深度求最优数量与成交均价（最优一档不交叉时立即返回）
+        books = {'bitget': bitget_book, 'bybit': bybit_book}
+        
+        for buy_venue, sell_venue in (('bitget', 'bybit'), ('bybit', 'bitget')):
+            cross = depth_arbitrage(
+                books[buy_venue]['asks'], books[sell_venue]['bids'],
+                self.config['fees'][buy_venue]['taker'], self.config['fees'][sell_venue]['taker'],
+                max_notional=self.config['max_trade_amount']
+            )
+            # 交给机会跟踪器去重，下游只收到生命周期事件
+            if cross is not None and cross.profit_percentage > self.config['min_profit_percentage']:
+                self.opportunities.observe(
+                    symbol, buy_venue, sell_venue, cross.profit_percentage, current_time,
+                    buy_price=cross.buy_price, sell_price=cross.sell_price, quantity=cross.quantity
+                )
+            else:
+                self.opportunities.clear(symbol, buy_venue, sell_venue, current_time)
+    
+    def _on_opportunity(self, event, opp):
+        """机会生命周期事件：开启时计数、记录并通知，扩大/结束时只记录"""
+        symbol = opp.symbol
+        direction = f"{opp.buy_venue.capitalize()} → {opp.sell_venue.capitalize()}"
+        
+        if event == 'update':
+            events.info('opportunity_update', "📈 套利机会扩大: {symbol} {direction} 峰值利润率: {profit_pct:.3f}%",
+                        key=symbol, symbol=symbol, direction=direction, profit_pct=opp.peak_pct,
+                        **opp.details)
+            return
+        
+        if event == 'close':
+            events.info('opportunity_closed', "⌛ 套利机会结束: {symbol} {direction} 持续 {duration:.2f}s | "
+                        "峰值 {peak_pct:.3f}% | 均值 {average_pct:.3f}% | {ticks} 次报价 ({reason})",
+                        symbol=symbol, direction=direction, duration=opp.duration, peak_pct=opp.peak_pct,
+                        average_pct=opp.average_pct, ticks=opp.ticks, reason=opp.close_reason)
+            return
+        
+        self.stats['opportunities_found'] += 1
+        self.metrics.opportunity(symbol)
+        
+        events.info('opportunity', "🎯 发现套利机会! {symbol} {direction} 利润率: {profit_pct:.3f}%",
+                    key=symbol, symbol=symbol, direction=direction, profit_pct=opp.last_pct, **opp.details)
+        
+        # 发送通知（每个新机会一次）
+        message = f"""
 ⚡ <b>WebSocket 实时套利机会!</b>
 
 💎 <b>币种</b>: {symbol}
-📊 <b>方向</b>: {opp['direction']}
-💰 <b>利润率</b>: {opp['profit_percentage']:.3f}%
-📈 <b>买入</b>: ${opp['buy_price']:.2f}
-📉 <b>卖出</b>: ${opp['sell_price']:.2f}
+📊 <b>方向</b>: {direction}
+💰 <b>利润率</b>: {opp.last_pct:.3f}%
+📈 <b>买入</b>: ${opp.details['buy_price']:.2f}
+📉 <b>卖出</b>: ${opp.details['sell_price']:.2f}
 
 ⏱️ <b>延迟</b>: <0.1秒
 🎯 <b>累计发现</b>: {self.stats['opportunities_found']}个机会
 """
-                self._send_telegram(message)
+        self._send_telegram(message)
+    
+    async def expire_opportunities(self):
+        """短周期结束已过宽限期或行情停止更新的机会（不依赖下一笔行情）"""
+        interval = max(self.opportunities.close_after / 2, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            self.opportunities.expire()
     
     async def print_statistics(self):
         """定期打印统计信息"""
@@ -301,20 +377,47 @@ class WebSocketArbitrageBot:
             logger.info(f"⚡ WebSocket 实时监控统计")
             logger.info(f"⏱️ 运行时间: {runtime}")
             logger.info(f"📨 接收消息: {self.stats['ws_messages_received']}")
-            logger.info(f"🎯 发现机会: {self.stats['opportunities_found']}")
+            tracker = self.opportunities.stats
+            logger.info(f"🎯 发现机会: {self.stats['opportunities_found']} (进行中 {len(self.opportunities.active)}, "
+                        f"已结束 {tracker['closed']}, 确认报价 {tracker['ticks']} 次)")
             logger.info(f"📊 消息速率: {self.stats['ws_messages_received'] / runtime.total_seconds():.1f}/秒")
+            for name, feed in self.feeds.items():
+                recovery = feed.stats['last_recovery_seconds']
+                logger.info(f"🔌 {name}: {feed.stats['shards']} 条连接, 重连 {feed.stats['reconnects']} 次, "
+                            f"静默频道 {feed.stats['stale_channels']} 次, 重新均衡 {feed.stats['rebalances']} 次"
+                            + (f", 最近恢复 {recovery:.2f}s" if recovery is not None else ""))
+            for row in self.clock.summary():
+                logger.info(f"🕐 {row['venue']}: 时钟偏移 {row['offset_ms']:+.1f}ms, 单向延迟 {row['latency_ms']:.1f}ms"
+                            + (f", 探测 RTT {row['rtt_ms']:.1f}ms" if row['rtt_ms'] is not None else ", 未同步"))
+            logger.info("⏱️ 延迟分布 (最近 60 秒):")
+            for line in self.stats['latency'].format_summary():
+                logger.info(f"   {line}")
+            self.stats['latency'].reset()
+            logger.info("🔬 事件循环 / 协程占用 (最近 60 秒):")
+            for line in self.profiler.format_summary():
+                logger.info(f"   {line}")
+            self.profiler.reset()
             logger.info("="*50)
     
     async def run(self):
         """运行 WebSocket 套利机器人"""
         logger.info("🎯 启动 WebSocket 连接...")
         
-        # 创建并发任务
+        await self.metrics.start_server({'/latency': self.stats['latency'].http_handler,
+                                         '/profile': self.profiler.http_handler})
+        self.profiler.install_signals()
+        
+        # 创建并发任务（各行情分片由 ShardedFeed 按协程计时，统计每一步占用事件循环的时间）
         tasks = [
             asyncio.create_task(self.connect_bitget_ws()),
             asyncio.create_task(self.connect_bybit_ws()),
-            asyncio.create_task(self.print_statistics())
+            asyncio.create_task(self.clock.run()),
+            asyncio.create_task(self.print_statistics()),
+            asyncio.create_task(self.expire_opportunities()),
+            asyncio.create_task(self.profiler.watch_loop())
         ]
+        if self.price_cache is not None:
+            tasks.append(asyncio.create_task(self.price_cache.run()))
         
         # 等待所有任务
         try:
@@ -325,9 +428,15 @@ class WebSocketArbitrageBot:
         except Exception as e:
             logger.error(f"❌ 运行错误: {e}")
             self._send_telegram(f"❌ WebSocket 机器人异常: {str(e)}")
+        finally:
+            self.opportunities.close_all()
+            if self.recorder is not None:
+                self.recorder.close()
 
 async def main():
     """主函数"""
+    # 配置日志（后台线程写盘，热路径只入队）；只在作为程序运行时配置，导入本模块不改动日志设置
+    configure_logging('logs/websocket_arbitrage.log', json_file='logs/websocket_arbitrage.jsonl')
     
     # 安装必要的包
     try: